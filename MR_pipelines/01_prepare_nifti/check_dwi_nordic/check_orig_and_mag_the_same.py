@@ -1,13 +1,19 @@
 from pathlib import Path
-import nibabel as nib
-import numpy as np
+
+from launchcontainers.quality_control.nii_compare import compare_many
 
 bids_dir = Path('/bcbl/home/public/Gari/VOTCLOC/main_exp/raw_nifti/sub-11/ses-10/dwi')
 
+pairs = []
 for mag in bids_dir.rglob("*magnitude.nii.gz"):
     if 'orig' in mag.name:
         continue
     orig = mag.parent / mag.name.replace('magnitude.nii.gz', 'magnitude_orig.nii.gz')
     if orig.exists():
-        same = np.allclose(nib.load(mag).get_fdata(), nib.load(orig).get_fdata())
-        print(f"{'✓' if same else '✗'} {mag.name}: {'same' if same else 'DIFFERENT'}")
\ No newline at end of file
+        pairs.append((mag, orig))
+
+# np.allclose tolerances, streamed chunk by chunk and stopping at the first difference
+results = compare_many(pairs, n_workers=4, rtol=1e-5, atol=1e-8, early_exit=True)
+for (mag, _), r in zip(pairs, results):
+    same = r.data_equal and not r.error
+    print(f"{'✓' if same else '✗'} {mag.name}: {'same' if same else 'DIFFERENT'}")
@@ -5,87 +5,152 @@ Check whether two NIfTI files are identical.
 
 Checks:
   1. Header fields (shape, zooms, affine, data type)
-  2. Voxel data (exact array equality, and if not: max absolute difference)
+  2. Voxel data, streamed in chunks in the stored dtype
+     (launchcontainers.quality_control.nii_compare): exact comparison stops
+     at the first difference; with --atol/--rtol the number of voxels out of
+     tolerance and the max / mean absolute difference are reported.
 
 Usage:
   python compare_nii.py file_a.nii.gz file_b.nii.gz
+  python compare_nii.py file_a.nii.gz file_b.nii.gz --atol 0      # exact, with diff stats
+  python compare_nii.py file_a.nii.gz file_b.nii.gz --rtol 1e-5 --atol 1e-8
+  python compare_nii.py file_a.nii.gz file_b.nii.gz --hash        # voxel-content hashes
+  python compare_nii.py --manifest pairs.csv -j 8 [--out results.csv]
 """
 
+import csv
 import sys
-import numpy as np
-import nibabel as nib
+from pathlib import Path
+from typing import Optional
 
+import typer
 
-def compare(path_a: str, path_b: str) -> None:
-    img_a = nib.load(path_a)
-    img_b = nib.load(path_b)
+from launchcontainers.quality_control.nii_compare import (
+    compare_many,
+    compare_nii,
+    read_manifest,
+    voxel_hash,
+)
 
-    ok = True
 
-    # --- shape ---
-    if img_a.shape != img_b.shape:
-        print(f"  DIFFER  shape:  {img_a.shape}  vs  {img_b.shape}")
-        ok = False
-    else:
-        print(f"  OK      shape:  {img_a.shape}")
-
-    # --- data type ---
-    if img_a.get_data_dtype() != img_b.get_data_dtype():
-        print(
-            f"  DIFFER  dtype:  {img_a.get_data_dtype()}  vs  {img_b.get_data_dtype()}"
-        )
-        ok = False
-    else:
-        print(f"  OK      dtype:  {img_a.get_data_dtype()}")
-
-    # --- zooms ---
-    if not np.allclose(img_a.header.get_zooms(), img_b.header.get_zooms()):
-        print(
-            f"  DIFFER  zooms:  {img_a.header.get_zooms()}  vs  {img_b.header.get_zooms()}"
-        )
-        ok = False
-    else:
-        print(f"  OK      zooms:  {img_a.header.get_zooms()}")
-
-    # --- affine ---
-    if not np.allclose(img_a.affine, img_b.affine):
-        print("  DIFFER  affine")
-        print(f"    A:\n{img_a.affine}")
-        print(f"    B:\n{img_b.affine}")
-        ok = False
-    else:
-        print("  OK      affine")
-
-    # --- voxel data ---
-    data_a = img_a.get_fdata()
-    data_b = img_b.get_fdata()
-
-    if data_a.shape != data_b.shape:
-        print("  DIFFER  data shape mismatch — cannot compare voxels")
-        ok = False
-    else:
-        if np.array_equal(data_a, data_b):
-            print("  OK      voxel data: exactly identical")
-        else:
-            diff = np.abs(data_a - data_b)
-            n_differ = np.sum(diff > 0)
-            print(f"  DIFFER  voxel data: {n_differ} voxels differ")
-            print(f"          max |diff| = {diff.max():.6g}")
-            print(f"          mean|diff| (nonzero) = {diff[diff > 0].mean():.6g}")
-            ok = False
+def compare(
+    path_a: str,
+    path_b: str,
+    atol: Optional[float] = None,
+    rtol: Optional[float] = None,
+) -> bool:
+    result = compare_nii(path_a, path_b, atol=atol, rtol=rtol)
+    for line in result.report():
+        print(line)
 
     print()
-    if ok:
+    if result.identical:
         print("RESULT: IDENTICAL")
     else:
         print("RESULT: DIFFERENT")
+    return result.identical
 
 
-if __name__ == "__main__":
-    if len(sys.argv) != 3:
+def compare_manifest(
+    manifest: Path,
+    atol: Optional[float] = None,
+    rtol: Optional[float] = None,
+    n_workers: int = 8,
+    out_csv: Optional[Path] = None,
+) -> int:
+    """Compare every (a, b) pair of a manifest; return the number of differing pairs."""
+    pairs = read_manifest(manifest)
+    print(f"Comparing {len(pairs)} pairs with {n_workers} workers...")
+    results = compare_many(pairs, n_workers=n_workers, atol=atol, rtol=rtol)
+
+    n_diff = 0
+    for r in results:
+        if r.identical:
+            continue
+        n_diff += 1
+        print(f"\nA: {r.path_a}\nB: {r.path_b}")
+        for line in r.report():
+            print(line)
+    print(f"\n{len(results) - n_diff}/{len(results)} pairs identical")
+
+    if out_csv:
+        with open(out_csv, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(
+                [
+                    "path_a",
+                    "path_b",
+                    "identical",
+                    "header_equal",
+                    "data_equal",
+                    "n_differ",
+                    "max_abs_diff",
+                    "mean_abs_diff",
+                    "first_diff",
+                    "error",
+                ]
+            )
+            for r in results:
+                writer.writerow(
+                    [
+                        r.path_a,
+                        r.path_b,
+                        r.identical,
+                        r.header_equal,
+                        r.data_equal,
+                        r.n_differ,
+                        r.max_abs_diff,
+                        r.mean_abs_diff,
+                        r.first_diff,
+                        r.error,
+                    ]
+                )
+        print(f"Results written to {out_csv}")
+    return n_diff
+
+
+def main(
+    files: Optional[list[Path]] = typer.Argument(
+        None, help="file_a.nii.gz file_b.nii.gz"
+    ),
+    atol: Optional[float] = typer.Option(
+        None, "--atol", help="Absolute tolerance (enables diff statistics)."
+    ),
+    rtol: Optional[float] = typer.Option(
+        None, "--rtol", help="Relative tolerance (np.allclose rule)."
+    ),
+    hash_only: bool = typer.Option(
+        False, "--hash", help="Print voxel-content hashes instead."
+    ),
+    manifest: Optional[Path] = typer.Option(
+        None, "--manifest", "-m", help="CSV/TSV of path_a,path_b pairs."
+    ),
+    n_workers: int = typer.Option(
+        8, "--workers", "-j", help="Pairs compared in parallel."
+    ),
+    out_csv: Optional[Path] = typer.Option(
+        None, "--out", help="Write manifest results to this CSV."
+    ),
+):
+    if manifest is not None:
+        n_diff = compare_manifest(manifest, atol, rtol, n_workers, out_csv)
+        sys.exit(1 if n_diff else 0)
+
+    if not files or len(files) != 2:
         print("Usage: python compare_nii.py file_a.nii.gz file_b.nii.gz")
         sys.exit(1)
-    print(f"A: {sys.argv[1]}")
-    print(f"B: {sys.argv[2]}")
+
+    if hash_only:
+        for f in files:
+            print(f"{voxel_hash(f)}  {f}")
+        return
+
+    print(f"A: {files[0]}")
+    print(f"B: {files[1]}")
     print()
-    compare(sys.argv[1], sys.argv[2])
+    identical = compare(str(files[0]), str(files[1]), atol=atol, rtol=rtol)
+    sys.exit(0 if identical else 1)
+
+
+if __name__ == "__main__":
+    typer.run(main)
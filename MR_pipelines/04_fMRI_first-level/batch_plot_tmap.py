@@ -11,6 +11,7 @@ import matplotlib.pyplot as plt
 import nibabel.freesurfer as fs
 import nibabel as nib
 from nilearn import plotting
+from nilearn.plotting.cm import mix_colormaps
 import numpy as np
 import nilearn.surface as surf
 from nilearn.surface import load_surf_data
@@ -25,205 +26,191 @@ matplotlib.use('Agg')
 app = typer.Typer()
 
 
-def plot_tmap_surface_lateral(tmap_file,
-                    hemi,
-                    path_to_sub_fs, 
-                    out_dir,
-                    threshold=0,
-                    path_to_ROI=None,
-                    elev=-30,
-                    azimuth=180,
-                    vmin=0,
-                    vmax=20):
-    """
-    Plot a single t-map surface visualization - LATERAL view.
-    Returns: (tmap_file, output_file, success)
-    """
-    try:
-        # tmap_file parse name
-        name = tmap_file.name.replace('.func.gii', '')
-        
-        ## below is the plot
-        surf_data = load_surf_data(tmap_file)
-        if hemi == 'L':
-            # surf_mesh
-            fs_inflated = f'{path_to_sub_fs}/surf/lh.inflated'
-            # background
-            fs_curv = fs.read_morph_data(f'{path_to_sub_fs}/surf/lh.curv')
-            fs_curv_sign = np.sign(fs_curv)
-            fs_sulc = fs.read_morph_data(f'{path_to_sub_fs}/surf/lh.sulc')
-        else:
-            # surf_mesh
-            fs_inflated = f'{path_to_sub_fs}/surf/rh.inflated'
-            # background
-            fs_curv = fs.read_morph_data(f'{path_to_sub_fs}/surf/rh.curv')
-            fs_curv_sign = np.sign(fs_curv)
-            fs_sulc = fs.read_morph_data(f'{path_to_sub_fs}/surf/rh.sulc')
+# t-maps per submitted job; a worker plots a whole chunk with one mesh and
+# one set of figures
+MAPS_PER_JOB = 25
 
-        # load ROI to plot as contours
-        if path_to_ROI:
-            votc_annot = fs.read_annot(path_to_ROI)
+# how many subjects' meshes/figures a worker keeps around
+N_CACHED_SUBJECTS = 2
 
-        # title
-        title = f"{name}"
 
-        # set view point
-        elva, azimuth_angle = elev, azimuth
+class SurfacePlotter:
+    '''
+    Plots t-maps of one subject/hemisphere without re-reading or re-building anything.
 
-        # storage setting
-        if threshold > 0:
-            # filename
-            figure_name = f'lateral_{name}_Tthresh-{threshold}.png'
-            output_file = os.path.join(out_dir, figure_name)
-            fig = plotting.plot_surf_stat_map(
-                fs_inflated, 
-                surf_data,
-                vmin=threshold, vmax=vmax,
-                bg_map=fs_curv_sign, bg_on_data=True,
-                cmap='jet', colorbar=True,
-                symmetric_cbar=False,
-                threshold=threshold,
-                darkness=.5, 
-                view=(elva, azimuth_angle),
-                engine='matplotlib', 
-            )
-        else:
-            figure_name = f'lateral_{name}_orig.png'
-            output_file = os.path.join(out_dir, figure_name)
+    The inflated mesh and the curvature background are read once. Each
+    (view, threshold, vmin, vmax) gets one figure, built by nilearn the
+    first time it is needed (mesh, view, colorbar); every t-map after that
+    only recolours the faces of that figure before saving it, following
+    nilearn's matplotlib surface renderer (mean over faces, threshold,
+    cmap, alpha .7 on top of the background).
+    '''
+
+    def __init__(self, path_to_sub_fs, hemi, cmap='jet', darkness=.5):
+        prefix = 'lh' if hemi == 'L' else 'rh'
+        coords, faces = surf.load_surf_mesh(f'{path_to_sub_fs}/surf/{prefix}.inflated')
+        self.coords = np.asarray(coords) - np.mean(coords, axis=0)
+        self.faces = np.asarray(faces)
+        self.cmap = plt.get_cmap(cmap)
+        # background: sign of the curvature, averaged over faces, in gray
+        fs_curv_sign = np.sign(fs.read_morph_data(f'{path_to_sub_fs}/surf/{prefix}.curv'))
+        self.bg_map = fs_curv_sign
+        bg_faces = fs_curv_sign[self.faces].mean(axis=1)
+        bg_vmin, bg_vmax = bg_faces.min(), bg_faces.max()
+        if bg_vmin < 0 or bg_vmax > 1:
+            bg_faces = matplotlib.colors.Normalize(vmin=bg_vmin, vmax=bg_vmax)(bg_faces)
+        if darkness is not None:
+            bg_faces = bg_faces * darkness
+        self.bg_colors = plt.cm.gray_r(np.asarray(bg_faces))
+        self._figures = {}
+
+    def face_colors(self, surf_data, vmin, vmax, threshold):
+        '''RGBA per face of *surf_data* over the background.'''
+        data_faces = np.asarray(surf_data, dtype=float)[self.faces].mean(axis=1)
+        kept = np.abs(data_faces) >= threshold
+        if vmin > -threshold:
+            kept &= data_faces >= vmin
+        if vmax < threshold:
+            kept &= data_faces <= vmax
+        overlay = self.cmap((data_faces - vmin) / (vmax - vmin))
+        overlay[~kept, 3] = 0
+        overlay[kept, 3] = 0.7
+        colors = mix_colormaps(overlay, self.bg_colors)
+        colors[colors > 1] = 1
+        return colors
+
+    def _figure(self, surf_data, elev, azimuth, vmin, vmax, threshold):
+        key = (elev, azimuth, vmin, vmax, threshold)
+        if key not in self._figures:
             fig = plotting.plot_surf_stat_map(
-                fs_inflated, 
+                (self.coords.copy(), self.faces),
                 surf_data,
                 vmin=vmin, vmax=vmax,
-                bg_map=fs_curv_sign, bg_on_data=True,
-                cmap='jet', colorbar=True,
+                bg_map=self.bg_map, bg_on_data=True,
+                cmap=self.cmap, colorbar=True,
                 symmetric_cbar=False,
-                darkness=.5, 
-                threshold=0.01,
-                view=(elva, azimuth_angle),
-                engine='matplotlib', 
+                threshold=threshold,
+                view=(elev, azimuth),
+                engine='matplotlib',
             )
+            mesh = fig.axes[0].collections[0]
+            self._figures[key] = (fig, mesh)
+        return self._figures[key]
 
+    def plot(self, surf_data, output_file, elev, azimuth, vmin, vmax, threshold):
+        fig, mesh = self._figure(surf_data, elev, azimuth, vmin, vmax, threshold)
+        colors = self.face_colors(surf_data, vmin, vmax, threshold)
+        mesh.set_facecolors(colors)
+        mesh.set_edgecolors(colors)
         fig.savefig(output_file, dpi=150, bbox_inches='tight')
-        plt.close(fig)
-        
-        return (str(tmap_file), str(output_file), True)
-    
-    except Exception as e:
-        return (str(tmap_file), str(e), False)
+
+    def close(self):
+        for fig, _ in self._figures.values():
+            plt.close(fig)
+        self._figures = {}
+
+
+# per-worker plotters, most recently used last
+_PLOTTERS = {}
 
 
-def plot_tmap_surface_basal(tmap_file, 
+def get_plotter(path_to_sub_fs, hemi):
+    '''The (cached) SurfacePlotter of this subject/hemisphere in this worker.'''
+    key = (str(path_to_sub_fs), hemi)
+    plotter = _PLOTTERS.pop(key, None)
+    if plotter is None:
+        plotter = SurfacePlotter(path_to_sub_fs, hemi)
+    _PLOTTERS[key] = plotter
+    while len(_PLOTTERS) > N_CACHED_SUBJECTS:
+        _PLOTTERS.pop(next(iter(_PLOTTERS))).close()
+    return plotter
+
+
+def plot_tmap_surface(view_name,
+                    tmap_file,
                     hemi,
-                    path_to_sub_fs, 
+                    path_to_sub_fs,
                     out_dir,
                     threshold=0,
                     path_to_ROI=None,
-                    elev=-90,
+                    elev=-30,
                     azimuth=180,
                     vmin=0,
-                    vmax=20):
+                    vmax=20,
+                    surf_data=None):
     """
-    Plot a single t-map surface visualization - BASAL view.
+    Plot a single t-map surface visualization for one view ('lateral', 'basal').
     Returns: (tmap_file, output_file, success)
     """
     try:
         # tmap_file parse name
         name = tmap_file.name.replace('.func.gii', '')
-        
-        ## below is the plot
-        surf_data = load_surf_data(tmap_file)
-
-        if hemi == 'L':
-            # surf_mesh
-            fs_inflated = f'{path_to_sub_fs}/surf/lh.inflated'
-            # background
-            fs_curv = fs.read_morph_data(f'{path_to_sub_fs}/surf/lh.curv')
-            fs_curv_sign = np.sign(fs_curv)
-            fs_sulc = fs.read_morph_data(f'{path_to_sub_fs}/surf/lh.sulc')
-        else:
-            # surf_mesh
-            fs_inflated = f'{path_to_sub_fs}/surf/rh.inflated'
-            # background
-            fs_curv = fs.read_morph_data(f'{path_to_sub_fs}/surf/rh.curv')
-            fs_curv_sign = np.sign(fs_curv)
-            fs_sulc = fs.read_morph_data(f'{path_to_sub_fs}/surf/rh.sulc')
-
-        # load ROI to plot as contours
-        if path_to_ROI:
-            votc_annot = fs.read_annot(path_to_ROI)
-
-        # title
-        title = f"{name}"
-
-        # set view point
-        elva, azimuth_angle = elev, azimuth
+        if surf_data is None:
+            surf_data = load_surf_data(tmap_file)
 
         # storage setting
         if threshold > 0:
-            # filename
-            figure_name = f'basal_{name}_Tthresh-{threshold}.png'
-            output_file = os.path.join(out_dir, figure_name)
-            fig = plotting.plot_surf_stat_map(
-                fs_inflated, 
-                surf_data,
-                vmin=threshold, vmax=vmax,
-                bg_map=fs_curv_sign, bg_on_data=True,
-                cmap='jet', colorbar=True,
-                symmetric_cbar=False,
-                threshold=threshold,
-                darkness=.5, 
-                view=(elva, azimuth_angle),
-                engine='matplotlib', 
-            )
+            figure_name = f'{view_name}_{name}_Tthresh-{threshold}.png'
+            plot_vmin, plot_threshold = threshold, threshold
         else:
-            figure_name = f'basal_{name}_orig.png'
-            output_file = os.path.join(out_dir, figure_name)
-            fig = plotting.plot_surf_stat_map(
-                fs_inflated, 
-                surf_data,
-                vmin=vmin, vmax=vmax,
-                bg_map=fs_curv_sign, bg_on_data=True,
-                cmap='jet', colorbar=True,
-                symmetric_cbar=False,
-                threshold=0.01,
-                darkness=.5, 
-                view=(elva, azimuth_angle),
-                engine='matplotlib', 
-            )
+            figure_name = f'{view_name}_{name}_orig.png'
+            plot_vmin, plot_threshold = vmin, 0.01
+        output_file = os.path.join(out_dir, figure_name)
+
+        plotter = get_plotter(path_to_sub_fs, hemi)
+        plotter.plot(surf_data, output_file, elev, azimuth,
+                     plot_vmin, vmax, plot_threshold)
 
-        fig.savefig(output_file, dpi=150, bbox_inches='tight')
-        plt.close(fig)
-        
         return (str(tmap_file), str(output_file), True)
-    
+
     except Exception as e:
         return (str(tmap_file), str(e), False)
 
 
+def plot_tmap_surface_lateral(tmap_file, hemi, path_to_sub_fs, out_dir, threshold=0,
+                              elev=-30, azimuth=180, **kwargs):
+    """
+    Plot a single t-map surface visualization - LATERAL view.
+    Returns: (tmap_file, output_file, success)
+    """
+    return plot_tmap_surface('lateral', tmap_file, hemi, path_to_sub_fs, out_dir,
+                             threshold, elev=elev, azimuth=azimuth, **kwargs)
+
+
+def plot_tmap_surface_basal(tmap_file, hemi, path_to_sub_fs, out_dir, threshold=0,
+                            elev=-90, azimuth=180, **kwargs):
+    """
+    Plot a single t-map surface visualization - BASAL view.
+    Returns: (tmap_file, output_file, success)
+    """
+    return plot_tmap_surface('basal', tmap_file, hemi, path_to_sub_fs, out_dir,
+                             threshold, elev=elev, azimuth=azimuth, **kwargs)
+
+
 def plot_both_views(tmap_file, hemi, path_to_sub_fs, out_dir, threshold, lateral_kwargs, basal_kwargs):
     """
     Plot both lateral and basal views for a single t-map.
     Returns: (tmap_file, results_dict, success)
     """
     results = {'lateral': None, 'basal': None}
-    all_success = True
-    
-    # Plot lateral view
-    lateral_result = plot_tmap_surface_lateral(
-        tmap_file, hemi, path_to_sub_fs, out_dir, threshold, **lateral_kwargs
+
+    # the t-map is read once for both views
+    try:
+        surf_data = load_surf_data(tmap_file)
+    except Exception as e:
+        failed = (str(tmap_file), str(e), False)
+        return (str(tmap_file), {'lateral': failed, 'basal': failed}, False)
+
+    results['lateral'] = plot_tmap_surface_lateral(
+        tmap_file, hemi, path_to_sub_fs, out_dir, threshold,
+        surf_data=surf_data, **lateral_kwargs
     )
-    results['lateral'] = lateral_result
-    if not lateral_result[2]:
-        all_success = False
-    
-    # Plot basal view
-    basal_result = plot_tmap_surface_basal(
-        tmap_file, hemi, path_to_sub_fs, out_dir, threshold, **basal_kwargs
+    results['basal'] = plot_tmap_surface_basal(
+        tmap_file, hemi, path_to_sub_fs, out_dir, threshold,
+        surf_data=surf_data, **basal_kwargs
     )
-    results['basal'] = basal_result
-    if not basal_result[2]:
-        all_success = False
-    
+    all_success = results['lateral'][2] and results['basal'][2]
+
     return (str(tmap_file), results, all_success)
 
 
@@ -235,6 +222,31 @@ def process_single_job(job_args):
     return plot_both_views(tmap_file, hemi, path_to_sub_fs, out_dir, threshold, lateral_kwargs, basal_kwargs)
 
 
+def process_job_chunk(jobs):
+    """
+    Process a chunk of jobs of the same subject/hemisphere in one worker,
+    so the mesh and the figures are reused across all of them.
+    Returns: list of (tmap_file, results_dict, success)
+    """
+    return [process_single_job(job) for job in jobs]
+
+
+def chunk_jobs_by_subject(all_jobs, maps_per_job=MAPS_PER_JOB):
+    '''
+    Group jobs by (FreeSurfer subject, hemisphere) and split every group
+    into chunks of at most *maps_per_job* jobs.
+    '''
+    groups = {}
+    for job in all_jobs:
+        tmap_file, hemi, path_to_sub_fs = job[:3]
+        groups.setdefault((str(path_to_sub_fs), hemi), []).append(job)
+    chunks = []
+    for jobs in groups.values():
+        for i in range(0, len(jobs), maps_per_job):
+            chunks.append(jobs[i:i + maps_per_job])
+    return chunks
+
+
 @app.command()
 def main(
     l1_surface_dir: Path = typer.Option(
@@ -289,6 +301,10 @@ def main(
         15,
         help="Maximum value for colorbar"
     ),
+    maps_per_job: int = typer.Option(
+        MAPS_PER_JOB,
+        help="T-maps (x thresholds) per submitted job; a job reuses one subject's mesh and figures"
+    ),
     dry_run: bool = typer.Option(
         False,
         help="Dry run - only show what would be processed"
@@ -413,42 +429,48 @@ def main(
     lateral_success = 0
     basal_success = 0
     
+    # jobs of one subject go to the same worker, in chunks
+    job_chunks = chunk_jobs_by_subject(all_jobs, maps_per_job)
+    typer.echo(f"Grouped into {len(job_chunks)} subject chunks of up to {maps_per_job} jobs")
+
     with ProcessPoolExecutor(max_workers=n_workers) as executor:
-        # Submit all jobs
-        futures = {executor.submit(process_single_job, job): job for job in all_jobs}
-        
-        # Process completed jobs with progress bar
+        # Submit all chunks
+        futures = {executor.submit(process_job_chunk, chunk): chunk for chunk in job_chunks}
+
+        # Process completed chunks with progress bar
         with tqdm(total=len(all_jobs), desc="Plotting t-maps (2 views each)", unit="job") as pbar:
             for future in as_completed(futures):
-                job = futures[future]
+                chunk = futures[future]
                 try:
-                    tmap_file, results, success = future.result()
-                    
+                    chunk_results = future.result()
+                except Exception as e:
+                    error_count += len(chunk)
+                    error_msg = f"Exception processing chunk of {len(chunk)} jobs: {e}"
+                    errors.append(error_msg)
+                    pbar.update(len(chunk))
+                    continue
+
+                for tmap_file, results, success in chunk_results:
                     if success:
                         success_count += 1
                     else:
                         error_count += 1
-                    
+
                     # Track individual view success
                     if results['lateral'][2]:
                         lateral_success += 1
                     else:
                         error_msg = f"Lateral view failed: {Path(tmap_file).name} - {results['lateral'][1]}"
                         errors.append(error_msg)
-                    
+
                     if results['basal'][2]:
                         basal_success += 1
                     else:
                         error_msg = f"Basal view failed: {Path(tmap_file).name} - {results['basal'][1]}"
                         errors.append(error_msg)
-                        
-                except Exception as e:
-                    error_count += 1
-                    error_msg = f"Exception processing job: {e}"
-                    errors.append(error_msg)
-                
-                pbar.update(1)
-    
+
+                pbar.update(len(chunk))
+
     # Final summary
     typer.echo("")
     typer.echo("="*80)
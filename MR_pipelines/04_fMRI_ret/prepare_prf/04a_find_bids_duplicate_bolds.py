@@ -1,120 +1,34 @@
 #!/usr/bin/env python3
 import typer
 from pathlib import Path
-from datetime import datetime
-import json
-from collections import defaultdict
 from rich.console import Console
 from rich.table import Table
 
+from launchcontainers.quality_control.bids_index import BIDSIndex, duplicate_report
+
 app = typer.Typer()
 console = Console()
 
 
-def get_acquisition_time(nii_file: Path):
-    """Get acquisition time from JSON sidecar."""
-    json_file = nii_file.with_suffix('').with_suffix('.json')
-    try:
-        with open(json_file) as f:
-            data = json.load(f)
-        acq_time = data.get('AcquisitionTime')
-        if acq_time:
-            time_str = acq_time.split('.')[0]
-            dt = datetime.strptime(f"1900-01-01 {time_str}", '%Y-%m-%d %H:%M:%S')
-            return dt
-    except:
-        pass
-    return None
-
-
-def parse_filename(filename: str):
-    """Parse BIDS filename to get components."""
-    parts = filename.split('_')
-    info = {'sub': None, 'ses': None, 'task': None, 'run': None, 'type': None}
-    
-    for part in parts:
-        if part.startswith('sub-'):
-            info['sub'] = part.replace('sub-', '')
-        elif part.startswith('ses-'):
-            info['ses'] = part.replace('ses-', '')
-        elif part.startswith('task-'):
-            info['task'] = part.replace('task-', '')
-        elif part.startswith('run-'):
-            info['run'] = part.replace('run-', '')
-    
-    if 'sbref' in filename:
-        info['type'] = 'sbref'
-    elif 'bold' in filename:
-        info['type'] = 'bold'
-    
-    return info
-
-
 @app.command()
 def find_duplicates(
     bids_dir: Path = typer.Option(..., "--bids", "-b"),
+    index_file: Path = typer.Option(None, "--index", help="Content index file (default: <bids>/.bids_content_index.json)."),
+    max_gap: int = typer.Option(0, "--max-gap", help="Seconds between AcquisitionTimes still counted as the same run."),
+    content: bool = typer.Option(True, "--content/--no-content", help="Also hash voxel data to find identical runs under other names."),
+    workers: int = typer.Option(8, "--workers", "-j"),
 ):
-    """Find duplicate functional runs within each session."""
-    
-    console.print("[cyan]Scanning for duplicates within sessions...[/cyan]\n")
-    
-    # Group files by subject/session
-    sessions = defaultdict(list)
-    
-    bids_files = list(bids_dir.glob("sub-*/ses-*/func/*_bold.nii.gz"))
-    bids_files += list(bids_dir.glob("sub-*/ses-*/func/*_sbref.nii.gz"))
-    
-    for f in bids_files:
-        acq_time = get_acquisition_time(f)
-        if not acq_time:
-            continue
-        
-        info = parse_filename(f.name)
-        session_key = f"{info['sub']}/{info['ses']}"
-        
-        sessions[session_key].append({
-            'file': f,
-            'time': acq_time,
-            'time_str': acq_time.strftime('%H:%M:%S'),
-            'task': info['task'],
-            'run': info['run'],
-            'type': info['type'],
-            'info': info
-        })
-    
-    # Find duplicates within each session
-    all_duplicates = []
-    
-    for session_key, files in sessions.items():
-        # Group by time within this session
-        time_groups = defaultdict(list)
-        for item in files:
-            time_groups[item['time_str']].append(item)
-        
-        # Find duplicates (excluding sbref+bold pairs for same task/run)
-        for time_str, group in time_groups.items():
-            if len(group) < 2:
-                continue
-            
-            # Check if it's just sbref+bold pair for same task/run
-            if len(group) == 2:
-                if (group[0]['task'] == group[1]['task'] and 
-                    group[0]['run'] == group[1]['run'] and
-                    {group[0]['type'], group[1]['type']} == {'sbref', 'bold'}):
-                    # This is OK - sbref and bold for same task/run
-                    continue
-            
-            # Real duplicate found
-            for item in group:
-                all_duplicates.append({
-                    'session': session_key,
-                    'time': time_str,
-                    'task': item['task'],
-                    'run': item['run'],
-                    'type': item['type'],
-                    'file': str(item['file'])
-                })
-    
+    """Find duplicate functional runs: same data anywhere, or same time and geometry within a session."""
+
+    console.print("[cyan]Updating BIDS content index...[/cyan]")
+    index = BIDSIndex(bids_dir, index_file)
+    counts = index.update(hash_data=("bold", "sbref") if content else False, n_workers=workers)
+    index.save()
+    console.print(f"[dim]{len(index)} images indexed ({counts})[/dim]\n")
+
+    # sbref+bold of one run never group: their shapes differ
+    all_duplicates = duplicate_report(index, suffixes=("bold", "sbref"), max_gap=max_gap)
+
     if not all_duplicates:
         console.print("\n[green]✅ No duplicates found![/green]")
         return
@@ -123,6 +37,8 @@ def find_duplicates(
     console.print(f"\n[red]Found {len(all_duplicates)} duplicate files:[/red]\n")
     
     table = Table(show_header=True, header_style="bold magenta")
+    table.add_column("Group")
+    table.add_column("Kind")
     table.add_column("Session")
     table.add_column("Time")
     table.add_column("Task")
@@ -132,10 +48,12 @@ def find_duplicates(
     
     for dup in all_duplicates:
         table.add_row(
+            str(dup['group']),
+            dup['kind'],
             dup['session'],
             dup['time'],
-            dup['task'],
-            dup['run'],
+            str(dup['task']),
+            str(dup['run']),
             dup['type'],
             Path(dup['file']).name
         )
@@ -144,9 +62,9 @@ def find_duplicates(
     
     # Save to file
     with open('duplicates.txt', 'w') as f:
-        f.write("session\ttime\ttask\trun\ttype\tfile\n")
+        f.write("session\ttime\ttask\trun\ttype\tfile\tgroup\tkind\n")
         for dup in all_duplicates:
-            f.write(f"{dup['session']}\t{dup['time']}\t{dup['task']}\t{dup['run']}\t{dup['type']}\t{dup['file']}\n")
+            f.write(f"{dup['session']}\t{dup['time']}\t{dup['task']}\t{dup['run']}\t{dup['type']}\t{dup['file']}\t{dup['group']}\t{dup['kind']}\n")
     
     console.print(f"\n[cyan]Saved to duplicates.txt[/cyan]")
 
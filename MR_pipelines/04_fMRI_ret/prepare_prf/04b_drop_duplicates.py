@@ -1,8 +1,11 @@
 #!/usr/bin/env python3
 import typer
+from collections import defaultdict
 from pathlib import Path
 from rich.console import Console
 
+from launchcontainers.quality_control.bids_index import BIDSIndex, duplicate_report
+
 app = typer.Typer()
 console = Console()
 
@@ -34,38 +37,51 @@ def should_drop(task: str, competing_tasks: list):
 
 
 
-@app.command()
-def drop_duplicates(
-    duplicates_file: Path = typer.Option("duplicates.txt", "--input", "-i"),
-    dry_run: bool = typer.Option(True, "--dry-run/--execute"),
-):
-    """Drop duplicate files based on task priority rules."""
-    
-    console.print(f"[cyan]Reading duplicates from {duplicates_file}[/cyan]")
-    console.print(f"[yellow]Dry run: {dry_run}[/yellow]\n")
-    
-    # Read duplicates file
+def read_duplicates_file(duplicates_file: Path):
+    """Rows of duplicates.txt; files from the old 6-column format group by session + time."""
     duplicates = []
     with open(duplicates_file) as f:
         lines = f.readlines()[1:]  # Skip header
         for line in lines:
             parts = line.strip().split('\t')
-            if len(parts) == 6:
+            if len(parts) >= 6:
                 duplicates.append({
                     'session': parts[0],
                     'time': parts[1],
                     'task': parts[2],
                     'run': parts[3],
                     'type': parts[4],
-                    'file': parts[5]
+                    'file': parts[5],
+                    'group': parts[6] if len(parts) > 6 else f"{parts[0]}_{parts[1]}",
                 })
+    return duplicates
+
+
+@app.command()
+def drop_duplicates(
+    duplicates_file: Path = typer.Option("duplicates.txt", "--input", "-i"),
+    bids_dir: Path = typer.Option(None, "--bids", "-b", help="Take the duplicate groups from the BIDS content index instead of --input."),
+    index_file: Path = typer.Option(None, "--index", help="Content index file (default: <bids>/.bids_content_index.json)."),
+    dry_run: bool = typer.Option(True, "--dry-run/--execute"),
+):
+    """Drop duplicate files based on task priority rules."""
+    
+    index = None
+    if bids_dir is not None:
+        console.print(f"[cyan]Reading duplicate groups from the content index of {bids_dir}[/cyan]")
+        index = BIDSIndex(bids_dir, index_file)
+        index.update(hash_data=("bold", "sbref"))
+        index.save()
+        duplicates = duplicate_report(index, suffixes=("bold", "sbref"))
+    else:
+        console.print(f"[cyan]Reading duplicates from {duplicates_file}[/cyan]")
+        duplicates = read_duplicates_file(duplicates_file)
+    console.print(f"[yellow]Dry run: {dry_run}[/yellow]\n")
     
-    # Group by session + time
-    from collections import defaultdict
+    # Group by the group column (same data, or same session + time)
     groups = defaultdict(list)
     for dup in duplicates:
-        key = f"{dup['session']}_{dup['time']}"
-        groups[key].append(dup)
+        groups[dup['group']].append(dup)
     
     # Determine what to drop
     to_drop = []
@@ -74,7 +90,8 @@ def drop_duplicates(
         # Get all tasks in this group
         tasks_in_group = [item['task'] for item in group]
         for item in group:
-            if should_drop(item['task'], tasks_in_group):
+            # a file can be in an "identical" and a "same_time" group
+            if should_drop(item['task'], tasks_in_group) and item['file'] not in {d['file'] for d in to_drop}:
                 to_drop.append(item)
     
     if not to_drop:
@@ -106,6 +123,10 @@ def drop_duplicates(
         console.print(f"\n[yellow]This is a DRY RUN. Use --execute to delete files.[/yellow]")
     else:
         console.print(f"\n[green]Dropped {len(to_drop)} duplicate files[/green]")
+        if index is not None:
+            # forget the dropped files; only their sessions are rescanned
+            index.update(subses=sorted({tuple(item['session'].split('/')) for item in to_drop}), hash_data=False)
+            index.save()
 
 
 if __name__ == "__main__":
@@ -3,6 +3,7 @@ analysis_specs/bids.py
 =======================
 BIDS-related specs:
   BIDSSpec            — raw BIDS modality folder check (glob-based)
+  BIDSContentSpec     — duplicated / same-time / orphan func images (content index)
   BIDSDWISpec         — BIDS DWI acq-label discovery + AP/PA file check
   BIDSFuncSBRefSpec   — sbref ↔ bold pairing + timing gap check
 
@@ -16,6 +17,8 @@ from __future__ import annotations
 
 import fnmatch
 import re
+import threading
+from collections import defaultdict
 from datetime import datetime
 from pathlib import Path
 
@@ -107,6 +110,98 @@ class BIDSSpec(AnalysisSpec):
         return default_combinations()
 
 
+# =============================================================================
+# BIDSContentSpec
+# =============================================================================
+
+
+class BIDSContentSpec(AnalysisSpec):
+    """
+    BIDS func content, read from the persistent content index
+    (launchcontainers.quality_control.bids_index).
+
+    One group per func NIfTI, expecting its .json sidecar.  Reported as
+    issues of the group:
+      1. identical voxel data to another image anywhere in the dataset
+      2. same geometry and AcquisitionTime as another image of the session
+      3. sbref without a bold/magnitude within max_gap_sec after it
+    The index is updated once per check (only new or changed files are read)
+    and saved next to the data.
+
+    [DEV] Change the checked suffixes or the sbref gap in __init__.
+    """
+
+    def __init__(self, max_gap_sec: int = 30, suffixes=("bold", "sbref", "magnitude")):
+        self.max_gap_sec = max_gap_sec
+        self.suffixes = suffixes
+        self._lock = threading.Lock()
+        self._index = None
+        self._issues: dict[str, list[str]] = {}
+
+    @property
+    def name(self) -> str:
+        return "bidscontent"
+
+    @property
+    def description(self) -> str:
+        return (
+            "BIDS func content — duplicated data, same-time runs, orphan sbrefs "
+            f"(gap <= {self.max_gap_sec}s)"
+        )
+
+    def get_session_dir(self, analysis_dir: Path, sub: str, ses: str) -> Path:
+        return analysis_dir / sub / ses
+
+    def _load(self, bids_dir: Path) -> None:
+        """Update the index and collect the issues of every image, once."""
+        from launchcontainers.quality_control.bids_index import BIDSIndex
+
+        with self._lock:
+            if self._index is not None:
+                return
+            index = BIDSIndex(bids_dir)
+            index.update(hash_data=self.suffixes)
+            index.save()
+            issues = defaultdict(list)
+            for group in index.duplicates(self.suffixes):
+                for e in group:
+                    others = [o.relpath for o in group if o is not e]
+                    issues[e.relpath].append(f"  identical data: {', '.join(others)}")
+            for group in index.near_duplicates(self.suffixes):
+                for e in group:
+                    others = [Path(o.relpath).name for o in group if o is not e]
+                    issues[e.relpath].append(
+                        f"  same time/geometry ({e.acq_time}): {', '.join(others)}"
+                    )
+            for rel, reason in index.orphans(self.max_gap_sec):
+                if Path(rel).name.endswith("_sbref.nii.gz"):
+                    issues[rel].append(f"  {reason}")
+            self._issues = dict(issues)
+            self._index = index
+
+    def get_expected_groups(self, session_dir: Path) -> dict[str, list[str]]:
+        # session_dir is <bids>/sub-*/ses-*
+        self._load(session_dir.parents[1])
+        sub, ses = session_dir.parent.name[4:], session_dir.name[4:]
+        entries = self._index.select(
+            sub=sub, ses=ses, datatype="func", suffixes=self.suffixes
+        )
+        return {
+            f"func/{Path(e.relpath).name}": [
+                f"func/{Path(e.relpath).name.split('.nii')[0]}.json"
+            ]
+            for e in entries
+        }
+
+    def _check_timing(self, session_dir: Path, group_label: str) -> str | None:
+        rel = f"{session_dir.parent.name}/{session_dir.name}/{group_label}"
+        issues = self._issues.get(rel)
+        return "\n".join(issues) if issues else None
+
+    def get_default_combinations(self) -> list[tuple[str, str]]:
+        return default_combinations()
+
+
 # =============================================================================
 # BIDSDWISpec
 # =============================================================================
@@ -40,17 +40,18 @@ from dataclasses import dataclass
 from dataclasses import field
 from datetime import datetime
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-import h5py
-import pandas as pd
-import scipy.io
 import typer
 from rich.console import Console
 from rich.table import Table
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 try:
     from .base import AnalysisSpec
-    from .bids import DWINiiSpec, FuncSBRefSpec, BIDSfuncSpec, BIDSSpec
+    from .bids import DWINiiSpec, FuncSBRefSpec, BIDSfuncSpec, BIDSSpec, BIDSContentSpec
     from .fmriprep import FMRIPrepSpec
     from .glm import GLMSpec
     from .prf_analyze import PRFAnalyzeSpec
@@ -62,12 +63,18 @@ except ImportError:
 
     sys.path.insert(0, os.path.dirname(__file__))
     from base import AnalysisSpec
-    from bids import DWINiiSpec, FuncSBRefSpec, BIDSfuncSpec, BIDSSpec
+    from bids import (
+        DWINiiSpec,
+        FuncSBRefSpec,
+        BIDSfuncSpec,
+        BIDSSpec,
+        BIDSContentSpec,
+    )
     from fmriprep import FMRIPrepSpec
     from glm import GLMSpec
     from prf_analyze import PRFAnalyzeSpec
     from prf_prepare import PRFPrepareSpec
-    from rtp import RTPSpec
+    from rtp import RTPSpec, RTP2PipelineSpec
 
 # Import all specs from analysis_checker package.
 # [DEV] When you add a new spec file, register it in analysis_checker/__init__.py
@@ -191,6 +198,8 @@ class SessionResult:
 
 def check_broken_mat(filepath: Path) -> tuple[bool, str]:
     """Validate .mat file (scipy v5-v7.2 first, h5py v7.3 fallback)."""
+    import scipy.io
+
     try:
         data = scipy.io.loadmat(str(filepath))
         for key, val in data.items():
@@ -199,6 +208,8 @@ def check_broken_mat(filepath: Path) -> tuple[bool, str]:
         return True, ""
     except Exception as e_scipy:
         try:
+            import h5py
+
             with h5py.File(str(filepath), "r") as f:
 
                 def _read_all(obj):
@@ -245,10 +256,24 @@ def check_broken_nii(filepath: Path) -> tuple[bool, str]:
         return False, str(e)
 
 
+def check_broken_tck(filepath: Path) -> tuple[bool, str]:
+    """Validate .tck header, data size and end sentinel (mmap, cached by mtime)."""
+    from launchcontainers.quality_control.tck_inspect import inspect_tck
+
+    info = inspect_tck(filepath)
+    return info.valid, info.error
+
+
 # ── Core engine ───────────────────────────────────────────────────────────────
 
 
-def _check_file_exists(session_dir: Path, fname: str, use_glob: bool) -> bool:
+def _check_file_exists(
+    session_dir: Path, fname: str, use_glob: bool, spec: AnalysisSpec | None = None
+) -> bool:
+    # [DEV] specs whose files may live elsewhere (e.g. inside a zip) implement
+    #       _file_exists(session_dir, fname) -> bool
+    if spec is not None and hasattr(spec, "_file_exists"):
+        return spec._file_exists(session_dir, fname)
     if use_glob and ("*" in fname or "?" in fname):
         fpath = Path(fname)
         parent = session_dir / fpath.parent if str(fpath.parent) != "." else session_dir
@@ -296,11 +321,20 @@ def check_one_session(
 
         for fname in expected_files:
             fpath = session_dir / fname
-            if _check_file_exists(session_dir, fname, spec.uses_glob):
+            if _check_file_exists(session_dir, fname, spec.uses_glob, spec):
                 # ── Integrity checks (only when --check-corrupted is set) ──
                 # [DEV] add new elif branch here for a new extension
                 if not check_corruption:
                     valid, err = True, ""
+                elif fname.endswith(".tck"):
+                    # spec hook when the file may only exist inside a zip
+                    if hasattr(spec, "check_broken_tck"):
+                        valid, err = spec.check_broken_tck(session_dir, fname)
+                    else:
+                        valid, err = check_broken_tck(fpath)
+                elif hasattr(spec, "_file_exists") and not fpath.exists():
+                    # found by the spec elsewhere (e.g. still zipped): no file to open
+                    valid, err = True, ""
                 elif fname.endswith(".mat"):
                     valid, err = check_broken_mat(fpath)
                 elif fname.endswith(".json"):
@@ -431,6 +465,8 @@ def run_integrity_check_single(
 
 def write_brief_csv(results: list[SessionResult], output_path: Path) -> pd.DataFrame:
     """Write brief CSV: sub, ses, RUN (True/False). Returns DataFrame."""
+    import pandas as pd
+
     rows = []
     with open(output_path, "w", newline="") as f:
         writer = csv.writer(f)
@@ -452,6 +488,8 @@ def write_matrix_from_brief_csv(
     Accepts either a DataFrame or a path to a brief CSV file.
     """
     if isinstance(source, Path):
+        import pandas as pd
+
         df = pd.read_csv(source, dtype=str)
     else:
         df = source.copy().astype(str)
@@ -1048,6 +1086,7 @@ SPEC_REGISTRY: dict[str, AnalysisSpec] = {
     "prfprepare": PRFPrepareSpec(),
     "prfanalyze": PRFAnalyzeSpec(),
     "bids": BIDSSpec(),
+    "bidscontent": BIDSContentSpec(),
     "dwinii": DWINiiSpec(),
     "funcsbref": FuncSBRefSpec(),
     "bidsfunc": BIDSfuncSpec(),
@@ -1132,7 +1171,7 @@ def check(
     ),
     analysis_type: str = typer.Argument(
         ...,
-        help="Analysis type: prfprepare, prfanalyze, bids, bidsfunc, "
+        help="Analysis type: prfprepare, prfanalyze, bids, bidscontent, bidsfunc, "
         "dwinii, funcsbref, fmriprep, glm, rtp, rtp2pipeline",
     ),
     subses: list[str] | None = typer.Option(
@@ -57,9 +57,16 @@ class RTP2PipelineSpec(AnalysisSpec):
     """
     Checker for rtp2-pipeline output completeness.
 
-    Verifies two things per sub/ses:
+    Verifies per sub/ses:
       1. ``output/log/RTP_log.txt`` exists.
       2. The last non-empty line of that log is ``Sending exit(0) signal.``
+      3. Every tract of the analysis tractparams has its ``.tck`` and
+         ``_fa_bin.nii.gz`` in ``RTP_PIPELINE_ALL_OUTPUT/mrtrix`` (one group
+         per tract), read from the extracted folder or, if the session was
+         never unzipped, from ``RTP_PIPELINE_ALL_OUTPUT.zip``.
+      4. With --check-corrupted, each ``.tck`` is a complete file with at
+         least ``MIN_STREAMLINES`` streamlines (see
+         launchcontainers.quality_control.tck_inspect).
 
     Usage example
     -------------
@@ -69,6 +76,11 @@ class RTP2PipelineSpec(AnalysisSpec):
     """
 
     _LOG_SUBPATH = Path("output") / "log" / "RTP_log.txt"
+    # tract outputs, relative to RTP_PIPELINE_ALL_OUTPUT (dir or zip)
+    _RTP_OUTPUT = Path("output") / "RTP_PIPELINE_ALL_OUTPUT"
+    TRACT_SUFFIXES = [".tck", "_fa_bin.nii.gz"]
+    # [DEV] a readable .tck with fewer streamlines counts as corrupted
+    MIN_STREAMLINES = 0
 
     @property
     def name(self) -> str:
@@ -92,9 +104,70 @@ class RTP2PipelineSpec(AnalysisSpec):
         ]
 
     def get_expected_groups(self, session_dir: Path) -> dict[str, list[str]]:
-        return {
+        groups = {
             "pipeline_log": [str(self._LOG_SUBPATH)],
         }
+        for tract in self._tracts(session_dir.parent.parent):
+            groups[tract] = [
+                str(self._RTP_OUTPUT / "mrtrix" / f"{tract}{s}")
+                for s in self.TRACT_SUFFIXES
+            ]
+        return groups
+
+    def _tracts(self, analysis_dir: Path) -> list[str]:
+        """Tracts of the analysis tractparams (parsed once per file); [] if absent."""
+        from launchcontainers.quality_control.qc_tract_finish_rtp2pipeline import (
+            TRACTPARAMS_NAME,
+            load_tract_table,
+        )
+
+        tractparams = analysis_dir / TRACTPARAMS_NAME
+        if not tractparams.is_file():
+            return []
+        return list(dict.fromkeys(load_tract_table(tractparams)["tract"]))
+
+    def _rtp_member(self, fname: str) -> str | None:
+        """Path of *fname* inside RTP_PIPELINE_ALL_OUTPUT, or None if outside."""
+        try:
+            return Path(fname).relative_to(self._RTP_OUTPUT).as_posix()
+        except ValueError:
+            return None
+
+    def _file_exists(self, session_dir: Path, fname: str) -> bool:
+        """
+        Duck-typed hook used by the engine instead of a plain ``exists``.
+
+        Tract outputs are looked up through ``zipfs.RTP2Output``, so a session
+        whose results are still zipped is not reported as missing.
+        """
+        from launchcontainers.quality_control.zipfs import RTP2Output
+
+        relpath = self._rtp_member(fname)
+        if relpath is None:
+            return (session_dir / fname).exists()
+        return RTP2Output(session_dir / "output").exists(relpath)
+
+    def check_broken_tck(self, session_dir: Path, fname: str) -> tuple[bool, str]:
+        """
+        Duck-typed hook called for ``.tck`` files under --check-corrupted.
+
+        Inspects the extracted file, or streams the member of the zip.
+        """
+        from launchcontainers.quality_control.tck_inspect import get_inspector
+        from launchcontainers.quality_control.zipfs import RTP2Output
+
+        inspector = get_inspector()
+        relpath = self._rtp_member(fname)
+        rtp2_output = RTP2Output(session_dir / "output")
+        if relpath is None or rtp2_output.has_dir:
+            info = inspector.inspect(session_dir / fname)
+        else:
+            info = inspector.inspect_member(rtp2_output.index, relpath)
+        if not info.valid:
+            return False, info.error
+        if info.streamlines < self.MIN_STREAMLINES:
+            return False, f"{info.streamlines} streamlines < {self.MIN_STREAMLINES}"
+        return True, ""
 
     def _check_log_completion(self, session_dir: Path, group_label: str) -> str | None:
         """
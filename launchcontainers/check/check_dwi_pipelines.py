@@ -25,45 +25,38 @@ import json
 import os
 import os.path as op
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+import numpy as np
+import pandas as pd
+
 from launchcontainers.log_setup import console, log_info
+from launchcontainers.quality_control.zipfs import zip_index
 
 
-def check_tractparam(lc_config, sub, ses, tractparam_df):
+ROI_COLUMNS = ["roi1", "roi2", "roi3", "roi4", "roiexc1", "roiexc2"]
+FS_ZIP_COLUMN = "fs.zip"
+
+
+def required_rois(tractparam_df):
     """
-    Verify that all ROIs referenced in ``tractparams`` exist in ``fs.zip``.
+    ROI names referenced by a tractparams table.
+
+    ``_AND_``-joined entries are split and ``NO`` is ignored.
 
     Parameters
     ----------
-    lc_config : dict
-        Parsed launchcontainers YAML configuration.
-    sub : str
-        Subject identifier without the ``sub-`` prefix.
-    ses : str
-        Session identifier without the ``ses-`` prefix.
     tractparam_df : pandas.DataFrame
         Tract parameter table used by ``rtp-pipeline`` or ``rtp2-pipeline``.
 
     Returns
     -------
-    bool
-        ``True`` if every required ROI file is present in the anatomical
-        derivative ``fs.zip`` archive.
-
-    Raises
-    ------
-    FileNotFoundError
-        If one or more required ROI files are missing.
+    set[str]
     """
-    # Define the list of required ROIs
-    console.print(
-        "\n" + "#####################################################\n",
-        style="bold red",
-    )
     roi_list = []
     # Iterate over some defined roisand check if they are required or not in the config.yaml
-    for col in ["roi1", "roi2", "roi3", "roi4", "roiexc1", "roiexc2"]:
+    for col in ROI_COLUMNS:
         for val in tractparam_df[col][~tractparam_df[col].isna()]:
             if "_AND_" in val:
                 multi_roi = val.split("_AND_")
@@ -71,10 +64,11 @@ def check_tractparam(lc_config, sub, ses, tractparam_df):
             else:
                 if val != "NO":
                     roi_list.append(val)
+    return set(roi_list)
 
-    required_rois = set(roi_list)
 
-    # Define the zip file
+def fs_zip_path(lc_config, sub, ses):
+    """Path of the anatomical derivative ``fs.zip`` of one session."""
     basedir = lc_config["general"]["basedir"]
     container = lc_config["general"]["container"]
     bidsdir_name = lc_config["general"]["bidsdir_name"]
@@ -82,9 +76,7 @@ def check_tractparam(lc_config, sub, ses, tractparam_df):
     anat_analysis_name = lc_config["container_specific"][container][
         "anat_analysis_name"
     ]
-
-    # Define where the fs.zip file is
-    fs_zip = op.join(
+    return op.join(
         basedir,
         bidsdir_name,
         "derivatives",
@@ -96,41 +88,184 @@ def check_tractparam(lc_config, sub, ses, tractparam_df):
         "fs.zip",
     )
 
-    # Extract .gz files from zip file and check if they are all present
-    with zipfile.ZipFile(fs_zip, "r") as zip:
-        zip_gz_files = set(zip.namelist())
 
-    # See which ROIs are present in the fs.zip file
-    required_gz_files = {f"fs/ROIs/{file}.nii.gz" for file in required_rois}
+def missing_rois(fs_zip, rois):
+    """
+    ROIs of *rois* without ``fs/ROIs/<roi>.nii.gz`` in *fs_zip*.
+
+    The archive's member listing comes from
+    :func:`~launchcontainers.quality_control.zipfs.zip_index`, cached in the
+    process and on disk by the zip's path, size and mtime.
+
+    Raises
+    ------
+    FileNotFoundError
+        If *fs_zip* does not exist.
+    """
+    index = zip_index(fs_zip, strip_root=False)
+    return sorted(roi for roi in rois if not index.is_file(f"fs/ROIs/{roi}.nii.gz"))
+
+
+def check_tractparam(lc_config, sub, ses, tractparam_df):
+    """
+    Verify that all ROIs referenced in ``tractparams`` exist in ``fs.zip``.
+
+    Parameters
+    ----------
+    lc_config : dict
+        Parsed launchcontainers YAML configuration.
+    sub : str
+        Subject identifier without the ``sub-`` prefix.
+    ses : str
+        Session identifier without the ``ses-`` prefix.
+    tractparam_df : pandas.DataFrame
+        Tract parameter table used by ``rtp-pipeline`` or ``rtp2-pipeline``.
+
+    Returns
+    -------
+    bool
+        ``True`` if every required ROI file is present in the anatomical
+        derivative ``fs.zip`` archive.
+
+    Raises
+    ------
+    FileNotFoundError
+        If one or more required ROI files are missing.
+    """
+    rois = required_rois(tractparam_df)
+    fs_zip = fs_zip_path(lc_config, sub, ses)
+    missing = missing_rois(fs_zip, rois)
     console.print(
         "\n"
-        + f"---The following are the ROIs in fs.zip file: \n {zip_gz_files} \n"
-        + f"---there are {len(zip_gz_files)} .nii.gz files in fs.zip from anatrois output\n"
-        + f"---There are {len(required_gz_files)} ROIs that are required to run RTP-PIPELINE\n",
+        + f"---There are {len(rois)} ROIs that are required to run RTP-PIPELINE, "
+        + f"checked against {fs_zip}\n",
         style="cyan",
     )
-    if required_gz_files.issubset(zip_gz_files):
-        console.print(
-            "\n" + "---checked! All required .gz files are present in the fs.zip \n",
-            style="green",
-        )
-    else:
-        missing_files = required_gz_files - zip_gz_files
+    if missing:
         console.print(
             "\n"
             + "*****Error: \n"
-            + f"there are {len(missing_files)} missed in fs.zip \n"
-            + f"The following .gz files are missing in the zip file:\n {missing_files}",
+            + f"there are {len(missing)} missed in fs.zip \n"
+            + "The following .gz files are missing in the zip file:\n "
+            + f"{[f'fs/ROIs/{roi}.nii.gz' for roi in missing]}",
             style="red",
         )
         raise FileNotFoundError("Required .gz file are missing")
+    console.print(
+        "\n" + "---checked! All required .gz files are present in the fs.zip \n",
+        style="green",
+    )
+    return True
+
+
+def roi_matrix(lc_config, sessions, tractparam_df, n_workers=16):
+    """
+    Missing-ROI matrix of a cohort.
+
+    Every session's ``fs.zip`` is listed once (see :func:`missing_rois`), in
+    worker threads.
+
+    Parameters
+    ----------
+    lc_config : dict
+        Parsed launchcontainers YAML configuration.
+    sessions : list[tuple[str, str]]
+        ``(sub, ses)`` pairs, without prefixes.
+    tractparam_df : pandas.DataFrame
+        Tract parameter table.
+    n_workers : int, default=16
+        Archives listed in parallel.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Boolean, one row per session (index ``sub``, ``ses``), a first
+        ``fs.zip`` column (the archive itself is missing or not a valid zip)
+        and one column per required ROI; ``True`` means missing.
+    """
+    rois = sorted(required_rois(tractparam_df))
+    column = {roi: k for k, roi in enumerate(rois, start=1)}
+
+    def _row(subses):
+        row = np.zeros(len(rois) + 1, dtype=bool)
+        try:
+            missing = missing_rois(fs_zip_path(lc_config, *subses), rois)
+        except (FileNotFoundError, zipfile.BadZipFile):
+            row[:] = True
+            return row
+        row[[column[roi] for roi in missing]] = True
+        return row
+
+    sessions = list(sessions)
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        rows = list(executor.map(_row, sessions))
+    return pd.DataFrame(
+        np.array(rows, dtype=bool).reshape(len(sessions), len(rois) + 1),
+        index=pd.MultiIndex.from_tuples(sessions, names=["sub", "ses"]),
+        columns=[FS_ZIP_COLUMN, *rois],
+    )
+
+
+def check_tractparam_cohort(
+    lc_config, sessions, tractparam_df, out_file=None, n_workers=16
+):
+    """
+    Run the ROI check of :func:`check_tractparam` on all sessions at once.
+
+    Parameters
+    ----------
+    lc_config : dict
+        Parsed launchcontainers YAML configuration.
+    sessions : list[tuple[str, str]]
+        ``(sub, ses)`` pairs, without prefixes.
+    tractparam_df : pandas.DataFrame
+        Tract parameter table.
+    out_file : str, optional
+        Write the rows of the sessions with missing inputs of
+        :func:`roi_matrix` there (TSV).
+    n_workers : int, default=16
+        Archives listed in parallel.
+
+    Returns
+    -------
+    bool
+        ``True`` if every session has its ``fs.zip`` and all required ROIs.
 
-    ROIs_are_there = required_gz_files.issubset(zip_gz_files)
+    Raises
+    ------
+    FileNotFoundError
+        If any session misses its ``fs.zip`` or a required ROI; the whole
+        cohort is reported first.
+    """
+    matrix = roi_matrix(lc_config, sessions, tractparam_df, n_workers)
+    incomplete = matrix[matrix.any(axis=1)]
     console.print(
-        "\n" + "#####################################################\n",
-        style="bold red",
+        f"\n---Checked {matrix.shape[1] - 1} required ROIs in the fs.zip of "
+        + f"{len(matrix)} sessions\n",
+        style="cyan",
+    )
+    if incomplete.empty:
+        console.print(
+            "---checked! All required .gz files are present in every fs.zip\n",
+            style="green",
+        )
+        return True
+
+    for (sub, ses), row in incomplete.iterrows():
+        if row[FS_ZIP_COLUMN]:
+            console.print(f"sub-{sub}_ses-{ses}: no fs.zip", style="red")
+        else:
+            missing = row.index[row.to_numpy()].tolist()
+            console.print(
+                f"sub-{sub}_ses-{ses}: {len(missing)} ROIs missing {missing}",
+                style="red",
+            )
+    if out_file:
+        incomplete.astype(int).to_csv(out_file, sep="\t")
+        console.print(f"Missing-ROI matrix written to {out_file}", style="red")
+    raise FileNotFoundError(
+        f"Required .gz files are missing in {len(incomplete)} sessions"
     )
-    return ROIs_are_there
 
 
 def check_dwi_analysis_folder(parse_namespace, container):
@@ -0,0 +1,173 @@
+# """
+# MIT License
+# Copyright (c) 2020-2025 Garikoitz Lerma-Usabiaga
+# Copyright (c) 2020-2022 Mengxing Liu
+# Copyright (c) 2022-2023 Leandro Lecca
+# Copyright (c) 2022-2025 Yongning Lei
+# Copyright (c) 2023 David Linhardt
+# Copyright (c) 2023 Iñigo Tellaetxe
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit persons to
+# whom the Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+# """
+"""
+Pre-launch validation of every generated launch command.
+
+``lc run`` used to show only one example command, so a broken bind path or a
+dangling input symlink surfaced only after the job had queued.  The checks
+here run over all commands in parallel (they are pure file-system calls, so
+threads are enough) and report, per session:
+
+- bind sources (``--bind SRC:DST``) that do not exist, including
+  ``output/log/config.json``;
+- input symlinks under ``sub-*/ses-*/input`` that do not resolve;
+- a missing ``.sif`` image;
+- log / output directories that are missing or not writable.
+"""
+
+from __future__ import annotations
+
+import os
+import os.path as op
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from rich.table import Table
+
+from launchcontainers.log_setup import console
+
+_BIND_RE = re.compile(r"--bind\s+(\S+)")
+_SIF_RE = re.compile(r"(\S+\.sif)\b")
+_REDIRECT_RE = re.compile(r"[12]>>?\s*(\S+)")
+
+
+def _dangling_symlinks(input_dir: str) -> list[str]:
+    """Return the symlinks under ``input_dir`` whose target does not exist."""
+    dangling = []
+    stack = [input_dir]
+    while stack:
+        try:
+            entries = list(os.scandir(stack.pop()))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.is_symlink():
+                if not op.exists(entry.path):
+                    dangling.append(entry.path)
+            elif entry.is_dir(follow_symlinks=False):
+                stack.append(entry.path)
+    return dangling
+
+
+def check_command(cmd: str, analysis_dir: str, sub: str, ses: str) -> list[str]:
+    """
+    Validate one launch command.
+
+    Parameters
+    ----------
+    cmd : str
+        Generated launch command.
+    analysis_dir : str
+        Prepared analysis directory.
+    sub, ses : str
+        Session the command belongs to.
+
+    Returns
+    -------
+    list[str]
+        Human-readable problems; empty when the command looks launchable.
+    """
+    problems = []
+    for bind in _BIND_RE.findall(cmd):
+        src = bind.split(":", 1)[0]
+        if not op.exists(src):
+            problems.append(f"bind source missing: {src}")
+
+    sif = _SIF_RE.search(cmd)
+    if sif and not op.isfile(sif.group(1)):
+        problems.append(f"image missing: {sif.group(1)}")
+
+    for log_fpath in set(_REDIRECT_RE.findall(cmd)):
+        log_dir = op.dirname(log_fpath)
+        if not op.isdir(log_dir):
+            problems.append(f"log dir missing: {log_dir}")
+        elif not os.access(log_dir, os.W_OK):
+            problems.append(f"log dir not writable: {log_dir}")
+
+    subses_dir = op.join(analysis_dir, f"sub-{sub}", f"ses-{ses}")
+    output_dir = op.join(subses_dir, "output")
+    if op.isdir(output_dir) and not os.access(output_dir, os.W_OK):
+        problems.append(f"output dir not writable: {output_dir}")
+
+    input_dir = op.join(subses_dir, "input")
+    if op.isdir(input_dir):
+        for link in _dangling_symlinks(input_dir):
+            problems.append(f"dangling input symlink: {op.relpath(link, subses_dir)}")
+    return problems
+
+
+def run_preflight(
+    commands: list[str],
+    df_subses: list[tuple[str, str]],
+    analysis_dir: str,
+    max_workers: int = 16,
+) -> dict[tuple[str, str], list[str]]:
+    """
+    Check every command in parallel.
+
+    Parameters
+    ----------
+    commands : list[str]
+        Launch commands aligned with ``df_subses``.
+    df_subses : list[tuple[str, str]]
+        Sessions to check.
+    analysis_dir : str
+        Prepared analysis directory.
+    max_workers : int, default=16
+        Number of checker threads; the work is I/O-bound on shared storage.
+
+    Returns
+    -------
+    dict[tuple[str, str], list[str]]
+        Problems of every session that failed at least one check.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(
+            lambda args: check_command(args[0], analysis_dir, *args[1]),
+            zip(commands, df_subses),
+        )
+        return {
+            subses: problems for subses, problems in zip(df_subses, results) if problems
+        }
+
+
+def print_preflight_table(bad: dict[tuple[str, str], list[str]], n_total: int) -> None:
+    """Print one table with all sessions that failed the pre-flight checks."""
+    if not bad:
+        console.print(
+            f"\n### Pre-flight: all {n_total} sessions passed", style="bold red"
+        )
+        return
+    table = Table(
+        title=f"Pre-flight: {len(bad)} of {n_total} sessions not launchable",
+        show_header=True,
+        header_style="bold magenta",
+    )
+    table.add_column("sub")
+    table.add_column("ses")
+    table.add_column("problems", overflow="fold")
+    for (sub, ses), problems in sorted(bad.items()):
+        table.add_row(sub, ses, "\n".join(problems))
+    console.print(table)
+
+
+def write_held_subseslist(bad: dict[tuple[str, str], list[str]], fpath: str) -> None:
+    """Write the held sessions as a TSV subseslist with a ``reason`` column."""
+    with open(fpath, "w") as f:
+        f.write("sub\tses\tRUN\treason\n")
+        for (sub, ses), problems in sorted(bad.items()):
+            f.write(f"{sub}\t{ses}\tTrue\t{'; '.join(problems)}\n")
@@ -24,7 +24,14 @@ from datetime import datetime
 
 import typer
 
-from launchcontainers.log_setup import console, setup_verbosity, set_log_files
+from launchcontainers.log_setup import (
+    console,
+    flush_logs,
+    set_log_files,
+    set_stage,
+    setup_verbosity,
+    summarize_console,
+)
 
 app = typer.Typer()
 
@@ -62,15 +69,19 @@ def prepare(
     )
     from launchcontainers import do_prepare
 
+    set_stage("prepare")
     console.print("\n....running prepare mode", style="bold red")
     _, analysis_dir = do_prepare.main(parse_namespace)
+    summarize_console()
     # Copy logs to analysis_dir/prepare_log/ only when an analysis dir was created
     if analysis_dir is not None:
         console.print("Copied console log to analysis_dir", style="bold cyan")
         prepare_log_dir = op.join(analysis_dir, "prepare_log")
         os.makedirs(prepare_log_dir, exist_ok=True)
-        shutil.copy(log_fpath, op.join(prepare_log_dir, op.basename(log_fpath)))
-        shutil.copy(err_fpath, op.join(prepare_log_dir, op.basename(err_fpath)))
+        flush_logs()
+        jsonl_fpath = op.splitext(log_fpath)[0] + ".jsonl"
+        for fpath in (log_fpath, err_fpath, jsonl_fpath):
+            shutil.copy(fpath, op.join(prepare_log_dir, op.basename(fpath)))
 
 
 @app.command()
@@ -93,8 +104,10 @@ def run(
     )
     from launchcontainers import do_launch
 
+    set_stage("run")
     console.print("\n....running run mode\n", style="bold red")
     do_launch.main(workdir, run_lc)
+    summarize_console()
 
 
 @app.command()
@@ -114,8 +127,84 @@ def qc(
     )
     from launchcontainers import do_qc
 
+    set_stage("qc")
     console.print("\n....running quality check mode\n", style="bold red")
     do_qc.main(workdir, log_dir, debug)
+    summarize_console()
+
+
+@app.command()
+def workflow(
+    lc_config: list[str] = typer.Option(
+        ...,
+        "--lc-config",
+        "-lcc",
+        help="lc_config YAML of each stage, repeated in chain order",
+    ),
+    sub_ses_list: str = typer.Option(
+        ..., "--sub-ses-list", "-ssl", help="Path to subject/session list"
+    ),
+    container_specific_config: list[str] | None = typer.Option(
+        None,
+        "--container-specific-config",
+        "-cc",
+        help="Container-specific config of each stage, same order as -lcc",
+    ),
+    run_lc: bool = typer.Option(
+        False, "--run-lc", "-R", help="Prepare and launch ready sessions"
+    ),
+    poll_interval: int = typer.Option(
+        300, "--poll-interval", help="Seconds between checks for new outputs"
+    ),
+    state_file: str | None = typer.Option(
+        None, "--state-file", help="Workflow state JSON (resumable)"
+    ),
+    max_hours: float | None = typer.Option(
+        None, "--max-hours", help="Stop polling after this many hours"
+    ),
+    quiet: bool = typer.Option(False, "--quiet", "-q", help="Quiet mode"),
+    verbose: bool = typer.Option(False, "--verbose", "-v", help="Verbose mode"),
+    debug: bool = typer.Option(False, "--debug", "-d", help="Debug mode"),
+):
+    setup_verbosity(quiet=quiet, verbose=verbose, debug=debug)
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    tmp_log_dir = op.join(".", "logs_tmp")
+    os.makedirs(tmp_log_dir, exist_ok=True)
+    set_log_files(
+        op.join(tmp_log_dir, f"lc_workflow_{timestamp}.log"),
+        op.join(tmp_log_dir, f"lc_workflow_{timestamp}.err"),
+    )
+    from launchcontainers import do_workflow
+
+    set_stage("workflow")
+    console.print("\n....running workflow mode\n", style="bold red")
+    do_workflow.main(
+        lc_config,
+        container_specific_config,
+        sub_ses_list,
+        run_lc=run_lc,
+        poll_interval=poll_interval,
+        state_fpath=state_file,
+        max_hours=max_hours,
+    )
+    summarize_console()
+
+
+@app.command()
+def estimate(
+    workdir: str = typer.Option(..., "--workdir", "-w", help="Working directory"),
+    history: str | None = typer.Option(
+        None, "--history", help="Runtime history TSV (default from host_options)"
+    ),
+    debug: bool = typer.Option(False, "--debug", "-d", help="Debug mode"),
+):
+    setup_verbosity(debug=debug)
+    from launchcontainers import do_estimate
+
+    set_stage("estimate")
+    console.print("\n....running estimate mode\n", style="bold red")
+    do_estimate.main(workdir, history)
+    summarize_console()
 
 
 # Add other commands similarly...
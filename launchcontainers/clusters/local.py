@@ -16,8 +16,10 @@
 # """
 from __future__ import annotations
 
+import os
 import resource
 import subprocess as sp
+import sys
 from concurrent.futures import ProcessPoolExecutor, as_completed
 
 from launchcontainers.log_setup import console
@@ -46,18 +48,32 @@ def _worker_init(mem_bytes: int | None) -> None:
         resource.setrlimit(resource.RLIMIT_AS, (mem_bytes, mem_bytes))
 
 
-def _run_cmd(cmd: str) -> tuple[int, str]:
-    """Run a single shell command via a bash login shell and return (returncode, cmd).
+def _run_cmd(cmd: str) -> tuple[int, str, int]:
+    """Run a single shell command via a bash login shell.
 
     Using ``bash -l`` ensures that the module system (e.g. Environment Modules
     or Lmod) is initialised, so ``module load apptainer/...`` works even inside
     a subprocess that would otherwise inherit a plain /bin/sh environment.
+
+    Returns ``(returncode, cmd, peak_rss_kb)``; the peak RSS comes from
+    ``os.wait4`` and covers the bash process and every child it waited for.
     """
-    rc = sp.run(["bash", "-l", "-c", cmd]).returncode
-    return rc, cmd
+    proc = sp.Popen(["bash", "-l", "-c", cmd])
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    peak_kb = usage.ru_maxrss // 1024 if sys.platform == "darwin" else usage.ru_maxrss
+    return proc.returncode, cmd, peak_kb
+
+
+def _write_rss(rss_record_fpath: str | None, element: int, peak_kb: int) -> None:
+    """Append one ``element<TAB>peak_rss_kb`` row for the runtime model."""
+    if rss_record_fpath:
+        with open(rss_record_fpath, "a") as f:
+            f.write(f"{element}\t{peak_kb}\n")
 
 
-def launch_serial(cmds: list[str]) -> list[int]:
+def launch_serial(cmds: list[str], rss_record_fpath: str | None = None) -> list[int]:
     """
     Execute a list of shell commands one by one in order.
 
@@ -65,6 +81,9 @@ def launch_serial(cmds: list[str]) -> list[int]:
     ----------
     cmds : list[str]
         Shell commands to run sequentially.
+    rss_record_fpath : str or None
+        If given, the peak RSS of each command is appended to this TSV, keyed
+        by its 1-based position in ``cmds``.
 
     Returns
     -------
@@ -76,8 +95,9 @@ def launch_serial(cmds: list[str]) -> list[int]:
         style="cyan",
     )
     results = []
-    for cmd in cmds:
-        rc, _ = _run_cmd(cmd)
+    for element, cmd in enumerate(cmds, start=1):
+        rc, _, peak_kb = _run_cmd(cmd)
+        _write_rss(rss_record_fpath, element, peak_kb)
         results.append(rc)
         console.print(f"Finished rc={rc} | {cmd[:100]}", style="cyan")
     console.print("All local jobs finished.", style="bold red")
@@ -88,6 +108,7 @@ def launch_parallel(
     cmds: list[str],
     max_workers: int | None = None,
     mem_per_job: str | None = None,
+    rss_record_fpath: str | None = None,
 ) -> list[int]:
     """
     Execute a list of shell commands in parallel using ProcessPoolExecutor.
@@ -106,6 +127,9 @@ def launch_parallel(
         Maximum number of parallel workers. ``None`` uses the number of CPUs.
     mem_per_job : str or None
         Memory limit per worker, e.g. ``'32g'``. ``None`` means no limit.
+    rss_record_fpath : str or None
+        If given, the peak RSS of each command is appended to this TSV, keyed
+        by its 1-based position in ``cmds``.
 
     Returns
     -------
@@ -124,9 +148,13 @@ def launch_parallel(
         initializer=_worker_init,
         initargs=(mem_bytes,),
     ) as executor:
-        futures = {executor.submit(_run_cmd, cmd): cmd for cmd in cmds}
+        futures = {
+            executor.submit(_run_cmd, cmd): element
+            for element, cmd in enumerate(cmds, start=1)
+        }
         for future in as_completed(futures):
-            rc, cmd = future.result()
+            rc, cmd, peak_kb = future.result()
+            _write_rss(rss_record_fpath, futures[future], peak_kb)
             results.append(rc)
             console.print(f"Finished rc={rc} | {cmd[:100]}", style="cyan")
     console.print("All local jobs finished.", style="bold red")
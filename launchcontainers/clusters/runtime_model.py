@@ -0,0 +1,641 @@
+# """
+# MIT License
+# Copyright (c) 2020-2025 Garikoitz Lerma-Usabiaga
+# Copyright (c) 2020-2022 Mengxing Liu
+# Copyright (c) 2022-2023 Leandro Lecca
+# Copyright (c) 2022-2025 Yongning Lei
+# Copyright (c) 2023 David Linhardt
+# Copyright (c) 2023 Iñigo Tellaetxe
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit persons to
+# whom the Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+# """
+"""
+Historical runtime model for scheduler requests and job packing.
+
+Every launched task is wrapped with a small bash timer that appends one row
+(array index, sub, ses, elapsed seconds, exit code) to
+``<job_script_dir>/task_runtime.tsv``.  Peak memory comes from the OS for
+local runs (``os.wait4``) and from scheduler accounting (``sacct`` /
+``qacct``) for SLURM and SGE.  :func:`harvest` folds finished rows into a
+tab-separated history file keyed by ``(container, version, sub, ses)``, and
+:func:`predict_tasks` turns that history into per-task walltime and memory
+requests.
+
+Relevant ``host_options.<host>`` keys (all optional):
+
+- ``record_runtime`` (bool, default ``True``): wrap commands with the timer.
+- ``runtime_model`` (bool, default ``False``): replace the static
+  ``walltime`` / ``memory`` with predictions from the history.
+- ``pack_walltime`` (str, e.g. ``'04:00:00'``): pack short tasks into the
+  same array element up to this walltime.  Needs ``runtime_model: True``.
+- ``runtime_history`` (str): history file, default
+  ``~/.launchcontainers/runtime_history.tsv``.
+"""
+
+from __future__ import annotations
+
+import csv
+import glob
+import json
+import math
+import os
+import os.path as op
+import re
+import subprocess as sp
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from launchcontainers.log_setup import console
+
+RUNTIME_RECORD = "task_runtime.tsv"
+RSS_RECORD = "task_rss.tsv"
+SUBMISSION_MANIFEST = "submission.json"
+
+HISTORY_COLUMNS = [
+    "container",
+    "version",
+    "sub",
+    "ses",
+    "host",
+    "elapsed_s",
+    "peak_rss_mb",
+    "exit_code",
+    "recorded_at",
+    "job_script_dir",
+]
+
+# Never request less than this, queue start-up alone can take a minute
+MIN_WALLTIME_S = 600
+DEFAULT_MARGIN = 1.25
+DEFAULT_QUANTILE = 0.9
+
+
+@dataclass
+class TaskEstimate:
+    """Predicted resources for one (sub, ses) task."""
+
+    sub: str
+    ses: str
+    walltime_s: int | None
+    mem_mb: float | None
+    # session | version | container | config
+    source: str
+
+
+@dataclass
+class ArrayPlan:
+    """How a list of per-session commands is turned into array elements."""
+
+    lines: list[str]
+    groups: list[list[int]]
+    estimates: list[TaskEstimate] = field(default_factory=list)
+    # None means: keep the static value from host_options
+    walltime: str | None = None
+    memory: str | None = None
+
+
+# ---------------------------------------------------------------------------
+# Unit helpers
+# ---------------------------------------------------------------------------
+
+
+def parse_walltime(walltime) -> int | None:
+    """Parse ``'D-HH:MM:SS'``, ``'HH:MM:SS'`` or ``'MM:SS'`` into seconds."""
+    if walltime is None:
+        return None
+    text = str(walltime).strip().strip("'\"")
+    if not text:
+        return None
+    days = 0
+    if "-" in text:
+        day_str, text = text.split("-", 1)
+        days = int(day_str)
+    parts = [int(float(p)) for p in text.split(":")]
+    while len(parts) < 3:
+        parts.insert(0, 0)
+    hours, minutes, seconds = parts[-3:]
+    return ((days * 24 + hours) * 60 + minutes) * 60 + seconds
+
+
+def format_walltime(seconds: int) -> str:
+    """Format seconds as ``'HH:MM:SS'`` (hours may exceed 24)."""
+    seconds = math.ceil(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+
+def parse_memory_mb(mem, default_unit: str = "m") -> float | None:
+    """
+    Parse a memory string such as ``'32G'``, ``'512m'`` or ``'1234K'`` to MB.
+
+    ``default_unit`` is used when the string carries no unit; SLURM
+    treats bare numbers as MB, accounting tools report bare bytes.
+    """
+    if mem is None:
+        return None
+    match = re.match(r"^\s*([\d.]+)\s*([bkmgtBKMGT]?)", str(mem))
+    if not match or not match.group(1).strip("."):
+        return None
+    value = float(match.group(1))
+    unit = (match.group(2) or default_unit).lower()
+    factor = {"b": 1 / 1024**2, "k": 1 / 1024, "m": 1, "g": 1024, "t": 1024**2}
+    return value * factor[unit]
+
+
+def format_memory(mem_mb: float) -> str:
+    """Format MB as a whole number of GB, e.g. ``'12G'``."""
+    return f"{max(1, math.ceil(mem_mb / 1024))}G"
+
+
+def _quantile(values: list[float], q: float) -> float | None:
+    """Linear-interpolated quantile of ``values``; ``None`` when empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    pos = q * (len(ordered) - 1)
+    lo = math.floor(pos)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo)
+
+
+# ---------------------------------------------------------------------------
+# History file
+# ---------------------------------------------------------------------------
+
+
+def history_path(jobqueue_config: dict) -> str:
+    """Return the history file configured for a host (or the default)."""
+    path = jobqueue_config.get("runtime_history") if jobqueue_config else None
+    if not path:
+        path = op.join(op.expanduser("~"), ".launchcontainers", "runtime_history.tsv")
+    return path
+
+
+def read_history(path: str) -> list[dict]:
+    """Read the runtime history TSV; returns an empty list when missing."""
+    if not op.isfile(path):
+        return []
+    with open(path, newline="") as f:
+        return list(csv.DictReader(f, delimiter="\t"))
+
+
+def append_history(path: str, records: list[dict]) -> None:
+    """Append records to the runtime history TSV, writing a header if new."""
+    if not records:
+        return
+    os.makedirs(op.dirname(op.abspath(path)), exist_ok=True)
+    new_file = not op.isfile(path)
+    with open(path, "a", newline="") as f:
+        writer = csv.DictWriter(
+            f, fieldnames=HISTORY_COLUMNS, delimiter="\t", extrasaction="ignore"
+        )
+        if new_file:
+            writer.writeheader()
+        writer.writerows(records)
+
+
+# ---------------------------------------------------------------------------
+# Prediction and packing
+# ---------------------------------------------------------------------------
+
+
+def predict_tasks(
+    history: list[dict],
+    container: str,
+    version: str,
+    df_subses: list[tuple[str, str]],
+    default_walltime_s: int | None = None,
+    default_mem_mb: float | None = None,
+    margin: float = DEFAULT_MARGIN,
+    quantile: float = DEFAULT_QUANTILE,
+) -> list[TaskEstimate]:
+    """
+    Predict walltime and memory for each (sub, ses) from the history.
+
+    Successful runs of the same session with the same container version win.
+    Otherwise the ``quantile`` of all successful runs of that version is used,
+    then the same quantile over any version of the container, and finally the
+    static ``host_options`` defaults.  History-based values are multiplied by
+    ``margin``.
+
+    Parameters
+    ----------
+    history : list[dict]
+        Rows from :func:`read_history`.
+    container, version : str
+        Container name and version being launched.
+    df_subses : list[tuple[str, str]]
+        Sessions to predict, in launch order.
+    default_walltime_s, default_mem_mb : int, float or None
+        Fallback when there is no history for the container.
+    margin : float
+        Safety factor applied to observed values.
+    quantile : float
+        Quantile of the container-level distribution used for unseen sessions.
+
+    Returns
+    -------
+    list[TaskEstimate]
+        One estimate per input session, same order.
+    """
+    ok = [
+        r
+        for r in history
+        if r.get("container") == container and str(r.get("exit_code")) == "0"
+    ]
+    same_version = [r for r in ok if r.get("version") == version]
+    pool = same_version or ok
+    pool_source = "version" if same_version else "container"
+
+    def _mem(r):
+        return float(r["peak_rss_mb"]) if r.get("peak_rss_mb") else None
+
+    per_session: dict[tuple[str, str], tuple[float, float | None]] = {}
+    for r in same_version:
+        key = (r["sub"], r["ses"])
+        wall, mem = per_session.get(key, (0.0, None))
+        row_mem = _mem(r)
+        if row_mem is not None:
+            mem = row_mem if mem is None else max(mem, row_mem)
+        per_session[key] = (max(wall, float(r["elapsed_s"])), mem)
+
+    pool_wall = _quantile([float(r["elapsed_s"]) for r in pool], quantile)
+    pool_mem = _quantile(
+        [m for m in (_mem(r) for r in pool) if m is not None], quantile
+    )
+
+    estimates = []
+    for sub, ses in df_subses:
+        if (sub, ses) in per_session:
+            wall, mem = per_session[(sub, ses)]
+            source = "session"
+        elif pool_wall is not None:
+            wall, mem = pool_wall, pool_mem
+            source = pool_source
+        else:
+            estimates.append(
+                TaskEstimate(sub, ses, default_walltime_s, default_mem_mb, "config")
+            )
+            continue
+        walltime_s = max(MIN_WALLTIME_S, math.ceil(wall * margin))
+        mem_mb = mem * margin if mem is not None else default_mem_mb
+        estimates.append(TaskEstimate(sub, ses, walltime_s, mem_mb, source))
+    return estimates
+
+
+def pack_tasks(estimates: list[TaskEstimate], max_walltime_s: int) -> list[list[int]]:
+    """
+    Pack tasks into array elements with first-fit decreasing.
+
+    Tasks are placed, longest first, into the first element whose summed
+    predicted walltime stays below ``max_walltime_s``.  Tasks without a
+    prediction or longer than the cap get an element of their own.
+
+    Returns
+    -------
+    list[list[int]]
+        Groups of task indices, ordered by their first task.
+    """
+    order = sorted(
+        range(len(estimates)),
+        key=lambda i: -(estimates[i].walltime_s or max_walltime_s),
+    )
+    groups: list[list[int]] = []
+    loads: list[int] = []
+    for idx in order:
+        wall = estimates[idx].walltime_s
+        if wall is None or wall >= max_walltime_s:
+            groups.append([idx])
+            loads.append(max_walltime_s)
+            continue
+        for g, load in enumerate(loads):
+            if load + wall <= max_walltime_s:
+                groups[g].append(idx)
+                loads[g] += wall
+                break
+        else:
+            groups.append([idx])
+            loads.append(wall)
+    for group in groups:
+        group.sort()
+    return sorted(groups, key=lambda g: g[0])
+
+
+def wrap_with_timer(
+    cmd: str, element: int, sub: str, ses: str, record_fpath: str
+) -> str:
+    """
+    Wrap a command so it appends its elapsed time and exit code to a TSV.
+
+    The wrapped form keeps the worst non-zero exit code in ``_lc_rc`` so a
+    packed element reports failure if any of its tasks failed.
+    """
+    return (
+        f"_t0=$SECONDS; ( {cmd} ); _rc=$?; [ $_rc -eq 0 ] || _lc_rc=$_rc; "
+        f"printf '%s\\t%s\\t%s\\t%s\\t%s\\n' {element} {sub} {ses} "
+        f"$((SECONDS-_t0)) $_rc >> {record_fpath}"
+    )
+
+
+def plan_array(
+    lc_config: dict,
+    df_subses: list[tuple[str, str]],
+    commands: list[str],
+    record_fpath: str,
+) -> ArrayPlan:
+    """
+    Decide array elements, timer wrapping and resource requests for a launch.
+
+    Parameters
+    ----------
+    lc_config : dict
+        Loaded ``lc_config.yaml``.
+    df_subses : list[tuple[str, str]]
+        Sessions, aligned with ``commands``.
+    commands : list[str]
+        One launch command per session.
+    record_fpath : str
+        Path of the ``task_runtime.tsv`` written by the wrapped commands.
+
+    Returns
+    -------
+    ArrayPlan
+        ``lines`` holds one shell line per array element.
+    """
+    host = lc_config["general"]["host"]
+    container = lc_config["general"]["container"]
+    jobqueue_config = lc_config["host_options"][host]
+    version = (lc_config.get("container_specific", {}).get(container) or {}).get(
+        "version", ""
+    )
+    groups = [[i] for i in range(len(commands))]
+    plan = ArrayPlan(lines=list(commands), groups=groups)
+
+    if jobqueue_config.get("runtime_model", False):
+        history = read_history(history_path(jobqueue_config))
+        plan.estimates = predict_tasks(
+            history,
+            container,
+            str(version),
+            df_subses,
+            default_walltime_s=parse_walltime(jobqueue_config.get("walltime")),
+            default_mem_mb=parse_memory_mb(jobqueue_config.get("memory")),
+        )
+        pack_walltime_s = parse_walltime(jobqueue_config.get("pack_walltime"))
+        if host != "local" and pack_walltime_s:
+            plan.groups = pack_tasks(plan.estimates, pack_walltime_s)
+        longest = max(
+            (sum(plan.estimates[i].walltime_s or 0 for i in g) for g in plan.groups),
+            default=0,
+        )
+        mems = [e.mem_mb for e in plan.estimates if e.mem_mb is not None]
+        if any(e.source != "config" for e in plan.estimates):
+            plan.walltime = format_walltime(longest) if longest else None
+            plan.memory = format_memory(max(mems)) if mems else None
+
+    if not jobqueue_config.get("record_runtime", True):
+        plan.lines = [" ; ".join(commands[i] for i in g) for g in plan.groups]
+        return plan
+
+    lines = []
+    for element, group in enumerate(plan.groups, start=1):
+        wrapped = [
+            wrap_with_timer(commands[i], element, *df_subses[i], record_fpath)
+            for i in group
+        ]
+        lines.append("_lc_rc=0; " + "; ".join(wrapped) + "; (exit $_lc_rc)")
+    plan.lines = lines
+    return plan
+
+
+def summarize_plan(plan: ArrayPlan) -> None:
+    """Print where the predictions came from and the resulting requests."""
+    if not plan.estimates:
+        return
+    sources: dict[str, int] = {}
+    for est in plan.estimates:
+        sources[est.source] = sources.get(est.source, 0) + 1
+    source_str = ", ".join(f"{k}={v}" for k, v in sorted(sources.items()))
+    console.print(
+        f"Runtime model: {len(plan.estimates)} tasks in {len(plan.groups)} "
+        f"array elements (estimates from {source_str})",
+        style="cyan",
+    )
+    if plan.walltime or plan.memory:
+        console.print(
+            f"Runtime model request: walltime={plan.walltime}, memory={plan.memory}",
+            style="cyan",
+        )
+
+
+# ---------------------------------------------------------------------------
+# Recording finished jobs
+# ---------------------------------------------------------------------------
+
+
+def parse_job_id(submit_stdout: str) -> str | None:
+    """Extract the job id from ``sbatch`` / ``qsub`` output."""
+    match = re.search(r"(\d+)", submit_stdout or "")
+    return match.group(1) if match else None
+
+
+def write_submission_manifest(
+    job_script_dir: str,
+    lc_config: dict,
+    plan: ArrayPlan,
+    job_id: str | None = None,
+) -> str:
+    """Record what was launched so :func:`harvest` can attribute results."""
+    container = lc_config["general"]["container"]
+    manifest = {
+        "host": lc_config["general"]["host"],
+        "container": container,
+        "version": str(
+            (lc_config.get("container_specific", {}).get(container) or {}).get(
+                "version", ""
+            )
+        ),
+        "job_id": job_id,
+        "n_tasks": sum(len(g) for g in plan.groups),
+        "submitted_at": datetime.now().isoformat(timespec="seconds"),
+        "harvested_rows": 0,
+    }
+    fpath = op.join(job_script_dir, SUBMISSION_MANIFEST)
+    with open(fpath, "w") as f:
+        json.dump(manifest, f, indent=2)
+    return fpath
+
+
+def _read_tsv_rows(fpath: str) -> list[list[str]]:
+    if not op.isfile(fpath):
+        return []
+    with open(fpath) as f:
+        return [line.rstrip("\n").split("\t") for line in f if line.strip()]
+
+
+def _sacct_peak_mb(job_id: str) -> dict[int, float]:
+    """Peak RSS per array index from SLURM accounting."""
+    try:
+        result = sp.run(
+            ["sacct", "-j", job_id, "-n", "-P", "--format=JobID,MaxRSS"],
+            capture_output=True,
+            text=True,
+            timeout=60,
+        )
+    except (OSError, sp.TimeoutExpired):
+        return {}
+    peaks: dict[int, float] = {}
+    for line in result.stdout.splitlines():
+        parts = line.split("|")
+        if len(parts) < 2:
+            continue
+        match = re.match(r"^\d+_(\d+)", parts[0])
+        mem = parse_memory_mb(parts[1], default_unit="b")
+        if match and mem:
+            idx = int(match.group(1))
+            peaks[idx] = max(peaks.get(idx, 0.0), mem)
+    return peaks
+
+
+def _qacct_peak_mb(job_id: str) -> dict[int, float]:
+    """Peak memory per array index from SGE accounting (``maxvmem``)."""
+    try:
+        result = sp.run(
+            ["qacct", "-j", job_id], capture_output=True, text=True, timeout=60
+        )
+    except (OSError, sp.TimeoutExpired):
+        return {}
+    peaks: dict[int, float] = {}
+    task_id = None
+    for line in result.stdout.splitlines():
+        parts = line.split(None, 1)
+        if len(parts) != 2:
+            continue
+        key, value = parts[0], parts[1].strip()
+        if key == "taskid":
+            task_id = int(value) if value.isdigit() else None
+        elif key == "maxvmem" and task_id is not None:
+            mem = parse_memory_mb(value, default_unit="b")
+            if mem:
+                peaks[task_id] = max(peaks.get(task_id, 0.0), mem)
+    return peaks
+
+
+# SLURM states of a job that will not run any more
+_SLURM_ENDED = {
+    "BOOT_FAIL",
+    "CANCELLED",
+    "COMPLETED",
+    "DEADLINE",
+    "FAILED",
+    "NODE_FAIL",
+    "OUT_OF_MEMORY",
+    "PREEMPTED",
+    "TIMEOUT",
+}
+
+
+def job_in_queue(host: str, job_id: str | None) -> bool:
+    """
+    Whether an array job may still run (pending, running or completing).
+
+    Local launches return only once all commands finished.  SLURM (``DIPC``)
+    and SGE (``BCBL``) jobs are looked up with ``squeue`` / ``qstat``; only an
+    unknown job id or an ended state counts as gone, so if the scheduler
+    cannot be asked the job is assumed to be queued.
+    """
+    if host == "local":
+        return False
+    if not job_id or host not in ("DIPC", "BCBL"):
+        return True
+    cmd = (
+        ["squeue", "-h", "-j", job_id, "-o", "%T"]
+        if host == "DIPC"
+        else ["qstat", "-j", job_id]
+    )
+    try:
+        result = sp.run(cmd, capture_output=True, text=True, timeout=60)
+    except (OSError, sp.TimeoutExpired):
+        return True
+    if result.returncode != 0:
+        message = (result.stdout + result.stderr).lower()
+        return not ("invalid job id" in message or "do not exist" in message)
+    if host == "DIPC":
+        return any(s.rstrip("+") not in _SLURM_ENDED for s in result.stdout.split())
+    return True
+
+
+def harvest(workdir: str, history_fpath: str) -> int:
+    """
+    Append newly finished tasks of every launch under ``workdir`` to the history.
+
+    Each ``job_script_dir_*`` with a :data:`SUBMISSION_MANIFEST` is scanned;
+    only rows beyond ``harvested_rows`` are added, so calling this repeatedly
+    (e.g. while an array is still running) never duplicates records.
+
+    Returns
+    -------
+    int
+        Number of records appended.
+    """
+    n_new = 0
+    for job_script_dir in sorted(glob.glob(op.join(workdir, "job_script_dir_*"))):
+        manifest_fpath = op.join(job_script_dir, SUBMISSION_MANIFEST)
+        if not op.isfile(manifest_fpath):
+            continue
+        with open(manifest_fpath) as f:
+            manifest = json.load(f)
+        rows = _read_tsv_rows(op.join(job_script_dir, RUNTIME_RECORD))
+        new_rows = rows[manifest.get("harvested_rows", 0) :]
+        if not new_rows:
+            continue
+
+        if manifest["host"] == "local":
+            peaks = {
+                int(idx): float(kb) / 1024
+                for idx, kb in _read_tsv_rows(op.join(job_script_dir, RSS_RECORD))
+            }
+        elif manifest["host"] == "DIPC" and manifest.get("job_id"):
+            peaks = _sacct_peak_mb(manifest["job_id"])
+        elif manifest["host"] == "BCBL" and manifest.get("job_id"):
+            peaks = _qacct_peak_mb(manifest["job_id"])
+        else:
+            peaks = {}
+
+        recorded_at = datetime.now().isoformat(timespec="seconds")
+        records = []
+        for row in new_rows:
+            if len(row) < 5:
+                continue
+            element, sub, ses, elapsed, rc = row[:5]
+            peak = peaks.get(int(element))
+            records.append(
+                {
+                    "container": manifest["container"],
+                    "version": manifest["version"],
+                    "sub": sub,
+                    "ses": ses,
+                    "host": manifest["host"],
+                    "elapsed_s": elapsed,
+                    "peak_rss_mb": f"{peak:.1f}" if peak else "",
+                    "exit_code": rc,
+                    "recorded_at": recorded_at,
+                    "job_script_dir": job_script_dir,
+                }
+            )
+        append_history(history_fpath, records)
+        manifest["harvested_rows"] = len(rows)
+        with open(manifest_fpath, "w") as f:
+            json.dump(manifest, f, indent=2)
+        n_new += len(records)
+    if n_new:
+        console.print(
+            f"Recorded {n_new} finished tasks into {history_fpath}", style="cyan"
+        )
+    return n_new
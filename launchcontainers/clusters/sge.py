@@ -10,6 +10,8 @@ def gen_sge_array_job_script(
     parse_namespace,
     log_dir,
     n_jobs,
+    walltime=None,
+    memory=None,
 ):
     """
     Build the SGE array-job script used for batch container launches.
@@ -22,6 +24,12 @@ def gen_sge_array_job_script(
         Directory where scheduler stdout/stderr logs should be written.
     n_jobs : int
         Number of array tasks to request.
+    walltime : str or None
+        Walltime request overriding ``host_options`` (e.g. from the runtime
+        model). ``None`` keeps the configured value.
+    memory : str or None
+        Memory request overriding ``host_options``. ``None`` keeps the
+        configured value.
 
     Returns:
         str
@@ -36,7 +44,9 @@ def gen_sge_array_job_script(
     # below is the job specific configs
     job_name = jobqueue_config["job_name"]
     queue = jobqueue_config["queue"]
-    walltime = jobqueue_config["walltime"]
+    walltime = walltime or jobqueue_config["walltime"]
+    # SGE only gets a memory request when one is passed explicitly
+    mem_directive = f"\n#$ -l h_vmem={memory}" if memory else ""
 
     # Generate array job script
     job_name = f"{job_name}_array"
@@ -45,7 +55,7 @@ def gen_sge_array_job_script(
 #$ -N {job_name}
 #$ -o {log_dir}/{job_name}_$JOB_ID_$TASK_ID.out
 #$ -e {log_dir}/{job_name}_$JOB_ID_$TASK_ID.err
-#$ -l h_rt={walltime}
+#$ -l h_rt={walltime}{mem_directive}
 #$ -S /bin/bash
 #$ -q {queue}
 
@@ -9,6 +9,8 @@ def gen_slurm_array_job_script(
     parse_namespace,
     log_dir,
     n_jobs,
+    walltime=None,
+    memory=None,
 ):
     """
     Build the SLURM array-job script used for batch container launches.
@@ -21,6 +23,12 @@ def gen_slurm_array_job_script(
         Directory where scheduler stdout/stderr logs should be written.
     n_jobs : int
         Number of array tasks to request.
+    walltime : str or None
+        Walltime request overriding ``host_options`` (e.g. from the runtime
+        model). ``None`` keeps the configured value.
+    memory : str or None
+        Memory request overriding ``host_options``. ``None`` keeps the
+        configured value.
 
     Returns:
         str
@@ -35,11 +43,11 @@ def gen_slurm_array_job_script(
     # below is the job specific configs
     job_name = jobqueue_config["job_name"]
     cores = jobqueue_config["cores"]
-    memory = jobqueue_config["memory"]
+    memory = memory or jobqueue_config["memory"]
     partition = jobqueue_config["partition"]
     # qos is a DIPC specific command, it is defining the queue
     qos = jobqueue_config["qos"]
-    walltime = jobqueue_config["walltime"]
+    walltime = walltime or jobqueue_config["walltime"]
 
     # Generate array job script
     job_name = f"{job_name}_array"
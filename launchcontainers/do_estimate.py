@@ -0,0 +1,120 @@
+# """
+# MIT License
+# Copyright (c) 2020-2025 Garikoitz Lerma-Usabiaga
+# Copyright (c) 2020-2022 Mengxing Liu
+# Copyright (c) 2022-2023 Leandro Lecca
+# Copyright (c) 2022-2025 Yongning Lei
+# Copyright (c) 2023 David Linhardt
+# Copyright (c) 2023 Iñigo Tellaetxe
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit persons to
+# whom the Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+# """
+from __future__ import annotations
+
+import heapq
+import os.path as op
+
+from launchcontainers import utils as do
+from launchcontainers.clusters import runtime_model
+from launchcontainers.log_setup import console
+
+
+def _local_makespan(walltimes: list[int], max_workers: int) -> int:
+    """Longest-processing-time-first makespan on ``max_workers`` slots."""
+    slots = [0] * max(1, max_workers)
+    for wall in sorted(walltimes, reverse=True):
+        heapq.heappush(slots, heapq.heappop(slots) + wall)
+    return max(slots)
+
+
+def main(workdir: str, history: str | None = None):
+    """
+    Report the expected cost of launching a prepared analysis directory.
+
+    Finished tasks of earlier launches under ``workdir`` are first added to
+    the runtime history; the history is then used to predict walltime and
+    memory for every session in ``subseslist.txt``, exactly as ``lc run``
+    would with ``runtime_model: True``.
+
+    Parameters
+    ----------
+    workdir : str
+        Prepared analysis directory.
+    history : str or None
+        Runtime history TSV. ``None`` uses ``host_options.<host>.runtime_history``
+        or the default under ``~/.launchcontainers``.
+    """
+    analysis_dir = workdir
+    lc_config = do.read_yaml(op.join(analysis_dir, "lc_config.yaml"))
+    df_subses = do.parse_subses_list(op.join(analysis_dir, "subseslist.txt"))
+    host = lc_config["general"]["host"]
+    container = lc_config["general"]["container"]
+    jobqueue_config = lc_config["host_options"][host]
+    history_fpath = history or runtime_model.history_path(jobqueue_config)
+
+    runtime_model.harvest(analysis_dir, history_fpath)
+    history_rows = runtime_model.read_history(history_fpath)
+
+    # reuse the launch planner with the model switched on
+    jobqueue_config = dict(jobqueue_config, runtime_model=True)
+    jobqueue_config["runtime_history"] = history_fpath
+    plan_config = dict(lc_config, host_options={host: jobqueue_config})
+    plan = runtime_model.plan_array(
+        plan_config,
+        df_subses,
+        [""] * len(df_subses),
+        op.join(analysis_dir, runtime_model.RUNTIME_RECORD),
+    )
+
+    console.print(
+        f"\n### Runtime estimate for {container} on {host} "
+        f"({len(history_rows)} history records in {history_fpath})",
+        style="bold cyan",
+    )
+    for est in plan.estimates:
+        wall = (
+            runtime_model.format_walltime(est.walltime_s)
+            if est.walltime_s
+            else "unknown"
+        )
+        mem = runtime_model.format_memory(est.mem_mb) if est.mem_mb else "unknown"
+        console.print(
+            f"sub-{est.sub} ses-{est.ses}: walltime={wall} memory={mem} [{est.source}]"
+        )
+    runtime_model.summarize_plan(plan)
+
+    walltimes = [e.walltime_s for e in plan.estimates if e.walltime_s]
+    if len(walltimes) < len(plan.estimates):
+        console.print(
+            f"{len(plan.estimates) - len(walltimes)} tasks have no walltime "
+            "estimate (no history and no walltime in host_options)",
+            style="yellow",
+        )
+    if not walltimes:
+        return
+    task_hours = sum(walltimes) / 3600
+    if host == "local":
+        max_workers = int(jobqueue_config.get("max_workers") or 1)
+        if jobqueue_config.get("launch_mode", "serial") != "parallel":
+            max_workers = 1
+        makespan = _local_makespan(walltimes, max_workers)
+        console.print(
+            f"Expected campaign: {task_hours:.1f} task-hours, about "
+            f"{runtime_model.format_walltime(makespan)} wall-clock on "
+            f"{max_workers} local worker(s)",
+            style="bold cyan",
+        )
+    else:
+        cores = int(jobqueue_config.get("cores") or 1)
+        console.print(
+            f"Expected campaign: {task_hours:.1f} task-hours, "
+            f"{task_hours * cores:.1f} core-hours with {cores} cores per task, "
+            f"{len(plan.groups)} array elements requesting "
+            f"walltime={plan.walltime} memory={plan.memory}",
+            style="bold cyan",
+        )
@@ -23,12 +23,8 @@ import sys
 from argparse import Namespace
 from datetime import datetime
 from os import makedirs
+
 from launchcontainers import utils as do
-from launchcontainers.check import check_dwi_pipelines
-from launchcontainers.check import general_checks
-from launchcontainers.clusters import local
-from launchcontainers.clusters import sge
-from launchcontainers.clusters import slurm
 from launchcontainers.gen_jobscript import gen_launch_cmd
 from launchcontainers.log_setup import console
 
@@ -92,19 +88,35 @@ def launch_jobs(
         If ``True``, submit jobs for execution. If ``False``, only print the
         generated launch information.
     """
+    # scheduler backends are only needed once commands are generated
+    from launchcontainers.clusters import local
+    from launchcontainers.clusters import runtime_model
+    from launchcontainers.clusters import sge
+    from launchcontainers.clusters import slurm
+
     # read LC config yml from analysis dir
     analysis_dir = parse_namespace.workdir
     lc_config_fpath = op.join(analysis_dir, "lc_config.yaml")
     lc_config = do.read_yaml(lc_config_fpath)
     host = lc_config["general"]["host"]
-    # get number of jobs from subseslist
-    n_jobs = len(df_subses)
+    jobqueue_config = lc_config["host_options"][host]
     # write commands into a single file to form batch array
     batch_command_fpath = op.join(job_script_dir, "batch_commands.txt")
     commands = gen_launch_cmd(parse_namespace, df_subses, batch_command_fpath)
+    # fold finished tasks of earlier launches into the runtime history, then
+    # wrap (and optionally pack) the commands into array elements
+    if jobqueue_config.get("runtime_model", False):
+        runtime_model.harvest(analysis_dir, runtime_model.history_path(jobqueue_config))
+    record_fpath = op.join(job_script_dir, runtime_model.RUNTIME_RECORD)
+    plan = runtime_model.plan_array(lc_config, df_subses, commands, record_fpath)
+    runtime_model.summarize_plan(plan)
+    with open(batch_command_fpath, "w") as f:
+        f.write("\n".join(plan.lines) + "\n")
+    commands = plan.lines
+    # get number of jobs from the array elements
+    n_jobs = len(plan.lines)
     # read the first command as example
-    with open(batch_command_fpath) as f:
-        command = f.readline().strip()
+    command = plan.lines[0]
 
     # DRY RUN mode
     if not run_lc:
@@ -116,6 +128,8 @@ def launch_jobs(
                 parse_namespace,
                 job_script_dir,
                 n_jobs,
+                walltime=plan.walltime,
+                memory=plan.memory,
             )
             console.print(f"\n### SLURM job script is {job_script}", style="bold red")
         elif host == "BCBL":
@@ -123,6 +137,8 @@ def launch_jobs(
                 parse_namespace,
                 job_script_dir,
                 n_jobs,
+                walltime=plan.walltime,
+                memory=plan.memory,
             )
             console.print(f"\n### SGE job script is {job_script}", style="bold red")
         console.print(f"\n### Example launch command is: {command}", style="bold red")
@@ -135,19 +151,27 @@ def launch_jobs(
 
         def launch_cmd(cmd):
             result = sp.run(cmd, shell=True, capture_output=True, text=True, timeout=60)
-            return result.returncode
+            return result.returncode, result.stdout
 
         if host == "local":
-            jobqueue_config = lc_config["host_options"][host]
+            runtime_model.write_submission_manifest(job_script_dir, lc_config, plan)
+            rss_record_fpath = op.join(job_script_dir, runtime_model.RSS_RECORD)
             launch_mode = jobqueue_config.get("launch_mode", "serial")
             if launch_mode == "parallel":
                 max_workers = jobqueue_config.get("max_workers", None)
                 mem_per_job = jobqueue_config.get("mem_per_job", None)
                 local.launch_parallel(
-                    commands, max_workers=max_workers, mem_per_job=mem_per_job
+                    commands,
+                    max_workers=max_workers,
+                    mem_per_job=mem_per_job,
+                    rss_record_fpath=rss_record_fpath,
                 )
             else:
-                local.launch_serial(commands)
+                local.launch_serial(commands, rss_record_fpath=rss_record_fpath)
+            if jobqueue_config.get("record_runtime", True):
+                runtime_model.harvest(
+                    analysis_dir, runtime_model.history_path(jobqueue_config)
+                )
 
         elif host == "DIPC":
             batch_command = (
@@ -157,6 +181,8 @@ def launch_jobs(
                 parse_namespace,
                 job_script_dir,
                 n_jobs,
+                walltime=plan.walltime,
+                memory=plan.memory,
             )
             final_script = job_script.replace("your_command_here", batch_command)
             job_script_fname = "src_launch_script.slurm"
@@ -171,11 +197,17 @@ def launch_jobs(
             )
             cmd = f"sbatch {job_script_fpath}"
             try:
-                return_code = launch_cmd(cmd)
+                return_code, stdout = launch_cmd(cmd)
                 console.print(
                     f"\n return code of launch is {return_code} \n",
                     style="bold red",
                 )
+                runtime_model.write_submission_manifest(
+                    job_script_dir,
+                    lc_config,
+                    plan,
+                    job_id=runtime_model.parse_job_id(stdout),
+                )
             except sp.TimeoutExpired:
                 console.print("Sbatch submission timed out!", style="bold red")
             except Exception as e:
@@ -187,6 +219,8 @@ def launch_jobs(
                 parse_namespace,
                 job_script_dir,
                 n_jobs,
+                walltime=plan.walltime,
+                memory=plan.memory,
             )
             final_script = job_script.replace("your_command_here", batch_command)
             job_script_fname = "src_launch_script.sh"
@@ -201,11 +235,17 @@ def launch_jobs(
             )
             cmd = f"qsub {job_script_fpath}"
             try:
-                return_code = launch_cmd(cmd)
+                return_code, stdout = launch_cmd(cmd)
                 console.print(
                     f"\n return code of launch is {return_code} \n",
                     style="bold red",
                 )
+                runtime_model.write_submission_manifest(
+                    job_script_dir,
+                    lc_config,
+                    plan,
+                    job_id=runtime_model.parse_job_id(stdout),
+                )
             except sp.TimeoutExpired:
                 console.print("Qsub submission timed out!", style="bold red")
             except Exception as e:
@@ -230,6 +270,10 @@ def main(workdir: str, run_lc: bool = False):
     run_lc : bool, default=False
         Whether to run launchcontainers.
     """
+    from launchcontainers.check import check_dwi_pipelines
+    from launchcontainers.check import general_checks
+    from launchcontainers.check import preflight
+
     # 1. setup run mode logger
     # read the yaml to get input info
     analysis_dir = workdir
@@ -245,7 +289,6 @@ def main(workdir: str, run_lc: bool = False):
     # get stuff from subseslist for future jobs scheduling
     sub_ses_list_path = op.join(analysis_dir, "subseslist.txt")
     df_subses = do.parse_subses_list(sub_ses_list_path)
-    num_of_jobs = len(df_subses)
     # 2. do a independent check to see if everything is in place
     parse_namespace = Namespace(workdir=workdir, run_lc=run_lc)
     if container in [
@@ -260,12 +303,37 @@ def main(workdir: str, run_lc: bool = False):
         if container in ["rtp2-pipeline", "rtp-pipeline"]:
             # do a second check for the RTP file, if exist, backup
             check_dwi_pipelines.backup_old_rtp2pipeline_log(parse_namespace, df_subses)
-    # 3. tree sub-/ses- structure for checking
+    # 3. pre-flight: check every generated command before anything is queued
+    job_script_dir = (
+        f"{analysis_dir}/job_script_dir_{datetime.now().strftime('%Y-%m-%d_%H-%M')}"
+    )
+    os.makedirs(job_script_dir, exist_ok=True)
+    commands = gen_launch_cmd(
+        parse_namespace, df_subses, op.join(job_script_dir, "batch_commands.txt")
+    )
+    bad_subses = preflight.run_preflight(commands, df_subses, analysis_dir)
+    preflight.print_preflight_table(bad_subses, len(df_subses))
+    if bad_subses:
+        # hold the broken sessions out of this launch, they can be relaunched
+        # from the held list once fixed
+        held_fpath = op.join(job_script_dir, "preflight_held_subseslist.tsv")
+        preflight.write_held_subseslist(bad_subses, held_fpath)
+        df_subses = [subses for subses in df_subses if subses not in bad_subses]
+        console.print(
+            f"\n### {len(bad_subses)} sessions held, see {held_fpath}",
+            style="yellow",
+        )
+        if not df_subses:
+            console.print("No session passed the pre-flight checks.", style="red")
+            sys.exit(1)
+    num_of_jobs = len(df_subses)
+
+    # 4. tree sub-/ses- structure for checking
     sub, ses = df_subses[0]
     console.print("\n### output example subject folder structure \n", style="bold red")
     general_checks.cli_show_folder_struc(analysis_dir, sub, ses)
 
-    # 4. ask for user input about folder structure and example command
+    # 5. ask for user input about folder structure and example command
     general_checks.print_option_for_review(
         num_of_jobs,
         lc_config,
@@ -273,14 +341,6 @@ def main(workdir: str, run_lc: bool = False):
         bidsdir_name,
     )
 
-    # 5. generate the job script
-    # TODO: for different containers
-    # check here if the log dir and singularity home dir is being put under proper place
-    # Setup log dir, create command txt under log dir
-    job_script_dir = (
-        f"{analysis_dir}/job_script_dir_{datetime.now().strftime('%Y-%m-%d_%H-%M')}"
-    )
-    os.makedirs(job_script_dir, exist_ok=True)
     # 6. generate command to print
     # === Ask user to confirm before launching anything ===
     ans = input(
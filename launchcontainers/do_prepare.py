@@ -19,12 +19,14 @@ from __future__ import annotations
 import os
 import os.path as op
 
-from bids import BIDSLayout
-
 from launchcontainers import utils as do
 from launchcontainers.log_setup import console
-from launchcontainers.prepare import dwi_prepare as dwi_prepare
-from launchcontainers.prepare.glm_prepare import run_glm_prepare
+from launchcontainers.prepare.permissions import (
+    fix_permissions,
+    fs_now_ns,
+    parse_mode,
+    prepare_plan,
+)
 
 _GLM_PIPELINES = {"fMRI-GLM"}
 _DWI_PIPELINES = {
@@ -103,13 +105,24 @@ def _prepare_analysis_dir(parse_namespace, analysis_dir: str, lc_config: dict):
     )
 
 
-def _chmod777(path: str) -> None:
-    """Recursively set permissions to 777 on *path* so other users can access it."""
-    console.print(f"Setting permissions 777 on {path}", style="blue")
-    for dirpath, dirnames, filenames in os.walk(path):
-        os.chmod(dirpath, 0o777)
-        for fname in filenames:
-            os.chmod(op.join(dirpath, fname), 0o777)
+def _fix_permissions(analysis_dir: str, df_subses, mode: int, since_ns: int) -> None:
+    """
+    Open up what this prepare wrote in *analysis_dir* so other users can access it.
+
+    Only the folders of the prepare plan are scanned, and only entries
+    changed since *since_ns* get *mode*; symlinks and existing container
+    outputs are left alone.
+    """
+    console.print(f"Setting permissions {mode:o} on {analysis_dir}", style="blue")
+    report = fix_permissions(
+        prepare_plan(analysis_dir, df_subses), mode=mode, since_ns=since_ns
+    )
+    console.print(
+        f"Checked {report.checked} entries, changed {report.changed}",
+        style="blue",
+    )
+    for failure in report.failed:
+        console.print(f"  could not chmod {failure}", style="yellow")
 
 
 def main(parse_namespace) -> tuple[bool, str | None]:
@@ -140,12 +153,22 @@ def main(parse_namespace) -> tuple[bool, str | None]:
     container = lc_config["general"]["container"]
     basedir = lc_config["general"]["basedir"]
     bidsdir_name = lc_config["general"]["bidsdir_name"]
+    # checked before anything is prepared, applied at the end
+    mode = parse_mode(lc_config["general"].get("permission_mode"))
 
     sub_ses_list_path = parse_namespace.sub_ses_list
     df_subses = do.parse_subses_list(sub_ses_list_path)
 
+    # pybids and the pipeline modules are only needed past this point, so they
+    # are imported here to keep `lc --help` and `lc run` fast
+    from bids import BIDSLayout
+
     if container in _DWI_PIPELINES:
+        from launchcontainers.prepare import dwi_prepare
+
         analysis_dir = _create_analysis_dir(lc_config)
+        # entries older than this were not written by this prepare
+        started_ns = fs_now_ns(analysis_dir)
         _prepare_analysis_dir(parse_namespace, analysis_dir, lc_config)
 
         console.print("Reading the BIDS layout...", style="blue")
@@ -158,7 +181,7 @@ def main(parse_namespace) -> tuple[bool, str | None]:
             f"\n #####\n \U0001f37a Analysis dir is \n{analysis_dir}\n",
             style="bold red",
         )
-        _chmod777(analysis_dir)
+        _fix_permissions(analysis_dir, df_subses, mode, started_ns)
         return success, analysis_dir
 
     elif container in _GLM_PIPELINES:
@@ -173,7 +196,11 @@ def main(parse_namespace) -> tuple[bool, str | None]:
             GLMPrepare.write_example_config()
             return False, None
 
+        from launchcontainers.prepare.glm_prepare import run_glm_prepare
+
         analysis_dir = _create_analysis_dir(lc_config)
+        # entries older than this were not written by this prepare
+        started_ns = fs_now_ns(analysis_dir)
         _prepare_analysis_dir(parse_namespace, analysis_dir, lc_config)
 
         console.print("Reading the BIDS layout...", style="blue")
@@ -186,7 +213,7 @@ def main(parse_namespace) -> tuple[bool, str | None]:
             f"\n #####\n \U0001f37a Analysis dir is \n{analysis_dir}\n",
             style="bold red",
         )
-        _chmod777(analysis_dir)
+        _fix_permissions(analysis_dir, df_subses, mode, started_ns)
         return success, analysis_dir
 
     else:
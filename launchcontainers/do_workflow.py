@@ -0,0 +1,560 @@
+# """
+# MIT License
+# Copyright (c) 2020-2025 Garikoitz Lerma-Usabiaga
+# Copyright (c) 2020-2022 Mengxing Liu
+# Copyright (c) 2022-2023 Leandro Lecca
+# Copyright (c) 2022-2025 Yongning Lei
+# Copyright (c) 2023 David Linhardt
+# Copyright (c) 2023 Iñigo Tellaetxe
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit persons to
+# whom the Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+# """
+"""
+Per-session workflow across a chain of DWI containers.
+
+``lc workflow`` takes several lc_configs (e.g. freesurferator ->
+rtp2-preproc -> rtp2-pipeline) and treats every (stage, sub, ses) as a node.
+A node is prepared and launched as soon as the upstream outputs of *that*
+session exist, so early sessions reach rtp2-pipeline while late sessions are
+still in freesurferator.  Stage dependencies are read from the
+``precontainer_*`` / ``*_analysis_name`` keys of each lc_config.
+
+The driver polls the file system; launching goes through
+:func:`launchcontainers.do_launch.launch_jobs`, so local, SLURM and SGE all
+work.  On ``local`` each wave of ready sessions runs to completion before
+the next poll.  Node states are kept in a JSON file so an interrupted
+workflow can be resumed.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import os.path as op
+import time
+from argparse import Namespace
+from dataclasses import dataclass
+from datetime import datetime
+
+from launchcontainers import utils as do
+from launchcontainers.log_setup import console
+
+# Files in <analysis_dir>/sub-*/ses-*/output that mark a finished session
+_STAGE_OUTPUTS = {
+    "anatrois": ["fs.zip", "T1.nii.gz"],
+    "freesurferator": ["fs.zip", "T1.nii.gz"],
+    "rtppreproc": ["dwi.nii.gz", "dwi.bvals", "dwi.bvecs", "t1.nii.gz"],
+    "rtp2-preproc": ["dwi.nii.gz", "dwi.bvals", "dwi.bvecs", "t1.nii.gz"],
+    "rtp-pipeline": ["RTP_PIPELINE_ALL_OUTPUT.zip"],
+    "rtp2-pipeline": ["RTP_PIPELINE_ALL_OUTPUT.zip"],
+}
+
+# (container key, analysis-name key) pairs pointing to upstream stages
+_UPSTREAM_KEYS = {
+    "rtppreproc": [("precontainer_anat", "anat_analysis_name")],
+    "rtp2-preproc": [("precontainer_anat", "anat_analysis_name")],
+    "rtp-pipeline": [
+        ("precontainer_anat", "anat_analysis_name"),
+        ("precontainer_preproc", "preproc_analysis_name"),
+    ],
+    "rtp2-pipeline": [
+        ("precontainer_anat", "anat_analysis_name"),
+        ("precontainer_preproc", "preproc_analysis_name"),
+    ],
+}
+
+# waiting -> launched -> done | failed; blocked when an upstream can never finish
+_TERMINAL = {"done", "failed", "blocked"}
+
+
+@dataclass
+class Stage:
+    """One lc_config of the chain."""
+
+    lc_config_fpath: str
+    container_config_fpath: str | None
+    lc_config: dict
+    # filled by the analysis-level prepare
+    config_json_dict: dict | None = None
+
+    @property
+    def container(self) -> str:
+        return self.lc_config["general"]["container"]
+
+    @property
+    def version(self) -> str:
+        return str(self.lc_config["container_specific"][self.container]["version"])
+
+    @property
+    def analysis_name(self) -> str:
+        return str(self.lc_config["general"]["analysis_name"])
+
+    @property
+    def name(self) -> str:
+        return f"{self.container}_{self.version}/analysis-{self.analysis_name}"
+
+    @property
+    def derivatives_dir(self) -> str:
+        general = self.lc_config["general"]
+        return op.join(general["basedir"], general["bidsdir_name"], "derivatives")
+
+    @property
+    def analysis_dir(self) -> str:
+        # same rule as do_prepare._create_analysis_dir
+        if self.lc_config["general"]["deriv_layout"] == "legacy":
+            return op.join(
+                self.derivatives_dir,
+                f"{self.container}_{self.version}",
+                f"analysis-{self.analysis_name}",
+            )
+        return op.join(
+            self.derivatives_dir,
+            f"{self.container}-{self.version}_{self.analysis_name}",
+        )
+
+    def upstream_dirs(self) -> list[tuple[str, str]]:
+        """``(precontainer, analysis_dir)`` of every input this stage reads."""
+        specific = self.lc_config["container_specific"][self.container]
+        dirs = []
+        for container_key, analysis_key in _UPSTREAM_KEYS.get(self.container, []):
+            precontainer = specific[container_key]
+            dirs.append(
+                (
+                    precontainer,
+                    op.join(
+                        self.derivatives_dir,
+                        precontainer,
+                        f"analysis-{specific[analysis_key]}",
+                    ),
+                )
+            )
+        return dirs
+
+
+def _session_output_dir(analysis_dir: str, sub: str, ses: str) -> str:
+    return op.join(analysis_dir, f"sub-{sub}", f"ses-{ses}", "output")
+
+
+def _outputs_exist(container: str, analysis_dir: str, sub: str, ses: str) -> bool:
+    output_dir = _session_output_dir(analysis_dir, sub, ses)
+    return all(op.exists(op.join(output_dir, f)) for f in _STAGE_OUTPUTS[container])
+
+
+def _failed_in_job_dir(job_script_dir: str | None, sub: str, ses: str) -> bool:
+    """True when the runtime record of a launch reports a non-zero exit code."""
+    if not job_script_dir:
+        return False
+    from launchcontainers.clusters import runtime_model
+
+    record = op.join(job_script_dir, runtime_model.RUNTIME_RECORD)
+    if not op.isfile(record):
+        return False
+    with open(record) as f:
+        for line in f:
+            row = line.rstrip("\n").split("\t")
+            if len(row) >= 5 and row[1] == sub and row[2] == ses and row[4] != "0":
+                return True
+    return False
+
+
+def _left_queue(job_script_dir: str | None) -> bool:
+    """True once the job launched from *job_script_dir* can no longer run."""
+    if not job_script_dir:
+        return False
+    from launchcontainers.clusters import runtime_model
+
+    manifest_fpath = op.join(job_script_dir, runtime_model.SUBMISSION_MANIFEST)
+    if not op.isfile(manifest_fpath):
+        # written right after submission; missing means nothing was queued
+        return True
+    with open(manifest_fpath) as f:
+        manifest = json.load(f)
+    return not runtime_model.job_in_queue(manifest["host"], manifest.get("job_id"))
+
+
+class Workflow:
+    """
+    Per-session DAG over a chain of stages.
+
+    Parameters
+    ----------
+    stages : list[Stage]
+        Stages in chain order.
+    sub_ses_list : str
+        Subject/session list streamed through the chain.
+    state_fpath : str
+        JSON file keeping node states between polls and between invocations.
+    """
+
+    def __init__(self, stages: list[Stage], sub_ses_list: str, state_fpath: str):
+        self.stages = stages
+        self.sub_ses_list = sub_ses_list
+        self.df_subses = do.parse_subses_list(sub_ses_list)
+        self.state_fpath = state_fpath
+        self.state: dict[str, dict[str, dict]] = {}
+        if op.isfile(state_fpath):
+            with open(state_fpath) as f:
+                self.state = json.load(f)
+        for stage in stages:
+            nodes = self.state.setdefault(stage.name, {})
+            for sub, ses in self.df_subses:
+                node = nodes.setdefault(f"{sub}/{ses}", {"status": "waiting"})
+                # a new invocation retries whatever failed last time
+                if node["status"] in {"failed", "blocked"}:
+                    node["status"] = "waiting"
+        # upstream stage indices of each stage, resolved by analysis dir
+        by_dir = {op.normpath(s.analysis_dir): i for i, s in enumerate(stages)}
+        self.parents: list[list[int]] = []
+        self.external: list[list[tuple[str, str]]] = []
+        for stage in stages:
+            parents, external = [], []
+            for precontainer, upstream_dir in stage.upstream_dirs():
+                idx = by_dir.get(op.normpath(upstream_dir))
+                if idx is None:
+                    external.append((precontainer, upstream_dir))
+                else:
+                    parents.append(idx)
+            self.parents.append(parents)
+            self.external.append(external)
+        self._prepared: set[int] = set()
+        self._layout = None
+
+    def node(self, stage_idx: int, sub: str, ses: str) -> dict:
+        return self.state[self.stages[stage_idx].name][f"{sub}/{ses}"]
+
+    def save(self) -> None:
+        with open(self.state_fpath, "w") as f:
+            json.dump(self.state, f, indent=2)
+
+    def refresh(self) -> None:
+        """
+        Update node states from the file system, runtime records and queue.
+
+        A launched node fails when its runtime record reports a non-zero exit
+        code, or when its job has left the scheduler queue without producing
+        the stage outputs (e.g. killed before the record was written).
+        """
+        left_queue: dict[str, bool] = {}
+        for idx, stage in enumerate(self.stages):
+            for sub, ses in self.df_subses:
+                node = self.node(idx, sub, ses)
+                if node["status"] == "done":
+                    continue
+                if _outputs_exist(stage.container, stage.analysis_dir, sub, ses):
+                    node["status"] = "done"
+                elif node["status"] == "launched" and _failed_in_job_dir(
+                    node.get("job_script_dir"), sub, ses
+                ):
+                    node["status"] = "failed"
+                    console.print(
+                        f"{stage.name} failed for sub-{sub} ses-{ses}", style="red"
+                    )
+                elif node["status"] == "launched" and self._job_lost(
+                    node.get("job_script_dir"), left_queue, idx, sub, ses
+                ):
+                    node["status"] = "failed"
+                    console.print(
+                        f"{stage.name} failed for sub-{sub} ses-{ses}: the job "
+                        "left the queue without writing its outputs",
+                        style="red",
+                    )
+                elif node["status"] == "waiting" and self._is_blocked(idx, sub, ses):
+                    node["status"] = "blocked"
+                    console.print(
+                        f"{stage.name} blocked for sub-{sub} ses-{ses}: an upstream "
+                        "stage failed or its outputs are missing",
+                        style="yellow",
+                    )
+
+    def _job_lost(
+        self, job_script_dir, left_queue: dict, idx: int, sub: str, ses: str
+    ) -> bool:
+        if not job_script_dir:
+            return False
+        if job_script_dir not in left_queue:
+            left_queue[job_script_dir] = _left_queue(job_script_dir)
+        if not left_queue[job_script_dir]:
+            return False
+        # outputs may have landed between the first check and the queue lookup
+        stage = self.stages[idx]
+        return not _outputs_exist(stage.container, stage.analysis_dir, sub, ses)
+
+    def _external_ready(self, idx: int, sub: str, ses: str) -> bool:
+        """Upstream outputs not produced by this workflow must already exist."""
+        for precontainer, upstream_dir in self.external[idx]:
+            container = precontainer.split("_")[0]
+            if container in _STAGE_OUTPUTS and not _outputs_exist(
+                container, upstream_dir, sub, ses
+            ):
+                return False
+        return True
+
+    def _is_blocked(self, idx: int, sub: str, ses: str) -> bool:
+        if not self._external_ready(idx, sub, ses):
+            return True
+        return any(
+            self.node(p, sub, ses)["status"] in {"failed", "blocked"}
+            for p in self.parents[idx]
+        )
+
+    def ready(self, idx: int) -> list[tuple[str, str]]:
+        """Sessions of stage ``idx`` whose upstream nodes are all done."""
+        return [
+            (sub, ses)
+            for sub, ses in self.df_subses
+            if self.node(idx, sub, ses)["status"] == "waiting"
+            and all(
+                self.node(p, sub, ses)["status"] == "done" for p in self.parents[idx]
+            )
+            and self._external_ready(idx, sub, ses)
+        ]
+
+    def finished(self) -> bool:
+        return all(
+            self.node(idx, sub, ses)["status"] in _TERMINAL
+            for idx in range(len(self.stages))
+            for sub, ses in self.df_subses
+        )
+
+    def print_status(self) -> None:
+        for sub, ses in self.df_subses:
+            status = ", ".join(
+                f"{stage.container}={self.node(i, sub, ses)['status']}"
+                for i, stage in enumerate(self.stages)
+            )
+            console.print(f"sub-{sub} ses-{ses}: {status}")
+
+    # ------------------------------------------------------------------
+    # prepare + launch
+    # ------------------------------------------------------------------
+
+    def _namespace(self, stage: Stage) -> Namespace:
+        return Namespace(
+            lc_config=stage.lc_config_fpath,
+            sub_ses_list=self.sub_ses_list,
+            container_specific_config=stage.container_config_fpath,
+        )
+
+    def _layout_for(self, stage: Stage):
+        if self._layout is None:
+            from bids import BIDSLayout
+
+            general = stage.lc_config["general"]
+            console.print("Reading the BIDS layout...", style="blue")
+            self._layout = BIDSLayout(
+                op.join(general["basedir"], general["bidsdir_name"]), validate=False
+            )
+        return self._layout
+
+    def _prepare_stage(self, idx: int) -> dict:
+        """Analysis-level prepare, done once per stage."""
+        from launchcontainers import do_prepare
+        from launchcontainers.prepare import dwi_prepare
+
+        stage = self.stages[idx]
+        parse_namespace = self._namespace(stage)
+        analysis_dir = do_prepare._create_analysis_dir(stage.lc_config)
+        do_prepare._prepare_analysis_dir(parse_namespace, analysis_dir, stage.lc_config)
+        config_json_dict = dwi_prepare.copy_and_edit_config_json(
+            parse_namespace, analysis_dir
+        )
+        self._prepared.add(idx)
+        stage.config_json_dict = config_json_dict
+        return config_json_dict
+
+    def _check_cohort_rois(self, idx: int) -> None:
+        """
+        Cohort ROI check of ``dwi_prepare.main``, once per stage.
+
+        Only sessions whose upstream stages are done can have an ``fs.zip``
+        yet.  Missing inputs are reported (and written to
+        ``missing_rois.tsv``) without stopping the workflow; those sessions
+        then fail in their own prepare.
+        """
+        from launchcontainers.prepare import dwi_prepare
+
+        stage = self.stages[idx]
+        if stage.container not in ("rtp-pipeline", "rtp2-pipeline"):
+            return
+        sessions = [
+            (sub, ses)
+            for sub, ses in self.df_subses
+            if all(
+                self.node(p, sub, ses)["status"] == "done" for p in self.parents[idx]
+            )
+            and self._external_ready(idx, sub, ses)
+        ]
+        if not sessions:
+            return
+        try:
+            dwi_prepare.check_cohort_rois(
+                stage.config_json_dict, stage.analysis_dir, stage.lc_config, sessions
+            )
+        except FileNotFoundError as e:
+            console.print(f"{stage.name}: {e}", style="red")
+
+    def launch(self, idx: int, sessions: list[tuple[str, str]], run_lc: bool) -> None:
+        """Prepare ``sessions`` for stage ``idx`` and launch them as one array."""
+        from launchcontainers import do_launch
+        from launchcontainers.check import check_dwi_pipelines
+        from launchcontainers.check import preflight
+        from launchcontainers.gen_jobscript import gen_launch_cmd
+        from launchcontainers.prepare import dwi_prepare
+
+        stage = self.stages[idx]
+        if idx not in self._prepared:
+            self._prepare_stage(idx)
+            self._check_cohort_rois(idx)
+        parse_namespace = self._namespace(stage)
+        layout = self._layout_for(stage)
+        launchable = []
+        for sub, ses in sessions:
+            try:
+                dwi_prepare.prepare_session(
+                    parse_namespace,
+                    stage.config_json_dict,
+                    stage.analysis_dir,
+                    stage.lc_config,
+                    sub,
+                    ses,
+                    layout,
+                )
+                launchable.append((sub, ses))
+            except Exception as e:
+                console.print(
+                    f"{stage.name}: prepare failed for sub-{sub} ses-{ses}: {e}",
+                    style="red",
+                )
+                self.node(idx, sub, ses)["status"] = "failed"
+        if not launchable:
+            return
+
+        run_namespace = Namespace(workdir=stage.analysis_dir, run_lc=run_lc)
+        check_dwi_pipelines.check_dwi_analysis_folder(run_namespace, stage.container)
+        if stage.container in ["rtp2-pipeline", "rtp-pipeline"]:
+            check_dwi_pipelines.backup_old_rtp2pipeline_log(run_namespace, launchable)
+        job_script_dir = op.join(
+            stage.analysis_dir,
+            f"job_script_dir_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}",
+        )
+        os.makedirs(job_script_dir, exist_ok=True)
+        commands = gen_launch_cmd(
+            run_namespace, launchable, op.join(job_script_dir, "batch_commands.txt")
+        )
+        bad_subses = preflight.run_preflight(commands, launchable, stage.analysis_dir)
+        if bad_subses:
+            preflight.print_preflight_table(bad_subses, len(launchable))
+            for sub, ses in bad_subses:
+                self.node(idx, sub, ses)["status"] = "failed"
+            launchable = [subses for subses in launchable if subses not in bad_subses]
+            if not launchable:
+                return
+        console.print(
+            f"\n### {stage.name}: launching {len(launchable)} sessions",
+            style="bold red",
+        )
+        do_launch.launch_jobs(run_namespace, launchable, job_script_dir, run_lc)
+        for sub, ses in launchable:
+            node = self.node(idx, sub, ses)
+            node["status"] = "launched"
+            node["job_script_dir"] = job_script_dir
+            node["launched_at"] = datetime.now().isoformat(timespec="seconds")
+
+
+def main(
+    lc_configs: list[str],
+    container_configs: list[str] | None,
+    sub_ses_list: str,
+    run_lc: bool = False,
+    poll_interval: int = 300,
+    state_fpath: str | None = None,
+    max_hours: float | None = None,
+):
+    """
+    Stream a cohort through a chain of containers, session by session.
+
+    Parameters
+    ----------
+    lc_configs : list[str]
+        lc_config YAML files, one per stage, in chain order.
+    container_configs : list[str] or None
+        Container-specific JSON configs aligned with ``lc_configs``.
+    sub_ses_list : str
+        Subject/session list shared by all stages.
+    run_lc : bool, default=False
+        If ``False`` only print the DAG state of every session.
+    poll_interval : int, default=300
+        Seconds between file-system polls.
+    state_fpath : str or None
+        Workflow state JSON. Defaults to ``./lc_workflow_state.json``.
+    max_hours : float or None
+        Stop polling after this many hours; the state file keeps progress.
+    """
+    container_configs = container_configs or [None] * len(lc_configs)
+    if len(container_configs) != len(lc_configs):
+        raise ValueError(
+            "Pass one --container-specific-config per --lc-config "
+            f"(got {len(container_configs)} and {len(lc_configs)})"
+        )
+    stages = []
+    for lc_config_fpath, cc_fpath in zip(lc_configs, container_configs):
+        stage = Stage(lc_config_fpath, cc_fpath, do.read_yaml(lc_config_fpath))
+        if stage.container not in _STAGE_OUTPUTS:
+            raise ValueError(
+                f"{stage.container} cannot be chained in a workflow; "
+                f"valid containers are {sorted(_STAGE_OUTPUTS)}"
+            )
+        stages.append(stage)
+
+    workflow = Workflow(
+        stages, sub_ses_list, state_fpath or op.join(".", "lc_workflow_state.json")
+    )
+    for idx, stage in enumerate(stages):
+        parents = ", ".join(stages[p].container for p in workflow.parents[idx])
+        external = ", ".join(p for p, _ in workflow.external[idx])
+        console.print(
+            f"Stage {idx + 1}: {stage.name} "
+            f"(after: {parents or '-'}; existing inputs: {external or '-'})",
+            style="cyan",
+        )
+
+    workflow.refresh()
+    if not run_lc:
+        console.print(
+            "\n### Workflow dry run, current session states", style="bold red"
+        )
+        for idx, stage in enumerate(stages):
+            console.print(
+                f"{stage.name}: {len(workflow.ready(idx))} sessions ready to launch",
+                style="cyan",
+            )
+        workflow.print_status()
+        workflow.save()
+        return
+
+    deadline = time.time() + max_hours * 3600 if max_hours else None
+    while True:
+        for idx in range(len(stages)):
+            ready = workflow.ready(idx)
+            if ready:
+                workflow.launch(idx, ready, run_lc)
+                workflow.save()
+        workflow.refresh()
+        workflow.save()
+        if workflow.finished():
+            console.print("\n### Workflow finished", style="bold red")
+            break
+        if deadline and time.time() > deadline:
+            console.print(
+                f"\n### Stopping after {max_hours} h, rerun to resume from "
+                f"{workflow.state_fpath}",
+                style="yellow",
+            )
+            break
+        time.sleep(poll_interval)
+    workflow.print_status()
@@ -43,6 +43,28 @@ verbosity level is respected automatically:
     log_critical("Launching now")
     log_debug("Internal state: x = 42")
 
+Structured events
+-----------------
+High-volume, per-file actions (symlinks, copies, checks) should go through
+``log_event`` instead of ``console.print``.  Every event is written as one
+JSON line (``ts``, ``level``, ``stage``, ``action``, ``sub``, ``ses``,
+``duration``, ``msg`` and any extra fields) next to the ``.log`` file, which
+keeps only the events of level WARNING and above, while
+the console shows only the first few events of each action and a summary at
+the end of the command (``summarize_console``):
+
+.. code-block:: python
+
+    from launchcontainers.log_setup import log_event, timed_event
+
+    log_event("symlink", f"{src} -> {dst}", sub="01", ses="01")
+    with timed_event("prepare_session", sub="01", ses="01"):
+        ...
+
+All records are handed to a ``QueueHandler``; a ``QueueListener`` thread does
+the formatting and file I/O, so logging never blocks the caller on shared
+storage.
+
 Color scheme (mirrors color_codes.txt)
 ---------------------------------------
 - INFO / DEBUG  ``"cyan"``       General information messages
@@ -54,7 +76,16 @@ Color scheme (mirrors color_codes.txt)
 
 from __future__ import annotations
 
+import atexit
+import contextvars
+import json
 import logging
+import logging.handlers
+import queue
+import re
+import time
+from contextlib import contextmanager
+from datetime import datetime
 
 from rich.console import Console
 
@@ -132,32 +163,203 @@ _logger.addHandler(logging.NullHandler())  # silent until set_log_files() is cal
 
 _LOG_FMT = logging.Formatter("%(asctime)s [%(levelname)s] %(message)s")
 
+# every record is queued here and written by the listener thread
+_log_queue: queue.SimpleQueue = queue.SimpleQueue()
+_listener: logging.handlers.QueueListener | None = None
+
+
+class _JSONLinesFormatter(logging.Formatter):
+    """Render a structured record (see ``log_event``) as one JSON line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+        }
+        payload.update(record.lc_event)
+        return json.dumps(payload, default=str)
+
 
-def set_log_files(log_fpath: str, err_fpath: str) -> None:
+def _is_event(record: logging.LogRecord) -> bool:
+    return hasattr(record, "lc_event")
+
+
+def _is_text_record(record: logging.LogRecord) -> bool:
+    # per-file events live in the .jsonl; only their warnings reach the .log
+    return not _is_event(record) or record.levelno >= logging.WARNING
+
+
+def _stop_listener() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def set_log_files(
+    log_fpath: str, err_fpath: str, jsonl_fpath: str | None = None
+) -> None:
     """
-    Attach two FileHandlers to the launchcontainers logger.
+    Route the launchcontainers logger to files through a queue listener.
 
     Parameters
     ----------
     log_fpath : str
-        ``.log`` file — captures everything (DEBUG and above).
+        ``.log`` file — captures everything (DEBUG and above) except
+        structured events below WARNING, which go to the ``.jsonl`` only.
     err_fpath : str
         ``.err`` file — captures WARNING and above only.
+    jsonl_fpath : str, optional
+        JSON-lines file for structured events. Defaults to ``log_fpath``
+        with a ``.jsonl`` suffix.
     """
+    _stop_listener()
     for h in list(_logger.handlers):
-        if isinstance(h, logging.FileHandler):
+        if isinstance(h, (logging.FileHandler, logging.handlers.QueueHandler)):
             h.close()
             _logger.removeHandler(h)
 
     log_h = logging.FileHandler(log_fpath)
     log_h.setLevel(logging.DEBUG)
+    log_h.addFilter(_is_text_record)
     log_h.setFormatter(_LOG_FMT)
-    _logger.addHandler(log_h)
 
     err_h = logging.FileHandler(err_fpath)
     err_h.setLevel(logging.WARNING)
     err_h.setFormatter(_LOG_FMT)
-    _logger.addHandler(err_h)
+
+    if jsonl_fpath is None:
+        jsonl_fpath = re.sub(r"\.log$", "", log_fpath) + ".jsonl"
+    jsonl_h = logging.FileHandler(jsonl_fpath)
+    jsonl_h.setLevel(logging.DEBUG)
+    jsonl_h.addFilter(_is_event)
+    jsonl_h.setFormatter(_JSONLinesFormatter())
+
+    global _listener
+    _listener = logging.handlers.QueueListener(
+        _log_queue, log_h, err_h, jsonl_h, respect_handler_level=True
+    )
+    _listener.start()
+    _logger.addHandler(logging.handlers.QueueHandler(_log_queue))
+
+
+def flush_logs() -> None:
+    """Block until every queued record has been written (e.g. before copying logs)."""
+    if _listener is not None:
+        _listener.stop()
+        _listener.start()
+
+
+atexit.register(_stop_listener)
+
+# ---------------------------------------------------------------------------
+# Structured events with a rate-limited console
+# ---------------------------------------------------------------------------
+
+# events of one action shown on the console before switching to counting
+CONSOLE_EVENTS_PER_ACTION = 5
+
+_stage: contextvars.ContextVar[str | None] = contextvars.ContextVar(
+    "lc_stage", default=None
+)
+_event_counts: dict[tuple[str, int], int] = {}
+
+
+def set_stage(stage: str | None) -> None:
+    """Set the default ``stage`` recorded by ``log_event`` (e.g. ``prepare``)."""
+    _stage.set(stage)
+
+
+def log_event(
+    action: str,
+    msg: str = "",
+    *,
+    sub: str | None = None,
+    ses: str | None = None,
+    stage: str | None = None,
+    duration: float | None = None,
+    level: int = logging.INFO,
+    **fields,
+) -> None:
+    """
+    Record one structured event.
+
+    The event always goes to the ``.jsonl`` log; the ``.log`` and ``.err``
+    files get it only at WARNING and above.  On the console, the first
+    ``CONSOLE_EVENTS_PER_ACTION`` events of each (action, level) are printed;
+    the rest are only counted and reported by ``summarize_console``.
+    Warnings and errors are always printed; ``--debug`` prints everything.
+
+    Parameters
+    ----------
+    action : str
+        Short machine-readable verb, e.g. ``symlink`` or ``copy_file``.
+    msg : str
+        Human-readable detail.
+    sub, ses : str, optional
+        Session the event belongs to.
+    stage : str, optional
+        Overrides the stage set with ``set_stage``.
+    duration : float, optional
+        Seconds spent on the action.
+    level : int
+        ``logging`` level of the event.
+    **fields
+        Extra JSON-serialisable fields stored with the event.
+    """
+    event = {
+        "stage": stage or _stage.get(),
+        "action": action,
+        "sub": sub,
+        "ses": ses,
+        "duration": round(duration, 4) if duration is not None else None,
+    }
+    event.update(fields)
+    event["msg"] = msg
+    _logger.log(level, f"[{action}] {msg}", extra={"lc_event": event})
+
+    key = (action, level)
+    count = _event_counts.get(key, 0) + 1
+    _event_counts[key] = count
+    if _quiet and level < logging.ERROR:
+        return
+    if _debug or level >= logging.WARNING or count <= CONSOLE_EVENTS_PER_ACTION:
+        where = "".join(
+            f"{label}-{value} "
+            for label, value in (("sub", sub), ("ses", ses))
+            if value
+        )
+        took = f" ({duration:.2f}s)" if duration is not None else ""
+        msg = f": {msg}" if msg else ""
+        style = {logging.WARNING: WARNING, logging.ERROR: ERROR}.get(level, INFO)
+        # print through the plain Console so the event is not logged twice
+        Console.print(console, f"{where}{action}{msg}{took}", style=style)
+
+
+@contextmanager
+def timed_event(action: str, msg: str = "", **kwargs):
+    """Context manager that records ``action`` with its duration on exit."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        log_event(action, msg, duration=time.perf_counter() - t0, **kwargs)
+
+
+def summarize_console() -> None:
+    """Print how many events of each action were logged but not shown."""
+    for (action, level), count in sorted(_event_counts.items()):
+        hidden = count - CONSOLE_EVENTS_PER_ACTION
+        if hidden > 0 and level < logging.WARNING and not _debug:
+            console.print(
+                f"{action}: {count} events ({hidden} not shown, see the .jsonl log)",
+                style=INFO,
+            )
+    _event_counts.clear()
 
 
 # ---------------------------------------------------------------------------
@@ -34,9 +34,64 @@ import pandas as pd
 from launchcontainers.check import check_dwi_pipelines as check
 from launchcontainers.utils import force_symlink
 from launchcontainers.log_setup import console
+from launchcontainers.prepare.input_resolver import resolver_for
 
 
-def anatrois(dict_store_cs_configs, analysis_dir, lc_config, sub, ses, layout):
+def _select_zip(zips, pattern, directory, label):
+    """
+    Pick one derivative zip out of the matches of *pattern* in *directory*.
+
+    Parameters
+    ----------
+    zips : list[str]
+        Matching paths, newest last (see :meth:`SessionInputs.find_zips`).
+    pattern : str
+        Pattern from the lc config, used in messages only.
+    directory : str
+        Searched derivative folder, used in messages only.
+    label : str
+        Name of the searched path in the error message.
+
+    Returns
+    -------
+    str
+        The only match, or the newest one if the user confirms it.
+
+    Raises
+    ------
+    FileNotFoundError
+        If nothing matches *pattern*.
+    """
+    if len(zips) == 0:
+        console.print(
+            "\n"
+            + f"There are no files with pattern: {pattern} in {directory}, \
+                 we will listed potential zip file for you",
+            style="red",
+        )
+        raise FileNotFoundError(f"{label} is empty, no previous analysis was found")
+    if len(zips) == 1:
+        return zips[0]
+    answer = input(
+        f"Do you want to use the newset fs.zip: \n{zips[-1]} \n we get for you? \
+              \n input y for yes, n for no",
+    )
+    if answer in "y":
+        return zips[-1]
+    console.print(
+        "\n"
+        + "An error occurred"
+        + str(zips)
+        + "\n"
+        + "no target preanalysis.zip file exist, please check the config_lc.yaml file",
+        style="red",
+    )
+    sys.exit(1)
+
+
+def anatrois(
+    dict_store_cs_configs, analysis_dir, lc_config, sub, ses, layout, inputs=None
+):
     """
     Create session input symlinks for ``anatrois`` and ``freesurferator``.
 
@@ -54,12 +109,16 @@ def anatrois(dict_store_cs_configs, analysis_dir, lc_config, sub, ses, layout):
         Session identifier without the ``ses-`` prefix.
     layout : bids.BIDSLayout
         BIDS layout used to locate raw anatomical inputs.
+    inputs : SessionInputs, optional
+        Pre-resolved session inputs; resolved from *layout* when omitted.
 
     Raises
     ------
     FileNotFoundError
         If required anatomical or prior-analysis inputs cannot be located.
     """
+    if inputs is None:
+        inputs = resolver_for(layout).session(sub, ses)
 
     # General level variables:
     basedir = lc_config["general"]["basedir"]
@@ -141,13 +200,7 @@ def anatrois(dict_store_cs_configs, analysis_dir, lc_config, sub, ses, layout):
 
         # 5 main filed needs to be in anatrois if all specified, so there will be 5 checks
         if "anat" in required_inputfiles:
-            src_path_anat_lst = layout.get(
-                subject=sub,
-                session=ses,
-                extension="nii.gz",
-                suffix="T1w",
-                return_type="filename",
-            )
+            src_path_anat_lst = inputs.t1w
             if len(src_path_anat_lst) == 0:
                 raise FileNotFoundError(
                     f"the T1w.nii.gz you are specifying for sub-{sub}_ses-{ses} "
@@ -184,57 +237,23 @@ def anatrois(dict_store_cs_configs, analysis_dir, lc_config, sub, ses, layout):
                 "\n" + f"the tpye of patter is {type(prefs_zipname)}",
                 style="cyan",
             )
-            zips = []
-            for filename in os.listdir(pre_fs_path):
-                if filename.endswith(".zip") and re.match(prefs_zipname, filename):
-                    zips.append(filename)
-                    if "control_points" in required_inputfiles:
-                        if op.isdir(op.join(pre_fs_path, filename)) and re.match(
-                            prefs_unzipname, filename
-                        ):
-                            src_path_ControlPoints = op.join(
-                                pre_fs_path,
-                                filename,
-                                "tmp",
-                                "control.dat",
-                            )
-                        else:
-                            raise FileNotFoundError(
-                                "Didn't found control_points .zip file"
-                            )
-
-            if len(zips) == 0:
-                console.print(
-                    "\n"
-                    + f"There are no files with pattern: {prefs_zipname} in {pre_fs_path}, \
-                         we will listed potential zip file for you",
-                    style="red",
-                )
-                raise FileNotFoundError(
-                    "pre_fs_path is empty, no previous analysis was found"
-                )
-            elif len(zips) == 1:
-                src_path_fszip = op.join(pre_fs_path, zips[0])
-            else:
-                src_paths_fszip = [op.join(pre_fs_path, fszip) for fszip in zips]
-                zips_by_time = sorted(src_paths_fszip, key=op.getmtime)
-                answer = input(
-                    f"Do you want to use the newset fs.zip: \n{zips_by_time[-1]} \n \
-                        we get for you? \n input y for yes, n for no",
-                )
-                if answer in "y":
-                    src_path_fszip = zips_by_time[-1]
-                else:
-                    console.print(
-                        "\n"
-                        + "An error occurred"
-                        + str(zips_by_time)
-                        + "\n"
-                        + "no target preanalysis.zip file exist, \
-                            please check the config_lc.yaml file",
-                        style="red",
-                    )
-                    sys.exit(1)
+            zips = inputs.find_zips(pre_fs_path, prefs_zipname)
+            if "control_points" in required_inputfiles:
+                for zip_path in zips:
+                    if op.isdir(zip_path) and re.match(
+                        prefs_unzipname, op.basename(zip_path)
+                    ):
+                        src_path_ControlPoints = op.join(
+                            zip_path,
+                            "tmp",
+                            "control.dat",
+                        )
+                    else:
+                        raise FileNotFoundError("Didn't found control_points .zip file")
+
+            src_path_fszip = _select_zip(
+                zips, prefs_zipname, pre_fs_path, "pre_fs_path"
+            )
 
             dst_fname_fs = config_json_instance["inputs"]["pre_fs"]["location"]["name"]
             dst_path_fszip = op.join(dstDir_input, "pre_fs", dst_fname_fs)
@@ -276,7 +295,9 @@ def anatrois(dict_store_cs_configs, analysis_dir, lc_config, sub, ses, layout):
     return
 
 
-def rtppreproc(dict_store_cs_configs, analysis_dir, lc_config, sub, ses, layout):
+def rtppreproc(
+    dict_store_cs_configs, analysis_dir, lc_config, sub, ses, layout, inputs=None
+):
     """
     Create session input symlinks for ``rtppreproc`` and ``rtp2-preproc``.
 
@@ -294,6 +315,8 @@ def rtppreproc(dict_store_cs_configs, analysis_dir, lc_config, sub, ses, layout)
         Session identifier without the ``ses-`` prefix.
     layout : bids.BIDSLayout
         BIDS layout used to locate raw DWI inputs.
+    inputs : SessionInputs, optional
+        Pre-resolved session inputs; resolved from *layout* when omitted.
 
     Returns
     -------
@@ -301,6 +324,9 @@ def rtppreproc(dict_store_cs_configs, analysis_dir, lc_config, sub, ses, layout)
         The function creates the expected symlinks in place.
     """
 
+    if inputs is None:
+        inputs = resolver_for(layout).session(sub, ses)
+
     # general level variables:
     basedir = lc_config["general"]["basedir"]
     container = lc_config["general"]["container"]
@@ -387,66 +413,25 @@ def rtppreproc(dict_store_cs_configs, analysis_dir, lc_config, sub, ses, layout)
     else:
         src_path_FSMASK = op.join(precontainer_anat_dir, "brain.nii.gz")
     # 3 dwi file that needs to be preprocessed, under BIDS/sub/ses/dwi
+    pe_files = inputs.dwi_dir(PE_direction)
     if not separated_shell_files:
         # the bval
-        src_path_BVAL = layout.get(
-            subject=sub,
-            session=ses,
-            extension="bval",
-            suffix="dwi",
-            direction=PE_direction,
-            return_type="filename",
-        )[0]
+        src_path_BVAL = pe_files.bval[0]
         # the bve
-        src_path_BVEC = layout.get(
-            subject=sub,
-            session=ses,
-            extension="bvec",
-            suffix="dwi",
-            direction=PE_direction,
-            return_type="filename",
-        )[0]
+        src_path_BVEC = pe_files.bvec[0]
         # the dwi
-        src_path_DIFF = layout.get(
-            subject=sub,
-            session=ses,
-            extension="nii.gz",
-            suffix="dwi",
-            direction=PE_direction,
-            return_type="filename",
-        )[0]
+        src_path_DIFF = pe_files.nii[0]
 
     else:
         # check how many *dir_dwi.nii.gz there are in the BIDS/sub/ses/dwi directory
-        diff_files = layout.get(
-            subject=sub,
-            session=ses,
-            extension="nii.gz",
-            suffix="dwi",
-            direction=PE_direction,
-            return_type="filename",
-        )
+        diff_files = pe_files.nii
 
         dwi_file_with_acq_in_name = [f for f in diff_files if "acq-" in f]
         # create the file name, it will be a file after concat
         target_dwi_concat = re.sub(r"acq-[^_]+", "", diff_files[0])
         src_path_DIFF = target_dwi_concat
-        bval_files = layout.get(
-            subject=sub,
-            session=ses,
-            extension="bval",
-            suffix="dwi",
-            direction=PE_direction,
-            return_type="filename",
-        )
-        bvec_files = layout.get(
-            subject=sub,
-            session=ses,
-            extension="bvec",
-            suffix="dwi",
-            direction=PE_direction,
-            return_type="filename",
-        )
+        bval_files = pe_files.bval
+        bvec_files = pe_files.bvec
         target_bvec = re.sub(r"acq-[^_]+", "", bvec_files[0])
         target_bval = re.sub(r"acq-[^_]+", "", bval_files[0])
         src_path_BVEC = target_bvec
@@ -564,25 +549,12 @@ def rtppreproc(dict_store_cs_configs, analysis_dir, lc_config, sub, ses, layout)
     )
     # check_create_bvec_bval（force) one of the todo here
     if rpe:
+        rpe_files = inputs.dwi_dir(RPE_direction)
         # the reverse direction nii.gz
-        src_path_RDIF = layout.get(
-            subject=sub,
-            session=ses,
-            extension="nii.gz",
-            suffix="dwi",
-            direction=RPE_direction,
-            return_type="filename",
-        )[0]
+        src_path_RDIF = rpe_files.nii[0]
 
         # the reverse direction bval
-        src_path_RBVL_lst = layout.get(
-            subject=sub,
-            session=ses,
-            extension="bval",
-            suffix="dwi",
-            direction=RPE_direction,
-            return_type="filename",
-        )
+        src_path_RBVL_lst = rpe_files.bval
 
         if len(src_path_RBVL_lst) == 0:
             src_path_RBVL = src_path_RDIF.replace("dwi.nii.gz", "dwi.bval")
@@ -591,24 +563,10 @@ def rtppreproc(dict_store_cs_configs, analysis_dir, lc_config, sub, ses, layout)
                 style="yellow",
             )
         else:
-            src_path_RBVL = layout.get(
-                subject=sub,
-                session=ses,
-                extension="bval",
-                suffix="dwi",
-                direction=RPE_direction,
-                return_type="filename",
-            )[0]
+            src_path_RBVL = src_path_RBVL_lst[0]
 
         # the reverse direction bvec
-        src_path_RBVC_lst = layout.get(
-            subject=sub,
-            session=ses,
-            extension="bvec",
-            suffix="dwi",
-            direction=RPE_direction,
-            return_type="filename",
-        )
+        src_path_RBVC_lst = rpe_files.bvec
         if len(src_path_RBVC_lst) == 0:
             src_path_RBVC = src_path_RDIF.replace("dwi.nii.gz", "dwi.bvec")
             console.print(
@@ -616,14 +574,7 @@ def rtppreproc(dict_store_cs_configs, analysis_dir, lc_config, sub, ses, layout)
                 style="yellow",
             )
         else:
-            src_path_RBVC = layout.get(
-                subject=sub,
-                session=ses,
-                extension="bvec",
-                suffix="dwi",
-                direction=RPE_direction,
-                return_type="filename",
-            )[0]
+            src_path_RBVC = src_path_RBVC_lst[0]
 
         # If bval and bvec do not exist because it is only b0-s, create them
         # (it would be better if dcm2niix would output them but...)
@@ -697,40 +648,8 @@ def rtppreproc(dict_store_cs_configs, analysis_dir, lc_config, sub, ses, layout)
             "\n" + f"the tpye of patter is {type(qmap_fname)}",
             style="cyan",
         )
-        zips = []
-        for filename in os.listdir(qmap_path):
-            if filename.endswith(".zip") and re.match(qmap_fname, filename):
-                zips.append(filename)
-        if len(zips) == 0:
-            console.print(
-                "\n"
-                + f"There are no files with pattern: {qmap_fname} in {qmap_path}, \
-                     we will listed potential zip file for you",
-                style="red",
-            )
-            raise FileNotFoundError(
-                "qmap_path is empty, no previous analysis was found"
-            )
-        elif len(zips) == 1:
-            src_path_qmap = op.join(qmap_path, zips[0])
-        else:
-            zips_by_time = sorted(zips, key=op.getmtime)
-            answer = input(
-                f"Do you want to use the newset fs.zip: \n{zips_by_time[-1]} \n we get for you? \
-                      \n input y for yes, n for no",
-            )
-            if answer in "y":
-                src_path_qmap = zips_by_time[-1]
-            else:
-                console.print(
-                    "\n"
-                    + "An error occurred"
-                    + str(zips_by_time)
-                    + "\n"
-                    + "no target preanalysis.zip file exist, please check the config_lc.yaml file",
-                    style="red",
-                )
-                sys.exit(1)
+        zips = inputs.find_zips(qmap_path, qmap_fname)
+        src_path_qmap = _select_zip(zips, qmap_fname, qmap_path, "qmap_path")
 
         dst_fname_qmap = config_json_instance["inputs"]["qmap"]["location"]["name"]
         dst_path_qmap = op.join(dstDir_input, "qmap", dst_fname_qmap)
@@ -742,7 +661,7 @@ def rtppreproc(dict_store_cs_configs, analysis_dir, lc_config, sub, ses, layout)
 
 
 # %%
-def rtppipeline(dict_store_cs_configs, analysis_dir, lc_config, sub, ses):
+def rtppipeline(dict_store_cs_configs, analysis_dir, lc_config, sub, ses, inputs=None):
     """
     Create session input symlinks for ``rtp-pipeline`` and ``rtp2-pipeline``.
 
@@ -758,12 +677,16 @@ def rtppipeline(dict_store_cs_configs, analysis_dir, lc_config, sub, ses):
         Subject identifier without the ``sub-`` prefix.
     ses : str
         Session identifier without the ``ses-`` prefix.
+    inputs : SessionInputs, optional
+        Session inputs whose derivative listing is used to find qmap zips.
 
     Returns
     -------
     None
         The function creates the expected symlinks in place.
     """
+    if inputs is None:
+        inputs = resolver_for().session(sub, ses, raw=False)
     # define local variables from config dict
     # input from get_parser
     # general level variables:
@@ -923,40 +846,8 @@ def rtppipeline(dict_store_cs_configs, analysis_dir, lc_config, sub, ses):
             "\n" + f"the tpye of patter is {type(qmap_fname)}",
             style="cyan",
         )
-        zips = []
-        for filename in os.listdir(qmap_path):
-            if filename.endswith(".zip") and re.match(qmap_fname, filename):
-                zips.append(filename)
-        if len(zips) == 0:
-            console.print(
-                "\n"
-                + f"There are no files with pattern: {qmap_fname} in {qmap_path}, \
-                     we will listed potential zip file for you",
-                style="red",
-            )
-            raise FileNotFoundError(
-                "qmap_path is empty, no previous analysis was found"
-            )
-        elif len(zips) == 1:
-            src_path_qmap = op.join(qmap_path, zips[0])
-        else:
-            zips_by_time = sorted(zips, key=op.getmtime)
-            answer = input(
-                f"Do you want to use the newset fs.zip: \n{zips_by_time[-1]} \n we get for you?\
-                      \n input y for yes, n for no",
-            )
-            if answer in "y":
-                src_path_qmap = zips_by_time[-1]
-            else:
-                console.print(
-                    "\n"
-                    + "An error occurred"
-                    + str(zips_by_time)
-                    + "\n"
-                    + "no target preanalysis.zip file exist, please check the config_lc.yaml file",
-                    style="red",
-                )
-                sys.exit(1)
+        zips = inputs.find_zips(qmap_path, qmap_fname)
+        src_path_qmap = _select_zip(zips, qmap_fname, qmap_path, "qmap_path")
 
         dst_fname_qmap = config_json_instance["inputs"]["qmap"]["location"]["name"]
         dst_path_qmap = op.join(dstDir_input, "qmap", dst_fname_qmap)
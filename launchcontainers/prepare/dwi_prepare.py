@@ -25,9 +25,13 @@ import json
 import os
 import os.path as op
 
+import pandas as pd
+
 from launchcontainers import utils as do
+from launchcontainers.check import check_dwi_pipelines as check
 from launchcontainers.log_setup import console
 from launchcontainers.prepare import RTP2_prepare_input as prepare_input
+from launchcontainers.prepare.input_resolver import resolver_for
 
 
 def copy_rtp2_configs(container, extra_config_fpath, analysis_dir, force, option=None):
@@ -398,6 +402,184 @@ def copy_and_edit_config_json(parser_namespace, analysis_dir):
     return config_json_dict
 
 
+def prepare_session(
+    parser_namespace, config_json_dict, analysis_dir, lc_config, sub, ses, layout
+):
+    """
+    Prepare the session-level folders, configs and input symlinks.
+
+    Parameters
+    ----------
+    parser_namespace : argparse.Namespace
+        Parsed CLI arguments for prepare mode.
+    config_json_dict : dict
+        Analysis-level container input mapping returned by
+        :func:`copy_and_edit_config_json`.
+    analysis_dir : str
+        Prepared analysis directory.
+    lc_config : dict
+        Parsed launchcontainers YAML configuration.
+    sub : str
+        Subject identifier without the ``sub-`` prefix.
+    ses : str
+        Session identifier without the ``ses-`` prefix.
+    layout : bids.BIDSLayout
+        BIDS layout built from the configured raw dataset.
+    """
+    container = lc_config["general"]["container"]
+    force = lc_config["general"]["force"]
+    version = lc_config["container_specific"][container]["version"]
+
+    console.print(
+        "\n"
+        + "The current ses is: \n"
+        + f"sub-{sub}_ses-{ses}_{container}_{version}\n",
+        style="bold red",
+    )
+
+    tmpdir = op.join(
+        analysis_dir,
+        "sub-" + sub,
+        "ses-" + ses,
+        "output",
+        "tmp",
+    )
+    # Tiger: for now, the log dir for container is under output folder,
+    # mainly bc RTP will wrote RTP.txt to output/log
+    # don't change this
+    container_logdir = op.join(
+        analysis_dir,
+        "sub-" + sub,
+        "ses-" + ses,
+        "output",
+        "log",
+    )
+    # For all the container, create ses-/log and ses-/output/tmp
+    # if we will use 1 session anatrois/freesurferator as ref,
+    # we will not creat outoput dir for other session
+
+    if container not in ["anatrois", "freesurferator"]:
+        os.makedirs(tmpdir, exist_ok=True)
+        os.makedirs(container_logdir, exist_ok=True)
+    else:
+        use_src_session = lc_config["container_specific"][container]["use_src_session"]
+        current_session_dir = op.join(analysis_dir, "sub-" + sub, "ses-" + ses)
+        src_session_dir = op.join(analysis_dir, "sub-" + sub, "ses-" + use_src_session)
+
+        if ses == use_src_session:
+            # this is src session, we will create tmp and log for this session,
+            # and other session will link to this session
+            os.makedirs(tmpdir, exist_ok=True)
+            os.makedirs(container_logdir, exist_ok=True)
+        elif os.path.islink(current_session_dir) or os.path.exists(src_session_dir):
+            # retest session and src already exists, skip
+            console.print(
+                f"\n You are preparing for the session:{ses} that are"
+                + f"not the reference session:{use_src_session}",
+                style="yellow",
+            )
+            console.print("\n Not creating tmp dir, skip", style="yellow")
+        else:
+            # retest session but src doesn't exist yet, warn loudly
+            console.print(
+                f"src session {use_src_session} not found, cannot skip!",
+                style="yellow",
+            )
+    try:
+        do.copy_file(
+            parser_namespace.lc_config,
+            op.join(container_logdir, "lc_config.yaml"),
+            force,
+        )
+        config_json_path = config_json_dict["config_path"]
+        do.copy_file(config_json_path, op.join(container_logdir, "config.json"), force)
+    except Exception:
+        console.print(
+            f"\n copy config file and create tmp failed for sub-{sub}_ses-{ses}",
+            style="red",
+        )
+
+    # one layout query per subject, shared by all its sessions
+    inputs = resolver_for(layout).session(
+        sub, ses, raw=container not in ["rtp-pipeline", "rtp2-pipeline"]
+    )
+    if container in ["rtppreproc", "rtp2-preproc"]:
+        prepare_input.rtppreproc(
+            config_json_dict,
+            analysis_dir,
+            lc_config,
+            sub,
+            ses,
+            layout,
+            inputs=inputs,
+        )
+    elif container in ["rtp-pipeline", "rtp2-pipeline"]:
+        prepare_input.rtppipeline(
+            config_json_dict,
+            analysis_dir,
+            lc_config,
+            sub,
+            ses,
+            inputs=inputs,
+        )
+    elif container in ["anatrois", "freesurferator"]:
+        prepare_input.anatrois(
+            config_json_dict,
+            analysis_dir,
+            lc_config,
+            sub,
+            ses,
+            layout,
+            inputs=inputs,
+        )
+    else:
+        console.print(
+            f"\n{container} is not created, check for typos or "
+            "contact admin for singularity images\n",
+            style="red",
+        )
+
+
+def check_cohort_rois(config_json_dict, analysis_dir, lc_config, df_subses):
+    """
+    Check the tractparams ROIs in the ``fs.zip`` of every session up front.
+
+    All sessions are checked in parallel and reported together; the matrix of
+    the incomplete ones is written to ``missing_rois.tsv`` in the analysis
+    directory.  The per-session check in
+    :func:`RTP2_prepare_input.rtppipeline` then reuses the cached listings.
+
+    Parameters
+    ----------
+    config_json_dict : dict
+        Analysis-level container input mapping returned by
+        :func:`copy_and_edit_config_json`.
+    analysis_dir : str
+        Prepared analysis directory.
+    lc_config : dict
+        Parsed launchcontainers YAML configuration.
+    df_subses : list[tuple[str, str]]
+        Subject/session pairs to prepare.
+
+    Raises
+    ------
+    FileNotFoundError
+        If any session misses its ``fs.zip`` or a required ROI.
+    """
+    with open(config_json_dict["config_path"]) as f:
+        inputs = json.load(f)["inputs"]
+    if "tractparams" not in inputs:
+        return
+    tractparams = op.join(analysis_dir, inputs["tractparams"]["location"]["name"])
+    tractparam_df = pd.read_csv(tractparams, sep=",", dtype=str)
+    check.check_tractparam_cohort(
+        lc_config,
+        list(df_subses),
+        tractparam_df,
+        out_file=op.join(analysis_dir, "missing_rois.tsv"),
+    )
+
+
 def main(parser_namespace, analysis_dir, df_subses, layout):
     """
     Prepare analysis-level and session-level inputs for DWI containers.
@@ -424,14 +606,8 @@ def main(parser_namespace, analysis_dir, df_subses, layout):
     lc_config = lc_config = do.read_yaml(lc_config_fpath)
     console.print("\n prepare_dwi_input_folder reading lc config yaml", style="cyan")
 
-    container = lc_config["general"]["container"]
-    force = lc_config["general"]["force"]
-    version = lc_config["container_specific"][container]["version"]
-
     # read parameters from lc_config
     container = lc_config["general"]["container"]
-    force = lc_config["general"]["force"]
-    version = lc_config["container_specific"][container]["version"]
 
     console.print(
         "#####################################################\n"
@@ -467,113 +643,17 @@ def main(parser_namespace, analysis_dir, df_subses, layout):
         style="cyan",
     )
 
-    for sub, ses in df_subses:
-
-        console.print(
-            "\n"
-            + "The current ses is: \n"
-            + f"sub-{sub}_ses-{ses}_{container}_{version}\n",
-            style="bold red",
-        )
+    if container in ["rtp-pipeline", "rtp2-pipeline"]:
+        check_cohort_rois(config_json_dict, analysis_dir, lc_config, df_subses)
 
-        tmpdir = op.join(
-            analysis_dir,
-            "sub-" + sub,
-            "ses-" + ses,
-            "output",
-            "tmp",
-        )
-        # Tiger: for now, the log dir for container is under output folder,
-        # mainly bc RTP will wrote RTP.txt to output/log
-        # don't change this
-        container_logdir = op.join(
+    for sub, ses in df_subses:
+        prepare_session(
+            parser_namespace,
+            config_json_dict,
             analysis_dir,
-            "sub-" + sub,
-            "ses-" + ses,
-            "output",
-            "log",
+            lc_config,
+            sub,
+            ses,
+            layout,
         )
-        # For all the container, create ses-/log and ses-/output/tmp
-        # if we will use 1 session anatrois/freesurferator as ref,
-        # we will not creat outoput dir for other session
-
-        if container not in ["anatrois", "freesurferator"]:
-            os.makedirs(tmpdir, exist_ok=True)
-            os.makedirs(container_logdir, exist_ok=True)
-        else:
-            use_src_session = lc_config["container_specific"][container][
-                "use_src_session"
-            ]
-            current_session_dir = op.join(analysis_dir, "sub-" + sub, "ses-" + ses)
-            src_session_dir = op.join(
-                analysis_dir, "sub-" + sub, "ses-" + use_src_session
-            )
-
-            if ses == use_src_session:
-                # this is src session, we will create tmp and log for this session,
-                # and other session will link to this session
-                os.makedirs(tmpdir, exist_ok=True)
-                os.makedirs(container_logdir, exist_ok=True)
-            elif os.path.islink(current_session_dir) or os.path.exists(src_session_dir):
-                # retest session and src already exists, skip
-                console.print(
-                    f"\n You are preparing for the session:{ses} that are"
-                    + f"not the reference session:{use_src_session}",
-                    style="yellow",
-                )
-                console.print("\n Not creating tmp dir, skip", style="yellow")
-            else:
-                # retest session but src doesn't exist yet, warn loudly
-                console.print(
-                    f"src session {use_src_session} not found, cannot skip!",
-                    style="yellow",
-                )
-        try:
-            do.copy_file(
-                parser_namespace.lc_config,
-                op.join(container_logdir, "lc_config.yaml"),
-                force,
-            )
-            config_json_path = config_json_dict["config_path"]
-            do.copy_file(
-                config_json_path, op.join(container_logdir, "config.json"), force
-            )
-        except Exception:
-            console.print(
-                f"\n copy config file and create tmp failed for sub-{sub}_ses-{ses}",
-                style="red",
-            )
-
-        if container in ["rtppreproc", "rtp2-preproc"]:
-            prepare_input.rtppreproc(
-                config_json_dict,
-                analysis_dir,
-                lc_config,
-                sub,
-                ses,
-                layout,
-            )
-        elif container in ["rtp-pipeline", "rtp2-pipeline"]:
-            prepare_input.rtppipeline(
-                config_json_dict,
-                analysis_dir,
-                lc_config,
-                sub,
-                ses,
-            )
-        elif container in ["anatrois", "freesurferator"]:
-            prepare_input.anatrois(
-                config_json_dict,
-                analysis_dir,
-                lc_config,
-                sub,
-                ses,
-                layout,
-            )
-        else:
-            console.print(
-                f"\n{container} is not created, check for typos or "
-                "contact admin for singularity images\n",
-                style="red",
-            )
     return True
@@ -0,0 +1,236 @@
+# """
+# MIT License
+# Copyright (c) 2020-2025 Garikoitz Lerma-Usabiaga
+# Copyright (c) 2020-2022 Mengxing Liu
+# Copyright (c) 2022-2023 Leandro Lecca
+# Copyright (c) 2022-2025 Yongning Lei
+# Copyright (c) 2023 David Linhardt
+# Copyright (c) 2023 Iñigo Tellaetxe
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit persons to
+# whom the Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+# """
+"""
+Resolve the raw and derivative inputs of an RTP2 session in bulk.
+
+The prepare functions in :mod:`launchcontainers.prepare.RTP2_prepare_input`
+used to ask the BIDS layout for every input separately (DWI, bval, bvec, and
+again for the reverse phase-encoding direction), each a fresh query of the
+pyBIDS database, and to ``os.listdir`` + ``getmtime`` derivative folders to
+find ``fs.zip`` / qmap zips.  :class:`InputResolver` instead
+
+* fetches the anat/dwi/fmap files of a subject with **one** layout query
+  (entities are parsed from the file names, so no per-file lookups follow)
+  and keeps them for all sessions of that subject;
+* lists each derivative folder once with ``os.scandir`` (the mtime comes
+  with the entry) and reuses the listing until the folder changes.
+
+:meth:`InputResolver.session` returns a :class:`SessionInputs` bundle that
+the prepare functions read instead of querying the layout themselves.
+"""
+
+from __future__ import annotations
+
+import os
+import os.path as op
+import re
+import weakref
+from dataclasses import dataclass, field
+
+from launchcontainers.utils import parse_bids_name
+
+RAW_DATATYPES = ("anat", "dwi", "fmap")
+
+
+def _split_name(name: str) -> tuple[dict[str, str], str, str]:
+    """BIDS file name → (entities, suffix, extension without the dot)."""
+    stem, _, ext = name.partition(".")
+    entities, suffix = parse_bids_name(stem)
+    return entities, suffix, ext
+
+
+@dataclass
+class DWIFiles:
+    """DWI image, bval and bvec files of one phase-encoding direction, sorted."""
+
+    nii: list[str] = field(default_factory=list)
+    bval: list[str] = field(default_factory=list)
+    bvec: list[str] = field(default_factory=list)
+
+
+class DirListing:
+    """
+    Cached ``os.scandir`` of derivative folders.
+
+    A listing is reused until the folder's own mtime changes (a file added,
+    removed or renamed), so repeated lookups in the same folder cost a single
+    ``stat``.
+    """
+
+    def __init__(self):
+        self._cache: dict[str, tuple[int, list[os.DirEntry]]] = {}
+
+    def entries(self, directory: str) -> list[os.DirEntry]:
+        """
+        Entries of *directory*.
+
+        Raises
+        ------
+        FileNotFoundError
+            If *directory* does not exist.
+        """
+        mtime_ns = os.stat(directory).st_mtime_ns
+        cached = self._cache.get(directory)
+        if cached is None or cached[0] != mtime_ns:
+            with os.scandir(directory) as it:
+                cached = (mtime_ns, sorted(it, key=lambda e: e.name))
+            self._cache[directory] = cached
+        return cached[1]
+
+    def find(self, directory: str, pattern: str, ext: str = ".zip") -> list[str]:
+        """
+        Paths in *directory* ending in *ext* whose name matches *pattern*.
+
+        *pattern* is applied with :func:`re.match`, as in the lc config.  The
+        result is sorted by modification time, newest last.
+        """
+        hits = [
+            e
+            for e in self.entries(directory)
+            if e.name.endswith(ext) and re.match(pattern, e.name)
+        ]
+        hits.sort(key=lambda e: e.stat().st_mtime)
+        return [e.path for e in hits]
+
+
+@dataclass
+class SessionInputs:
+    """
+    Raw inputs of one session and access to the derivative listing.
+
+    Attributes
+    ----------
+    sub, ses : str
+        Subject and session labels without prefix.
+    t1w : list[str]
+        ``*_T1w.nii.gz`` files of the session.
+    dwi : dict[str, DWIFiles]
+        DWI files keyed by the ``dir-`` entity (``""`` when absent).
+    fmap : list[str]
+        Files in the session's ``fmap`` folder.
+    derivatives : DirListing
+        Shared listing used by :meth:`find_zips`.
+    """
+
+    sub: str
+    ses: str
+    t1w: list[str] = field(default_factory=list)
+    dwi: dict[str, DWIFiles] = field(default_factory=dict)
+    fmap: list[str] = field(default_factory=list)
+    derivatives: DirListing = field(default_factory=DirListing, repr=False)
+
+    def dwi_dir(self, direction: str) -> DWIFiles:
+        """DWI files acquired with phase-encoding *direction* (may be empty)."""
+        return self.dwi.get(direction, DWIFiles())
+
+    def find_zips(self, directory: str, pattern: str) -> list[str]:
+        """Zips in *directory* matching *pattern*, newest last."""
+        return self.derivatives.find(directory, pattern)
+
+
+class InputResolver:
+    """
+    Per-subject cache of raw BIDS files plus a shared derivative listing.
+
+    Parameters
+    ----------
+    layout : bids.BIDSLayout or None
+        Layout queried once per subject.  Without a layout the subject's
+        ``ses-*/{anat,dwi,fmap}`` folders under *bids_dir* are scanned.
+    bids_dir : str, optional
+        BIDS root; defaults to ``layout.root``.
+    """
+
+    def __init__(self, layout=None, bids_dir: str | None = None):
+        self.layout = layout
+        self.bids_dir = bids_dir or (getattr(layout, "root", None) if layout else None)
+        self.derivatives = DirListing()
+        self._subjects: dict[str, list[str]] = {}
+
+    def subject_files(self, sub: str) -> list[str]:
+        """All anat/dwi/fmap files of *sub*, fetched once."""
+        if sub not in self._subjects:
+            if self.layout is not None:
+                files = self.layout.get(
+                    subject=sub,
+                    datatype=list(RAW_DATATYPES),
+                    return_type="filename",
+                )
+            else:
+                files = self._scan_subject(sub)
+            self._subjects[sub] = sorted(files)
+        return self._subjects[sub]
+
+    def _scan_subject(self, sub: str) -> list[str]:
+        sub_dir = op.join(self.bids_dir, f"sub-{sub}") if self.bids_dir else None
+        if not sub_dir or not op.isdir(sub_dir):
+            return []
+        files = []
+        for ses_dir in os.scandir(sub_dir):
+            if not (ses_dir.is_dir() and ses_dir.name.startswith("ses-")):
+                continue
+            for datatype in RAW_DATATYPES:
+                dpath = op.join(ses_dir.path, datatype)
+                if op.isdir(dpath):
+                    files.extend(e.path for e in os.scandir(dpath) if not e.is_dir())
+        return files
+
+    def session(self, sub: str, ses: str, raw: bool = True) -> SessionInputs:
+        """
+        Bundle the inputs of ``sub-<sub>_ses-<ses>``.
+
+        With ``raw=False`` the layout is not touched and only the derivative
+        listing is usable (``rtppipeline`` reads derivatives only).
+        """
+        inputs = SessionInputs(sub=sub, ses=ses, derivatives=self.derivatives)
+        if not raw:
+            return inputs
+        for path in self.subject_files(sub):
+            entities, suffix, ext = _split_name(op.basename(path))
+            if entities.get("ses") != ses:
+                continue
+            datatype = op.basename(op.dirname(path))
+            if suffix == "T1w" and ext == "nii.gz":
+                inputs.t1w.append(path)
+            elif suffix == "dwi" and ext in ("nii.gz", "bval", "bvec"):
+                files = inputs.dwi.setdefault(entities.get("dir", ""), DWIFiles())
+                getattr(files, "nii" if ext == "nii.gz" else ext).append(path)
+            elif datatype == "fmap":
+                inputs.fmap.append(path)
+        return inputs
+
+
+_resolvers: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+_default_resolver: InputResolver | None = None
+
+
+def resolver_for(layout=None) -> InputResolver:
+    """
+    The :class:`InputResolver` shared by all sessions prepared with *layout*.
+
+    Without a layout (``rtppipeline`` only reads derivatives) a module-wide
+    resolver is returned.
+    """
+    global _default_resolver
+    if layout is None:
+        if _default_resolver is None:
+            _default_resolver = InputResolver()
+        return _default_resolver
+    resolver = _resolvers.get(layout)
+    if resolver is None:
+        resolver = _resolvers[layout] = InputResolver(layout)
+    return resolver
@@ -0,0 +1,214 @@
+# """
+# MIT License
+# Copyright (c) 2020-2025 Garikoitz Lerma-Usabiaga
+# Copyright (c) 2020-2022 Mengxing Liu
+# Copyright (c) 2022-2023 Leandro Lecca
+# Copyright (c) 2022-2025 Yongning Lei
+# Copyright (c) 2023 David Linhardt
+# Copyright (c) 2023 Iñigo Tellaetxe
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit persons to
+# whom the Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+# """
+"""
+Voxel-wise mean of NIfTI images, streamed slab by slab without FSL.
+
+:func:`mean_images` computes several means at once from one pass over the
+inputs: every input is read once, in lockstep with the others, in slabs of
+``chunk_voxels`` voxels (through
+:class:`~launchcontainers.quality_control.nii_compare.VoxelStream`, so
+``.nii.gz`` is decompressed on the fly and never held whole), and each slab
+is added to the (float64) accumulator of every mean it belongs to.  The
+finished slab of each mean is written straight to its output as float32
+(what ``fslmaths`` writes), so memory stays at a few slabs whatever the
+image size, and e.g. echo, run and session averages of one acquisition cost
+a single read of the echoes instead of one ``fslmaths`` round trip each.
+
+The inputs of each mean must share shape, voxel size and affine; a mean
+whose inputs do not is skipped without affecting the others.  Each output
+gets the header of its first input (float32, no scaling) and a JSON sidecar
+with the sources and the sidecar fields common to all of them.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import os.path as op
+from contextlib import ExitStack
+
+import numpy as np
+
+from launchcontainers.quality_control.nii_compare import VoxelStream
+
+# voxels per slab; one float64 accumulator per mean (+ one input) is alive
+CHUNK_VOXELS = 1 << 21
+
+
+def check_geometry(streams: list[VoxelStream], atol: float = 1e-4) -> None:
+    """Raise ValueError unless all images share shape, zooms and affine."""
+    ref = streams[0]
+    ref_zooms = ref.img.header.get_zooms()
+    for s in streams[1:]:
+        if s.shape != ref.shape:
+            raise ValueError(f"shape {s.shape} != {ref.shape}: {s.path}")
+        if not np.allclose(s.img.header.get_zooms(), ref_zooms, atol=atol):
+            raise ValueError(f"voxel size differs from {ref.path}: {s.path}")
+        if not np.allclose(s.img.affine, ref.img.affine, atol=atol):
+            raise ValueError(f"affine differs from {ref.path}: {s.path}")
+
+
+def _mean_header(ref: VoxelStream, n: int):
+    header = ref.img.header.copy()
+    if header.endianness != "<":
+        header = header.as_byteswapped("<")
+    header.extensions.clear()
+    header.set_data_dtype("<f4")
+    header.set_slope_inter(1.0, 0.0)
+    # no extensions: data right after the header (352 NIfTI-1, 544 NIfTI-2)
+    header.set_data_offset(header.single_vox_offset)
+    header["cal_min"] = header["cal_max"] = 0
+    header["descrip"] = f"mean of {n} images"[:80].encode()
+    return header
+
+
+def _sidecar(path: str) -> dict:
+    json_path = op.join(op.dirname(path), op.basename(path).split(".nii")[0] + ".json")
+    if not op.isfile(json_path):
+        return {}
+    with open(json_path) as fh:
+        return json.load(fh)
+
+
+def provenance(files: list[str]) -> dict:
+    """Sidecar of a mean: fields equal in all inputs, plus the sources."""
+    sidecars = [_sidecar(f) for f in files]
+    common = {
+        k: v
+        for k, v in sidecars[0].items()
+        if all(k in s and s[k] == v for s in sidecars[1:])
+    }
+    common["Description"] = f"Voxel-wise mean of {len(files)} images"
+    common["Sources"] = [op.basename(f) for f in files]
+    return common
+
+
+def is_up_to_date(out, files) -> bool:
+    """True when *out* exists and is newer than all of *files*."""
+    if not op.isfile(out):
+        return False
+    mtime = op.getmtime(out)
+    return all(op.getmtime(f) <= mtime for f in files)
+
+
+def _write_means(groups: dict, streams: dict, chunk_voxels: int) -> None:
+    """One lockstep pass over the inputs of *groups*, which share a shape."""
+    from nibabel.openers import ImageOpener
+
+    inputs = sorted({f for files in groups.values() for f in files})
+    group_streams = [streams[f] for f in inputs]
+    position = {f: i for i, f in enumerate(inputs)}
+    members = {out: [position[f] for f in files] for out, files in groups.items()}
+    used_by = [
+        [out for out, idx in members.items() if i in idx] for i in range(len(inputs))
+    ]
+
+    # temporary names keep .nii.gz so the opener compresses them
+    tmp = {
+        out: op.join(op.dirname(out), f".tmp{os.getpid()}_{op.basename(out)}")
+        for out in groups
+    }
+    try:
+        with ExitStack() as stack:
+            writers = {}
+            for out, idx in members.items():
+                fh = stack.enter_context(ImageOpener(tmp[out], "wb"))
+                _mean_header(group_streams[idx[0]], len(idx)).write_to(fh)
+                writers[out] = fh
+            readers = [s.chunks(chunk_voxels) for s in group_streams]
+            for raws in zip(*readers):
+                n = len(raws[0]) // group_streams[0].dtype.itemsize
+                acc = {out: np.zeros(n) for out in groups}
+                # each input slab is converted once and added to its means
+                for i, (s, raw) in enumerate(zip(group_streams, raws)):
+                    values = s.values(raw)
+                    for out in used_by[i]:
+                        acc[out] += values
+                for out, idx in members.items():
+                    acc[out] /= len(idx)
+                    writers[out].write(acc[out].astype("<f4").tobytes())
+        for out in groups:
+            os.replace(tmp[out], out)
+    finally:
+        for path in tmp.values():
+            if op.exists(path):
+                os.remove(path)
+
+
+def mean_images(
+    groups: dict, chunk_voxels: int = CHUNK_VOXELS, write_json: bool = True
+) -> dict:
+    """
+    Write the voxel-wise mean of each group of images, reading every input once.
+
+    Parameters
+    ----------
+    groups : dict
+        ``{output_path: [input_path, ...]}``; inputs may be shared between
+        groups (each is still read once).
+    chunk_voxels : int
+        Slab size in voxels.
+    write_json : bool
+        Write ``<output>.json`` with :func:`provenance`.
+
+    Returns
+    -------
+    dict
+        ``{output_path: number of inputs averaged}``.
+
+    Raises
+    ------
+    ValueError
+        When the inputs of some groups do not share shape, voxel size and
+        affine; raised after the other groups were written.
+    """
+    groups = {
+        os.fspath(out): [os.fspath(f) for f in files] for out, files in groups.items()
+    }
+    streams = {
+        f: VoxelStream(f) for f in sorted({f for fs in groups.values() for f in fs})
+    }
+
+    skipped = {}
+    by_shape: dict[tuple, dict] = {}
+    for out, files in groups.items():
+        try:
+            check_geometry([streams[f] for f in files])
+        except ValueError as e:
+            skipped[out] = str(e)
+            continue
+        by_shape.setdefault(streams[files[0]].shape, {})[out] = files
+
+    written = {}
+    for shape_groups in by_shape.values():
+        _write_means(shape_groups, streams, chunk_voxels)
+        for out, files in shape_groups.items():
+            if write_json:
+                json_out = op.join(
+                    op.dirname(out), op.basename(out).split(".nii")[0] + ".json"
+                )
+                with open(json_out, "w") as fh:
+                    json.dump(provenance(files), fh, indent=2)
+            written[out] = len(files)
+
+    if skipped:
+        raise ValueError(
+            "; ".join(
+                f"{op.basename(out)} skipped: {msg}" for out, msg in skipped.items()
+            )
+        )
+    return written
@@ -0,0 +1,217 @@
+# """
+# MIT License
+# Copyright (c) 2020-2025 Garikoitz Lerma-Usabiaga
+# Copyright (c) 2020-2022 Mengxing Liu
+# Copyright (c) 2022-2023 Leandro Lecca
+# Copyright (c) 2022-2025 Yongning Lei
+# Copyright (c) 2023 David Linhardt
+# Copyright (c) 2023 Iñigo Tellaetxe
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit persons to
+# whom the Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+# """
+"""
+Open up the permissions of what a prepare run wrote, and nothing else.
+
+Prepare used to ``os.walk`` the whole analysis directory and ``chmod`` every
+entry, container outputs included.  :func:`prepare_plan` lists only the
+places prepare writes to (analysis-level files, the session folders, their
+``input/`` trees and ``output/log``), and :func:`fix_permissions` scans those
+with ``os.scandir`` in worker threads, changing an entry only when it
+
+* is not a symlink (``chmod`` would change the link target),
+* changed since the prepare started (``st_ctime`` not older than *since_ns*),
+* does not already have the requested mode.
+"""
+
+from __future__ import annotations
+
+import os
+import os.path as op
+import stat
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+
+DEFAULT_MODE = 0o777
+
+
+def parse_mode(value) -> int:
+    """
+    Permission mode from the lc config.
+
+    The value must be a string of octal digits: ``"775"`` and ``"0o775"``
+    both mean ``0o775``.  YAML turns an unquoted ``775`` into decimal 775 and
+    an unquoted ``0775`` into 509, and the two cannot be told apart, so ints
+    are rejected.  ``None`` is :data:`DEFAULT_MODE`.
+
+    Raises
+    ------
+    ValueError
+        If *value* is not a quoted octal mode of at most four digits.
+    """
+    if value is None:
+        return DEFAULT_MODE
+    if not isinstance(value, str):
+        raise ValueError(
+            f"permission_mode must be a quoted octal string, e.g. "
+            f'permission_mode: "775"; got {value!r}'
+        )
+    text = value.strip().lower().removeprefix("0o")
+    try:
+        mode = int(text, 8)
+    except ValueError:
+        raise ValueError(
+            f'permission_mode must be octal (e.g. "775"), got {value!r}'
+        ) from None
+    if not 0 <= mode <= 0o7777:
+        raise ValueError(f"permission_mode out of range: {value!r}")
+    return mode
+
+
+def fs_now_ns(directory: str) -> int:
+    """
+    Current time as the filesystem of *directory* stamps ``st_ctime``.
+
+    File timestamps come from a coarse kernel clock, or from the server's
+    clock on NFS, so ``time.time_ns()`` is not a safe reference for
+    *since_ns* of :func:`fix_permissions`; a temporary file's ctime is.
+    """
+    with tempfile.NamedTemporaryFile(dir=directory) as fh:
+        return os.fstat(fh.fileno()).st_ctime_ns
+
+
+def prepare_plan(analysis_dir: str, sessions) -> list[tuple[str, bool]]:
+    """
+    Directories a prepare run writes to, as ``(path, recursive)`` pairs.
+
+    The analysis directory and the session folders are scanned one level
+    deep, so existing container outputs are never walked; ``input/`` holds
+    only what prepare creates and is scanned recursively.
+
+    Parameters
+    ----------
+    analysis_dir : str
+        Prepared analysis directory.
+    sessions : list[tuple[str, str]]
+        ``(sub, ses)`` pairs, without prefixes.
+    """
+    plan = [(analysis_dir, False)]
+    for sub in sorted({sub for sub, _ in sessions}):
+        plan.append((op.join(analysis_dir, f"sub-{sub}"), False))
+    for sub, ses in sessions:
+        ses_dir = op.join(analysis_dir, f"sub-{sub}", f"ses-{ses}")
+        plan += [
+            (ses_dir, False),
+            (op.join(ses_dir, "input"), True),
+            (op.join(ses_dir, "output"), False),
+            (op.join(ses_dir, "output", "log"), False),
+        ]
+    return plan
+
+
+@dataclass
+class PermissionReport:
+    """Outcome of :func:`fix_permissions`."""
+
+    checked: int = 0
+    changed: int = 0
+    failed: list[str] = field(default_factory=list)
+
+
+def _fix_entry(path, st, mode, since_ns, report) -> None:
+    if stat.S_ISLNK(st.st_mode) or stat.S_IMODE(st.st_mode) == mode:
+        return
+    if since_ns is not None and st.st_ctime_ns < since_ns:
+        return
+    try:
+        os.chmod(path, mode)
+        report.changed += 1
+    except OSError as e:
+        report.failed.append(f"{path}: {e.strerror}")
+
+
+def _scan_dir(path, recursive, mode, since_ns) -> tuple[PermissionReport, list[str]]:
+    report = PermissionReport()
+    subdirs = []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    st = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                report.checked += 1
+                _fix_entry(entry.path, st, mode, since_ns, report)
+                if recursive and stat.S_ISDIR(st.st_mode):
+                    subdirs.append(entry.path)
+    except (FileNotFoundError, NotADirectoryError):
+        pass
+    except OSError as e:
+        report.failed.append(f"{path}: {e.strerror}")
+    return report, subdirs
+
+
+def fix_permissions(
+    plan, mode: int = DEFAULT_MODE, since_ns: int | None = None, n_workers: int = 8
+) -> PermissionReport:
+    """
+    Set *mode* on the entries of the directories in *plan*.
+
+    Parameters
+    ----------
+    plan : list[tuple[str, bool]]
+        ``(directory, recursive)`` pairs, e.g. from :func:`prepare_plan`.  The
+        directories themselves are handled too; missing ones and symlinks
+        are skipped, and a folder listed under several paths is scanned once.
+    mode : int
+        Permission bits, e.g. ``0o775``.
+    since_ns : int, optional
+        Leave entries whose ``st_ctime_ns`` is older alone (entries not
+        created or modified since then); see :func:`fs_now_ns`.
+    n_workers : int, default=8
+        Directories scanned in parallel.
+
+    Returns
+    -------
+    PermissionReport
+    """
+    report = PermissionReport()
+    roots = {}
+    for path, recursive in plan:
+        try:
+            st = os.lstat(path)
+        except FileNotFoundError:
+            continue
+        if not stat.S_ISDIR(st.st_mode):
+            continue
+        # symlinked plan dirs are skipped above; one reached through a
+        # symlinked parent resolves to its real folder and is scanned once
+        path = op.realpath(path)
+        if path not in roots:
+            report.checked += 1
+            _fix_entry(path, st, mode, since_ns, report)
+        roots[path] = roots.get(path, False) or recursive
+
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        pending = {
+            executor.submit(_scan_dir, path, recursive, mode, since_ns)
+            for path, recursive in roots.items()
+        }
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                part, subdirs = future.result()
+                report.checked += part.checked
+                report.changed += part.changed
+                report.failed += part.failed
+                pending |= {
+                    executor.submit(_scan_dir, d, True, mode, since_ns)
+                    for d in subdirs
+                    if d not in roots
+                }
+    return report
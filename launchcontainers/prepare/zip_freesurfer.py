@@ -1,78 +1,180 @@
 #!/usr/bin/env python3
 """
-Zip FreeSurfer outputs from freesurferator-with_t2 into anatrois-compatible format.
-Creates freesurferator_Sxxx.zip in sub-xx/ses-01/output/ with Sxxx/ as root directory.
+Zip FreeSurfer subjects into the archive layout anatrois/rtppreproc expect.
+
+Each subject directory is streamed straight into the archive, with the
+archive root renamed on the fly (``Sxxx/`` for ``freesurferator_Sxxx.zip``,
+``fs/`` for ``fs.zip``): no temporary copy of the subject and no external
+``zip``.  Already-compressed files (``.mgz``, ``.nii.gz``, ...) are stored,
+everything else is deflated.  Archives are written to a temporary name and
+renamed when complete, and a subject whose archive is newer than all of its
+files is skipped unless ``--force``.
+
+Example::
+
+    python -m launchcontainers.prepare.zip_freesurfer \\
+        --fs-dir /scratch/VOTCLOC/BIDS/derivatives/freesurfer-with_t2 \\
+        --output-base /scratch/VOTCLOC/BIDS/derivatives/freesurfer-with_t2/analysis-prefs \\
+        --subseslist subseslist.txt
 """
 
-from pathlib import Path
-import subprocess
-import shutil
-from concurrent.futures import ProcessPoolExecutor, as_completed
-from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn
-from launchcontainers.log_setup import console
-
-FREESURFERATOR_BASE = Path("/scratch/tlei/VOTCLOC/BIDS/derivatives/freesurfer-with_t2")
-OUTPUT_BASE = Path(
-    "/scratch/tlei/VOTCLOC/BIDS/derivatives/freesurfer-with_t2/analysis-prefs"
-)
-SUBJECTS = [f"sub-{i:02d}" for i in range(1, 12)]
+from __future__ import annotations
 
+import os
+import os.path as op
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
 
-def zip_subject(subject: str) -> tuple[str, bool, str]:
-    """Zip FreeSurfer output for one subject."""
-
-    s_id = "Sxxx"
+import typer
+from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn
 
-    source_dir = FREESURFERATOR_BASE / subject
-    output_dir = OUTPUT_BASE / subject / "ses-01" / "output"
-    zip_file = output_dir / f"freesurferator_{s_id}.zip"
+from launchcontainers.log_setup import console
+from launchcontainers.utils import parse_subses_list
+
+# deflating these again costs CPU for (almost) no size reduction
+STORED_SUFFIXES = (".mgz", ".gz", ".zip", ".png", ".jpg", ".jpeg")
+
+app = typer.Typer(add_completion=False)
+
+
+def compress_type(fname: str) -> int:
+    """``ZIP_STORED`` for already-compressed files, ``ZIP_DEFLATED`` otherwise."""
+    if fname.lower().endswith(STORED_SUFFIXES):
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+def iter_subject_tree(source_dir: str | Path):
+    """
+    Yield ``(path, relpath, is_dir)`` for everything under *source_dir*.
+
+    Symlinks are followed, as ``zip -r`` does, and each real directory is
+    visited once, so a link back up the tree cannot loop.
+    """
+    source_dir = op.abspath(os.fspath(source_dir))
+    seen = set()
+    for dirpath, dirnames, filenames in os.walk(source_dir, followlinks=True):
+        real = op.realpath(dirpath)
+        if real in seen:
+            dirnames[:] = []
+            continue
+        seen.add(real)
+        dirnames.sort()
+        relpath = op.relpath(dirpath, source_dir)
+        if relpath != ".":
+            yield dirpath, relpath, True
+        for fname in sorted(filenames):
+            path = op.join(dirpath, fname)
+            if op.exists(path):  # skip dangling links
+                yield path, op.normpath(op.join(relpath, fname)), False
+
+
+def package_subject(
+    source_dir: str | Path,
+    zip_file: str | Path,
+    root_name: str,
+    force: bool = False,
+    compresslevel: int = 6,
+) -> tuple[bool, str]:
+    """
+    Stream *source_dir* into *zip_file* under the archive root *root_name*.
+
+    Returns
+    -------
+    tuple[bool, str]
+        Whether the archive was written (``False`` when it was up to date)
+        and a message.
+    """
+    zip_file = os.fspath(zip_file)
+    entries = list(iter_subject_tree(source_dir))
+
+    if not force and op.isfile(zip_file):
+        newest = max((os.stat(path).st_mtime for path, _, _ in entries), default=0)
+        if os.stat(zip_file).st_mtime >= newest:
+            return False, f"Up to date: {zip_file}"
+
+    tmp = f"{zip_file}.part"
+    n_files = 0
+    try:
+        with zipfile.ZipFile(tmp, "w", allowZip64=True) as zf:
+            zf.write(os.fspath(source_dir), f"{root_name}/")
+            for path, relpath, is_dir in entries:
+                arcname = f"{root_name}/{relpath.replace(os.sep, '/')}"
+                if is_dir:
+                    zf.write(path, f"{arcname}/")
+                    continue
+                zf.write(
+                    path,
+                    arcname,
+                    compress_type=compress_type(relpath),
+                    compresslevel=compresslevel,  # ignored when stored
+                )
+                n_files += 1
+        os.replace(tmp, zip_file)
+    except BaseException:
+        if op.exists(tmp):
+            os.remove(tmp)
+        raise
+    return True, f"Created {zip_file} ({n_files} files)"
+
+
+def zip_subject(
+    sub: str,
+    ses: str,
+    fs_dir: str | Path,
+    output_base: str | Path,
+    root_name: str = "Sxxx",
+    zip_name: str = "freesurferator_{root}.zip",
+    force: bool = False,
+) -> tuple[str, bool, str]:
+    """
+    Zip FreeSurfer output for one subject.
+
+    The archive goes to ``<output_base>/sub-<sub>/ses-<ses>/output/<zip_name>``.
+    """
+    subject = f"sub-{sub}"
+    source_dir = Path(fs_dir) / subject
+    output_dir = Path(output_base) / subject / f"ses-{ses}" / "output"
+    zip_file = output_dir / zip_name.format(root=root_name)
 
     if not source_dir.exists():
         return subject, False, f"Source not found: {source_dir}"
 
     output_dir.mkdir(parents=True, exist_ok=True)
-
-    # Create temp directory with Sxxx structure
-    temp_dir = output_dir / f"temp_{s_id}"
-    temp_target = temp_dir / s_id
-
     try:
-        # Clean up any existing temp
-        if temp_dir.exists():
-            shutil.rmtree(temp_dir)
-
-        # Create Sxxx directory and copy contents
-        temp_target.mkdir(parents=True)
-
-        # Copy all contents from source to Sxxx/
-        for item in source_dir.iterdir():
-            if item.is_dir():
-                shutil.copytree(item, temp_target / item.name, symlinks=True)
-            else:
-                shutil.copy2(item, temp_target / item.name)
-
-        # Zip from temp directory
-        subprocess.run(
-            ["zip", "-r", "-q", str(zip_file), s_id],
-            cwd=temp_dir,
-            check=True,
-            capture_output=True,
-        )
-
-        # Clean up
-        shutil.rmtree(temp_dir)
-
-        return subject, True, f"Created {zip_file}"
-
+        _, message = package_subject(source_dir, zip_file, root_name, force)
+        return subject, True, message
     except Exception as e:
-        if temp_dir.exists():
-            shutil.rmtree(temp_dir)
         return subject, False, f"Error: {str(e)}"
 
 
-def main():
+@app.command()
+def main(
+    fs_dir: Path = typer.Option(
+        ..., "--fs-dir", help="FreeSurfer SUBJECTS_DIR holding sub-XX/"
+    ),
+    output_base: Path = typer.Option(
+        ..., "--output-base", help="Analysis dir receiving sub-XX/ses-YY/output/"
+    ),
+    subseslist: Path = typer.Option(
+        ..., "--subseslist", help="subseslist (sub,ses[,RUN]) of the subjects to zip"
+    ),
+    root_name: str = typer.Option(
+        "Sxxx", "--root-name", help="Root directory inside the archive (fs for fs.zip)"
+    ),
+    zip_name: str = typer.Option(
+        "freesurferator_{root}.zip",
+        "--zip-name",
+        help="Archive file name, {root} is replaced by --root-name",
+    ),
+    n_workers: int = typer.Option(11, "--workers", "-j", help="Parallel subjects"),
+    force: bool = typer.Option(False, "--force", help="Rewrite up-to-date archives"),
+):
+    """Zip the FreeSurfer subjects of a subseslist in parallel."""
+    subses = parse_subses_list(subseslist)
     console.print("[bold cyan]FreeSurfer Output Zipper[/bold cyan]")
-    console.print(f"Processing {len(SUBJECTS)} subjects\n")
+    console.print(f"Processing {len(subses)} subjects\n")
 
     with Progress(
         SpinnerColumn(),
@@ -81,13 +183,25 @@ def main():
         TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
         console=console,
     ) as progress:
-        task = progress.add_task("Zipping...", total=len(SUBJECTS))
+        task = progress.add_task("Zipping...", total=len(subses))
 
         success_count = 0
         failed = []
 
-        with ProcessPoolExecutor(max_workers=11) as executor:
-            futures = {executor.submit(zip_subject, subj): subj for subj in SUBJECTS}
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            futures = {
+                executor.submit(
+                    zip_subject,
+                    sub,
+                    ses,
+                    fs_dir,
+                    output_base,
+                    root_name,
+                    zip_name,
+                    force,
+                ): sub
+                for sub, ses in subses
+            }
 
             for future in as_completed(futures):
                 subject, success, message = future.result()
@@ -101,7 +215,7 @@ def main():
 
                 progress.advance(task)
 
-    console.print(f"\n[bold]Summary: {success_count}/{len(SUBJECTS)} successful[/bold]")
+    console.print(f"\n[bold]Summary: {success_count}/{len(subses)} successful[/bold]")
 
     if failed:
         console.print("\n[bold red]Failed:[/bold red]")
@@ -110,4 +224,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    app()
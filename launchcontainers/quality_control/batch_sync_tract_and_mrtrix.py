@@ -1,22 +1,27 @@
 import os
-import subprocess
 import pandas as pd
 from pathlib import Path
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+from launchcontainers.quality_control.tract_sync import sync_session
+
 """
 This script is because I don't really know how the RTP-pipeline
 
 output the result to which place
 
-so I rsync things in place for checking
+so I sync things in place for checking
 
 """
 
 
-def rsync_single_subject(analysis_dir, sub, ses):
+def sync_single_subject(analysis_dir, sub, ses, dry_run=False):
     """
-    Synchronize tract files for one subject/session using ``rsync``.
+    Synchronize tract files of one subject/session from ``RTP/mrtrix`` to ``tracts``.
+
+    Files are compared by size and mtime and linked (reflink or hardlink)
+    rather than copied when both directories share a filesystem; see
+    :func:`launchcontainers.quality_control.tract_sync.sync_tree`.
 
     Parameters
     ----------
@@ -26,6 +31,8 @@ def rsync_single_subject(analysis_dir, sub, ses):
         Subject identifier without the ``sub-`` prefix.
     ses : str
         Session identifier without the ``ses-`` prefix.
+    dry_run : bool, default=False
+        Only report the files that would be transferred.
 
     Returns
     -------
@@ -37,35 +44,21 @@ def rsync_single_subject(analysis_dir, sub, ses):
     subses_outputdir = Path(analysis_dir) / f"sub-{sub}" / f"ses-{ses}" / "output"
     # The directory which stores all the tracts
     file_path_tracts = subses_outputdir / "tracts"
-    # the RTP working dir and all the tracts file will be under RTP/mrtrix
-    file_path_rtp = subses_outputdir / "RTP" / "mrtrix"
-    # Another place that stores the RTP output, it should be a zip file
-    # tract_dir = subses_outputdir / "RTP_PIPELINE_ALL_OUTPUT" / "mrtrix"
-    # Skip if source doesn't exist
+    # Skip if the destination doesn't exist
     if not file_path_tracts.exists():
         return f"sub-{sub}_ses-{ses}: No tracts directory"
 
-    # Create destination directory
-    file_path_rtp.mkdir(parents=True, exist_ok=True)
-
-    # Run rsync
-    cmd = [
-        "rsync",
-        "-avzP",
-        "-h",
-        str(file_path_rtp) + "/",
-        str(file_path_tracts) + "/",
-    ]
-
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=3600)
-        if result.returncode == 0:
-            return f"sub-{sub}_ses-{ses}: SUCCESS"
-        else:
-            return f"sub-{sub}_ses-{ses}: FAILED - {result.stderr}"
+        # RTP/mrtrix (the RTP working dir) -> tracts
+        result = sync_session(subses_outputdir, "rtp", "tracts", dry_run=dry_run)
     except Exception as e:
         return f"sub-{sub}_ses-{ses}: ERROR - {str(e)}"
 
+    msg = f"sub-{sub}_ses-{ses}: SUCCESS - {result}"
+    if dry_run and result.actions:
+        msg += "\n  " + "\n  ".join(result.manifest())
+    return msg
+
 
 def find_subseslist(analysis_dir):
     """
@@ -78,7 +71,7 @@ def find_subseslist(analysis_dir):
     raise FileNotFoundError(f"No subseslist.txt found under {analysis_dir}")
 
 
-def batch_rsync_tracts(analysis_dir):
+def batch_sync_tracts(analysis_dir, dry_run=False, n_workers=18):
     """
     Run tract synchronization across all runnable DWI sessions in parallel.
 
@@ -86,11 +79,15 @@ def batch_rsync_tracts(analysis_dir):
     ----------
     analysis_dir : str or path-like
         Analysis directory containing ``subseslist.txt`` and output folders.
+    dry_run : bool, default=False
+        Only print what would be transferred.
+    n_workers : int, default=18
+        Sessions synchronized in parallel.
 
     Returns
     -------
     list[str]
-        Status messages returned by :func:`rsync_single_subject`.
+        Status messages returned by :func:`sync_single_subject`.
     """
 
     # Load subseslist
@@ -101,14 +98,14 @@ def batch_rsync_tracts(analysis_dir):
     tasks = []
     for row in df_subSes.itertuples(index=False, name="Pandas"):
         if row.RUN == "True" and row.dwi == "True":
-            tasks.append((analysis_dir, row.sub, row.ses))
+            tasks.append((analysis_dir, row.sub, row.ses, dry_run))
 
-    print(f"Processing {len(tasks)} subjects with 35 workers...")
+    print(f"Processing {len(tasks)} subjects with {n_workers} workers...")
 
-    # Run parallel rsync
+    # Run parallel sync
     results = []
-    with ThreadPoolExecutor(max_workers=18) as executor:
-        futures = {executor.submit(rsync_single_subject, *task): task for task in tasks}
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        futures = {executor.submit(sync_single_subject, *task): task for task in tasks}
 
         for future in as_completed(futures):
             result = future.result()
@@ -124,4 +121,4 @@ if __name__ == "__main__":
         "/bcbl/home/public/DB/devtrajtract/DATA/MINI/nifti/derivatives/"
         "rtp2-pipeline_0.2.1_3.0.4rc2/analysis-paper_dv-main"
     )
-    results = batch_rsync_tracts(analysis_dir)
+    results = batch_sync_tracts(analysis_dir)
@@ -0,0 +1,481 @@
+# """
+# MIT License
+# Copyright (c) 2020-2025 Garikoitz Lerma-Usabiaga
+# Copyright (c) 2020-2022 Mengxing Liu
+# Copyright (c) 2022-2023 Leandro Lecca
+# Copyright (c) 2022-2025 Yongning Lei
+# Copyright (c) 2023 David Linhardt
+# Copyright (c) 2023 Iñigo Tellaetxe
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit persons to
+# whom the Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+# """
+"""
+Persistent content index of a BIDS dataset.
+
+For every NIfTI under ``sub-*/ses-*/<datatype>/`` the index keeps the BIDS
+entities, the header geometry (shape, zooms, affine, dtype), a hash of the
+voxel data (:func:`~launchcontainers.quality_control.nii_compare.voxel_hash`)
+and a few sidecar fields (``AcquisitionTime``, ``SeriesNumber`` ...).  It is
+stored as JSON next to the data and updated incrementally: a file whose size
+and mtime did not change is not opened again, and a sidecar is only re-read
+when its own mtime changed, so refreshing a cohort costs one ``stat`` per
+file.
+
+Queries, cohort-wide or per session:
+
+- :meth:`BIDSIndex.duplicates` — images with identical voxel data, whatever
+  their names or sessions;
+- :meth:`BIDSIndex.near_duplicates` — images with the same geometry acquired
+  at the same time (within ``max_gap`` seconds) in a session, e.g. one run
+  converted twice under two task names;
+- :meth:`BIDSIndex.orphans` — images without sidecar, sidecars without
+  image and sbrefs without a following bold/magnitude.
+"""
+
+from __future__ import annotations
+
+import glob
+import json
+import os
+import os.path as op
+import re
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+
+import numpy as np
+
+from launchcontainers.utils import parse_bids_name
+
+INDEX_NAME = ".bids_content_index.json"
+INDEX_VERSION = 1
+SIDECAR_FIELDS = (
+    "AcquisitionTime",
+    "AcquisitionDateTime",
+    "SeriesNumber",
+    "SeriesDescription",
+    "ProtocolName",
+    "RepetitionTime",
+)
+# blake2b: as strong as needed here and faster than sha256 without SHA-NI
+HASH_ALGORITHM = "blake2b"
+FUNC_SUFFIXES = ("bold", "magnitude")
+
+_NII_RE = re.compile(r"\.nii(\.gz)?$")
+
+
+def acq_seconds(acq_time) -> float:
+    """HH:MM:SS[.xxx] → seconds since midnight; inf when missing or malformed."""
+    if not acq_time:
+        return float("inf")
+    try:
+        parts = str(acq_time).split("T")[-1].split(":")
+        return float(parts[0]) * 3600 + float(parts[1]) * 60 + float(parts[2])
+    except (ValueError, IndexError):
+        return float("inf")
+
+
+def sidecar_of(relpath: str) -> str:
+    return _NII_RE.sub("", relpath) + ".json"
+
+
+@dataclass
+class BIDSEntry:
+    """
+    One indexed NIfTI; paths are relative to the BIDS root.
+
+    ``json_mtime_ns`` is 0 when the image has no sidecar.  ``voxel_hash`` is
+    None until the index was updated with ``hash_data=True``.
+    """
+
+    relpath: str
+    sub: str
+    ses: str
+    datatype: str
+    suffix: str
+    entities: dict[str, str]
+    size: int
+    mtime_ns: int
+    is_link: bool = False
+    shape: list[int] | None = None
+    zooms: list[float] | None = None
+    affine: list[list[float]] | None = None
+    dtype: str | None = None
+    voxel_hash: str | None = None
+    sidecar: dict = field(default_factory=dict)
+    json_mtime_ns: int = 0
+    error: str = ""
+
+    @property
+    def acq_time(self) -> str:
+        return self.sidecar.get("AcquisitionTime") or ""
+
+    @property
+    def acq_sec(self) -> float:
+        return acq_seconds(self.acq_time)
+
+    @property
+    def geometry(self) -> tuple | None:
+        """Hashable shape/zooms/affine key; None when the header was unreadable."""
+        if self.shape is None:
+            return None
+        return (
+            tuple(self.shape),
+            tuple(round(z, 4) for z in self.zooms),
+            tuple(round(v, 3) for row in self.affine for v in row),
+        )
+
+    @property
+    def session(self) -> str:
+        return f"sub-{self.sub}/ses-{self.ses}"
+
+
+def _read_sidecar(path: str) -> dict:
+    with open(path) as fh:
+        meta = json.load(fh)
+    return {k: meta[k] for k in SIDECAR_FIELDS if k in meta}
+
+
+def _read_geometry(path: str) -> dict:
+    import nibabel as nib
+
+    img = nib.load(path)
+    return {
+        "shape": [int(n) for n in img.shape],
+        "zooms": [float(z) for z in img.header.get_zooms()],
+        "affine": np.asarray(img.affine, dtype=float).round(6).tolist(),
+        "dtype": str(img.dataobj.dtype),
+    }
+
+
+class BIDSIndex:
+    """
+    Content index of one BIDS dataset, persisted as JSON.
+
+    Parameters
+    ----------
+    bids_dir : str or path-like
+        BIDS root.
+    index_file : str or path-like, optional
+        Where the index is stored; defaults to ``<bids_dir>/.bids_content_index.json``.
+        An existing index is loaded; :meth:`update` refreshes it.
+    """
+
+    def __init__(self, bids_dir, index_file=None):
+        self.bids_dir = op.abspath(os.fspath(bids_dir))
+        self.index_file = (
+            os.fspath(index_file) if index_file else op.join(self.bids_dir, INDEX_NAME)
+        )
+        self.entries: dict[str, BIDSEntry] = {}
+        # sidecars without an image, relative paths
+        self.orphan_sidecars: list[str] = []
+        self._lock = threading.Lock()
+        if op.isfile(self.index_file):
+            with open(self.index_file) as fh:
+                data = json.load(fh)
+            if data.get("version") == INDEX_VERSION:
+                for e in data["entries"]:
+                    self.entries[e["relpath"]] = BIDSEntry(**e)
+                self.orphan_sidecars = data.get("orphan_sidecars", [])
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    # ------------------------------------------------------------------
+    # Update
+    # ------------------------------------------------------------------
+
+    def _datatype_dirs(self, subses=None) -> list[str]:
+        if subses is None:
+            pattern = [op.join(self.bids_dir, "sub-*", "ses-*", "*")]
+        else:
+            pattern = [
+                op.join(self.bids_dir, f"sub-{sub}", f"ses-{ses}", "*")
+                for sub, ses in subses
+            ]
+        return sorted(d for p in pattern for d in glob.glob(p) if op.isdir(d))
+
+    def _scan(self, subses=None) -> tuple[dict, dict]:
+        """One ``scandir`` per datatype dir: {relpath: stat} of images and sidecars."""
+        images, sidecars = {}, {}
+        for d in self._datatype_dirs(subses):
+            rel_dir = op.relpath(d, self.bids_dir)
+            with os.scandir(d) as it:
+                for de in it:
+                    if de.name.startswith("."):
+                        continue
+                    rel = op.join(rel_dir, de.name)
+                    try:
+                        if _NII_RE.search(de.name):
+                            images[rel] = (de.stat(), de.is_symlink())
+                        elif de.name.endswith(".json"):
+                            sidecars[rel] = de.stat()
+                    except FileNotFoundError:
+                        # broken symlink
+                        continue
+        return images, sidecars
+
+    def _refresh(self, rel, st, is_link, json_st, hash_data) -> BIDSEntry:
+        old = self.entries.get(rel)
+        path = op.join(self.bids_dir, rel)
+        entities, suffix = parse_bids_name(op.basename(rel))
+        sub, ses, datatype = rel.split(os.sep)[:3]
+        if old is not None and (old.size, old.mtime_ns) == (st.st_size, st.st_mtime_ns):
+            entry = old
+        else:
+            entry = BIDSEntry(
+                relpath=rel,
+                sub=sub[4:],
+                ses=ses[4:],
+                datatype=datatype,
+                suffix=suffix,
+                entities=entities,
+                size=st.st_size,
+                mtime_ns=st.st_mtime_ns,
+                is_link=is_link,
+            )
+            try:
+                for k, v in _read_geometry(path).items():
+                    setattr(entry, k, v)
+            except Exception as e:
+                entry.error = f"{type(e).__name__}: {e}"
+        if isinstance(hash_data, bool):
+            wanted = hash_data
+        else:
+            wanted = entry.suffix in hash_data
+        if wanted and entry.voxel_hash is None and not entry.error:
+            from launchcontainers.quality_control.nii_compare import voxel_hash
+
+            try:
+                entry.voxel_hash = voxel_hash(path, algorithm=HASH_ALGORITHM)
+            except Exception as e:
+                entry.error = f"{type(e).__name__}: {e}"
+
+        json_mtime_ns = json_st.st_mtime_ns if json_st is not None else 0
+        if json_mtime_ns != entry.json_mtime_ns:
+            entry.sidecar = {}
+            if json_st is not None:
+                try:
+                    entry.sidecar = _read_sidecar(
+                        op.join(self.bids_dir, sidecar_of(rel))
+                    )
+                except (OSError, ValueError) as e:
+                    # kept apart from ``error``, which is about the image
+                    entry.sidecar = {"error": str(e)}
+            entry.json_mtime_ns = json_mtime_ns
+        return entry
+
+    def update(self, subses=None, hash_data=True, n_workers: int = 8) -> dict[str, int]:
+        """
+        Bring the index up to date with the files on disk.
+
+        Parameters
+        ----------
+        subses : list of (sub, ses), optional
+            Only rescan these sessions (labels without ``sub-``/``ses-``);
+            entries of other sessions are kept as they are.
+        hash_data : bool or collection of str, default=True
+            Hash the voxel data of new and changed images (the slow part:
+            every image is decompressed once), or only of those with these
+            suffixes, e.g. ``("bold", "sbref")``.  Otherwise only headers and
+            sidecars are read; hashes are filled in by a later update.
+        n_workers : int
+            Worker threads; decompression and hashing release the GIL.
+
+        Returns
+        -------
+        dict
+            Counts of ``new``, ``changed``, ``removed`` and ``unchanged`` images.
+        """
+        images, sidecars = self._scan(subses)
+        if subses is None:
+            prefixes = ("",)
+        else:
+            prefixes = tuple(
+                op.join(f"sub-{s}", f"ses-{e}") + os.sep for s, e in subses
+            )
+        in_scope = {rel for rel in self.entries if rel.startswith(prefixes)}
+
+        counts = {"new": 0, "changed": 0, "removed": 0, "unchanged": 0}
+        for rel, (st, _) in images.items():
+            old = self.entries.get(rel)
+            if old is None:
+                counts["new"] += 1
+            elif (old.size, old.mtime_ns) != (st.st_size, st.st_mtime_ns):
+                counts["changed"] += 1
+            else:
+                counts["unchanged"] += 1
+
+        def _one(item):
+            rel, (st, is_link) = item
+            return self._refresh(
+                rel, st, is_link, sidecars.get(sidecar_of(rel)), hash_data
+            )
+
+        items = sorted(images.items())
+        if n_workers > 1 and len(items) > 1:
+            with ThreadPoolExecutor(max_workers=n_workers) as executor:
+                refreshed = list(executor.map(_one, items))
+        else:
+            refreshed = [_one(item) for item in items]
+
+        with self._lock:
+            for rel in in_scope - set(images):
+                del self.entries[rel]
+                counts["removed"] += 1
+            for entry in refreshed:
+                self.entries[entry.relpath] = entry
+            image_sidecars = {sidecar_of(rel) for rel in images}
+            self.orphan_sidecars = sorted(
+                [rel for rel in self.orphan_sidecars if not rel.startswith(prefixes)]
+                + [rel for rel in sidecars if rel not in image_sidecars]
+            )
+        return counts
+
+    def save(self, index_file=None) -> None:
+        """Write the index as JSON (atomically)."""
+        index_file = os.fspath(index_file) if index_file else self.index_file
+        with self._lock:
+            data = {
+                "version": INDEX_VERSION,
+                "entries": [asdict(e) for e in self.entries.values()],
+                "orphan_sidecars": self.orphan_sidecars,
+            }
+        tmp = f"{index_file}.part"
+        with open(tmp, "w") as fh:
+            json.dump(data, fh)
+        os.replace(tmp, index_file)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def select(
+        self, sub=None, ses=None, datatype=None, suffixes=None
+    ) -> list[BIDSEntry]:
+        """Entries matching the given labels, sorted by path."""
+        return [
+            e
+            for rel, e in sorted(self.entries.items())
+            if (sub is None or e.sub == sub)
+            and (ses is None or e.ses == ses)
+            and (datatype is None or e.datatype == datatype)
+            and (suffixes is None or e.suffix in suffixes)
+        ]
+
+    def path(self, entry: BIDSEntry) -> str:
+        return op.join(self.bids_dir, entry.relpath)
+
+    def duplicates(self, suffixes=None) -> list[list[BIDSEntry]]:
+        """
+        Groups of images with identical voxel data, cohort-wide.
+
+        Symlinks are left out (they are duplicates by construction), as are
+        images not hashed yet.
+        """
+        groups = defaultdict(list)
+        for e in self.select(suffixes=suffixes):
+            if e.voxel_hash and not e.is_link:
+                groups[e.voxel_hash].append(e)
+        return [g for g in groups.values() if len(g) > 1]
+
+    def near_duplicates(
+        self, suffixes=None, max_gap: float = 0, within_session: bool = True
+    ) -> list[list[BIDSEntry]]:
+        """
+        Groups of images with the same geometry acquired at the same time.
+
+        Images of one session (or of the cohort, with ``within_session=False``,
+        for datasets whose sidecars carry ``AcquisitionDateTime``) whose
+        shape, zooms and affine agree and whose acquisition times are at most
+        ``max_gap`` seconds apart (0: the same second, as the times are
+        compared to the second).  An sbref never groups with its bold, as
+        their shapes differ.
+        """
+        by_key = defaultdict(list)
+        for e in self.select(suffixes=suffixes):
+            if e.is_link or e.geometry is None or e.acq_sec == float("inf"):
+                continue
+            if within_session:
+                scope = e.session
+            else:
+                scope = str(e.sidecar.get("AcquisitionDateTime", "")).split("T")[0]
+            by_key[(scope, e.geometry)].append(e)
+
+        groups = []
+        for members in by_key.values():
+            members.sort(key=lambda e: (int(e.acq_sec), e.relpath))
+            run = [members[0]]
+            for e in members[1:]:
+                if int(e.acq_sec) - int(run[-1].acq_sec) <= max_gap:
+                    run.append(e)
+                    continue
+                if len(run) > 1:
+                    groups.append(run)
+                run = [e]
+            if len(run) > 1:
+                groups.append(run)
+        return groups
+
+    def orphans(self, max_gap: float = 30) -> list[tuple[str, str]]:
+        """
+        ``(relpath, reason)`` for files missing their counterpart.
+
+        - an image without sidecar;
+        - a sidecar without image;
+        - an sbref not followed, within ``max_gap`` seconds, by a bold or
+          magnitude image of its session (the rule of
+          ``01_drop_duplicated_sbrefs.py``).
+        """
+        out = [(e.relpath, "no sidecar") for e in self.select() if not e.json_mtime_ns]
+        out += [(rel, "sidecar without image") for rel in self.orphan_sidecars]
+
+        funcs = defaultdict(list)
+        for e in self.select(datatype="func", suffixes=FUNC_SUFFIXES):
+            funcs[e.session].append(e.acq_sec)
+        for e in self.select(datatype="func", suffixes=("sbref",)):
+            t = e.acq_sec
+            gaps = [f - t for f in funcs[e.session] if f != float("inf") and f >= t]
+            if t == float("inf") or not gaps or min(gaps) > max_gap:
+                out.append((e.relpath, f"sbref without func within {max_gap:g}s"))
+        return sorted(out)
+
+
+def duplicate_report(
+    index: BIDSIndex, suffixes=("bold", "sbref"), max_gap: float = 0
+) -> list[dict]:
+    """
+    Rows of the duplicate groups of an index, for ``duplicates.txt``.
+
+    Exact duplicates (same voxel data) come first, then near duplicates not
+    already reported; each row carries its ``group`` number and ``kind``.
+    """
+    rows = []
+    seen = set()
+    groups = [("identical", g) for g in index.duplicates(suffixes)]
+    groups += [("same_time", g) for g in index.near_duplicates(suffixes, max_gap)]
+    for kind, group in groups:
+        key = frozenset(e.relpath for e in group)
+        if key in seen:
+            continue
+        seen.add(key)
+        for e in group:
+            rows.append(
+                {
+                    "group": len(seen),
+                    "kind": kind,
+                    "session": f"{e.sub}/{e.ses}",
+                    "time": e.acq_time.split(".")[0],
+                    "task": e.entities.get("task"),
+                    "run": e.entities.get("run"),
+                    "type": e.suffix,
+                    "file": index.path(e),
+                }
+            )
+    return rows
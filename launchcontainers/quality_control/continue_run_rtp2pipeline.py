@@ -1,19 +1,30 @@
 from __future__ import annotations
 
 import os
-import shutil
-import zipfile
 from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import pandas as pd
 import typer
 
+from launchcontainers.quality_control.tract_sync import sync_tree
+from launchcontainers.quality_control.zip_extract import extract_zip
 
-def process_tracts(sub, ses, analysis_dir):
+# tracts the continued run recomputes from RTP/mrtrix
+RERUN_TRACT_PATTERNS = ["L_Ope*", "L_Tri*", "L_Orb*"]
+
+
+def process_tracts(sub, ses, analysis_dir, dry_run=False):
     """
     Unpack and reorganize tract outputs for one subject/session.
 
+    The previous ``tracts/`` becomes ``old_tracts/`` and ``tracts.zip`` is
+    extracted into it (missing or changed members only) and renamed to
+    ``old_tracts.zip``; the tracts to recompute are then synced into
+    ``RTP/mrtrix`` as reflinks where the filesystem supports them, copies
+    otherwise, never hardlinks, since the pipeline writes there again.
+    Running it twice is harmless.
+
     Parameters
     ----------
     sub : str
@@ -22,37 +33,42 @@ def process_tracts(sub, ses, analysis_dir):
         Session identifier without the ``ses-`` prefix.
     analysis_dir : str
         Analysis directory containing per-session output folders.
+    dry_run : bool, default=False
+        Only print what would be extracted and synced.
     """
     base = Path(analysis_dir) / f"sub-{sub}" / f"ses-{ses}" / "output"
     zip_path = base / "tracts.zip"
-    csv_path = base / "tracts.csv"
     extract_dir = base / "tracts"
-
-    print(f"\n For sub-{sub} ses-{ses}")
-    # 1) Unzip
-    if not zip_path.exists():
-        print(f"No zip at {zip_path}")
-    with zipfile.ZipFile(zip_path, "r") as zf:
-        zf.extractall(base)
-
-    # 2) Rename zip, folder, csv
     old_zip = base / "old_tracts.zip"
-    zip_path.rename(old_zip)
-
     old_dir = base / "old_tracts"
-    extract_dir.rename(old_dir)
-
-    old_csv_path = base / "tracts.csv"
-    csv_path.rename(old_csv_path)
 
-    # 3) Copy selected files
+    print(f"\n For sub-{sub} ses-{ses}")
+    if not zip_path.exists() and not old_zip.exists():
+        print(f"No zip at {zip_path}")
+        return
+
+    # 1) Move the tracts folder aside and unzip straight into it
+    if extract_dir.exists() and not old_dir.exists():
+        if dry_run:
+            # nothing is renamed: plan against the folder as it is now
+            old_dir = extract_dir
+        else:
+            extract_dir.rename(old_dir)
+    if zip_path.exists():
+        result = extract_zip(zip_path, old_dir, dry_run=dry_run)
+        print(f"{zip_path.name} -> {old_dir.name}: {result}")
+        if not dry_run:
+            zip_path.rename(old_zip)
+
+    # 2) Sync the tracts to recompute
     dest = base / "RTP" / "mrtrix"
-    dest.mkdir(parents=True, exist_ok=True)
-
-    for pattern in ("L_Ope*", "L_Tri*", "L_Orb*"):
-        for src in old_dir.glob(pattern):
-            if src.is_file():
-                shutil.copy2(src, dest / src.name)
+    result = sync_tree(
+        old_dir, dest, patterns=RERUN_TRACT_PATTERNS, mode="clone", dry_run=dry_run
+    )
+    print(f"{old_dir.name} -> RTP/mrtrix: {result}")
+    if dry_run:
+        for line in result.manifest():
+            print(f"  {line}")
 
 
 def find_subseslist(analysis_dir):
@@ -76,7 +92,7 @@ def find_subseslist(analysis_dir):
     raise FileNotFoundError(f"No subseslist.txt found under {analysis_dir}")
 
 
-def main(analysis_dir):
+def main(analysis_dir: str, dry_run: bool = False):
     """
     Reprocess tract outputs in parallel for every runnable DWI session.
 
@@ -84,6 +100,8 @@ def main(analysis_dir):
     ----------
     analysis_dir : str
         Analysis directory containing the prepared ``subseslist.txt`` file.
+    dry_run : bool, default=False
+        Only print what each session would extract and sync.
     """
     path_to_subses = find_subseslist(analysis_dir)
     df_subSes = pd.read_csv(path_to_subses, sep=",", dtype=str)
@@ -106,11 +124,13 @@ def main(analysis_dir):
     ses = df_filtered["ses"].tolist()
     # repeat the same analysis_dir for each task
     ana_dirs = [analysis_dir] * len(subs)
+    dry_runs = [dry_run] * len(subs)
 
     # 3) Dispatch in parallel
     with ThreadPoolExecutor(max_workers=30) as executor:
-        # executor.map will call process_tracts(sub, ses, analysis_dir)
-        executor.map(process_tracts, subs, ses, ana_dirs)
+        # executor.map will call process_tracts(sub, ses, analysis_dir, dry_run);
+        # list() re-raises the first failure
+        list(executor.map(process_tracts, subs, ses, ana_dirs, dry_runs))
 
 
 if __name__ == "__main__":
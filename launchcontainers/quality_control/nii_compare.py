@@ -0,0 +1,379 @@
+# """
+# MIT License
+# Copyright (c) 2020-2025 Garikoitz Lerma-Usabiaga
+# Copyright (c) 2020-2022 Mengxing Liu
+# Copyright (c) 2022-2023 Leandro Lecca
+# Copyright (c) 2022-2025 Yongning Lei
+# Copyright (c) 2023 David Linhardt
+# Copyright (c) 2023 Iñigo Tellaetxe
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit persons to
+# whom the Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+# """
+"""
+Streaming comparison and content hashing of NIfTI images.
+
+``get_fdata()`` on two 4D DWI/BOLD runs makes two float64 copies of both
+images before anything is compared.  Here the voxel data of a single-file
+NIfTI (``.nii`` or ``.nii.gz``) is read sequentially from the data offset in
+chunks of whole voxels, in the stored dtype, and the two images are walked in
+step:
+
+- exact mode (``atol`` and ``rtol`` None) compares the raw bytes when both
+  images store the same dtype and scaling, the scaled values otherwise, and
+  stops at the first differing chunk, reporting the first differing voxel;
+- tolerance mode applies ``np.allclose``'s rule (``|a - b| <= atol +
+  rtol * |b|``) per chunk and accumulates the number of voxels out of
+  tolerance and the max / mean absolute difference;
+- :func:`voxel_hash` digests shape, dtype, scaling and the little-endian
+  voxel bytes, so it does not depend on gzip level, header padding or
+  extensions;
+- :func:`compare_many` runs many pairs (e.g. from :func:`read_manifest`) in
+  worker threads; decompression and the array work release the GIL.
+
+Memory stays at a few chunks (``chunk_bytes``) per pair.
+"""
+
+from __future__ import annotations
+
+import csv
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+
+CHUNK_BYTES = 64 << 20
+
+
+@dataclass
+class NiiComparison:
+    """
+    Outcome of :func:`compare_nii`; ``data_equal`` is None when not compared.
+
+    ``zooms`` and ``affine`` hold the values of both images, so that
+    :meth:`report` can show them when they differ.
+    """
+
+    path_a: str
+    path_b: str
+    shape: tuple[tuple, tuple]
+    dtype: tuple[str, str]
+    zooms_equal: bool
+    affine_equal: bool
+    zooms: tuple[tuple, tuple] = ((), ())
+    affine: tuple[np.ndarray, np.ndarray] | None = None
+    data_equal: bool | None = None
+    tolerance: tuple[float, float] | None = None
+    n_differ: int | None = None
+    max_abs_diff: float | None = None
+    mean_abs_diff: float | None = None
+    first_diff: tuple[int, ...] | None = None
+    first_values: tuple[float, float] | None = None
+    error: str = ""
+
+    @property
+    def header_equal(self) -> bool:
+        return (
+            self.shape[0] == self.shape[1]
+            and self.dtype[0] == self.dtype[1]
+            and self.zooms_equal
+            and self.affine_equal
+        )
+
+    @property
+    def identical(self) -> bool:
+        return self.header_equal and bool(self.data_equal)
+
+    def report(self) -> list[str]:
+        """Lines in the format of ``compare_nii.py``."""
+        lines = []
+        if self.error and not any(self.shape):
+            # the images could not even be opened
+            return [f"  ERROR   {self.error}"]
+
+        def _line(ok, what):
+            lines.append(f"  {'OK    ' if ok else 'DIFFER'}  {what}")
+
+        same_shape = self.shape[0] == self.shape[1]
+        _line(
+            same_shape,
+            f"shape:  {self.shape[0]}"
+            + ("" if same_shape else f"  vs  {self.shape[1]}"),
+        )
+        same_dtype = self.dtype[0] == self.dtype[1]
+        _line(
+            same_dtype,
+            f"dtype:  {self.dtype[0]}"
+            + ("" if same_dtype else f"  vs  {self.dtype[1]}"),
+        )
+        _line(
+            self.zooms_equal,
+            f"zooms:  {self.zooms[0]}"
+            + ("" if self.zooms_equal else f"  vs  {self.zooms[1]}"),
+        )
+        _line(self.affine_equal, "affine")
+        if not self.affine_equal and self.affine is not None:
+            lines.append(f"    A:\n{self.affine[0]}")
+            lines.append(f"    B:\n{self.affine[1]}")
+        if self.error:
+            _line(False, f"voxel data: {self.error}")
+        elif self.data_equal and self.tolerance is None:
+            _line(True, "voxel data: exactly identical")
+        elif self.data_equal:
+            _line(
+                True,
+                f"voxel data: within atol={self.tolerance[0]:g}, rtol={self.tolerance[1]:g}",
+            )
+        if self.n_differ:
+            _line(False, f"voxel data: {self.n_differ} voxels out of tolerance")
+        if self.max_abs_diff is not None and self.max_abs_diff > 0:
+            lines.append(f"          max |diff| = {self.max_abs_diff:.6g}")
+            lines.append(f"          mean|diff| (nonzero) = {self.mean_abs_diff:.6g}")
+        if self.first_diff is not None and not self.data_equal:
+            if self.tolerance is None:
+                _line(False, "voxel data: differ (stopped at the first difference)")
+            a, b = self.first_values
+            lines.append(
+                f"          first difference at voxel {self.first_diff}: {a:.6g} vs {b:.6g}"
+            )
+        return lines
+
+
+class VoxelStream:
+    """
+    Voxel data of one single-file NIfTI, read in order in whole voxels.
+
+    Only the header is parsed up front; :meth:`chunks` then reads the data
+    section sequentially (through nibabel's opener, so ``.nii.gz`` works),
+    which is the Fortran (first axis fastest) voxel order.
+    """
+
+    def __init__(self, path):
+        import nibabel as nib
+
+        self.path = os.fspath(path)
+        self.img = nib.load(self.path)
+        if not isinstance(self.img, (nib.Nifti1Image, nib.Nifti2Image)):
+            raise ValueError(f"not a single-file NIfTI: {self.path}")
+        # the loaded header has offset and scaling reset; the proxy keeps them
+        proxy = self.img.dataobj
+        self.shape = tuple(int(n) for n in proxy.shape)
+        self.dtype = proxy.dtype
+        self.offset = int(proxy.offset)
+        self.size = int(np.prod(self.shape, dtype=np.int64))
+        self.slope = float(proxy.slope)
+        self.inter = float(proxy.inter)
+
+    @property
+    def scaled(self) -> bool:
+        return (self.slope, self.inter) != (1.0, 0.0)
+
+    def chunks(self, n_voxels: int):
+        """Yield the raw bytes of up to *n_voxels* stored values, in file order."""
+        from nibabel.openers import ImageOpener
+
+        itemsize = self.dtype.itemsize
+        remaining = self.size
+        with ImageOpener(self.path, "rb") as fh:
+            fh.seek(self.offset)
+            while remaining:
+                n = min(n_voxels, remaining)
+                raw = fh.read(n * itemsize)
+                if len(raw) != n * itemsize:
+                    raise ValueError(f"{self.path}: data section truncated")
+                yield raw
+                remaining -= n
+
+    def values(self, raw: bytes) -> np.ndarray:
+        """Chunk as scaled float64 values, as ``get_fdata`` would give them."""
+        out = np.frombuffer(raw, dtype=self.dtype).astype(np.float64)
+        if self.scaled:
+            out *= self.slope
+            out += self.inter
+        return out
+
+
+def _first_index(mask: np.ndarray, start: int, shape) -> tuple[int, ...]:
+    flat = start + int(np.argmax(mask))
+    return tuple(int(i) for i in np.unravel_index(flat, shape, order="F"))
+
+
+def compare_nii(
+    path_a,
+    path_b,
+    atol: float | None = None,
+    rtol: float | None = None,
+    early_exit: bool | None = None,
+    chunk_bytes: int = CHUNK_BYTES,
+) -> NiiComparison:
+    """
+    Compare two NIfTI files header-wise and voxel by voxel, streaming.
+
+    Parameters
+    ----------
+    path_a, path_b : path-like
+        The images.
+    atol, rtol : float, optional
+        Tolerances (``np.allclose`` rule); both None means exact comparison
+        of the (scaled) values.  Give ``atol=0`` for exact comparison with
+        full difference statistics.
+    early_exit : bool, optional
+        Stop at the first chunk with a difference.  Defaults to True in
+        exact mode and False with tolerances, where the statistics need the
+        whole image.
+    chunk_bytes : int
+        Size of one float64 chunk; about five such arrays are alive at once
+        while a differing chunk is examined.
+
+    Returns
+    -------
+    NiiComparison
+    """
+    a, b = VoxelStream(path_a), VoxelStream(path_b)
+    zooms = tuple(
+        tuple(float(z) for z in img.header.get_zooms()) for img in (a.img, b.img)
+    )
+    result = NiiComparison(
+        path_a=a.path,
+        path_b=b.path,
+        shape=(a.shape, b.shape),
+        dtype=(str(a.dtype), str(b.dtype)),
+        zooms_equal=bool(
+            len(zooms[0]) == len(zooms[1]) and np.allclose(zooms[0], zooms[1])
+        ),
+        affine_equal=bool(np.allclose(a.img.affine, b.img.affine)),
+        zooms=zooms,
+        affine=(a.img.affine, b.img.affine),
+    )
+    if a.shape != b.shape:
+        result.error = "data shape mismatch — cannot compare voxels"
+        return result
+
+    exact = atol is None and rtol is None
+    if not exact:
+        atol, rtol = atol or 0.0, rtol or 0.0
+        result.tolerance = (atol, rtol)
+    if early_exit is None:
+        early_exit = exact
+    # same storage: equal bytes mean equal values, checked with one memcmp
+    same_storage = a.dtype == b.dtype and (a.slope, a.inter) == (b.slope, b.inter)
+
+    # sized for the float64 temporaries of a differing chunk
+    n_voxels = max(1, chunk_bytes // 8)
+    n_differ = 0
+    n_nonzero = 0
+    sum_diff = 0.0
+    max_diff = 0.0
+    start = 0
+    result.data_equal = True
+    for ca, cb in zip(a.chunks(n_voxels), b.chunks(n_voxels)):
+        if same_storage and ca == cb:
+            start += len(ca) // a.dtype.itemsize
+            continue
+        va, vb = a.values(ca), b.values(cb)
+        diff = np.abs(va - vb)
+        if exact:
+            # NaN == NaN for our purpose, like comparing the stored bytes
+            bad = (va != vb) & ~(np.isnan(va) & np.isnan(vb))
+        else:
+            bad = ~np.isclose(va, vb, rtol=rtol, atol=atol, equal_nan=True)
+        if bad.any():
+            if result.first_diff is None:
+                result.first_diff = _first_index(bad, start, a.shape)
+                k = int(np.argmax(bad))
+                result.first_values = (float(va[k]), float(vb[k]))
+            result.data_equal = False
+            n_differ += int(np.count_nonzero(bad))
+        finite = diff[np.isfinite(diff) & (diff > 0)]
+        if finite.size:
+            n_nonzero += finite.size
+            sum_diff += float(finite.sum())
+            max_diff = max(max_diff, float(finite.max()))
+        start += va.size
+        if early_exit and not result.data_equal:
+            return result
+
+    if not early_exit:
+        result.n_differ = n_differ
+        result.max_abs_diff = max_diff
+        result.mean_abs_diff = sum_diff / n_nonzero if n_nonzero else 0.0
+    return result
+
+
+def voxel_hash(path, algorithm: str = "sha256", chunk_bytes: int = CHUNK_BYTES) -> str:
+    """
+    Hash of the voxel content of a NIfTI, independent of how it is stored on disk.
+
+    The digest covers the shape, the dtype (as little-endian), the scaling
+    and the voxel bytes (as little-endian), not the gzip stream, the header
+    padding, extensions or the affine: the same image written with other
+    compression settings hashes the same.
+    """
+    stream = VoxelStream(path)
+    h = hashlib.new(algorithm)
+    le = stream.dtype.newbyteorder("<")
+    h.update(f"{stream.shape}|{le.str}|{stream.slope!r}|{stream.inter!r}|".encode())
+    n_voxels = max(1, chunk_bytes // stream.dtype.itemsize)
+    for raw in stream.chunks(n_voxels):
+        if stream.dtype == le:
+            h.update(raw)
+        else:
+            h.update(np.frombuffer(raw, dtype=stream.dtype).astype(le).tobytes())
+    return h.hexdigest()
+
+
+def read_manifest(path) -> list[tuple[str, str]]:
+    """
+    Read ``(path_a, path_b)`` pairs from a CSV/TSV file.
+
+    The first two columns are used; a header row (whose first cell is not
+    an existing file) and ``#`` comments are skipped.
+    """
+    with open(path, newline="") as fh:
+        sample = fh.read(4096)
+        fh.seek(0)
+        delimiter = "\t" if "\t" in sample else ","
+        pairs = []
+        for i, row in enumerate(csv.reader(fh, delimiter=delimiter)):
+            if len(row) < 2 or row[0].startswith("#"):
+                continue
+            if i == 0 and not os.path.exists(row[0].strip()):
+                continue
+            pairs.append((row[0].strip(), row[1].strip()))
+    return pairs
+
+
+def compare_many(pairs, n_workers: int = 4, **kwargs) -> list:
+    """
+    :func:`compare_nii` over many ``(path_a, path_b)`` pairs in worker threads.
+
+    Results are in input order; a pair that cannot be read gives a
+    :class:`NiiComparison` with empty shapes and the ``error``, instead of
+    raising.
+    """
+
+    def _one(pair):
+        try:
+            return compare_nii(*pair, **kwargs)
+        except Exception as e:
+            return NiiComparison(
+                path_a=os.fspath(pair[0]),
+                path_b=os.fspath(pair[1]),
+                shape=((), ()),
+                dtype=("", ""),
+                zooms_equal=False,
+                affine_equal=False,
+                error=f"{type(e).__name__}: {e}",
+            )
+
+    pairs = list(pairs)
+    if n_workers <= 1:
+        return [_one(p) for p in pairs]
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        return list(executor.map(_one, pairs))
@@ -1,14 +1,49 @@
 """Tract processing and validation functions"""
 
 import pandas as pd
+import numpy as np
 from pathlib import Path
 import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
 from launchcontainers.log_setup import console
+from launchcontainers.quality_control.tck_inspect import TckInspector, get_inspector
+from launchcontainers.quality_control.zipfs import RTP2Output
+
+TRACTPARAMS_NAME = "tractparams_votc-ifg-ipl_280tract_hemi-both.csv"
+OUTPUT_SUMMARY_CSV = "RTP_PIPELINE_ALL_OUTPUT.csv"
+# pseudo file type of the matrix: the .tck is readable and has enough streamlines
+TCK_VALID = "tck_valid"
+
+
+@lru_cache(maxsize=8)
+def _read_tract_table(tractparams_file, mtime_ns):
+    df = pd.read_csv(tractparams_file, sep=",")
+    exclude = ["Ang", "Sup", "IPS0", "IPS1"]
+
+    df = df[~df["nhlabel"].str.contains("|".join(exclude))]
+
+    return pd.DataFrame(
+        {
+            "tract": (
+                df["shemi"].astype(str)
+                + "_"
+                + df["nhlabel"].str.replace("-", "_")
+                + "_clean"
+            ).to_numpy(),
+            "hemi": df["shemi"].astype(str).to_numpy(),
+            "label": df["nhlabel"].to_numpy(),
+        }
+    )
 
 
-def load_tract_params(tractparams_file):
+def load_tract_table(tractparams_file):
     """
-    Load tract names from a tract parameter CSV file.
+    Load the expected tracts, with hemisphere and label, from a tractparams CSV.
+
+    The parsed table is cached per file (and modification time), so checking
+    many sessions against the same tractparams reads it once.
 
     Parameters
     ----------
@@ -17,32 +52,41 @@ def load_tract_params(tractparams_file):
 
     Returns
     -------
-    pandas.Series
-        Derived tract names that should be present in the output.
+    pandas.DataFrame
+        Columns ``tract`` (derived tract name), ``hemi`` and ``label``.
     """
-    tractparams_file = Path(tractparams_file)
+    tractparams_file = Path(tractparams_file).resolve()
 
     if not tractparams_file.exists():
         raise FileNotFoundError(f"tractparams.tsv not found: {tractparams_file}")
 
     try:
-        df = pd.read_csv(tractparams_file, sep=",")
-        exclude = ["Ang", "Sup", "IPS0", "IPS1"]
-
-        df = df[~df["nhlabel"].str.contains("|".join(exclude))]
-
-        tract_names = (
-            df["shemi"].astype(str)
-            + "_"
-            + df["nhlabel"].str.replace("-", "_")
-            + "_clean"
+        table = _read_tract_table(
+            str(tractparams_file), tractparams_file.stat().st_mtime_ns
         )
-        console.print(f"Loaded {len(tract_names)} tract names", style="cyan")
-        return tract_names
-
     except Exception as e:
         console.print(f"Error reading tractparams.tsv: {e}", style="red")
         raise
+    return table.copy()
+
+
+def load_tract_params(tractparams_file):
+    """
+    Load tract names from a tract parameter CSV file.
+
+    Parameters
+    ----------
+    tractparams_file : str or path-like
+        Path to the tract parameter CSV file.
+
+    Returns
+    -------
+    pandas.Series
+        Derived tract names that should be present in the output.
+    """
+    tract_names = load_tract_table(tractparams_file)["tract"]
+    console.print(f"Loaded {len(tract_names)} tract names", style="cyan")
+    return tract_names
 
 
 def get_expected_tract_files():
@@ -60,7 +104,91 @@ def get_expected_tract_files():
     ]
 
 
-def check_tract_completeness(subses_outputdir):
+def list_tract_files(subses_outputdir, rtp2_output=None):
+    """
+    Names of the tract files of one session, from a single listing per source.
+
+    Tracts are looked up in ``tracts/`` and in ``mrtrix/`` of the RTP output,
+    read from ``RTP_PIPELINE_ALL_OUTPUT/`` or, if it was never extracted,
+    straight from ``RTP_PIPELINE_ALL_OUTPUT.zip``.
+
+    Parameters
+    ----------
+    subses_outputdir : str or path-like
+        Output directory for one subject/session.
+    rtp2_output : RTP2Output, optional
+        Already opened RTP output of the session.
+
+    Returns
+    -------
+    set[str]
+        File names (without directory).
+    """
+    subses_outputdir = Path(subses_outputdir)
+    found = set()
+    try:
+        with os.scandir(subses_outputdir / "tracts") as it:
+            found.update(e.name for e in it if e.is_file())
+    except FileNotFoundError:
+        pass
+    if rtp2_output is None:
+        rtp2_output = RTP2Output(subses_outputdir)
+    found.update(rtp2_output.files("mrtrix"))
+    return found
+
+
+def scan_session(subses_outputdir):
+    """
+    Everything tract QC needs from one session, from one listing per source.
+
+    Parameters
+    ----------
+    subses_outputdir : str or path-like
+        Output directory for one subject/session.
+
+    Returns
+    -------
+    tuple[bool, set[str]]
+        Whether ``RTP_PIPELINE_ALL_OUTPUT.csv`` exists (next to the outputs
+        or inside the archive), and the tract file names of
+        :func:`list_tract_files`.
+    """
+    subses_outputdir = Path(subses_outputdir)
+    if not subses_outputdir.is_dir():
+        return False, set()
+    rtp2_output = RTP2Output(subses_outputdir)
+    has_summary = (subses_outputdir / OUTPUT_SUMMARY_CSV).exists() or (
+        rtp2_output.exists(OUTPUT_SUMMARY_CSV)
+    )
+    return has_summary, list_tract_files(subses_outputdir, rtp2_output)
+
+
+def inspect_session_tck(subses_outputdir, fname, rtp2_output=None, inspector=None):
+    """
+    Inspect one ``.tck`` of a session, wherever :func:`list_tract_files` found it.
+
+    ``tracts/`` is tried first, then the RTP output (extracted or zipped).
+
+    Returns
+    -------
+    TckInfo
+        See :mod:`launchcontainers.quality_control.tck_inspect`.
+    """
+    inspector = inspector or get_inspector()
+    subses_outputdir = Path(subses_outputdir)
+    info = inspector.inspect(subses_outputdir / "tracts" / fname)
+    if info.error != "missing":
+        return info
+    rtp2_output = rtp2_output or RTP2Output(subses_outputdir)
+    relpath = f"mrtrix/{fname}"
+    if rtp2_output.has_dir:
+        return inspector.inspect(Path(rtp2_output.dir_path) / relpath)
+    if rtp2_output.has_zip and rtp2_output.index.is_file(relpath):
+        return inspector.inspect_member(rtp2_output.index, relpath)
+    return info
+
+
+def check_tract_completeness(subses_outputdir, inspect_tck=False, min_streamlines=0):
     """
     Check whether each expected tract has all required output files.
 
@@ -68,6 +196,11 @@ def check_tract_completeness(subses_outputdir):
     ----------
     subses_outputdir : str or path-like
         Output directory for one subject/session.
+    inspect_tck : bool, default=False
+        Also require every ``.tck`` to be valid (not empty or truncated,
+        see :mod:`launchcontainers.quality_control.tck_inspect`).
+    min_streamlines : int, default=0
+        With *inspect_tck*, minimum number of streamlines of a valid tract.
 
     Returns
     -------
@@ -76,24 +209,15 @@ def check_tract_completeness(subses_outputdir):
     """
     subses_outputdir = Path(subses_outputdir)
 
-    tractparams_file = (
-        subses_outputdir
-        / ".."
-        / ".."
-        / ".."
-        / "tractparams_votc-ifg-ipl_280tract_hemi-both.csv"
-    )
+    tractparams_file = subses_outputdir / ".." / ".." / ".." / TRACTPARAMS_NAME
     tract_names = load_tract_params(tractparams_file)
 
-    output_summary_csv = subses_outputdir / "RTP_PIPELINE_ALL_OUTPUT.csv"
-
-    if not output_summary_csv.exists():
-        return [], tract_names.copy(), {}
-
-    if not subses_outputdir.exists():
+    has_summary, tract_files = scan_session(subses_outputdir)
+    if not has_summary:
         return [], tract_names.copy(), {}
 
     expected_suffixes = get_expected_tract_files()
+    rtp2_output = RTP2Output(subses_outputdir) if inspect_tck else None
     complete_tracts = []
     missing_tracts = []
     tract_status = {}
@@ -102,10 +226,9 @@ def check_tract_completeness(subses_outputdir):
         found_suffixes = []
         missing_suffixes = []
 
-        # this is for checking in the folder
+        # this is for checking in the folder (or the zip)
         for suffix in expected_suffixes:
-            file_path_tracts = subses_outputdir / "tracts" / f"{tract_name}{suffix}"
-            if file_path_tracts.exists():  # or file_path_rtp.exists():
+            if f"{tract_name}{suffix}" in tract_files:
                 found_suffixes.append(suffix)
             else:
                 missing_suffixes.append(suffix)
@@ -119,13 +242,29 @@ def check_tract_completeness(subses_outputdir):
         #     else:
         #         missing_suffixes.append(suffix)
 
-        tract_status[tract_name] = {
+        status = {
             "found": found_suffixes,
             "missing": missing_suffixes,
             "complete": len(found_suffixes) == len(expected_suffixes),
         }
 
-        if len(found_suffixes) == len(expected_suffixes):
+        # a .tck that exists can still be empty, truncated or too sparse
+        if inspect_tck and ".tck" in found_suffixes:
+            info = inspect_session_tck(
+                subses_outputdir, f"{tract_name}.tck", rtp2_output
+            )
+            status["streamlines"] = info.streamlines if info.valid else None
+            if not info.valid:
+                status["invalid"] = f".tck: {info.error}"
+            elif info.streamlines < min_streamlines:
+                status["invalid"] = (
+                    f".tck: {info.streamlines} streamlines < {min_streamlines}"
+                )
+            status["complete"] = status["complete"] and "invalid" not in status
+
+        tract_status[tract_name] = status
+
+        if status["complete"]:
             complete_tracts.append(tract_name)
         else:
             missing_tracts.append(tract_name)
@@ -133,6 +272,248 @@ def check_tract_completeness(subses_outputdir):
     return complete_tracts, missing_tracts, tract_status
 
 
+@dataclass
+class TractQCMatrix:
+    """
+    Tract completeness of a cohort: sessions x tracts x file types.
+
+    Attributes
+    ----------
+    found : pandas.DataFrame
+        Boolean, one row per session (index ``sub``, ``ses``) and one column
+        per (``tract``, ``filetype``): whether ``<tract><filetype>`` exists.
+    tracts : pandas.DataFrame
+        The tract table of :func:`load_tract_table`, indexed by ``tract``.
+    has_output : pandas.Series
+        Whether the session has ``RTP_PIPELINE_ALL_OUTPUT.csv``; sessions
+        without it count as incomplete, as in
+        :func:`check_tract_completeness`.
+    streamlines : pandas.DataFrame, optional
+        Sessions x tracts streamline counts of the valid ``.tck`` files (NaN
+        otherwise), when the matrix was built with ``inspect_tck``; the
+        ``found`` frame then also has a ``tck_valid`` file type.
+    """
+
+    found: pd.DataFrame
+    tracts: pd.DataFrame
+    has_output: pd.Series
+    streamlines: pd.DataFrame | None = None
+
+    @property
+    def filetypes(self):
+        return list(self.found.columns.unique("filetype"))
+
+    def complete(self):
+        """Boolean sessions x tracts: every file type present (and output done)."""
+        n_types = len(self.filetypes)
+        values = self.found.to_numpy().reshape(len(self.found), -1, n_types)
+        done = values.all(axis=2) & self.has_output.to_numpy()[:, None]
+        return pd.DataFrame(
+            done,
+            index=self.found.index,
+            columns=pd.Index(self.found.columns.unique("tract"), name="tract"),
+        )
+
+    def session_summary(self):
+        """Per session: output present, number and fraction of complete tracts."""
+        complete = self.complete()
+        return pd.DataFrame(
+            {
+                "has_output": self.has_output,
+                "n_complete": complete.sum(axis=1),
+                "n_missing": (~complete).sum(axis=1),
+                "frac_complete": complete.mean(axis=1),
+            }
+        )
+
+    def tract_summary(self):
+        """Per tract: hemisphere, label, number and fraction of complete sessions."""
+        complete = self.complete()
+        summary = self.tracts.copy()
+        summary["n_complete"] = complete.sum(axis=0)
+        summary["n_missing"] = (~complete).sum(axis=0)
+        summary["frac_complete"] = complete.mean(axis=0)
+        if self.streamlines is not None:
+            summary["median_streamlines"] = self.streamlines.median(axis=0)
+        # each file type on its own, e.g. tracks there but no _fa_bin
+        for ftype in self.filetypes:
+            summary[f"frac_{ftype.lstrip('_.')}"] = self.found.xs(
+                ftype, axis=1, level="filetype"
+            ).mean(axis=0)
+        return summary
+
+    def missing(self):
+        """``{(sub, ses): [tract, ...]}`` for the sessions with incomplete tracts."""
+        complete = self.complete()
+        tracts = complete.columns.to_numpy()
+        return {
+            key: tracts[~row].tolist()
+            for key, row in zip(complete.index, complete.to_numpy())
+            if not row.all()
+        }
+
+    def to_long(self):
+        """
+        Tidy table, one row per session x tract x file type.
+
+        Columns ``sub``, ``ses``, ``tract``, ``hemi``, ``label``, ``filetype``,
+        ``found`` and ``has_output``: filter it by any of them, e.g.
+        ``df[df.hemi == "L"]`` or ``df.query("sub == '05'")``.
+        """
+        # row-major like DataFrame.stack, without its pandas-version quirks
+        n_rows, n_cols = self.found.shape
+        rows = self.found.index.to_frame(index=False)
+        cols = self.found.columns.to_frame(index=False)
+        long = pd.concat(
+            [
+                rows.iloc[np.repeat(np.arange(n_rows), n_cols)].reset_index(drop=True),
+                cols.iloc[np.tile(np.arange(n_cols), n_rows)].reset_index(drop=True),
+            ],
+            axis=1,
+        )
+        long["found"] = self.found.to_numpy().ravel()
+        long = long.join(self.tracts[["hemi", "label"]], on="tract")
+        long["has_output"] = self.has_output.reindex(
+            pd.MultiIndex.from_frame(long[["sub", "ses"]])
+        ).to_numpy()
+        return long[
+            ["sub", "ses", "tract", "hemi", "label", "filetype", "found", "has_output"]
+        ]
+
+    def export(self, path):
+        """
+        Write :meth:`to_long` to ``.csv`` or ``.parquet`` (needs pyarrow or fastparquet).
+        """
+        path = Path(path)
+        long = self.to_long()
+        if path.suffix == ".parquet":
+            long.to_parquet(path, index=False)
+        elif path.suffix == ".csv":
+            long.to_csv(path, index=False)
+        else:
+            raise ValueError(f"Export to .csv or .parquet, got {path.name}")
+        console.print(
+            f"Wrote {len(long)} rows ({len(self.found)} sessions) to {path}",
+            style="cyan",
+        )
+        return path
+
+
+def tract_completeness_matrix(
+    analysis_dir,
+    sessions,
+    tractparams_file=None,
+    n_workers=16,
+    inspect_tck=False,
+    min_streamlines=0,
+    tck_cache=None,
+):
+    """
+    Build the :class:`TractQCMatrix` of many sessions.
+
+    The tractparams are parsed once and every session is listed once (its
+    ``tracts/`` folder and the RTP output, extracted or zipped), in worker
+    threads; the rest is array work on the names.  With *inspect_tck* the
+    ``.tck`` files found are also inspected, in the same threads.
+
+    Parameters
+    ----------
+    analysis_dir : str or path-like
+        Analysis directory holding ``sub-*/ses-*/output``.
+    sessions : list[tuple[str, str]]
+        ``(sub, ses)`` pairs, without prefixes.
+    tractparams_file : str or path-like, optional
+        Defaults to the tractparams CSV of the analysis directory.
+    n_workers : int, default=16
+        Sessions listed in parallel.
+    inspect_tck : bool, default=False
+        Add the ``tck_valid`` file type and the streamline counts.
+    min_streamlines : int, default=0
+        With *inspect_tck*, minimum streamlines for ``tck_valid``.
+    tck_cache : str or path-like, optional
+        JSON cache of the ``.tck`` inspections (see
+        :class:`~launchcontainers.quality_control.tck_inspect.TckInspector`),
+        updated at the end: unchanged files are not read again.
+
+    Returns
+    -------
+    TractQCMatrix
+    """
+    analysis_dir = Path(analysis_dir)
+    if tractparams_file is None:
+        tractparams_file = analysis_dir / TRACTPARAMS_NAME
+    tracts = load_tract_table(tractparams_file).drop_duplicates("tract")
+    suffixes = get_expected_tract_files()
+
+    expected = (
+        tracts["tract"].to_numpy()[:, None] + np.array(suffixes)[None, :]
+    ).ravel()
+
+    tract_names = tracts["tract"].to_numpy()
+    inspector = None
+    if inspect_tck:
+        inspector = TckInspector(tck_cache) if tck_cache else get_inspector()
+
+    def _scan(subses):
+        sub, ses = subses
+        outputdir = analysis_dir / f"sub-{sub}" / f"ses-{ses}" / "output"
+        has_output, files = scan_session(outputdir)
+        counts = np.full(len(tract_names), np.nan)
+        if inspector is not None and files:
+            rtp2_output = RTP2Output(outputdir)
+            for k, tract in enumerate(tract_names):
+                if f"{tract}.tck" in files:
+                    info = inspect_session_tck(
+                        outputdir, f"{tract}.tck", rtp2_output, inspector
+                    )
+                    if info.valid:
+                        counts[k] = info.streamlines
+        return has_output, files, counts
+
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        scans = list(executor.map(_scan, sessions))
+
+    # column of every expected file name: each listed name is one dict lookup
+    column = {name: k for k, name in enumerate(expected)}
+    found = np.zeros((len(sessions), expected.size), dtype=bool)
+    for i, (_, files, _) in enumerate(scans):
+        cols = [column[f] for f in files if f in column]
+        found[i, cols] = True
+
+    index = pd.MultiIndex.from_tuples(sessions, names=["sub", "ses"])
+    streamlines = None
+    if inspector is not None:
+        counts = np.stack([c for _, _, c in scans]) if scans else np.empty((0, 0))
+        counts = counts.reshape(len(sessions), len(tract_names))
+        # NaN (missing or invalid) compares False
+        tck_valid = counts >= max(min_streamlines, 0)
+        found = np.concatenate(
+            [
+                found.reshape(len(sessions), len(tract_names), len(suffixes)),
+                tck_valid[:, :, None],
+            ],
+            axis=2,
+        ).reshape(len(sessions), -1)
+        suffixes = suffixes + [TCK_VALID]
+        streamlines = pd.DataFrame(
+            counts, index=index, columns=pd.Index(tract_names, name="tract")
+        )
+        if tck_cache:
+            inspector.save()
+
+    columns = pd.MultiIndex.from_product(
+        [tracts["tract"], suffixes], names=["tract", "filetype"]
+    )
+    return TractQCMatrix(
+        found=pd.DataFrame(found, index=index, columns=columns),
+        tracts=tracts.set_index("tract"),
+        has_output=pd.Series(
+            [has for has, _, _ in scans], index=index, name="has_output"
+        ),
+        streamlines=streamlines,
+    )
+
+
 def find_subseslist(analysis_dir):
     """
     Locate ``subseslist.txt`` somewhere under an analysis directory.
@@ -183,7 +564,14 @@ def check_and_tract_dir(subses_outputdir):
         console.print("output.zip doesn't exist, not finishing", style="cyan")
 
 
-def check_all_sub(analysis_dir):
+def check_all_sub(
+    analysis_dir,
+    export_path=None,
+    n_workers=16,
+    inspect_tck=False,
+    min_streamlines=0,
+    tck_cache=None,
+):
     """
     Print missing tract summaries for all runnable DWI sessions.
 
@@ -191,21 +579,36 @@ def check_all_sub(analysis_dir):
     ----------
     analysis_dir : str or path-like
         Analysis directory containing ``subseslist.txt`` and output folders.
+    export_path : str or path-like, optional
+        Also write the session x tract x file type table to this ``.csv`` or
+        ``.parquet`` file.
+    n_workers : int, default=16
+        Sessions listed in parallel.
+    inspect_tck, min_streamlines, tck_cache
+        Also check that the ``.tck`` files are valid and dense enough; see
+        :func:`tract_completeness_matrix`.
+
+    Returns
+    -------
+    TractQCMatrix
     """
 
     path_to_subses = find_subseslist(analysis_dir)
     df_subSes = pd.read_csv(path_to_subses, sep=",", dtype=str)
-    for row in df_subSes.itertuples(index=True, name="Pandas"):
-        sub = row.sub
-        ses = row.ses
-        RUN = row.RUN
-        dwi = row.dwi
-        if RUN == "True" and dwi == "True":
-            subses_outputdir = os.path.join(
-                analysis_dir, f"sub-{sub}", f"ses-{ses}", "output"
-            )
-            complete_tracts, missing_tracts, tract_status = check_tract_completeness(
-                subses_outputdir
-            )
-            if not len(missing_tracts) == 0:
-                print(f"sub-{sub}_ses-{ses} have missing tracts {missing_tracts}")
+    df_subSes = df_subSes[(df_subSes.RUN == "True") & (df_subSes.dwi == "True")]
+    sessions = list(zip(df_subSes["sub"], df_subSes["ses"]))
+
+    qc = tract_completeness_matrix(
+        analysis_dir,
+        sessions,
+        n_workers=n_workers,
+        inspect_tck=inspect_tck,
+        min_streamlines=min_streamlines,
+        tck_cache=tck_cache,
+    )
+    for (sub, ses), missing_tracts in qc.missing().items():
+        print(f"sub-{sub}_ses-{ses} have missing tracts {missing_tracts}")
+
+    if export_path is not None:
+        qc.export(export_path)
+    return qc
@@ -2,13 +2,14 @@ from __future__ import annotations
 
 import os
 import shutil
-import zipfile
 from concurrent.futures import as_completed
 from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import pandas as pd
 from launchcontainers.log_setup import console
+from launchcontainers.quality_control.zip_extract import extract_zip
+from launchcontainers.quality_control.zipfs import RTP2Output
 
 
 def find_subseslist(analysis_dir):
@@ -44,17 +45,30 @@ def flatten_directory(directory):
         subdir.rmdir()
 
 
-def unzip_subses_output(subses_outputdir: Path, force):
+def unzip_subses_output(
+    subses_outputdir: Path, force, patterns=None, n_threads=8, dry_run=False
+):
     """
     Ensure that one session output has an extracted RTP output directory.
 
+    Members are written straight to their flattened path and only the missing
+    or changed ones are extracted (see :func:`zip_extract.extract_zip`).
+
     Parameters
     ----------
     subses_outputdir : pathlib.Path
         Output directory for one subject/session.
     force : bool
-        If ``True``, re-extract the archive even when an output directory
-        already exists.
+        If ``True``, check every member against the archive (CRC-32) even
+        when an output directory already exists, and remove files that are
+        not in the archive.
+    patterns : list of str, optional
+        Only extract members matching these glob patterns, e.g.
+        ``["mrtrix/*", "*_clean*"]``.
+    n_threads : int, default=8
+        Worker threads for archives with many members.
+    dry_run : bool, default=False
+        Only report what would be extracted.
 
     Returns
     -------
@@ -85,44 +99,30 @@ def unzip_subses_output(subses_outputdir: Path, force):
         )
         return has_tract_dir, has_tract_zip, True, ""
 
-    elif not has_tract_dir and has_tract_zip or force:
+    elif has_tract_zip:
         try:
             console.print(f"Unzipping {tract_zip}", style="cyan")
-            if tract_dir.exists():
-                shutil.rmtree(tract_dir)
-            with zipfile.ZipFile(tract_zip, "r") as zip_ref:
-                tract_dir.mkdir(parents=True, exist_ok=True)
-                zip_ref.extractall(tract_dir)
-                flatten_directory(tract_dir)
-
+            result = extract_zip(
+                tract_zip,
+                tract_dir,
+                patterns=patterns,
+                verify_crc=force,
+                prune=force,
+                n_threads=n_threads,
+                dry_run=dry_run,
+            )
             unzip_success = True
-            has_tract_dir = True
+            has_tract_dir = not dry_run or has_tract_dir
             console.print(
-                "Successfully unzipped RTP_PIPELINE_ALL_OUTPUT.zip", style="cyan"
+                f"{'Would unzip' if dry_run else 'Unzipped'} "
+                f"RTP_PIPELINE_ALL_OUTPUT.zip: {result}",
+                style="cyan",
             )
 
         except Exception as e:
             warning_msg = f"Failed to unzip RTP_PIPELINE_ALL_OUTPUT.zip: {e}"
             console.print(warning_msg, style="red")
 
-    elif has_tract_dir and has_tract_zip and force:
-        try:
-            # first remove the dir that are there
-            shutil.rmtree(tract_dir)
-            console.print(f"Unzipping {tract_zip}", style="cyan")
-            with zipfile.ZipFile(tract_zip, "r") as zip_ref:
-                tract_dir.mkdir(parents=True, exist_ok=True)
-                zip_ref.extractall(tract_dir)
-                flatten_directory(tract_dir)
-
-            unzip_success = True
-            has_tract_dir = True
-            console.print("Successfully unzipped tract.zip", style="cyan")
-
-        except Exception as e:
-            warning_msg = f"Failed to unzip tract.zip: {e}"
-            console.print(warning_msg, style="red")
-
     else:
         warning_msg = "Missing files (no tract/ or tract.zip)"
         console.print(warning_msg, style="yellow")
@@ -137,6 +137,10 @@ def check_subses_output(subses_outputdir):
     """
     Check whether one session output is ready for tract inspection.
 
+    A session whose ``RTP_PIPELINE_ALL_OUTPUT.zip`` holds ``mrtrix/`` files
+    is ready without extraction: QC reads it through
+    :class:`zipfs.RTP2Output`.
+
     Parameters
     ----------
     subses_outputdir : str or path-like
@@ -145,52 +149,52 @@ def check_subses_output(subses_outputdir):
     Returns
     -------
     tuple[bool, bool, bool, str]
-        Presence of the extracted directory, presence of the zip archive,
-        whether additional extraction is required, and an optional warning.
+        Whether the RTP output is readable (extracted or from the zip),
+        presence of the zip archive, whether the session is ready, and an
+        optional warning.
     """
-    subses_outputdir = Path(subses_outputdir)
-    tract_dir = subses_outputdir / "RTP_PIPELINE_ALL_OUTPUT"
-    tract_zip = subses_outputdir / "RTP_PIPELINE_ALL_OUTPUT.zip"
-
-    has_tract_dir = (
-        tract_dir.exists()
-        and tract_dir.is_dir()
-        and (len(os.listdir(tract_dir)) != 0 and (os.path.exists(tract_dir / "mrtrix")))
-    )
-    has_tract_zip = tract_zip.exists() and tract_zip.is_file()
-    unzip_success = False
+    rtp_output = RTP2Output(subses_outputdir)
+    has_tract_zip = rtp_output.has_zip
     warning_msg = ""
 
-    if has_tract_dir and has_tract_zip:
-        if len(os.listdir(tract_dir / "mrtrix")) != 0:
+    if rtp_output.has_dir and rtp_output.exists("mrtrix"):
+        if rtp_output.listdir("mrtrix"):
             console.print(
-                "Both RTP_PIPELINE_ALL_OUTPUT/ "
-                + "and RTP_PIPELINE_ALL_OUTPUT.zip exist, skipping",
-                style="cyan",
-            )
-            return has_tract_dir, has_tract_zip, True, ""
-        else:
-            console.print("has RTP_PIPELINE_ALL_OUTPUT but not complete", style="cyan")
-            return (
-                False,
-                has_tract_zip,
-                False,
-                "has RTP_PIPELINE_ALL_OUTPUT but not complete",
+                "RTP_PIPELINE_ALL_OUTPUT/ is extracted, skipping", style="cyan"
             )
-
-    elif not has_tract_dir and has_tract_zip:
-        console.print(f"need to unzip {tract_zip}", style="cyan")
-        unzip_success = False
-        has_tract_dir = True
-
-    else:
-        warning_msg = (
-            f"Missing files: has_tract_dir {has_tract_dir},"
-            + f"and has_tract_zip: {has_tract_zip} "
+            return True, has_tract_zip, True, ""
+        console.print("has RTP_PIPELINE_ALL_OUTPUT but not complete", style="cyan")
+        return (
+            False,
+            has_tract_zip,
+            False,
+            "has RTP_PIPELINE_ALL_OUTPUT but not complete",
         )
+
+    if has_tract_zip:
+        try:
+            index = rtp_output.index
+            n_mrtrix = len(index.listdir("mrtrix")) if index.is_dir("mrtrix") else 0
+        except Exception as e:
+            warning_msg = f"Cannot read {rtp_output.zip_path}: {e}"
+            console.print(warning_msg, style="red")
+            return False, has_tract_zip, False, warning_msg
+        if n_mrtrix:
+            console.print(
+                f"RTP_PIPELINE_ALL_OUTPUT.zip readable ({n_mrtrix} mrtrix files), "
+                "no extraction needed",
+                style="cyan",
+            )
+            return True, has_tract_zip, True, ""
+        warning_msg = "RTP_PIPELINE_ALL_OUTPUT.zip has no mrtrix/ files"
         console.print(warning_msg, style="yellow")
+        return False, has_tract_zip, False, warning_msg
 
-    return has_tract_dir, has_tract_zip, unzip_success, warning_msg
+    warning_msg = (
+        "Missing files: no RTP_PIPELINE_ALL_OUTPUT/ or RTP_PIPELINE_ALL_OUTPUT.zip"
+    )
+    console.print(warning_msg, style="yellow")
+    return False, has_tract_zip, False, warning_msg
 
 
 """
@@ -202,7 +206,9 @@ Parallel processing the unzipping
 """
 
 
-def process_single_subject(analysis_dir, sub, ses, run, dwi, force):
+def process_single_subject(
+    analysis_dir, sub, ses, run, dwi, force, patterns=None, n_threads=1
+):
     """
     Unzip tract outputs for one subject/session if the row should run.
     """
@@ -216,7 +222,9 @@ def process_single_subject(analysis_dir, sub, ses, run, dwi, force):
             )
 
             # Call your unzip_subses_output function
-            result = unzip_subses_output(subses_outputdir, force)
+            result = unzip_subses_output(
+                subses_outputdir, force, patterns=patterns, n_threads=n_threads
+            )
 
             console.print(f"Processed sub-{sub}_ses-{ses}: Success", style="cyan")
             return {
@@ -248,7 +256,7 @@ def process_single_subject(analysis_dir, sub, ses, run, dwi, force):
         }
 
 
-def unzipping_tracts_parallel(analysis_dir, force, n_workers=65):
+def unzipping_tracts_parallel(analysis_dir, force, n_workers=65, patterns=None):
     """
     Unzip all runnable tract archives in parallel.
 
@@ -259,7 +267,9 @@ def unzipping_tracts_parallel(analysis_dir, force, n_workers=65):
     force : bool
         If ``True``, re-extract existing output directories.
     n_workers : int, default=65
-        Maximum number of worker threads.
+        Maximum number of worker threads (one session each).
+    patterns : list of str, optional
+        Only extract members matching these glob patterns.
 
     Returns
     -------
@@ -285,9 +295,10 @@ def unzipping_tracts_parallel(analysis_dir, force, n_workers=65):
 
     # Prepare tasks
     tasks = []
-    force = False
     for row in df_subSes.itertuples(index=False, name="Pandas"):
-        tasks.append((analysis_dir, row.sub, row.ses, row.RUN, row.dwi, force))
+        tasks.append(
+            (analysis_dir, row.sub, row.ses, row.RUN, row.dwi, force, patterns)
+        )
 
     # Execute in parallel
     results = []
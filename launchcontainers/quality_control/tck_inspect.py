@@ -0,0 +1,407 @@
+# """
+# MIT License
+# Copyright (c) 2020-2025 Garikoitz Lerma-Usabiaga
+# Copyright (c) 2020-2022 Mengxing Liu
+# Copyright (c) 2022-2023 Leandro Lecca
+# Copyright (c) 2022-2025 Yongning Lei
+# Copyright (c) 2023 David Linhardt
+# Copyright (c) 2023 Iñigo Tellaetxe
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit persons to
+# whom the Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+# """
+"""
+Fast validity and streamline-count checks of MRtrix ``.tck`` files.
+
+A ``.tck`` file is a text header::
+
+    mrtrix tracks
+    datatype: Float32LE
+    count: 1234
+    file: . 512
+    END
+
+followed, from the ``file`` offset, by (x, y, z) triplets: each streamline
+ends with a NaN triplet and the file with an Inf triplet.  MRtrix writes the
+sentinel and the final ``count`` when it closes the file, so a crashed or
+truncated run leaves a file that exists but is not valid.
+
+:func:`inspect_tck` parses the header, maps the data section with
+:mod:`mmap` (no copy into memory) and checks that it is a whole number of
+triplets ending with the sentinel; optionally it also counts the NaN
+delimiters and compares them with the header ``count``.  Results are cached
+per file by size and mtime, in memory and, with :class:`TckInspector`, in a
+JSON file, so re-checking a cohort only costs one ``stat`` per unchanged
+file.  Members of ``RTP_PIPELINE_ALL_OUTPUT.zip`` are streamed instead of
+mapped (:meth:`TckInspector.inspect_member`).
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import os.path as op
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+
+import numpy as np
+
+TCK_MAGIC = b"mrtrix tracks"
+TCK_DTYPES = {
+    "Float32LE": "<f4",
+    "Float32BE": ">f4",
+    "Float64LE": "<f8",
+    "Float64BE": ">f8",
+    "Float32": "<f4",
+    "Float64": "<f8",
+}
+
+# the header is a few kB; give up on files without END in the first MB
+_MAX_HEADER = 1 << 20
+# triplets checked per block, bounds the temporary isnan arrays
+_BLOCK = 1 << 22
+
+
+@dataclass
+class TckInfo:
+    """
+    Result of inspecting one ``.tck`` file.
+
+    ``count`` is the header count; ``n_streamlines`` and ``n_points`` are
+    only filled when the data section was scanned.  ``error`` says why a file
+    is not ``valid``.
+    """
+
+    path: str
+    size: int
+    mtime_ns: int
+    valid: bool
+    error: str = ""
+    datatype: str | None = None
+    count: int | None = None
+    n_streamlines: int | None = None
+    n_points: int | None = None
+
+    @property
+    def streamlines(self) -> int:
+        """Streamline count, scanned if available, else from the header."""
+        if self.n_streamlines is not None:
+            return self.n_streamlines
+        return self.count or 0
+
+
+def parse_tck_header(raw: bytes) -> tuple[dict[str, str], int]:
+    """
+    Parse the header at the start of *raw*.
+
+    Returns
+    -------
+    tuple[dict[str, str], int]
+        Header fields (the last value of repeated keys) and the data offset.
+
+    Raises
+    ------
+    ValueError
+        If *raw* does not start with a complete ``.tck`` header.
+    """
+    if not raw.startswith(TCK_MAGIC):
+        raise ValueError("not a tck file (bad magic)")
+    end = raw.find(b"\nEND\n")
+    if end < 0:
+        raise ValueError("header has no END line")
+    fields = {}
+    for line in raw[:end].decode("latin-1").splitlines()[1:]:
+        key, sep, value = line.partition(":")
+        if sep:
+            fields[key.strip()] = value.strip()
+    try:
+        offset = int(fields["file"].split()[1])
+    except (KeyError, IndexError, ValueError):
+        raise ValueError(f"bad 'file' field: {fields.get('file')!r}") from None
+    return fields, offset
+
+
+class _DataScan:
+    """Running checks over the data section, fed block by block of triplets."""
+
+    def __init__(self, count_streamlines: bool):
+        self.count_streamlines = count_streamlines
+        self.n_triplets = 0
+        self.n_delimiters = 0
+        self.last = None
+        self.before_last = None
+
+    def feed(self, triplets: np.ndarray) -> None:
+        if not len(triplets):
+            return
+        if self.count_streamlines:
+            self.n_delimiters += int(np.count_nonzero(np.isnan(triplets[:, 0])))
+        self.before_last = np.array(triplets[-2]) if len(triplets) > 1 else self.last
+        self.last = np.array(triplets[-1])
+        self.n_triplets += len(triplets)
+
+    def finish(self, info: TckInfo) -> TckInfo:
+        if self.last is None or not np.isinf(self.last).all():
+            info.valid, info.error = False, "no end-of-file sentinel (truncated)"
+            return info
+        if self.before_last is not None and not np.isnan(self.before_last).all():
+            info.valid, info.error = False, "last streamline not terminated"
+            return info
+        if self.count_streamlines:
+            info.n_streamlines = self.n_delimiters
+            # every triplet but the delimiters and the sentinel is a point
+            info.n_points = self.n_triplets - self.n_delimiters - 1
+            if info.count is not None and info.count != info.n_streamlines:
+                info.valid = False
+                info.error = (
+                    f"header count {info.count} != "
+                    f"{info.n_streamlines} streamlines in data"
+                )
+                return info
+        info.valid = True
+        return info
+
+
+def _start(path, size, mtime_ns, raw) -> tuple[TckInfo, np.dtype | None, int]:
+    """Header checks shared by files and zip members."""
+    info = TckInfo(path=path, size=size, mtime_ns=mtime_ns, valid=False)
+    if not raw:
+        info.error = "empty file"
+        return info, None, 0
+    try:
+        fields, offset = parse_tck_header(raw)
+    except ValueError as e:
+        info.error = str(e)
+        return info, None, 0
+    info.datatype = fields.get("datatype")
+    if info.datatype not in TCK_DTYPES:
+        info.error = f"unsupported datatype {info.datatype!r}"
+        return info, None, 0
+    try:
+        info.count = int(fields["count"])
+    except (KeyError, ValueError):
+        info.count = None
+    return info, np.dtype(TCK_DTYPES[info.datatype]), offset
+
+
+def inspect_tck_file(
+    path: str | os.PathLike, count_streamlines: bool = True, st=None
+) -> TckInfo:
+    """
+    Inspect one ``.tck`` file on disk (uncached, see :func:`inspect_tck`).
+
+    Parameters
+    ----------
+    path : path-like
+        The file.
+    count_streamlines : bool, default=True
+        Scan the whole data section for NaN delimiters and compare with the
+        header count.  Without it only the header, the data size and the
+        sentinel are checked, which reads a few pages whatever the file size.
+    st : os.stat_result, optional
+        Already taken ``stat`` of *path*.
+    """
+    path = os.fspath(path)
+    st = st or os.stat(path)
+    with open(path, "rb") as fh:
+        raw = fh.read(min(st.st_size, 65536))
+        while b"\nEND\n" not in raw and len(raw) < min(st.st_size, _MAX_HEADER):
+            raw += fh.read(65536)
+        info, dtype, offset = _start(path, st.st_size, st.st_mtime_ns, raw)
+        if dtype is None:
+            return info
+
+        triplet = 3 * dtype.itemsize
+        n_bytes = st.st_size - offset
+        if n_bytes < triplet:
+            info.error = "empty data section (truncated)"
+            return info
+        if n_bytes % triplet:
+            info.error = f"data section is not whole triplets ({n_bytes} bytes)"
+            return info
+
+        scan = _DataScan(count_streamlines)
+        n_triplets = n_bytes // triplet
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            data = np.frombuffer(mm, dtype=dtype, count=3 * n_triplets, offset=offset)
+            data = data.reshape(-1, 3)
+            try:
+                if count_streamlines:
+                    for lo in range(0, n_triplets, _BLOCK):
+                        scan.feed(data[lo : lo + _BLOCK])
+                else:
+                    scan.feed(data[-2:])
+            finally:
+                # the mmap cannot close while numpy still views it
+                del data
+    return scan.finish(info)
+
+
+def inspect_tck_stream(
+    fh, name: str, size: int, mtime_ns: int, count_streamlines: bool = True
+) -> TckInfo:
+    """Inspect a ``.tck`` read from a binary stream (e.g. a zip member)."""
+    raw = b""
+    while b"\nEND\n" not in raw and len(raw) < _MAX_HEADER:
+        chunk = fh.read(65536)
+        if not chunk:
+            break
+        raw += chunk
+    info, dtype, offset = _start(name, size, mtime_ns, raw)
+    if dtype is None:
+        return info
+
+    triplet = 3 * dtype.itemsize
+    n_bytes = size - offset
+    if n_bytes < triplet:
+        info.error = "empty data section (truncated)"
+        return info
+    if n_bytes % triplet:
+        info.error = f"data section is not whole triplets ({n_bytes} bytes)"
+        return info
+
+    # the stream cannot seek: every block is read, only counting is optional
+    scan = _DataScan(count_streamlines)
+    if len(raw) < offset:
+        fh.read(offset - len(raw))
+    pending = raw[offset:]
+    block_bytes = _BLOCK // 4 * triplet
+    while True:
+        chunk = fh.read(block_bytes)
+        pending += chunk
+        usable = len(pending) - len(pending) % triplet
+        if usable:
+            scan.feed(np.frombuffer(pending[:usable], dtype=dtype).reshape(-1, 3))
+            pending = pending[usable:]
+        if not chunk:
+            break
+    return scan.finish(info)
+
+
+class TckInspector:
+    """
+    :func:`inspect_tck_file` with a cache keyed by path, size and mtime.
+
+    Thread safe; :meth:`inspect_many` spreads files over worker threads.
+
+    Parameters
+    ----------
+    cache_file : str or path-like, optional
+        JSON file to load the cache from and :meth:`save` it to, so later
+        runs only re-read changed files.
+    count_streamlines : bool, default=True
+        See :func:`inspect_tck_file`.
+    """
+
+    def __init__(self, cache_file=None, count_streamlines: bool = True):
+        self.cache_file = os.fspath(cache_file) if cache_file else None
+        self.count_streamlines = count_streamlines
+        self._cache: dict[str, TckInfo] = {}
+        self._lock = threading.Lock()
+        if self.cache_file and op.isfile(self.cache_file):
+            with open(self.cache_file) as fh:
+                for entry in json.load(fh):
+                    self._cache[entry["path"]] = TckInfo(**entry)
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def _cached(self, key: str, size: int, mtime_ns: int) -> TckInfo | None:
+        hit = self._cache.get(key)
+        if hit is None or (hit.size, hit.mtime_ns) != (size, mtime_ns):
+            return None
+        # a header-only result does not answer a counting inspector
+        if self.count_streamlines and hit.valid and hit.n_streamlines is None:
+            return None
+        return hit
+
+    def _store(self, key: str, info: TckInfo) -> TckInfo:
+        with self._lock:
+            self._cache[key] = info
+        return info
+
+    def inspect(self, path) -> TckInfo:
+        """Inspect a file; a missing file is an invalid result, not an error."""
+        path = op.abspath(os.fspath(path))
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return TckInfo(path=path, size=0, mtime_ns=0, valid=False, error="missing")
+        hit = self._cached(path, st.st_size, st.st_mtime_ns)
+        if hit is not None:
+            return hit
+        try:
+            info = inspect_tck_file(path, self.count_streamlines, st)
+        except OSError as e:
+            info = TckInfo(path, st.st_size, st.st_mtime_ns, False, str(e))
+        return self._store(path, info)
+
+    def inspect_member(self, index, relpath) -> TckInfo:
+        """
+        Inspect a member of a zip, given its :class:`~zipfs.ZipIndex`.
+
+        Cached by archive size and mtime.
+        """
+        key = f"{index.zip_path}::{relpath}"
+        st = os.stat(index.zip_path)
+        hit = self._cached(key, st.st_size, st.st_mtime_ns)
+        if hit is not None:
+            return hit
+        with index.open(relpath) as fh:
+            info = inspect_tck_stream(
+                fh, key, index.size(relpath), st.st_mtime_ns, self.count_streamlines
+            )
+        # cache against the archive, whose size/mtime decide staleness
+        info.size = st.st_size
+        return self._store(key, info)
+
+    def inspect_many(self, paths, n_workers: int = 16) -> list[TckInfo]:
+        """:meth:`inspect` every path, in worker threads; results in input order."""
+        paths = list(paths)
+        if n_workers <= 1 or len(paths) < 2:
+            return [self.inspect(p) for p in paths]
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            return list(executor.map(self.inspect, paths))
+
+    def save(self, cache_file=None) -> None:
+        """Write the cache as JSON (atomically) to *cache_file* or the one given at init."""
+        cache_file = os.fspath(cache_file) if cache_file else self.cache_file
+        if not cache_file:
+            raise ValueError("no cache_file to save to")
+        with self._lock:
+            entries = [asdict(info) for info in self._cache.values()]
+        tmp = f"{cache_file}.part"
+        with open(tmp, "w") as fh:
+            json.dump(entries, fh)
+        os.replace(tmp, cache_file)
+
+
+_DEFAULT_INSPECTORS: dict[bool, TckInspector] = {}
+
+
+def get_inspector(count_streamlines: bool = True) -> TckInspector:
+    """Process-wide, in-memory :class:`TckInspector`."""
+    if count_streamlines not in _DEFAULT_INSPECTORS:
+        _DEFAULT_INSPECTORS[count_streamlines] = TckInspector(
+            count_streamlines=count_streamlines
+        )
+    return _DEFAULT_INSPECTORS[count_streamlines]
+
+
+def inspect_tck(path, count_streamlines: bool = True) -> TckInfo:
+    """
+    Cached inspection of one ``.tck`` file.
+
+    Returns
+    -------
+    TckInfo
+        ``valid`` is False for missing, empty, truncated or inconsistent
+        files, with the reason in ``error``.
+    """
+    return get_inspector(count_streamlines).inspect(path)
@@ -0,0 +1,329 @@
+# """
+# MIT License
+# Copyright (c) 2020-2025 Garikoitz Lerma-Usabiaga
+# Copyright (c) 2020-2022 Mengxing Liu
+# Copyright (c) 2022-2023 Leandro Lecca
+# Copyright (c) 2022-2025 Yongning Lei
+# Copyright (c) 2023 David Linhardt
+# Copyright (c) 2023 Iñigo Tellaetxe
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit persons to
+# whom the Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+# """
+"""
+In-process synchronisation of tract outputs between session layouts.
+
+RTP2 leaves the same tract files in up to three places of
+``sub-*/ses-*/output`` (see :data:`TRACT_LAYOUTS`).  Keeping them in line
+with ``rsync -avzP`` costs one subprocess per session and compresses and
+rewrites every byte of what is, in the end, a local copy.  :func:`sync_tree`
+instead
+
+- lists source and destination once each (``os.scandir``) and treats a file
+  as current when its size and mtime (to the second, as rsync does) match,
+  or when both names are already the same inode;
+- transfers a file as a reflink (copy-on-write clone) or, failing that, a
+  hardlink when both trees share a filesystem, so no data is written, and
+  falls back to copies, in worker threads, otherwise;
+- writes every file under a temporary name and renames it into place;
+- with ``dry_run``, only returns the plan, whose :meth:`SyncResult.manifest`
+  lists what would change.
+"""
+
+from __future__ import annotations
+
+import errno
+import fnmatch
+import os
+import os.path as op
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+# relative to ``sub-*/ses-*/output``
+TRACT_LAYOUTS = {
+    "rtp": "RTP/mrtrix",
+    "tracts": "tracts",
+    "all_output": "RTP_PIPELINE_ALL_OUTPUT/mrtrix",
+}
+
+SYNC_MODES = ("auto", "clone", "reflink", "hardlink", "copy")
+
+# below this many copies, threads cost more than they save
+MIN_FILES_FOR_THREADS = 8
+
+# linux/fs.h FICLONE = _IOW(0x94, 9, int)
+_FICLONE = 0x40049409
+# errors meaning "this filesystem pair cannot do that", not "this file failed"
+_UNSUPPORTED = {errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.EPERM}
+
+
+@dataclass
+class SyncAction:
+    """
+    One file to transfer.
+
+    *method* is ``reflink``, ``hardlink`` or ``copy``, the one that worked
+    after the sync.  When planned it is the method that will be used or, if
+    that is only decided by trying (``auto``/``clone`` on one filesystem),
+    the mode name.
+    """
+
+    relpath: str
+    method: str
+    size: int
+    reason: str  # "new" or "changed"
+
+
+@dataclass
+class SyncResult:
+    """What :func:`sync_tree` did (or, with ``dry_run``, would do)."""
+
+    src_dir: str
+    dst_dir: str
+    actions: list[SyncAction] = field(default_factory=list)
+    unchanged: int = 0
+    removed: list[str] = field(default_factory=list)
+    dry_run: bool = False
+
+    @property
+    def bytes_written(self) -> int:
+        """Bytes actually written, i.e. by copies; links write no data."""
+        return sum(a.size for a in self.actions if a.method == "copy")
+
+    def manifest(self) -> list[str]:
+        """One line per change, ``<method> <reason> <size> <relpath>``."""
+        lines = [
+            f"{a.method:<8} {a.reason:<7} {a.size:>12} {a.relpath}"
+            for a in self.actions
+        ]
+        lines += [f"{'delete':<8} {'extra':<7} {'':>12} {r}" for r in self.removed]
+        return lines
+
+    def __str__(self) -> str:
+        counts = {}
+        for a in self.actions:
+            counts[a.method] = counts.get(a.method, 0) + 1
+        done = (
+            ", ".join(f"{n} {m}" for m, n in sorted(counts.items())) or "0 transferred"
+        )
+        prefix = "would do: " if self.dry_run else ""
+        return (
+            f"{prefix}{done} ({self.bytes_written / 1e6:.1f} MB copied), "
+            f"{self.unchanged} unchanged, {len(self.removed)} removed"
+        )
+
+
+def scan_tree(
+    root: str | os.PathLike, patterns: list[str] | None = None
+) -> dict[str, os.stat_result]:
+    """
+    ``{relpath: stat}`` of the files under *root*, from one ``scandir`` pass.
+
+    *patterns* are matched with :mod:`fnmatch` against the relative path.
+    A missing *root* is an empty tree.
+    """
+    root = os.fspath(root)
+    out: dict[str, os.stat_result] = {}
+    stack = [""]
+    while stack:
+        reldir = stack.pop()
+        try:
+            it = os.scandir(op.join(root, reldir))
+        except FileNotFoundError:
+            continue
+        with it:
+            for entry in it:
+                relpath = f"{reldir}/{entry.name}" if reldir else entry.name
+                if entry.is_dir():
+                    stack.append(relpath)
+                elif entry.is_file() and not entry.name.endswith(".part"):
+                    if patterns and not any(
+                        fnmatch.fnmatchcase(relpath, p) for p in patterns
+                    ):
+                        continue
+                    out[relpath] = entry.stat()
+    return out
+
+
+def is_current(src: os.stat_result, dst: os.stat_result) -> bool:
+    """Same inode, or same size and mtime to the second."""
+    if (src.st_dev, src.st_ino) == (dst.st_dev, dst.st_ino):
+        return True
+    return src.st_size == dst.st_size and int(src.st_mtime) == int(dst.st_mtime)
+
+
+def _device(path: str) -> int | None:
+    """``st_dev`` of *path* or of its closest existing parent."""
+    while True:
+        try:
+            return os.stat(path).st_dev
+        except FileNotFoundError:
+            parent = op.dirname(path)
+            if parent == path:
+                return None
+            path = parent
+
+
+def _reflink(src: str, dst: str) -> None:
+    import fcntl
+
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+    shutil.copystat(src, dst)
+
+
+def _transfer(src: str, dst: str, method: str) -> None:
+    tmp = op.join(op.dirname(dst), f".{op.basename(dst)}.part")
+    if op.lexists(tmp):
+        os.remove(tmp)
+    try:
+        if method == "reflink":
+            _reflink(src, tmp)
+        elif method == "hardlink":
+            os.link(src, tmp)
+        else:
+            shutil.copy2(src, tmp)
+        os.replace(tmp, dst)
+    except BaseException:
+        if op.lexists(tmp):
+            os.remove(tmp)
+        raise
+
+
+class _Transfer:
+    """Transfers with *mode*, downgrading once a method proves unsupported."""
+
+    def __init__(self, mode: str, same_fs: bool):
+        if mode not in SYNC_MODES:
+            raise ValueError(f"mode must be one of {SYNC_MODES}, got {mode!r}")
+        if mode == "auto":
+            self.methods = ["reflink", "hardlink", "copy"] if same_fs else ["copy"]
+        elif mode == "clone":
+            self.methods = ["reflink", "copy"] if same_fs else ["copy"]
+        else:
+            self.methods = [mode]
+        self.mode = mode
+        self._lock = threading.Lock()
+
+    @property
+    def planned(self) -> str:
+        """The method files will get, or the mode while that needs a try."""
+        return self.methods[0] if len(self.methods) == 1 else self.mode
+
+    def __call__(self, src: str, dst: str) -> str:
+        while True:
+            method = self.methods[0]
+            try:
+                _transfer(src, dst, method)
+                return method
+            except OSError as e:
+                if len(self.methods) == 1 or e.errno not in _UNSUPPORTED:
+                    raise
+                # not supported here: no point trying it for the other files
+                with self._lock:
+                    if self.methods[0] == method:
+                        self.methods.pop(0)
+
+
+def sync_tree(
+    src_dir: str | os.PathLike,
+    dst_dir: str | os.PathLike,
+    patterns: list[str] | None = None,
+    mode: str = "auto",
+    delete: bool = False,
+    n_threads: int = 8,
+    dry_run: bool = False,
+) -> SyncResult:
+    """
+    Make *dst_dir* hold the files of *src_dir* (``rsync -a src/ dst/``).
+
+    Parameters
+    ----------
+    src_dir, dst_dir : path-like
+        Source and destination trees; *dst_dir* is created if needed.
+    patterns : list of str, optional
+        Only sync files whose relative path matches one of these globs.
+    mode : {"auto", "clone", "reflink", "hardlink", "copy"}, default="auto"
+        How to transfer files.  ``auto`` tries reflink, then hardlink when
+        both trees are on one filesystem, and copies otherwise.  Hardlinked
+        files share their inode with the source: a tool that rewrites the
+        source in place also changes the destination.  ``clone`` never
+        shares inodes (reflink, else copy), for destinations that will be
+        written to.
+    delete : bool, default=False
+        Remove destination files (matching *patterns*) missing from the
+        source, like ``rsync --delete``.
+    n_threads : int, default=8
+        Worker threads for copies.
+    dry_run : bool, default=False
+        Only plan; see :meth:`SyncResult.manifest`.
+
+    Returns
+    -------
+    SyncResult
+    """
+    src_dir = op.abspath(os.fspath(src_dir))
+    dst_dir = op.abspath(os.fspath(dst_dir))
+    result = SyncResult(src_dir, dst_dir, dry_run=dry_run)
+
+    src_files = scan_tree(src_dir, patterns)
+    dst_files = scan_tree(dst_dir, patterns)
+    same_fs = _device(src_dir) == _device(dst_dir)
+    transfer = _Transfer(mode, same_fs)
+
+    for relpath, st in sorted(src_files.items()):
+        dst_st = dst_files.get(relpath)
+        if dst_st is not None and is_current(st, dst_st):
+            result.unchanged += 1
+            continue
+        reason = "new" if dst_st is None else "changed"
+        result.actions.append(SyncAction(relpath, transfer.planned, st.st_size, reason))
+
+    if delete:
+        result.removed = sorted(set(dst_files) - set(src_files))
+
+    if dry_run:
+        return result
+
+    for relpath in result.removed:
+        os.remove(op.join(dst_dir, relpath))
+    for parent in sorted({op.dirname(a.relpath) for a in result.actions}):
+        os.makedirs(op.join(dst_dir, parent), exist_ok=True)
+
+    def _work(action: SyncAction) -> None:
+        action.method = transfer(
+            op.join(src_dir, action.relpath), op.join(dst_dir, action.relpath)
+        )
+
+    if n_threads <= 1 or len(result.actions) < MIN_FILES_FOR_THREADS:
+        for action in result.actions:
+            _work(action)
+    else:
+        with ThreadPoolExecutor(max_workers=n_threads) as executor:
+            # list() re-raises the first failure
+            list(executor.map(_work, result.actions))
+    return result
+
+
+def sync_session(
+    subses_outputdir: str | os.PathLike,
+    src: str = "rtp",
+    dst: str = "tracts",
+    **kwargs,
+) -> SyncResult:
+    """
+    :func:`sync_tree` between two :data:`TRACT_LAYOUTS` of one session.
+
+    *src* and *dst* are layout names (``rtp``, ``tracts``, ``all_output``);
+    other keyword arguments are passed to :func:`sync_tree`.
+    """
+    base = os.fspath(subses_outputdir)
+    return sync_tree(
+        op.join(base, TRACT_LAYOUTS[src]), op.join(base, TRACT_LAYOUTS[dst]), **kwargs
+    )
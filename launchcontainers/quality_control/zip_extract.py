@@ -0,0 +1,292 @@
+# """
+# MIT License
+# Copyright (c) 2020-2025 Garikoitz Lerma-Usabiaga
+# Copyright (c) 2020-2022 Mengxing Liu
+# Copyright (c) 2022-2023 Leandro Lecca
+# Copyright (c) 2022-2025 Yongning Lei
+# Copyright (c) 2023 David Linhardt
+# Copyright (c) 2023 Iñigo Tellaetxe
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit persons to
+# whom the Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+# """
+"""
+Incremental, selective extraction of container output archives.
+
+``extractall`` followed by :func:`flatten_directory` writes every member once
+and then renames it again, and a forced re-extraction first removes the whole
+tree.  :func:`extract_zip` instead
+
+- strips the single top-level directory of the archive on the fly, so every
+  member is written straight to its final path;
+- skips members whose file is already there with the same size and the
+  archive's timestamp (extracted files get it), or, when the timestamp
+  differs, the same CRC-32;
+- can be limited to members matching glob patterns on the stripped path,
+  e.g. ``mrtrix/*`` or ``*_clean*``;
+- writes each member to a temporary name and renames it, so an interrupted
+  run never leaves a truncated file that looks current;
+- spreads large archives over worker threads, each with its own handle on
+  the zip.
+"""
+
+from __future__ import annotations
+
+import fnmatch
+import os
+import os.path as op
+import shutil
+import threading
+import time
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+# below this many members, threads cost more than they save
+MIN_MEMBERS_FOR_THREADS = 64
+_CHUNK = 1 << 20
+
+
+@dataclass
+class ExtractResult:
+    """What :func:`extract_zip` did (or, with ``dry_run``, would do)."""
+
+    extracted: list[str] = field(default_factory=list)
+    unchanged: int = 0
+    removed: list[str] = field(default_factory=list)
+    bytes_written: int = 0
+
+    def __str__(self) -> str:
+        return (
+            f"{len(self.extracted)} extracted ({self.bytes_written / 1e6:.1f} MB), "
+            f"{self.unchanged} unchanged, {len(self.removed)} removed"
+        )
+
+
+def archive_root(names: list[str]) -> str | None:
+    """
+    Return the single top-level directory shared by all members, if any.
+
+    This is the directory :func:`flatten_directory` used to remove after
+    extraction (``RTP_PIPELINE_ALL_OUTPUT.zip`` holds one ``<name>/`` root).
+    """
+    roots = {n.split("/", 1)[0] for n in names if n}
+    if len(roots) != 1:
+        return None
+    root = roots.pop()
+    # a lone top-level *file* is not a root to strip
+    if all("/" in n for n in names if n):
+        return root
+    return None
+
+
+def _member_path(name: str, root: str | None) -> str | None:
+    """Relative destination path of a member, or ``None`` for the root itself."""
+    if root is not None:
+        name = name[len(root) + 1 :]
+    name = name.replace("\\", "/")
+    parts = [p for p in name.split("/") if p not in ("", ".")]
+    if not parts:
+        return None
+    if ".." in parts or op.isabs(name):
+        raise ValueError(f"unsafe member path in archive: {name!r}")
+    return "/".join(parts)
+
+
+def select_members(
+    zf: zipfile.ZipFile,
+    patterns: list[str] | None = None,
+    strip_root: bool = True,
+) -> list[tuple[zipfile.ZipInfo, str]]:
+    """
+    Return ``(info, relpath)`` for the files of *zf* to extract.
+
+    *relpath* is the member path with the archive root stripped (when
+    *strip_root*); *patterns* are matched against it with :mod:`fnmatch`.
+    """
+    infos = zf.infolist()
+    root = archive_root([i.filename for i in infos]) if strip_root else None
+    selected = []
+    for info in infos:
+        if info.is_dir():
+            continue
+        relpath = _member_path(info.filename, root)
+        if relpath is None:
+            continue
+        if patterns and not any(fnmatch.fnmatchcase(relpath, p) for p in patterns):
+            continue
+        selected.append((info, relpath))
+    return selected
+
+
+def _zip_mtime(info: zipfile.ZipInfo) -> float:
+    return time.mktime(info.date_time + (0, 0, -1))
+
+
+def _file_crc32(path: str) -> int:
+    crc = 0
+    with open(path, "rb") as fh:
+        while chunk := fh.read(_CHUNK):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+def member_is_current(
+    info: zipfile.ZipInfo, path: str, verify_crc: bool = False, dry_run: bool = False
+) -> bool:
+    """
+    True if *path* already holds the content of *info*.
+
+    Same size and the archive timestamp is enough unless *verify_crc*; a file
+    with the same size but another timestamp (e.g. from an earlier
+    ``extractall``) is compared by CRC-32 and, if equal, gets the archive
+    timestamp so the next check is a plain ``stat`` (not with *dry_run*).
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return False
+    if st.st_size != info.file_size:
+        return False
+    mtime = _zip_mtime(info)
+    if int(st.st_mtime) == int(mtime) and not verify_crc:
+        return True
+    if _file_crc32(path) != info.CRC:
+        return False
+    if not dry_run:
+        os.utime(path, (mtime, mtime))
+    return True
+
+
+def _extract_member(zf: zipfile.ZipFile, info: zipfile.ZipInfo, path: str) -> int:
+    tmp = op.join(op.dirname(path), f".{op.basename(path)}.part")
+    with zf.open(info) as src, open(tmp, "wb") as dst:
+        shutil.copyfileobj(src, dst, _CHUNK)
+    mode = (info.external_attr >> 16) & 0o777
+    if mode:
+        os.chmod(tmp, mode)
+    mtime = _zip_mtime(info)
+    os.utime(tmp, (mtime, mtime))
+    os.replace(tmp, path)
+    return info.file_size
+
+
+def _prune(
+    dest_dir: str, keep: set[str], patterns: list[str] | None, dry_run: bool = False
+) -> list[str]:
+    """Remove files under *dest_dir* that are not in *keep* (and match *patterns*)."""
+    removed = []
+    for dirpath, _, filenames in os.walk(dest_dir):
+        for fname in filenames:
+            path = op.join(dirpath, fname)
+            relpath = op.relpath(path, dest_dir).replace(os.sep, "/")
+            if relpath in keep:
+                continue
+            if patterns and not any(fnmatch.fnmatchcase(relpath, p) for p in patterns):
+                continue
+            if not dry_run:
+                os.remove(path)
+            removed.append(relpath)
+    return removed
+
+
+def extract_zip(
+    zip_path: str | os.PathLike,
+    dest_dir: str | os.PathLike,
+    patterns: list[str] | None = None,
+    strip_root: bool = True,
+    verify_crc: bool = False,
+    prune: bool = False,
+    n_threads: int = 8,
+    dry_run: bool = False,
+) -> ExtractResult:
+    """
+    Extract the missing or changed members of *zip_path* into *dest_dir*.
+
+    Parameters
+    ----------
+    zip_path : path-like
+        Archive to extract.
+    dest_dir : path-like
+        Destination; created if needed.
+    patterns : list of str, optional
+        Only extract members whose (root-stripped) path matches one of these
+        glob patterns.
+    strip_root : bool, default=True
+        Drop the single top-level directory of the archive, as
+        :func:`flatten_directory` did after ``extractall``.
+    verify_crc : bool, default=False
+        Compare the CRC-32 of every existing file, not only size and time.
+    prune : bool, default=False
+        Remove files in *dest_dir* that are not in the archive (restricted to
+        *patterns* when given).  This replaces removing the tree before a
+        forced re-extraction.
+    n_threads : int, default=8
+        Worker threads for archives with many members.
+    dry_run : bool, default=False
+        Only report what would be extracted or removed.
+
+    Returns
+    -------
+    ExtractResult
+    """
+    zip_path = os.fspath(zip_path)
+    dest_dir = os.fspath(dest_dir)
+    result = ExtractResult()
+
+    with zipfile.ZipFile(zip_path) as zf:
+        members = select_members(zf, patterns, strip_root)
+
+    todo = []
+    for info, relpath in members:
+        path = op.join(dest_dir, relpath)
+        if member_is_current(info, path, verify_crc, dry_run):
+            result.unchanged += 1
+        else:
+            todo.append((info, path))
+            result.extracted.append(relpath)
+            result.bytes_written += info.file_size
+
+    if prune and op.isdir(dest_dir):
+        keep = {relpath for _, relpath in members}
+        result.removed = _prune(dest_dir, keep, patterns, dry_run)
+
+    if dry_run or not todo:
+        return result
+
+    for parent in sorted({op.dirname(path) for _, path in todo}):
+        os.makedirs(parent, exist_ok=True)
+
+    if n_threads <= 1 or len(todo) < MIN_MEMBERS_FOR_THREADS:
+        with zipfile.ZipFile(zip_path) as zf:
+            for info, path in todo:
+                _extract_member(zf, info, path)
+        return result
+
+    # one ZipFile per thread: decompression then runs in parallel instead of
+    # serialising on a shared file handle
+    local = threading.local()
+    handles = []
+    lock = threading.Lock()
+
+    def _work(item):
+        zf = getattr(local, "zf", None)
+        if zf is None:
+            zf = local.zf = zipfile.ZipFile(zip_path)
+            with lock:
+                handles.append(zf)
+        return _extract_member(zf, *item)
+
+    try:
+        with ThreadPoolExecutor(max_workers=n_threads) as executor:
+            # list() re-raises the first failure
+            list(executor.map(_work, todo))
+    finally:
+        for zf in handles:
+            zf.close()
+    return result
@@ -0,0 +1,348 @@
+# """
+# MIT License
+# Copyright (c) 2020-2025 Garikoitz Lerma-Usabiaga
+# Copyright (c) 2020-2022 Mengxing Liu
+# Copyright (c) 2022-2023 Leandro Lecca
+# Copyright (c) 2022-2025 Yongning Lei
+# Copyright (c) 2023 David Linhardt
+# Copyright (c) 2023 Iñigo Tellaetxe
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit persons to
+# whom the Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+# """
+"""
+Read-only, zip-backed access to container outputs.
+
+QC only needs to know which output files exist and to read a few of them,
+which the central directory of ``RTP_PIPELINE_ALL_OUTPUT.zip`` answers without
+extracting anything:
+
+    out = RTP2Output(subses_outputdir)
+    out.exists("mrtrix/L_Arcuate_clean.tck")
+    out.listdir("mrtrix")
+    out.read_text("RTP_PIPELINE_ALL_OUTPUT.csv")
+
+:class:`ZipIndex` is the listing of one archive (root directory stripped,
+like :func:`zip_extract.extract_zip` does): member names, sizes and CRCs.
+:func:`zip_index` caches it per process, keyed by the archive's path, size
+and mtime, so a rewritten zip is re-read and an unchanged one never is.
+Behind that, a :class:`ZipIndexStore` keeps the central directories on disk
+(``~/.launchcontainers/zip_index/`` by default), so later processes — the
+next prepare, run or QC pass — do not parse an unchanged archive again.
+:class:`RTP2Output` serves paths from the extracted
+``RTP_PIPELINE_ALL_OUTPUT/`` when there is one and from the zip otherwise.
+"""
+
+from __future__ import annotations
+
+import fnmatch
+import hashlib
+import io
+import json
+import os
+import os.path as op
+import posixpath
+import threading
+import zipfile
+from functools import lru_cache
+
+from launchcontainers.quality_control.zip_extract import archive_root
+
+RTP2_OUTPUT_NAME = "RTP_PIPELINE_ALL_OUTPUT"
+ZIP_INDEX_DIR = op.join(op.expanduser("~"), ".launchcontainers", "zip_index")
+
+
+class ZipIndex:
+    """
+    Member listing of one zip, from its central directory.
+
+    Parameters
+    ----------
+    zip_path : str or path-like
+        The archive.
+    strip_root : bool, default=True
+        Address members relative to the single top-level directory of the
+        archive, if it has one.
+    members : list[tuple[str, int, int]], optional
+        ``(name, size, crc)`` of every member, as returned by
+        :meth:`members`; the archive is not opened when given.
+    """
+
+    def __init__(self, zip_path, strip_root: bool = True, members=None):
+        self.zip_path = os.fspath(zip_path)
+        if members is None:
+            with zipfile.ZipFile(self.zip_path) as zf:
+                infos = zf.infolist()
+        else:
+            infos = [_member_info(*m) for m in members]
+        self._members = [(i.filename, i.file_size, i.CRC) for i in infos]
+        self.root = archive_root([i.filename for i in infos]) if strip_root else None
+        prefix = f"{self.root}/" if self.root else ""
+        self._infos: dict[str, zipfile.ZipInfo] = {}
+        self._children: dict[str, set[str]] = {"": set()}
+        for info in infos:
+            relpath = info.filename[len(prefix) :].strip("/")
+            if not relpath:
+                continue
+            if not info.is_dir():
+                self._infos[relpath] = info
+            # register every parent directory, including implicit ones
+            parts = relpath.split("/")
+            for depth in range(len(parts)):
+                parent = "/".join(parts[:depth])
+                self._children.setdefault(parent, set()).add(parts[depth])
+            if info.is_dir():
+                self._children.setdefault(relpath, set())
+
+    def __len__(self) -> int:
+        return len(self._infos)
+
+    def __contains__(self, relpath: str) -> bool:
+        return self.exists(relpath)
+
+    @staticmethod
+    def _norm(relpath) -> str:
+        relpath = posixpath.normpath(os.fspath(relpath).replace(os.sep, "/"))
+        return "" if relpath == "." else relpath.strip("/")
+
+    def names(self) -> list[str]:
+        """Relative paths of all files."""
+        return list(self._infos)
+
+    def members(self) -> list[tuple[str, int, int]]:
+        """``(name, size, crc)`` of every member, names as stored in the archive."""
+        return list(self._members)
+
+    def exists(self, relpath) -> bool:
+        relpath = self._norm(relpath)
+        return relpath in self._infos or relpath in self._children
+
+    def is_file(self, relpath) -> bool:
+        return self._norm(relpath) in self._infos
+
+    def is_dir(self, relpath) -> bool:
+        return self._norm(relpath) in self._children
+
+    def listdir(self, reldir="") -> list[str]:
+        """Entry names directly under *reldir*, like :func:`os.listdir`."""
+        reldir = self._norm(reldir)
+        if reldir not in self._children:
+            raise FileNotFoundError(f"{self.zip_path}: no directory {reldir!r}")
+        return sorted(self._children[reldir])
+
+    def glob(self, pattern: str) -> list[str]:
+        """Relative file paths matching *pattern* (``*`` also matches ``/``)."""
+        return sorted(n for n in self._infos if fnmatch.fnmatchcase(n, pattern))
+
+    def getinfo(self, relpath) -> zipfile.ZipInfo:
+        try:
+            return self._infos[self._norm(relpath)]
+        except KeyError:
+            raise FileNotFoundError(f"{self.zip_path}: no member {relpath!r}") from None
+
+    def size(self, relpath) -> int:
+        return self.getinfo(relpath).file_size
+
+    def crc(self, relpath) -> int:
+        return self.getinfo(relpath).CRC
+
+    def open(self, relpath):
+        """Binary file object of one member; the archive is closed with it."""
+        info = self.getinfo(relpath)
+        # the open member holds its own reference to the archive's file
+        # handle, which is released when the member is closed
+        with zipfile.ZipFile(self.zip_path) as zf:
+            return zf.open(info.filename)
+
+    def read_bytes(self, relpath) -> bytes:
+        with self.open(relpath) as fh:
+            return fh.read()
+
+    def read_text(self, relpath, encoding: str = "utf-8") -> str:
+        return self.read_bytes(relpath).decode(encoding)
+
+
+def _member_info(name: str, size: int, crc: int) -> zipfile.ZipInfo:
+    info = zipfile.ZipInfo(name)
+    info.file_size = size
+    info.CRC = crc
+    return info
+
+
+class ZipIndexStore:
+    """
+    Zip central directories persisted as JSON, one file per archive.
+
+    An entry holds the member names, sizes and CRCs of the archive and is
+    valid while the archive keeps its size and mtime.  Write errors (e.g. a
+    read-only home) are ignored: the index is then just not persisted.
+
+    Parameters
+    ----------
+    cache_dir : str or path-like, optional
+        Defaults to :data:`ZIP_INDEX_DIR`.
+    """
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = os.fspath(cache_dir) if cache_dir else ZIP_INDEX_DIR
+
+    def _entry_path(self, zip_path: str) -> str:
+        key = hashlib.sha1(zip_path.encode()).hexdigest()
+        return op.join(self.cache_dir, f"{key}.json")
+
+    def load(
+        self, zip_path: str, size: int, mtime_ns: int, strip_root: bool = True
+    ) -> ZipIndex:
+        """Index of *zip_path* from the store, or read from the archive and stored."""
+        entry_path = self._entry_path(zip_path)
+        try:
+            with open(entry_path) as fh:
+                entry = json.load(fh)
+            if (entry["zip_path"], entry["size"], entry["mtime_ns"]) == (
+                zip_path,
+                size,
+                mtime_ns,
+            ):
+                return ZipIndex(zip_path, strip_root, members=entry["members"])
+        except (OSError, ValueError, KeyError):
+            pass
+        index = ZipIndex(zip_path, strip_root)
+        entry = {
+            "zip_path": zip_path,
+            "size": size,
+            "mtime_ns": mtime_ns,
+            "members": index.members(),
+        }
+        tmp = f"{entry_path}.{os.getpid()}.{threading.get_ident()}.part"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp, "w") as fh:
+                json.dump(entry, fh)
+            os.replace(tmp, entry_path)
+        except OSError:
+            if op.exists(tmp):
+                os.remove(tmp)
+        return index
+
+
+_default_store: ZipIndexStore | None = ZipIndexStore()
+
+
+def set_default_store(store: ZipIndexStore | None) -> None:
+    """Persist :func:`zip_index` results in *store*; ``None`` keeps them in memory only."""
+    global _default_store
+    _default_store = store
+    _cached_index.cache_clear()
+
+
+@lru_cache(maxsize=512)
+def _cached_index(
+    zip_path: str,
+    size: int,
+    mtime_ns: int,
+    strip_root: bool,
+    store: ZipIndexStore | None,
+) -> ZipIndex:
+    if store is None:
+        return ZipIndex(zip_path, strip_root)
+    return store.load(zip_path, size, mtime_ns, strip_root)
+
+
+def zip_index(zip_path, strip_root: bool = True) -> ZipIndex:
+    """
+    Cached :class:`ZipIndex` of *zip_path*.
+
+    The cache key includes the archive's size and mtime, so rewriting the
+    zip invalidates its entry.  A miss in this process is served from the
+    default :class:`ZipIndexStore` before the archive is parsed.
+    """
+    zip_path = op.abspath(os.fspath(zip_path))
+    st = os.stat(zip_path)
+    return _cached_index(
+        zip_path, st.st_size, st.st_mtime_ns, strip_root, _default_store
+    )
+
+
+class RTP2Output:
+    """
+    ``RTP_PIPELINE_ALL_OUTPUT`` of one session, extracted or not.
+
+    Paths are relative to the content of the archive (``mrtrix/...``,
+    ``RTP_PIPELINE_ALL_OUTPUT.csv``...).  They are served from the extracted
+    directory when it holds files, otherwise from the zip next to it.
+
+    Parameters
+    ----------
+    subses_outputdir : str or path-like
+        ``<analysis>/sub-*/ses-*/output``.
+    """
+
+    def __init__(self, subses_outputdir):
+        self.subses_outputdir = os.fspath(subses_outputdir)
+        self.dir_path = op.join(self.subses_outputdir, RTP2_OUTPUT_NAME)
+        self.zip_path = op.join(self.subses_outputdir, f"{RTP2_OUTPUT_NAME}.zip")
+        self.has_dir = op.isdir(self.dir_path) and bool(os.listdir(self.dir_path))
+        self.has_zip = op.isfile(self.zip_path)
+        self._index = None
+
+    @property
+    def source(self) -> str | None:
+        """``"dir"``, ``"zip"`` or ``None`` when the session has no output."""
+        if self.has_dir:
+            return "dir"
+        if self.has_zip:
+            return "zip"
+        return None
+
+    @property
+    def index(self) -> ZipIndex:
+        if self._index is None:
+            self._index = zip_index(self.zip_path)
+        return self._index
+
+    def _path(self, relpath) -> str:
+        return op.join(self.dir_path, os.fspath(relpath))
+
+    def exists(self, relpath) -> bool:
+        if self.has_dir:
+            return op.exists(self._path(relpath))
+        return self.has_zip and self.index.exists(relpath)
+
+    def listdir(self, reldir="") -> list[str]:
+        if self.has_dir:
+            return sorted(os.listdir(self._path(reldir)))
+        if not self.has_zip:
+            raise FileNotFoundError(f"no {RTP2_OUTPUT_NAME} in {self.subses_outputdir}")
+        return self.index.listdir(reldir)
+
+    def files(self, reldir="") -> set[str]:
+        """Names of the files directly under *reldir*; empty if it does not exist."""
+        if self.has_dir:
+            try:
+                with os.scandir(self._path(reldir)) as it:
+                    return {e.name for e in it if e.is_file()}
+            except FileNotFoundError:
+                return set()
+        if not self.has_zip or not self.index.is_dir(reldir):
+            return set()
+        prefix = ZipIndex._norm(reldir)
+        return {
+            name
+            for name in self.index.listdir(reldir)
+            if self.index.is_file(posixpath.join(prefix, name))
+        }
+
+    def open(self, relpath):
+        if self.has_dir:
+            return open(self._path(relpath), "rb")
+        if not self.has_zip:
+            raise FileNotFoundError(f"no {RTP2_OUTPUT_NAME} in {self.subses_outputdir}")
+        return self.index.open(relpath)
+
+    def read_text(self, relpath, encoding: str = "utf-8") -> str:
+        with self.open(relpath) as fh:
+            return io.TextIOWrapper(fh, encoding=encoding).read()
@@ -18,7 +18,11 @@ Three averages produced per acq label:
   3. desc-avgall     average everything (echoes, dirs, runs)
        sub-{sub}_ses-{ses}_acq-{acq}_desc-avgall_part-mag.nii.gz
 
-All averages use:  fslmaths img1 -add img2 ... -div N output
+All three levels of one acq are computed in a single pass over its echo
+files (launchcontainers.prepare.nii_average): the echoes are streamed slab
+by slab, accumulated in memory and the means written as float32 with a JSON
+sidecar listing the sources.  No FSL needed.  Subjects/acqs run in parallel
+processes; outputs newer than their inputs are skipped unless --force.
 
 Usage:
     python 03_avg_swi_mag.py -s 05 -e swi -d /path/to/BIDS
@@ -28,17 +32,17 @@ Usage:
 
 from __future__ import annotations
 
-import os
 import re
-import subprocess
 from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
 import typer
 from rich.console import Console
 from rich.table import Table
 
+from launchcontainers.prepare.nii_average import is_up_to_date, mean_images
+
 app = typer.Typer(add_completion=False)
 console = Console()
 
@@ -49,57 +53,20 @@ FILE_RE = re.compile(
 
 
 # ---------------------------------------------------------------------------
-# Module loader
-# ---------------------------------------------------------------------------
-
-
-def setup_module(module_name: str) -> None:
-    result = subprocess.run(
-        ["bash", "-lc", f"module load {module_name} 2>&1 && env"],
-        capture_output=True,
-        text=True,
-    )
-    if result.returncode != 0:
-        console.print(
-            f"[yellow]Warning: module load {module_name} failed — "
-            f"assuming it is already in PATH[/yellow]"
-        )
-        return
-    for line in result.stdout.splitlines():
-        if "=" in line:
-            key, _, val = line.partition("=")
-            os.environ[key] = val
-    console.print(f"[dim]module load {module_name}  ✓[/dim]")
-
-
-# ---------------------------------------------------------------------------
-# Core averaging function (one worker per job)
+# Core averaging function (one worker per sub/ses/acq)
 # ---------------------------------------------------------------------------
 
 
-def fslmaths_avg(files: list[Path], out: Path, dry_run: bool) -> tuple[str, bool, str]:
+def average_acq(groups: dict[Path, list[Path]]) -> tuple[bool, str]:
     """
-    fslmaths img1 -add img2 ... -div N out
-    Returns (out.name, success, error_msg).
+    Write every mean of one acq from a single read of its echo files.
+    Returns (success, error_msg).
     """
-    n = len(files)
-    lbl = out.name.removesuffix(".nii.gz")
-
-    if dry_run:
-        return lbl, True, f"{n} files ÷ {n}"
-
-    cmd = ["fslmaths", str(files[0])]
-    for f in files[1:]:
-        cmd += ["-add", str(f)]
-    cmd += ["-div", str(n), str(out)]
-
     try:
-        r = subprocess.run(cmd, capture_output=True, text=True)
-        if r.returncode != 0:
-            return lbl, False, r.stderr.strip()
-        return lbl, True, ""
+        mean_images(groups)
+        return True, ""
     except Exception as e:
-        return lbl, False, str(e)
+        return False, f"{type(e).__name__}: {e}"
 
 
 # ---------------------------------------------------------------------------
@@ -107,13 +74,17 @@ def fslmaths_avg(files: list[Path], out: Path, dry_run: bool) -> tuple[str, bool
 # ---------------------------------------------------------------------------
 
 
-def process_subject(
-    sub: str, ses: str, bids_dir: Path, workers: int, dry_run: bool
-) -> None:
+def collect_jobs(
+    sub: str, ses: str, bids_dir: Path, force: bool
+) -> list[tuple[str, dict[Path, list[Path]]]]:
+    """
+    One job per acq: (label, {output: echo files}) for the three levels.
+    Outputs newer than all their inputs are left out unless force.
+    """
     anat_dir = bids_dir / f"sub-{sub}" / f"ses-{ses}" / "anat"
     if not anat_dir.exists():
         console.print(f"[red]Not found:[/red] {anat_dir}")
-        return
+        return []
 
     # --- Collect echo files (skip existing averages) ---
     echo_files: list[Path] = []
@@ -129,7 +100,7 @@ def process_subject(
 
     if not echo_files:
         console.print(f"[yellow]No part-mag echo files in {anat_dir}[/yellow]")
-        return
+        return []
 
     # --- Build grouping dicts ---
     # key → list of files
@@ -144,70 +115,55 @@ def process_subject(
         g_avgrun[(acq, run)].append(nii)
         g_avgall[(acq,)].append(nii)
 
-    # --- Build job list: (files, out_path, level_label) ---
-    jobs: list[tuple[list[Path], Path, str]] = []
+    # --- Build output list per acq: (files, out_path, level_label) ---
+    outputs: dict[str, list[tuple[list[Path], Path, str]]] = defaultdict(list)
 
     for (acq, dir_, run), files in sorted(g_avgechos.items()):
         out = (
             anat_dir
             / f"sub-{sub}_ses-{ses}_acq-{acq}_dir-{dir_}_{run}_desc-avgechos_part-mag.nii.gz"
         )
-        jobs.append((sorted(files), out, "avgechos"))
+        outputs[acq].append((sorted(files), out, "avgechos"))
 
     for (acq, run), files in sorted(g_avgrun.items()):
         out = (
             anat_dir
             / f"sub-{sub}_ses-{ses}_acq-{acq}_{run}_desc-avgrun_part-mag.nii.gz"
         )
-        jobs.append((sorted(files), out, "avgrun"))
+        outputs[acq].append((sorted(files), out, "avgrun"))
 
     for (acq,), files in sorted(g_avgall.items()):
         out = anat_dir / f"sub-{sub}_ses-{ses}_acq-{acq}_desc-avgall_part-mag.nii.gz"
-        jobs.append((sorted(files), out, "avgall"))
+        outputs[acq].append((sorted(files), out, "avgall"))
 
     # --- Preview table ---
-    console.rule(f"sub-{sub}  ses-{ses}  ({len(jobs)} jobs)")
+    n_out = sum(len(v) for v in outputs.values())
+    console.rule(f"sub-{sub}  ses-{ses}  ({n_out} outputs)")
 
     tbl = Table(show_lines=False, box=None)
     tbl.add_column("level", style="cyan", width=10)
     tbl.add_column("n files", justify="right", width=8)
     tbl.add_column("output")
-
-    for files, out, level in jobs:
-        tbl.add_row(level, str(len(files)), out.name)
-
-    console.print(tbl)
-    console.print(f"\nRunning with up to [bold]{workers}[/bold] parallel worker(s)...")
-
-    # --- Run all jobs in parallel ---
-    results: list[tuple[str, bool, str, str]] = []  # (label, ok, msg, level)
-
-    with ThreadPoolExecutor(max_workers=workers) as pool:
-        future_to_level = {
-            pool.submit(fslmaths_avg, files, out, dry_run): level
-            for files, out, level in jobs
-        }
-        for future in as_completed(future_to_level):
-            level = future_to_level[future]
-            lbl, ok, msg = future.result()
-            results.append((lbl, ok, msg, level))
-            tag = (
-                "[dim](dry-run)[/dim]"
-                if dry_run
-                else ("[green]✓[/green]" if ok else "[red]✗[/red]")
-            )
-            console.print(
-                f"  {tag}  [{level}]  {lbl}" + (f"  [red]{msg}[/red]" if not ok else "")
+    tbl.add_column("status")
+
+    jobs = []
+    for acq, items in outputs.items():
+        groups = {}
+        for files, out, level in items:
+            current = not force and is_up_to_date(out, files)
+            tbl.add_row(
+                level,
+                str(len(files)),
+                out.name,
+                "[dim]up to date[/dim]" if current else "",
             )
+            if not current:
+                groups[out] = files
+        if groups:
+            jobs.append((f"sub-{sub}_ses-{ses}_acq-{acq}", groups))
 
-    # --- Summary ---
-    n_ok = sum(1 for _, ok, _, _ in results if ok)
-    n_err = len(results) - n_ok
-    console.print(
-        f"\n[bold]sub-{sub} ses-{ses}:[/bold]  "
-        f"[green]{n_ok} completed[/green]"
-        + (f"  [red]{n_err} failed[/red]" if n_err else "")
-    )
+    console.print(tbl)
+    return jobs
 
 
 # ---------------------------------------------------------------------------
@@ -223,14 +179,15 @@ def main(
         None, "-f", help="Path to subseslist CSV (skip header)"
     ),
     bids_dir: Path = typer.Option(..., "-d", help="BIDS root directory"),
-    workers: int = typer.Option(4, "-w", help="Number of parallel workers"),
+    workers: int = typer.Option(4, "-w", help="Number of parallel worker processes"),
     dry_run: bool = typer.Option(
-        False, "--dry-run", help="Print jobs without running FSL"
+        False, "--dry-run", help="Print jobs without writing anything"
+    ),
+    force: bool = typer.Option(
+        False, "--force", help="Recompute averages that are newer than their inputs"
     ),
 ) -> None:
-    """Average SWI part-mag files at echo / run / all levels using fslmaths in parallel."""
-
-    setup_module("fsl/6.0.3")
+    """Average SWI part-mag files at echo / run / all levels, one read per acq, in parallel."""
 
     pairs: list[tuple[str, str]] = []
 
@@ -246,8 +203,48 @@ def main(
         console.print("[red]Provide -s <sub> -e <ses>  or  -f <subseslist>[/red]")
         raise typer.Exit(1)
 
+    jobs = []
     for s, e in pairs:
-        process_subject(s, e, bids_dir, workers, dry_run)
+        jobs += collect_jobs(s, e, bids_dir, force)
+
+    if not jobs:
+        console.print("\n[green]All averages up to date[/green]")
+        return
+    if dry_run:
+        n_out = sum(len(groups) for _, groups in jobs)
+        console.print(
+            f"\n[dim](dry-run)[/dim] {len(jobs)} jobs, {n_out} averages to write"
+        )
+        return
+
+    console.print(
+        f"\nRunning {len(jobs)} jobs with up to [bold]{workers}[/bold] worker process(es)..."
+    )
+
+    # --- Run all jobs in parallel ---
+    n_ok = n_err = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        future_to_job = {
+            pool.submit(average_acq, groups): (label, groups) for label, groups in jobs
+        }
+        for future in as_completed(future_to_job):
+            label, groups = future_to_job[future]
+            ok, msg = future.result()
+            if ok:
+                n_ok += len(groups)
+            else:
+                n_err += len(groups)
+            tag = "[green]✓[/green]" if ok else "[red]✗[/red]"
+            console.print(
+                f"  {tag}  {label}  ({len(groups)} averages)"
+                + (f"  [red]{msg}[/red]" if not ok else "")
+            )
+
+    # --- Summary ---
+    console.print(
+        f"\n[bold]Done:[/bold]  [green]{n_ok} averages written[/green]"
+        + (f"  [red]{n_err} failed[/red]" if n_err else "")
+    )
 
 
 if __name__ == "__main__":
@@ -52,6 +52,7 @@ import typer
 from rich.console import Console
 from rich.table import Table
 
+from launchcontainers.quality_control.bids_index import BIDSIndex, sidecar_of
 from launchcontainers.utils import parse_subses_list
 
 console = Console()
@@ -99,7 +100,28 @@ def _find_ses_dirs(bidsdir: str, sub: str, ses: str) -> list[str]:
 # ---------------------------------------------------------------------------
 
 
-def _collect_func_and_sbref(bidsdir: str, sub: str, ses: str) -> dict:
+def _collect_from_index(index: BIDSIndex, sub: str, ses: str) -> list[dict]:
+    """Func-dir entries of one session from the content index (sidecars already parsed)."""
+    entries = []
+    for e in index.select(sub=sub, ses=ses, datatype="func"):
+        if not e.json_mtime_ns:
+            continue  # as in the JSON scan, images without sidecar are not listed
+        path = index.path(e)
+        basename = op.basename(sidecar_of(path))
+        entries.append(
+            {
+                "basename": re.sub(r"\.json$", "", basename),
+                "short": _short_name(basename, sub, ses),
+                "json_path": sidecar_of(path),
+                "acq_time": e.acq_time,
+            }
+        )
+    return entries
+
+
+def _collect_func_and_sbref(
+    bidsdir: str, sub: str, ses: str, index: Optional[BIDSIndex] = None
+) -> dict:
     """
     Collect func (bold/magnitude) and sbref files from the single merged
     session directory ses-{ses}.
@@ -107,6 +129,9 @@ def _collect_func_and_sbref(bidsdir: str, sub: str, ses: str) -> dict:
     Assumes 00_merge_split_ses_reording_runs.py has already been run; only the
     primary ses-{ses} directory is read (split parts are ignored here).
 
+    With a content ``index`` (updated for this session) the acquisition times
+    come from it instead of re-reading every JSON sidecar.
+
     Returns:
       funcs    — sorted by acq_sec
       sbrefs   — sorted by acq_sec
@@ -124,38 +149,49 @@ def _collect_func_and_sbref(bidsdir: str, sub: str, ses: str) -> dict:
         ses_label = ses
         func_dir = op.join(ses_dir, "func")
 
-        if op.isdir(func_dir):
+        if index is not None:
+            found = _collect_from_index(index, sub, ses_label)
+        elif op.isdir(func_dir):
+            found = []
             for jf in sorted(
                 glob.glob(op.join(func_dir, f"sub-{sub}_ses-{ses_label}_*.json"))
             ):
                 basename = op.basename(jf)
-                stem = re.sub(r"\.json$", "", basename)
-                short = _short_name(basename, sub, ses_label)
-                nii_path = op.join(func_dir, stem + ".nii.gz")
-
                 acq_time = ""
                 try:
                     with open(jf) as fh:
                         acq_time = json.load(fh).get("AcquisitionTime", "")
                 except Exception:
                     pass
+                found.append(
+                    {
+                        "basename": re.sub(r"\.json$", "", basename),
+                        "short": _short_name(basename, sub, ses_label),
+                        "json_path": jf,
+                        "acq_time": acq_time,
+                    }
+                )
+        else:
+            found = []
+
+        for f in found:
+            short, stem, acq_time = f["short"], f["basename"], f["acq_time"]
+            entry = {
+                "ses_label": ses_label,
+                "name": short,
+                "basename": stem,  # without extension
+                "json_path": f["json_path"],
+                "nii_path": op.join(func_dir, stem + ".nii.gz"),
+                "acq_time": acq_time,
+                "acq_sec": _to_sec(acq_time),
+                "func_dir": func_dir,
+            }
 
-                entry = {
-                    "ses_label": ses_label,
-                    "name": short,
-                    "basename": stem,  # without extension
-                    "json_path": jf,
-                    "nii_path": nii_path,
-                    "acq_time": acq_time,
-                    "acq_sec": _to_sec(acq_time),
-                    "func_dir": func_dir,
-                }
-
-                if short.endswith("_sbref"):
-                    sbrefs.append(entry)
-                elif short.endswith("_bold") or short.endswith("_magnitude"):
-                    funcs.append(entry)
-                # else: phase, gfactor, etc. — ignore
+            if short.endswith("_sbref"):
+                sbrefs.append(entry)
+            elif short.endswith("_bold") or short.endswith("_magnitude"):
+                funcs.append(entry)
+            # else: phase, gfactor, etc. — ignore
 
     funcs.sort(key=lambda r: r["acq_sec"])
     sbrefs.sort(key=lambda r: r["acq_sec"])
@@ -466,10 +502,11 @@ def _process_session(
     dry_run: bool,
     verbose: bool,
     outdir: Optional[str],
+    index: Optional[BIDSIndex] = None,
 ) -> dict:
     """Run the full drop/rename workflow for one sub/ses.  Returns a result dict."""
 
-    collected = _collect_func_and_sbref(bidsdir, sub, ses)
+    collected = _collect_func_and_sbref(bidsdir, sub, ses, index)
     funcs = collected["funcs"]
     sbrefs = collected["sbrefs"]
 
@@ -568,6 +605,13 @@ def main(
     outdir: Optional[Path] = typer.Option(
         None, "--outdir", "-o", help="Write per-session TSV logs to this directory."
     ),
+    use_index: bool = typer.Option(
+        True,
+        "--index/--no-index",
+        help="Read acquisition times from the BIDS content index "
+        "(<bidsdir>/.bids_content_index.json), updated for the given sessions; "
+        "the index is only saved with --execute.",
+    ),
 ):
     """
     Check sbref ↔ bold/magnitude pairing by AcquisitionTime and drop/rename
@@ -601,6 +645,13 @@ def main(
         f"max-gap={max_gap}s  mode={mode_str}\n"
     )
 
+    index = None
+    if use_index:
+        index = BIDSIndex(bidsdir)
+        # headers and sidecars only; unchanged files cost one stat.  Saved
+        # after the renames/drops below, never on a dry run.
+        index.update(subses=pairs, hash_data=False)
+
     results = []
     for s, e in pairs:
         r = _process_session(
@@ -611,9 +662,15 @@ def main(
             dry_run=dry_run,
             verbose=verbose,
             outdir=str(outdir) if outdir else None,
+            index=index,
         )
         results.append(r)
 
+    if index is not None and not dry_run:
+        # renamed/dropped sbrefs
+        index.update(subses=pairs, hash_data=False)
+        index.save()
+
     console.print()
     _print_summary_table(results)
 
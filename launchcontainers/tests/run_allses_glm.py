@@ -52,7 +52,6 @@ from bids import BIDSLayout
 from nilearn.plotting import plot_design_matrix
 from nilearn.glm.first_level import make_first_level_design_matrix
 from nilearn.glm.first_level.first_level import run_glm as nilearn_run_glm
-from nilearn.glm.contrasts import compute_contrast
 from nilearn.surface import load_surf_data
 from rich import box
 from rich.console import Console
@@ -72,6 +71,9 @@ replace_prefix_and_suffix = _run_glm_mod.replace_prefix_and_suffix
 load_contrasts            = _run_glm_mod.load_contrasts
 _load_rerun_exclusions    = _run_glm_mod._load_rerun_exclusions
 _print_timing_table       = _run_glm_mod._print_timing_table
+glm_inputs                = _run_glm_mod.glm_inputs
+glm_stream                = _run_glm_mod._load_sibling("glm_stream")
+glm_contrasts             = _run_glm_mod._load_sibling("glm_contrasts")
 
 console = Console()
 app = typer.Typer(add_completion=False, pretty_exceptions_show_locals=False)
@@ -99,6 +101,7 @@ def prepare_allses_glm_input(
     apply_label_as_mask: str,
     rerun_excl: dict,
     hemi: str | None = None,
+    run_store=None,
 ):
     """
     Load, z-score, and concatenate functional data across ALL sessions and
@@ -108,6 +111,10 @@ def prepare_allses_glm_input(
     cumulative number of scans seen so far, so MATLAB sees a single continuous
     timeline.
 
+    With *run_store* (a ``glm_stream.RunStore``) each z-scored run is spilled
+    to disk instead of kept in memory, and the store is returned in place of
+    the concatenated matrix.
+
     Returns
     -------
     tuple
@@ -148,8 +155,25 @@ def prepare_allses_glm_input(
 
         console.print(f"\n  [bold]ses-{ses}[/bold]  runs: {run_list}")
 
+        # Events, confounds and TR of all runs of this session in one pass
+        _t = time.time()
+        session_inputs = glm_inputs.load_session_inputs(
+            bids_dir, fmriprep_dir, subject, ses, task, run_list,
+        )
+        t_session_inputs = time.time() - _t
+        console.print(
+            f"  Events/confounds/TR for {len(session_inputs)}/{len(run_list)} runs  "
+            f"[dim](session_inputs: {t_session_inputs:.2f} s)[/dim]"
+        )
+
         for run_num in run_list:
             run_label = f"ses-{ses}_run-{run_num}"
+            if run_num not in session_inputs:
+                console.print(
+                    f"  [yellow]WARNING[/yellow]: no events/confounds/RepetitionTime "
+                    f"for {run_label} — skipping"
+                )
+                continue
             run_step_times[run_label] = {}
 
             # ── Step 1: load functional data ─────────────────────────────────
@@ -207,62 +231,22 @@ def prepare_allses_glm_input(
                 data_std = data_std * mask_arr
 
             n_scans = data_std.shape[1]
-            data_all.append(data_std)
+            if run_store is not None:
+                run_store.add(data_std)
+                del data_std
+            else:
+                data_all.append(data_std)
             run_step_times[run_label]["zscore_mask"] = time.time() - _t
             console.print(
                 f"  Trimmed length: {n_scans}  "
                 f"[dim](load+zscore: {run_step_times[run_label]['load_func'] + run_step_times[run_label]['zscore_mask']:.1f} s)[/dim]"
             )
 
-            # ── Step 3: TR from BOLD sidecar JSON ────────────────────────────
+            # ── Step 3: confounds + frame_times ──────────────────────────────
             _t = time.time()
-            json_files = fp_layout.get(
-                subject=subject, session=ses, task=task, run=run_num,
-                suffix="bold", extension=".json",
-            )
-            if not json_files:
-                console.print(
-                    f"  [yellow]WARNING[/yellow]: no sidecar JSON for {run_label} — skipping"
-                )
-                data_all.pop()
-                continue
-            import json as _json
-            with open(json_files[0].path) as _jf:
-                t_r = float(_json.load(_jf)["RepetitionTime"])
+            t_r, events, confounds = session_inputs[run_num]
             if t_r_global is None:
                 t_r_global = t_r
-            run_step_times[run_label]["read_tr"] = time.time() - _t
-
-            # ── Step 4: events.tsv from BIDS layout ───────────────────────────
-            _t = time.time()
-            ev_files = layout.get(
-                subject=subject, session=ses, task=task, run=run_num,
-                suffix="events", extension=".tsv",
-            )
-            if not ev_files:
-                console.print(
-                    f"  [yellow]WARNING[/yellow]: no events.tsv for {run_label} — skipping"
-                )
-                data_all.pop()
-                continue
-            events = pd.read_csv(ev_files[0].path, sep="\t")
-
-            # ── Step 5: confounds from fMRIprep layout ────────────────────────
-            conf_files = fp_layout.get(
-                subject=subject, session=ses, task=task, run=run_num,
-                desc="confounds", suffix="timeseries", extension=".tsv",
-            )
-            if not conf_files:
-                console.print(
-                    f"  [yellow]WARNING[/yellow]: no confounds TSV for {run_label} — skipping"
-                )
-                data_all.pop()
-                continue
-            confounds = pd.read_csv(conf_files[0].path, sep="\t")
-            run_step_times[run_label]["read_events_confounds"] = time.time() - _t
-
-            # ── Step 6: confounds + frame_times ──────────────────────────────
-            _t = time.time()
 
             # Shift onset times by cumulative scan count
             events = events.copy()
@@ -298,13 +282,13 @@ def prepare_allses_glm_input(
                 f"[dim](confounds: {run_step_times[run_label]['confounds']:.1f} s)[/dim]"
             )
 
-    if not data_all:
+    if not data_all and not run_store:
         raise RuntimeError(
             f"No data collected for sub-{subject} over sessions {sessions}."
         )
 
     # ── Per-run timing summary ────────────────────────────────────────────────
-    step_cols = ["load_func", "zscore_mask", "read_tr", "read_events_confounds", "confounds"]
+    step_cols = ["load_func", "zscore_mask", "confounds"]
     tbl = Table(title="Per-run step timing (s)", box=box.SIMPLE_HEAD)
     tbl.add_column("ses_run")
     for s in step_cols:
@@ -317,7 +301,10 @@ def prepare_allses_glm_input(
 
     # ── Build concatenated design matrix ─────────────────────────────────────
     _t = time.time()
-    conc_data_std      = np.concatenate(data_all, axis=1)
+    if run_store is not None:
+        conc_data_std  = run_store
+    else:
+        conc_data_std  = np.concatenate(data_all, axis=1)
     del data_all        # free individual-run arrays now that concatenation is done
     concat_frame_times = np.concatenate(frame_times_all, axis=0)
     concat_events      = pd.concat(events_all, axis=0)
@@ -368,6 +355,10 @@ def glm_allses(
     Fit the GLM and save contrast maps under
     ``<bids_dir>/derivatives/l1_surface/analysis-<output_name>/sub-<sub>/allses/``.
 
+    *conc_data_std* is either the concatenated (features x time) matrix or a
+    ``glm_stream.RunStore``; the latter is fitted out of core from sufficient
+    statistics, with the same labels/estimates as nilearn's run_glm.
+
     Returns
     -------
     dict[str, float]
@@ -387,16 +378,20 @@ def glm_allses(
     plt.savefig(op.join(outdir, "design_matrix.png"))
     plt.close()
 
-    Y = np.transpose(conc_data_std)
-    del conc_data_std   # Y is a view; free the name so GC can reclaim after GLM
     X = np.asarray(design_matrix_std)
-    labels, estimates = nilearn_run_glm(Y, X, n_jobs=1)
+    if isinstance(conc_data_std, glm_stream.RunStore):
+        labels, estimates = glm_stream.run_glm(conc_data_std, X)
+    else:
+        Y = np.transpose(conc_data_std)
+        del conc_data_std   # Y is a view; free the name so GC can reclaim after GLM
+        labels, estimates = nilearn_run_glm(Y, X, n_jobs=1)
 
     timing: dict[str, float] = {}
 
-    for contrast_id, contrast_val in contrasts.items():
-        t_c = time.time()
-
+    # all contrasts in batched blocks; the time of a block is booked on its
+    # first contrast, so the per-hemi totals stay exact
+    t_c = time.time()
+    for contrast_id, stat_maps in glm_contrasts.iter_contrasts(labels, estimates, contrasts):
         if hemi:
             outname_base = (
                 f"sub-{subject}_ses-{ses_label}_task-{task}"
@@ -413,19 +408,9 @@ def glm_allses(
             outname_base = outname_base.replace("_statmap", f"_desc-smoothed{sm}_statmap")
         outname_base = op.join(outdir, outname_base)
 
-        contrast_obj = compute_contrast(labels, estimates, contrast_val)
-        betas    = contrast_obj.effect_size()
-        t_value  = contrast_obj.stat()
-        z_score  = contrast_obj.z_score()
-        p_value  = contrast_obj.p_value()
-        variance = contrast_obj.effect_variance()
-
         if hemi:
-            save_statmap_to_gifti(betas,    outname_base.replace("stat-X", "stat-effect"))
-            save_statmap_to_gifti(t_value,  outname_base.replace("stat-X", "stat-t"))
-            save_statmap_to_gifti(z_score,  outname_base.replace("stat-X", "stat-z"))
-            save_statmap_to_gifti(p_value,  outname_base.replace("stat-X", "stat-p"))
-            save_statmap_to_gifti(variance, outname_base.replace("stat-X", "stat-variance"))
+            for st in ("effect", "t", "z", "p", "variance"):
+                save_statmap_to_gifti(stat_maps[st], outname_base.replace("stat-X", f"stat-{st}"))
         else:
             console.print(
                 f"  [yellow]WARNING[/yellow]: volumetric output not implemented, "
@@ -433,6 +418,7 @@ def glm_allses(
             )
 
         timing[contrast_id] = time.time() - t_c
+        t_c = time.time()
 
     console.print(f"  [green]GLM done[/green]  (hemi-{hemi if hemi else 'volumetric'})")
     return timing
@@ -520,6 +506,15 @@ def main(
         None, "--rerun-map",
         help="Path to rerun_check.tsv for compensated-run exclusion",
     ),
+    in_memory: bool = typer.Option(
+        False, "--in-memory",
+        help="Concatenate all runs in RAM and fit with nilearn run_glm "
+             "(default: spill runs to disk and fit from sufficient statistics)",
+    ),
+    scratch_dir: Optional[str] = typer.Option(
+        None, "--scratch-dir",
+        help="Where per-run float32 arrays are spilled (default: $TMPDIR)",
+    ),
 ) -> None:
     t0 = time.time()
 
@@ -603,6 +598,7 @@ def main(
     tbl.add_row("Smoothed",    f"Yes (sm={sm})" if use_smoothed else "No")
     tbl.add_row("Mask",        mask or "—")
     tbl.add_row("Rerun map",   rerun_map or "— (no exclusions)")
+    tbl.add_row("GLM engine",  "in-memory (nilearn)" if in_memory else "streaming (sufficient statistics)")
     tbl.add_row("Mode",        "[yellow]DRY-RUN[/yellow]" if dry_run else "[green]EXECUTE[/green]")
     console.print(tbl)
 
@@ -613,55 +609,62 @@ def main(
         label = f"hemi-{hemi}" if hemi else "volumetric"
         console.rule(f"[bold]Processing {label}[/bold]")
 
-        conc_data_std, design_matrix_std, contrasts_dict = prepare_allses_glm_input(
-            bids_dir=bids_dir,
-            fmriprep_dir=fmriprep_dir,
-            fp_layout=fp_layout,
-            layout=layout,
-            label_dir=label_dir,
-            contrast_fpath=contrast,
-            subject=sub,
-            sessions=sessions,
-            task=task,
-            start_scans=start_scans,
-            space=space,
-            slice_time_ref=slice_time_ref,
-            use_smoothed=use_smoothed,
-            sm=sm,
-            apply_label_as_mask=mask,
-            rerun_excl=rerun_excl,
-            hemi=hemi,
-        )
-        console.print(f"  Contrasts: {list(contrasts_dict.keys())}")
+        # per-hemisphere spill directory for the streaming engine
+        run_store = None if in_memory else glm_stream.RunStore(scratch_dir)
+        try:
+            conc_data_std, design_matrix_std, contrasts_dict = prepare_allses_glm_input(
+                bids_dir=bids_dir,
+                fmriprep_dir=fmriprep_dir,
+                fp_layout=fp_layout,
+                layout=layout,
+                label_dir=label_dir,
+                contrast_fpath=contrast,
+                subject=sub,
+                sessions=sessions,
+                task=task,
+                start_scans=start_scans,
+                space=space,
+                slice_time_ref=slice_time_ref,
+                use_smoothed=use_smoothed,
+                sm=sm,
+                apply_label_as_mask=mask,
+                rerun_excl=rerun_excl,
+                hemi=hemi,
+                run_store=run_store,
+            )
+            console.print(f"  Contrasts: {list(contrasts_dict.keys())}")
 
-        if dry_run:
-            console.print(
-                "  [dim]Dry-run — design matrix and confounds printed above, "
-                "nothing written.[/dim]"
+            if dry_run:
+                console.print(
+                    "  [dim]Dry-run — design matrix and confounds printed above, "
+                    "nothing written.[/dim]"
+                )
+                del conc_data_std, design_matrix_std, contrasts_dict
+                gc.collect()
+                timing_per_hemi[label] = {}
+                continue
+
+            timing = glm_allses(
+                conc_data_std=conc_data_std,
+                design_matrix_std=design_matrix_std,
+                contrasts=contrasts_dict,
+                bids_dir=bids_dir,
+                task=task,
+                space=space,
+                subject=sub,
+                sessions=sessions,
+                output_name=output_name,
+                use_smoothed=use_smoothed,
+                sm=sm,
+                hemi=hemi,
             )
+            # Free this hemisphere's data before loading the next one
             del conc_data_std, design_matrix_std, contrasts_dict
-            gc.collect()
-            timing_per_hemi[label] = {}
-            continue
-
-        timing = glm_allses(
-            conc_data_std=conc_data_std,
-            design_matrix_std=design_matrix_std,
-            contrasts=contrasts_dict,
-            bids_dir=bids_dir,
-            task=task,
-            space=space,
-            subject=sub,
-            sessions=sessions,
-            output_name=output_name,
-            use_smoothed=use_smoothed,
-            sm=sm,
-            hemi=hemi,
-        )
-        # Free this hemisphere's data before loading the next one
-        del conc_data_std, design_matrix_std, contrasts_dict
-        gc.collect()   # return freed pages to OS before next hemi loads
-        timing_per_hemi[label] = timing
+            gc.collect()   # return freed pages to OS before next hemi loads
+            timing_per_hemi[label] = timing
+        finally:
+            if run_store is not None:
+                run_store.cleanup()
 
     # ── Summary ───────────────────────────────────────────────────────────────
     total_elapsed = time.time() - t0
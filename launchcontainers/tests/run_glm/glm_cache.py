@@ -0,0 +1,216 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Yongning Lei 2024-2025
+# All rights reserved.
+#
+# This script is distributed under the Apache-2.0 license.
+# You may use, distribute, and modify this code under the terms of the Apache-2.0 license.
+# See the LICENSE file for details.
+#
+# THIS SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE, AND NONINFRINGEMENT.
+#
+# Author: Yongning Lei
+# Email: yl4874@nyu.edu
+# GitHub: https://github.com/yongninglei
+# -----------------------------------------------------------------------------
+"""
+On-disk cache of fitted first-level GLMs.
+
+A fit is keyed by a fingerprint of everything it depends on: the input files
+(path, size, mtime) and the GLM parameters (runs, start_scans,
+slice_time_ref, smoothing, mask, ...).  The contrast file is deliberately not
+part of it, so editing a contrast reuses the fit:
+
+    cache = FitCache(outdir, "hemi-L", fingerprint(files, start_scans=5, ...))
+    if cache.has_fit():
+        labels, results, design_matrix, extra = cache.load_fit()
+    else:
+        labels, results = run_glm(Y, X)
+        cache.save_fit(labels, results, design_matrix)
+    ...
+    if not cache.is_done(contrast_id, vector, outputs):
+        ...compute and write...
+        cache.mark_done(contrast_id, vector)
+
+The fit is stored as the ``theta``, ``cov``, ``dispersion`` and degrees of
+freedom of every AR(1) label, which is all ``compute_contrast`` reads; it is
+reloaded as :class:`glm_stream.SuffStatResults`.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import os.path as op
+
+import numpy as np
+import pandas as pd
+
+# bump when the stored layout or the GLM model (HRF, drift, confounds) changes
+CACHE_VERSION = 1
+
+
+def file_stamp(fpath):
+    """(absolute path, size, mtime_ns) of *fpath*, or the path alone if missing."""
+    fpath = op.abspath(fpath)
+    try:
+        st = os.stat(fpath)
+    except FileNotFoundError:
+        return [fpath, None, None]
+    return [fpath, st.st_size, st.st_mtime_ns]
+
+
+def fingerprint(files, **params):
+    """
+    SHA-256 of the input file stamps and the GLM parameters.
+
+    Parameters
+    ----------
+    files : iterable of str
+        Every input file of the fit (BOLD, events, confounds, sidecars, masks).
+    **params
+        JSON-serialisable parameters of the fit.
+    """
+    payload = {
+        "version": CACHE_VERSION,
+        "files": sorted(file_stamp(f) for f in set(files)),
+        "params": params,
+    }
+    blob = json.dumps(payload, sort_keys=True, default=str).encode()
+    return hashlib.sha256(blob).hexdigest()
+
+
+class FitCache:
+    """
+    Cached fit and computed contrasts of one GLM (one hemisphere / run set).
+
+    Parameters
+    ----------
+    outdir : str
+        Output directory of the GLM; the cache lives in ``outdir/.glm_cache``.
+    name : str
+        Slot name, e.g. ``hemi-L`` or ``volumetric_run-135``.  A slot holds
+        one fit; a new fingerprint replaces it.
+    key : str
+        Fingerprint of the inputs, see :func:`fingerprint`.
+    """
+
+    def __init__(self, outdir, name, key):
+        self.cache_dir = op.join(outdir, ".glm_cache")
+        self.fit_fpath = op.join(self.cache_dir, f"fit_{name}.npz")
+        self.manifest_fpath = op.join(self.cache_dir, f"fit_{name}.json")
+        self.key = key
+        self._manifest = None
+
+    # ── manifest ──────────────────────────────────────────────────────────────
+    def _load_manifest(self):
+        if self._manifest is None:
+            manifest = {}
+            if op.isfile(self.manifest_fpath):
+                with open(self.manifest_fpath) as fh:
+                    manifest = json.load(fh)
+            if manifest.get("key") != self.key:
+                manifest = {"key": self.key, "contrasts": {}}
+            self._manifest = manifest
+        return self._manifest
+
+    def _write_manifest(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = f"{self.manifest_fpath}.tmp"
+        with open(tmp, "w") as fh:
+            json.dump(self._manifest, fh, indent=1)
+        os.replace(tmp, self.manifest_fpath)
+
+    def has_fit(self):
+        return self._load_manifest().get("fit") is not None and op.isfile(
+            self.fit_fpath
+        )
+
+    def is_done(self, contrast_id, vector, outputs):
+        """True if *contrast_id* was written with this *vector* and all *outputs* exist."""
+        done = self._load_manifest()["contrasts"].get(contrast_id)
+        return (
+            done is not None
+            and np.array_equal(np.asarray(done), np.asarray(vector))
+            and all(op.isfile(f) for f in outputs)
+        )
+
+    def mark_done(self, contrast_id, vector):
+        self._load_manifest()["contrasts"][contrast_id] = np.asarray(vector).tolist()
+        self._write_manifest()
+
+    # ── fit ───────────────────────────────────────────────────────────────────
+    def save_fit(self, labels, results, design_matrix, **extra):
+        """
+        Store *labels*, the per-label *results* and the *design_matrix*.
+
+        *extra* arrays (e.g. the in-mask indices) are stored alongside and
+        returned by :meth:`load_fit`.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        label_keys = list(results)
+        arrays = {
+            "labels": np.asarray(labels),
+            "label_keys": np.asarray([str(k) for k in label_keys]),
+            "dm_values": np.asarray(design_matrix, dtype=np.float64),
+            "dm_columns": np.asarray([str(c) for c in design_matrix.columns]),
+            "dm_index": np.asarray(design_matrix.index, dtype=np.float64),
+        }
+        for i, k in enumerate(label_keys):
+            res = results[k]
+            arrays[f"theta_{i}"] = res.theta
+            arrays[f"cov_{i}"] = res.cov
+            arrays[f"dispersion_{i}"] = res.dispersion
+            arrays[f"df_{i}"] = np.array([res.df_total, res.df_model])
+        for k, v in extra.items():
+            arrays[f"extra_{k}"] = np.asarray(v)
+        # write-then-rename so an interrupted run never leaves a half fit
+        tmp = f"{self.fit_fpath}.tmp.npz"
+        np.savez(tmp, **arrays)
+        os.replace(tmp, self.fit_fpath)
+        manifest = self._load_manifest()
+        manifest["fit"] = op.basename(self.fit_fpath)
+        manifest["contrasts"] = {}
+        self._write_manifest()
+
+    def load_design_matrix(self):
+        """The cached design matrix, without reading the fit arrays."""
+        with np.load(self.fit_fpath) as npz:
+            return pd.DataFrame(
+                npz["dm_values"],
+                columns=list(npz["dm_columns"]),
+                index=pd.Index(npz["dm_index"], name="frame_times"),
+            )
+
+    def load_fit(self, results_cls):
+        """
+        Reload ``(labels, results, design_matrix, extra)``.
+
+        *results_cls* rebuilds each label's results from
+        ``(theta, cov, dispersion, df_total, df_model)``.
+        """
+        design_matrix = self.load_design_matrix()
+        with np.load(self.fit_fpath) as npz:
+            labels = npz["labels"]
+            # nilearn keys results by label value: float for OLS, str for AR(1)
+            keys = [
+                k if labels.dtype.kind == "U" else float(k) for k in npz["label_keys"]
+            ]
+            results = {}
+            for i, k in enumerate(keys):
+                df_total, df_model = npz[f"df_{i}"]
+                results[k] = results_cls(
+                    npz[f"theta_{i}"],
+                    npz[f"cov_{i}"],
+                    npz[f"dispersion_{i}"],
+                    int(df_total),
+                    int(df_model),
+                )
+            extra = {
+                name[len("extra_") :]: npz[name]
+                for name in npz.files
+                if name.startswith("extra_")
+            }
+        return labels, results, design_matrix, extra
@@ -0,0 +1,177 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Yongning Lei 2024-2025
+# All rights reserved.
+#
+# This script is distributed under the Apache-2.0 license.
+# You may use, distribute, and modify this code under the terms of the Apache-2.0 license.
+# See the LICENSE file for details.
+#
+# THIS SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE, AND NONINFRINGEMENT.
+#
+# Author: Yongning Lei
+# Email: yl4874@nyu.edu
+# GitHub: https://github.com/yongninglei
+# -----------------------------------------------------------------------------
+"""
+All t contrasts of a fitted GLM at once.
+
+``nilearn.glm.contrasts.compute_contrast`` handles one contrast per call: for
+every AR(1) label it builds the boolean mask ``labels == label``, runs
+``Tcontrast`` and, through the returned ``Contrast``, evaluates t, p and z one
+after the other.  Here the contrast vectors are stacked into a
+(n_contrasts, n_regressors) matrix ``C`` and, per label,
+
+    effect   = C theta                       (n_contrasts, n_label)
+    variance = diag(C cov C') x dispersion
+
+are single matrix products; t, p and z then follow elementwise for the whole
+block, with nilearn's conventions (``tiny`` floor on the variance, ``dofmax``,
+z from the survival function or, for p > .5, the CDF):
+
+    for contrast_id, maps in iter_contrasts(labels, results, contrasts):
+        save(maps["t"], ...)
+
+Only t contrasts (1D vectors) are batched; anything else is left to
+``compute_contrast``.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+from scipy import stats
+
+# nilearn.glm.contrasts defaults
+DEF_TINY = 1e-50
+DEF_DOFMAX = 1e10
+
+STAT_NAMES = ("effect", "t", "z", "p", "variance")
+
+
+def contrast_matrix(contrast_vals, n_regressors):
+    """
+    Stack 1D contrast vectors into (n_contrasts, n_regressors), zero-padded like nilearn.
+    """
+    C = np.zeros((len(contrast_vals), n_regressors))
+    for i, con_val in enumerate(contrast_vals):
+        con_val = np.asarray(con_val, dtype=np.float64)
+        if con_val.ndim != 1 or con_val.size == 0:
+            raise ValueError(
+                f"t contrasts should be non-empty 1D vectors: got {con_val}"
+            )
+        if con_val.size > n_regressors:
+            raise ValueError(
+                f"t contrasts should be of length P={n_regressors}, "
+                f"but it has length {con_val.size}."
+            )
+        C[i, : con_val.size] = con_val
+    return C
+
+
+def _z_score(p_value, one_minus_p):
+    """nilearn's z_score: isf(p), or ppf(1 - p) where that is more accurate."""
+    z = stats.norm.isf(np.clip(p_value, 1.0e-300, 1.0 - 1.0e-16))
+    use_cdf = z < 0
+    z[use_cdf] = stats.norm.ppf(np.clip(one_minus_p(use_cdf), 1.0e-300, 1.0 - 1.0e-16))
+    return z
+
+
+class ContrastEngine:
+    """
+    Batched t contrasts of one fit.
+
+    Parameters
+    ----------
+    labels : ndarray of shape (n_features,)
+        AR(1) label of every feature, as returned by ``run_glm``.
+    results : dict
+        ``{label: results}`` with ``theta``, ``cov``, ``dispersion`` and
+        ``df_residuals`` (nilearn ``RegressionResults`` or
+        ``glm_stream.SuffStatResults``).
+    """
+
+    def __init__(self, labels, results):
+        labels = np.asarray(labels)
+        self.n_features = labels.size
+        keys = list(results)
+        # one pass over the labels instead of one ``labels == label`` per
+        # label and contrast
+        uniq, inverse = np.unique(labels, return_inverse=True)
+        pos = {u: i for i, u in enumerate(uniq.tolist())}
+        order = np.argsort(inverse, kind="stable")
+        bounds = np.searchsorted(inverse[order], np.arange(uniq.size + 1))
+        self.groups = []
+        for key in keys:
+            i = pos.get(key)
+            idx = (
+                order[bounds[i] : bounds[i + 1]]
+                if i is not None
+                else np.empty(0, np.intp)
+            )
+            self.groups.append((idx, results[key]))
+        self.n_regressors = results[keys[0]].theta.shape[0]
+        # as compute_contrast: degrees of freedom of the last label
+        self.dof = min(results[keys[-1]].df_residuals, DEF_DOFMAX)
+
+    def compute(self, C, stat_names=STAT_NAMES):
+        """
+        Stat maps of the contrasts in the rows of *C*.
+
+        Returns
+        -------
+        dict
+            ``{stat: ndarray of shape (n_contrasts, n_features)}`` for the
+            requested *stat_names*.
+        """
+        C = np.atleast_2d(np.asarray(C, dtype=np.float64))
+        shape = (C.shape[0], self.n_features)
+        effect = np.zeros(shape)
+        variance = np.zeros(shape)
+        for idx, res in self.groups:
+            effect[:, idx] = C @ res.theta
+            cvc = np.einsum("kp,pq,kq->k", C, res.cov, C)
+            variance[:, idx] = cvc[:, None] * res.dispersion
+        out = {"effect": effect, "variance": variance}
+        if {"t", "z", "p"} & set(stat_names):
+            t = effect / np.sqrt(np.maximum(variance, DEF_TINY))
+            out["t"] = t
+            if {"z", "p"} & set(stat_names):
+                p = stats.t.sf(t, self.dof)
+                out["p"] = p
+                if "z" in stat_names:
+                    out["z"] = _z_score(p, lambda sel: stats.t.cdf(t[sel], self.dof))
+        return {st: out[st] for st in stat_names}
+
+
+def iter_contrasts(labels, results, contrasts, stat_names=STAT_NAMES, block_size=16):
+    """
+    Yield ``(contrast_id, {stat: map})`` for every contrast of *contrasts*.
+
+    Contrasts are computed *block_size* at a time, which bounds the memory of
+    the stacked (block_size, n_features) stat arrays.  Contrasts that are not
+    1D vectors (F contrasts) go through nilearn's ``compute_contrast``.
+    """
+    engine = ContrastEngine(labels, results)
+    t_ids = [cid for cid, val in contrasts.items() if np.ndim(val) == 1]
+    for lo in range(0, len(t_ids), block_size):
+        block = t_ids[lo : lo + block_size]
+        C = contrast_matrix([contrasts[cid] for cid in block], engine.n_regressors)
+        maps = engine.compute(C, stat_names)
+        for k, cid in enumerate(block):
+            yield cid, {st: maps[st][k] for st in stat_names}
+
+    other = [cid for cid, val in contrasts.items() if np.ndim(val) != 1]
+    if other:
+        from nilearn.glm.contrasts import compute_contrast
+
+        for cid in other:
+            con = compute_contrast(labels, results, contrasts[cid])
+            getters = {
+                "effect": con.effect_size,
+                "t": con.stat,
+                "z": con.z_score,
+                "p": con.p_value,
+                "variance": con.effect_variance,
+            }
+            yield cid, {st: getters[st]() for st in stat_names}
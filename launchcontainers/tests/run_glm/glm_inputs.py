@@ -0,0 +1,163 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Yongning Lei 2024-2025
+# All rights reserved.
+#
+# This script is distributed under the Apache-2.0 license.
+# You may use, distribute, and modify this code under the terms of the Apache-2.0 license.
+# See the LICENSE file for details.
+#
+# THIS SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE, AND NONINFRINGEMENT.
+#
+# Author: Yongning Lei
+# Email: yl4874@nyu.edu
+# GitHub: https://github.com/yongninglei
+# -----------------------------------------------------------------------------
+"""
+Session-level loader for the GLM model inputs (events, confounds, TR).
+
+``first_level_from_bids`` re-indexes the raw BIDS tree and the fMRIPrep
+derivatives on every call, and ``run_glm.py`` called it once per run just to
+get ``t_r``, the events and the confounds.  Here both ``func/`` folders of a
+session are listed once, each run's files are resolved from that listing, and
+all files are read in one pass:
+
+    inputs = load_session_inputs(bids_dir, fmriprep_dir, "01", "02", "fLoc")
+    t_r, events, confounds = inputs["01"]
+
+Files are matched on the ``task`` and ``run`` entities only, like the
+``layout.get(...)[0]`` queries they replace.  The TR comes from the fMRIPrep
+BOLD sidecar of the run (``desc-preproc`` first), then the raw sidecar, then
+the top-level ``task-<task>_bold.json`` (BIDS inheritance).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import os.path as op
+import re
+
+import pandas as pd
+
+_RUN_RE = re.compile(r"_run-(\d+)")
+_TASK_RE = re.compile(r"_task-([a-zA-Z0-9]+)")
+
+
+def _list_func(root, subject, session):
+    func_dir = op.join(root, f"sub-{subject}", f"ses-{session}", "func")
+    try:
+        return sorted(op.join(func_dir, f) for f in os.listdir(func_dir))
+    except FileNotFoundError:
+        return []
+
+
+def index_session(bids_dir, fmriprep_dir, subject, session, task):
+    """
+    Resolve the events, confounds and BOLD sidecar files of every run.
+
+    Parameters
+    ----------
+    bids_dir, fmriprep_dir : str
+        Raw BIDS and fMRIPrep derivatives roots.
+    subject, session, task : str
+        Labels without the ``sub-``/``ses-``/``task-`` prefixes.
+
+    Returns
+    -------
+    dict
+        ``{run: {"events": path, "confounds": path, "sidecars": [path, ...]}}``
+        with zero-padded two-digit run labels.  Missing files are ``None``;
+        ``sidecars`` is ordered by preference.
+    """
+    index: dict[str, dict] = {}
+
+    def _entry(fpath):
+        fname = op.basename(fpath)
+        task_m = _TASK_RE.search(fname)
+        run_m = _RUN_RE.search(fname)
+        if not task_m or task_m.group(1) != task or not run_m:
+            return None
+        run = f"{int(run_m.group(1)):02d}"
+        return index.setdefault(
+            run, {"events": None, "confounds": None, "sidecars": [], "_raw": []}
+        )
+
+    for fpath in _list_func(fmriprep_dir, subject, session):
+        entry = _entry(fpath)
+        if entry is None:
+            continue
+        if (
+            fpath.endswith("_desc-confounds_timeseries.tsv")
+            and entry["confounds"] is None
+        ):
+            entry["confounds"] = fpath
+        elif fpath.endswith("_bold.json"):
+            if "_desc-preproc_" in op.basename(fpath):
+                entry["sidecars"].insert(0, fpath)
+            else:
+                entry["sidecars"].append(fpath)
+
+    for fpath in _list_func(bids_dir, subject, session):
+        entry = _entry(fpath)
+        if entry is None:
+            continue
+        if fpath.endswith("_events.tsv") and entry["events"] is None:
+            entry["events"] = fpath
+        elif fpath.endswith("_bold.json"):
+            entry["_raw"].append(fpath)
+
+    toplevel = op.join(bids_dir, f"task-{task}_bold.json")
+    inherited = [toplevel] if op.isfile(toplevel) else []
+    for entry in index.values():
+        entry["sidecars"] += entry.pop("_raw") + inherited
+    return index
+
+
+def load_session_inputs(bids_dir, fmriprep_dir, subject, session, task, run_list=None):
+    """
+    Read ``(t_r, events, confounds)`` for every run of a session at once.
+
+    Parameters
+    ----------
+    bids_dir, fmriprep_dir : str
+        Raw BIDS and fMRIPrep derivatives roots.
+    subject, session, task : str
+        Labels without prefixes.
+    run_list : list[str], optional
+        Zero-padded run labels to load.  Default: every indexed run.
+
+    Returns
+    -------
+    dict
+        ``{run: (t_r, events_df, confounds_df)}``.  Runs with a missing
+        events, confounds or RepetitionTime are left out; the caller warns
+        and skips them, as it did when ``first_level_from_bids`` raised.
+    """
+    index = index_session(bids_dir, fmriprep_dir, subject, session, task)
+    runs = run_list if run_list is not None else sorted(index)
+
+    tr_cache: dict[str, float] = {}
+
+    def _repetition_time(sidecars):
+        for fpath in sidecars:
+            if fpath not in tr_cache:
+                with open(fpath) as fh:
+                    tr_cache[fpath] = json.load(fh).get("RepetitionTime")
+            if tr_cache[fpath] is not None:
+                return float(tr_cache[fpath])
+        return None
+
+    inputs = {}
+    for run in runs:
+        entry = index.get(run)
+        if entry is None or entry["events"] is None or entry["confounds"] is None:
+            continue
+        t_r = _repetition_time(entry["sidecars"])
+        if t_r is None:
+            continue
+        events = pd.read_csv(entry["events"], sep="\t")
+        confounds = pd.read_csv(entry["confounds"], sep="\t")
+        inputs[run] = (t_r, events, confounds)
+    return inputs
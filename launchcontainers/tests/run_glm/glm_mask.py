@@ -0,0 +1,113 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Yongning Lei 2024-2025
+# All rights reserved.
+#
+# This script is distributed under the Apache-2.0 license.
+# You may use, distribute, and modify this code under the terms of the Apache-2.0 license.
+# See the LICENSE file for details.
+#
+# THIS SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE, AND NONINFRINGEMENT.
+#
+# Author: Yongning Lei
+# Email: yl4874@nyu.edu
+# GitHub: https://github.com/yongninglei
+# -----------------------------------------------------------------------------
+"""
+In-mask feature selection for the GLM.
+
+The GLM is fitted only on the vertices of a FreeSurfer label (surface runs)
+or the voxels of the fMRIPrep brain mask (volume runs).  A
+:class:`FeatureMask` keeps the in-mask indices and, for volumes, the reference
+grid, so stat maps can be scattered back to full size when they are written:
+
+    fmask = FeatureMask.from_surface_label(label_path, n_vertices)
+    data_in = fmask.apply(data)               # (n_in, n_scans)
+    ...
+    full = fmask.scatter(t_values)            # (n_vertices,)
+"""
+
+from __future__ import annotations
+
+import nibabel as nib
+import numpy as np
+from nilearn.surface import load_surf_data
+
+
+class FeatureMask:
+    """
+    In-mask indices of a flattened surface or volume.
+
+    Parameters
+    ----------
+    indices : ndarray of int
+        Flat indices of the in-mask features, ascending.
+    n_features : int
+        Number of features of the full map.
+    ref_img : nibabel image, optional
+        Volume grid (shape, affine, header) for NIfTI outputs.
+    """
+
+    def __init__(self, indices, n_features, ref_img=None):
+        self.indices = np.asarray(indices, dtype=np.intp)
+        self.n_features = int(n_features)
+        self.ref_img = ref_img
+
+    @property
+    def n_in(self):
+        return self.indices.size
+
+    @classmethod
+    def from_surface_label(cls, label_path, n_features):
+        """Mask from a FreeSurfer ``.label`` (vertex indices) or a 0/1 surface map."""
+        surf_mask = np.asarray(load_surf_data(label_path))
+        if surf_mask.size == n_features and np.isin(surf_mask, (0, 1)).all():
+            indices = np.flatnonzero(surf_mask)
+        else:
+            indices = np.unique(surf_mask.astype(np.intp))
+        return cls(indices, n_features)
+
+    @classmethod
+    def from_volume_masks(cls, mask_fpaths, ref_img):
+        """Intersection of NIfTI masks on the grid of *ref_img* (e.g. per-run brain masks)."""
+        shape = ref_img.shape[:3]
+        mask = np.ones(shape, dtype=bool)
+        for fpath in mask_fpaths:
+            run_mask = np.asarray(nib.load(fpath).dataobj) > 0
+            if run_mask.shape != shape:
+                raise ValueError(
+                    f"mask {fpath} has shape {run_mask.shape}, BOLD grid is {shape}"
+                )
+            mask &= run_mask
+        return cls(np.flatnonzero(mask), mask.size, ref_img)
+
+    @classmethod
+    def full_volume(cls, ref_img):
+        """Every voxel of *ref_img* (used when no brain mask is available)."""
+        n_features = int(np.prod(ref_img.shape[:3]))
+        return cls(np.arange(n_features), n_features, ref_img)
+
+    def apply(self, data):
+        """Keep the in-mask rows of a (n_features, ...) array."""
+        return data[self.indices]
+
+    def apply_volume(self, img):
+        """In-mask (n_in, n_scans) timeseries of a 4D image, without the background."""
+        data = np.asarray(img.dataobj)
+        return data.reshape(-1, data.shape[3])[self.indices]
+
+    def scatter(self, values, fill=0.0):
+        """Full-size map with *values* at the in-mask features and *fill* elsewhere."""
+        values = np.asarray(values)
+        full = np.full((self.n_features,) + values.shape[1:], fill, dtype=values.dtype)
+        full[self.indices] = values
+        return full
+
+    def to_nifti(self, values, fill=0.0):
+        """Scatter *values* into a float32 NIfTI on the reference grid."""
+        full = self.scatter(values, fill).astype(np.float32)
+        shape = self.ref_img.shape[:3]
+        header = self.ref_img.header.copy()
+        header.set_data_dtype(np.float32)
+        return nib.Nifti1Image(full.reshape(shape), self.ref_img.affine, header)
@@ -0,0 +1,312 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Yongning Lei 2024-2025
+# All rights reserved.
+#
+# This script is distributed under the Apache-2.0 license.
+# You may use, distribute, and modify this code under the terms of the Apache-2.0 license.
+# See the LICENSE file for details.
+#
+# THIS SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE, AND NONINFRINGEMENT.
+#
+# Author: Yongning Lei
+# Email: yl4874@nyu.edu
+# GitHub: https://github.com/yongninglei
+# -----------------------------------------------------------------------------
+"""
+Out-of-core GLM from sufficient statistics.
+
+``nilearn.glm.first_level.run_glm`` needs the whole (time x vertex) matrix of
+all sessions in memory.  Here every z-scored run is written to disk as a
+float32 ``.npy`` (time x vertex) by :class:`RunStore`, and :func:`run_glm`
+streams the runs once to accumulate the data-side statistics
+
+    X'Y, sum_t x_{t-1} y_t, sum_t x_t y_{t-1},
+    y'y, sum_t y_t y_{t-1}, sum_t y_t, first and last row of Y
+
+(float64, p x V and V).  OLS and the AR(1) refit are then solved per vertex
+chunk from these sums, reproducing nilearn's run_glm: same Yule-Walker AR(1)
+estimate on the OLS residuals, same binning into labels, same whitening (first
+row unchanged) and pseudo-inverse.  The returned ``labels, results`` go
+straight into ``nilearn.glm.contrasts.compute_contrast``.
+
+Peak memory is one run plus the p x V accumulators, instead of the whole
+concatenated cohort.
+"""
+
+from __future__ import annotations
+
+import os
+import os.path as op
+import shutil
+import tempfile
+
+import numpy as np
+from nilearn.glm.model import LikelihoodModelResults
+
+
+class RunStore:
+    """
+    Disk-backed list of z-scored runs in concatenation order.
+
+    Parameters
+    ----------
+    scratch_dir : str, optional
+        Parent directory for the spill files (node-local scratch is best).
+        Default: ``$TMPDIR``.
+    """
+
+    def __init__(self, scratch_dir=None):
+        if scratch_dir:
+            os.makedirs(scratch_dir, exist_ok=True)
+        self.dirname = tempfile.mkdtemp(prefix="lc_glm_runs_", dir=scratch_dir or None)
+        self.fpaths: list[str] = []
+        self.n_scans: list[int] = []
+        self.n_features: int | None = None
+
+    def add(self, data_std):
+        """Spill one run, given as (n_features, n_scans) like prepare_*_input builds it."""
+        n_features, n_scans = data_std.shape
+        if self.n_features is None:
+            self.n_features = n_features
+        elif n_features != self.n_features:
+            raise ValueError(
+                f"run has {n_features} features, previous runs have {self.n_features}"
+            )
+        fpath = op.join(self.dirname, f"run-{len(self.fpaths):03d}.npy")
+        np.save(fpath, np.ascontiguousarray(data_std.T, dtype=np.float32))
+        self.fpaths.append(fpath)
+        self.n_scans.append(n_scans)
+
+    @property
+    def shape(self):
+        """(n_features, n_timepoints), the shape of the concatenated matrix."""
+        return (self.n_features or 0, sum(self.n_scans))
+
+    def __len__(self):
+        return len(self.fpaths)
+
+    def __iter__(self):
+        for fpath in self.fpaths:
+            yield np.load(fpath, mmap_mode="r")
+
+    def cleanup(self):
+        shutil.rmtree(self.dirname, ignore_errors=True)
+
+
+class SuffStatResults(LikelihoodModelResults):
+    """
+    Regression results built from sufficient statistics.
+
+    Holds only what ``Tcontrast``/``Fcontrast`` (and thus ``compute_contrast``)
+    use: ``theta``, ``cov``, ``dispersion`` and the degrees of freedom.
+    """
+
+    def __init__(self, theta, cov, dispersion, df_total, df_model):
+        self.theta = theta
+        self.cov = cov
+        self.dispersion = dispersion
+        self.nuisance = None
+        self.df_total = df_total
+        self.df_model = df_model
+        self.df_residuals = df_total - df_model
+
+
+def accumulate(store, X):
+    """
+    Stream the runs of *store* once and return the data-side sums.
+
+    Parameters
+    ----------
+    store : RunStore
+        Runs in the same order as the rows of *X*.
+    X : ndarray of shape (n_timepoints, n_regressors)
+        Design matrix of the concatenated runs.
+
+    Returns
+    -------
+    dict
+        ``XtY``, ``XlagY`` (sum x_{t-1} y_t), ``XYlag`` (sum x_t y_{t-1}),
+        ``yy``, ``ylag``, ``ysum``, ``yfirst``, ``ylast``.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    n_time, n_reg = X.shape
+    n_features = store.n_features
+    if sum(store.n_scans) != n_time:
+        raise ValueError(
+            f"design has {n_time} rows, stored runs have {sum(store.n_scans)} scans"
+        )
+
+    XtY = np.zeros((n_reg, n_features))
+    XlagY = np.zeros((n_reg, n_features))
+    XYlag = np.zeros((n_reg, n_features))
+    yy = np.zeros(n_features)
+    ylag = np.zeros(n_features)
+    ysum = np.zeros(n_features)
+    yfirst = yprev = None
+
+    start = 0
+    for Y in store:
+        Y = np.asarray(Y, dtype=np.float64)
+        stop = start + Y.shape[0]
+        Xr = X[start:stop]
+        XtY += Xr.T @ Y
+        yy += np.einsum("tv,tv->v", Y, Y)
+        ysum += Y.sum(0)
+        # lag products inside the run ...
+        XlagY += Xr[:-1].T @ Y[1:]
+        XYlag += Xr[1:].T @ Y[:-1]
+        ylag += np.einsum("tv,tv->v", Y[1:], Y[:-1])
+        # ... and across the boundary with the previous run, as in the
+        # concatenated series nilearn sees
+        if yprev is None:
+            yfirst = Y[0].copy()
+        else:
+            XlagY += np.outer(X[start - 1], Y[0])
+            XYlag += np.outer(Xr[0], yprev)
+            ylag += Y[0] * yprev
+        yprev = Y[-1].copy()
+        start = stop
+        del Y
+
+    return {
+        "XtY": XtY,
+        "XlagY": XlagY,
+        "XYlag": XYlag,
+        "yy": yy,
+        "ylag": ylag,
+        "ysum": ysum,
+        "yfirst": yfirst,
+        "ylast": yprev,
+    }
+
+
+def _whiten(X, rho):
+    """nilearn ARModel.whiten for AR(1): rows t>=1 minus rho * row t-1."""
+    W = X.copy()
+    W[1:] -= rho * X[:-1]
+    return W
+
+
+def _ar1_labels(stats, X, beta_ols, bins, mean):
+    """
+    Yule-Walker AR(1) of the OLS residuals, binned like nilearn.
+
+    *mean* is the grand mean of all residuals (all vertices, all scans), which
+    ``_yule_walker`` subtracts before the lag products.
+    """
+    n_time = X.shape[0]
+    XtY, XlagY, XYlag = stats["XtY"], stats["XlagY"], stats["XYlag"]
+    XlX = X[1:].T @ X[:-1]  # sum x_t x_{t-1}'
+    XtX = X.T @ X
+
+    sse = (
+        stats["yy"]
+        - 2 * np.einsum("pv,pv->v", beta_ols, XtY)
+        + np.einsum("pv,pv->v", beta_ols, XtX @ beta_ols)
+    )
+    elag = (
+        stats["ylag"]
+        - np.einsum("pv,pv->v", beta_ols, XlagY)
+        - np.einsum("pv,pv->v", beta_ols, XYlag)
+        + np.einsum("pv,pv->v", beta_ols, XlX @ beta_ols)
+    )
+    esum = stats["ysum"] - X.sum(0) @ beta_ols
+    efirst = stats["yfirst"] - X[0] @ beta_ols
+    elast = stats["ylast"] - X[-1] @ beta_ols
+
+    r0 = sse - 2 * mean * esum + n_time * mean**2
+    r1 = elag - mean * (2 * esum - efirst - elast) + (n_time - 1) * mean**2
+    r0 /= n_time * n_time
+    r1 /= (n_time - 1) * n_time
+    ar1 = r1 / r0
+    ar1 = (ar1 * bins).astype(int) * 1.0 / bins
+    return np.array([str(val) for val in ar1])
+
+
+def run_glm(store, X, noise_model="ar1", bins=100, chunk_size=20000):
+    """
+    Streaming equivalent of ``nilearn.glm.first_level.run_glm(Y, X)``.
+
+    Parameters
+    ----------
+    store : RunStore
+        Spilled runs, concatenated in order they were added.
+    X : array-like of shape (n_timepoints, n_regressors)
+        Design matrix of the concatenated runs.
+    noise_model : {"ar1", "ols"}
+        Temporal noise model.
+    bins : int
+        Number of AR(1) bins, as in nilearn.
+    chunk_size : int
+        Vertices solved at once; bounds the temporaries of the solve.
+
+    Returns
+    -------
+    labels : ndarray of shape (n_features,)
+    results : dict
+        ``{label: SuffStatResults}`` for ``compute_contrast``.
+    """
+    if noise_model not in ("ar1", "ols"):
+        raise ValueError(f"streaming GLM supports 'ar1' and 'ols', got {noise_model!r}")
+    X = np.asarray(X, dtype=np.float64)
+    n_time, n_reg = X.shape
+    stats = accumulate(store, X)
+    n_features = stats["yy"].size
+
+    eps = np.abs(X).sum() * np.finfo(np.float64).eps
+    df_model = np.linalg.matrix_rank(X, eps)
+
+    pinv_X = np.linalg.pinv(X)
+    cov_ols = pinv_X @ pinv_X.T
+    gram_pinv = np.linalg.pinv(X.T @ X)  # pinv(X) = pinv(X'X) X'
+    beta_ols = gram_pinv @ stats["XtY"]
+
+    if noise_model == "ols":
+        sse = stats["yy"] - np.einsum("pv,pv->v", beta_ols, stats["XtY"])
+        dispersion = sse / (n_time - n_reg)
+        labels = np.zeros(n_features)
+        return labels, {
+            0.0: SuffStatResults(beta_ols, cov_ols, dispersion, n_time, df_model)
+        }
+
+    residual_sum = stats["ysum"].sum() - X.sum(0) @ beta_ols.sum(1)
+    mean = residual_sum / (n_features * n_time)
+    labels = np.empty(n_features, dtype=object)
+    for lo in range(0, n_features, chunk_size):
+        sl = slice(lo, lo + chunk_size)
+        chunk = {k: v[..., sl] for k, v in stats.items()}
+        labels[sl] = _ar1_labels(chunk, X, beta_ols[:, sl], bins, mean)
+    labels = labels.astype(str)
+    del beta_ols
+
+    # AR(1) refit per label: whitened sums from the same accumulators
+    XtY, XlagY, XYlag = stats["XtY"], stats["XlagY"], stats["XYlag"]
+    results = {}
+    for label in np.unique(labels):
+        rho = float(label)
+        idx = np.flatnonzero(labels == label)
+        W = _whiten(X, rho)
+        pinv_W = np.linalg.pinv(W)
+        cov = pinv_W @ pinv_W.T
+        theta = np.empty((n_reg, idx.size))
+        dispersion = np.empty(idx.size)
+        for lo in range(0, idx.size, chunk_size):
+            cols = idx[lo : lo + chunk_size]
+            ylast = stats["ylast"][cols]
+            # W'y~ = X'Y - rho (sum x_{t-1} y_t + sum x_t y_{t-1}) + rho^2 sum x_{t-1} y_{t-1}
+            head = XtY[:, cols] - np.outer(X[-1], ylast)
+            WtY = XtY[:, cols] - rho * (XlagY[:, cols] + XYlag[:, cols]) + rho**2 * head
+            # y~'y~ = y'y - 2 rho sum y_t y_{t-1} + rho^2 sum y_{t-1}^2
+            wyy = (
+                stats["yy"][cols]
+                - 2 * rho * stats["ylag"][cols]
+                + rho**2 * (stats["yy"][cols] - ylast**2)
+            )
+            beta = cov @ WtY
+            theta[:, lo : lo + cols.size] = beta
+            sse = wyy - np.einsum("pv,pv->v", beta, WtY)
+            dispersion[lo : lo + cols.size] = sse / (n_time - n_reg)
+        results[label] = SuffStatResults(theta, cov, dispersion, n_time, df_model)
+    return labels, results
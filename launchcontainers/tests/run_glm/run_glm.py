@@ -31,8 +31,6 @@ import pandas as pd
 import typer
 import yaml
 from bids import BIDSLayout
-from nilearn.glm.contrasts import compute_contrast
-from nilearn.glm.first_level import first_level_from_bids
 from nilearn.glm.first_level import make_first_level_design_matrix
 from nilearn.glm.first_level.first_level import run_glm
 from nilearn.plotting import plot_design_matrix
@@ -47,6 +45,34 @@ app = typer.Typer(add_completion=False, pretty_exceptions_show_locals=False)
 logger = logging.getLogger("GENERAL")
 
 
+def _load_sibling(name):
+    """
+    Import a helper module that lives next to this file.
+
+    run_glm/ is not a package and this file is also loaded by path from
+    run_allses_glm.py, so the siblings are imported by path as well.
+    """
+    import importlib.util
+    import sys
+
+    mod_name = f"_run_glm_{name}"
+    if mod_name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(
+            mod_name, op.join(op.dirname(op.abspath(__file__)), f"{name}.py")
+        )
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[mod_name] = module
+        spec.loader.exec_module(module)
+    return sys.modules[mod_name]
+
+
+glm_inputs    = _load_sibling("glm_inputs")
+glm_mask      = _load_sibling("glm_mask")
+glm_stream    = _load_sibling("glm_stream")
+glm_cache     = _load_sibling("glm_cache")
+glm_contrasts = _load_sibling("glm_contrasts")
+
+
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
@@ -92,6 +118,123 @@ def save_statmap_to_gifti(data, outname):
     nib.save(gii, outname)
 
 
+def zscore_run_into(out, data):
+    """
+    Z-score one run over time straight into *out*.
+
+    *data* is the (n_features, n_scans) run as loaded, *out* its float32
+    (n_scans, n_features) block of the concatenation buffer.  Same result as
+    ``stats.zscore(data, axis=1).T`` (population std, NaN for flat features),
+    but the only full-size write is the copy into *out*; the mean and std are
+    accumulated in float64.
+    """
+    out[...] = data.T
+    n_scans = out.shape[0]
+    mean = out.sum(axis=0, dtype=np.float64) / n_scans
+    np.subtract(out, mean, out=out, casting="unsafe")
+    sd = np.sqrt(np.einsum("tv,tv->v", out, out, dtype=np.float64) / n_scans)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        np.divide(out, sd, out=out, casting="unsafe")
+    return out
+
+
+def save_statmap(data, outname, feature_mask=None, fill=0.0):
+    """
+    Save an in-mask stat map at full size.
+
+    Surface maps go to GIFTI, volumetric maps to NIfTI on the reference grid
+    of *feature_mask*; features outside the mask get *fill*.
+    """
+    if feature_mask is None:
+        save_statmap_to_gifti(data, outname)
+    elif feature_mask.ref_img is None:
+        save_statmap_to_gifti(feature_mask.scatter(data, fill), outname)
+    else:
+        nib.save(feature_mask.to_nifti(data, fill), outname)
+
+
+def find_func_file(
+    fp_layout, subject, session, task, run_num, space, use_smoothed, sm, hemi=None,
+):
+    """
+    Preprocessed BOLD file of one run in the fMRIPrep layout.
+
+    Returns
+    -------
+    tuple
+        (path or None, the layout query used)
+    """
+    is_surface = space in ["fsnative", "fsaverage"]
+    query_params = {
+        "subject":   subject,
+        "session":   session,
+        "task":      task,
+        "run":       run_num,
+        "space":     space,
+        "suffix":    "bold",
+        "extension": ".func.gii" if is_surface else ".nii.gz",
+    }
+    if is_surface and hemi:
+        query_params["hemi"] = hemi
+    if use_smoothed:
+        query_params["desc"] = f"smoothed{sm}"
+    elif not is_surface:
+        query_params["desc"] = "preproc"
+
+    func_files = fp_layout.get(**query_params)
+    return (func_files[0].path if func_files else None), query_params
+
+
+def volume_mask_files(
+    fp_layout, label_dir, apply_label_as_mask, subject, session, task, space, run_list,
+):
+    """fMRIPrep ``desc-brain_mask`` of each run, plus *apply_label_as_mask* if it is a NIfTI."""
+    mask_files = [
+        f.path for run_num in run_list for f in fp_layout.get(
+            subject=subject, session=session, task=task, run=run_num,
+            space=space, desc="brain", suffix="mask", extension=".nii.gz",
+        )[:1]
+    ]
+    if apply_label_as_mask and apply_label_as_mask.endswith((".nii", ".nii.gz")):
+        mask_files.append(op.join(label_dir, apply_label_as_mask))
+    return mask_files
+
+
+def build_feature_mask(
+    fp_layout, label_dir, apply_label_as_mask,
+    subject, session, task, space, run_list, n_features, ref_img=None,
+):
+    """
+    In-mask features the GLM is fitted on.
+
+    Surface runs: the FreeSurfer label ``{label_dir}/{apply_label_as_mask}``,
+    or ``None`` (all vertices) without a label.  Volume runs: the intersection
+    of the fMRIPrep ``desc-brain_mask`` of the runs, further restricted by
+    ``apply_label_as_mask`` when that is a NIfTI mask.
+    """
+    if ref_img is None:
+        if not apply_label_as_mask:
+            return None
+        return glm_mask.FeatureMask.from_surface_label(
+            op.join(label_dir, apply_label_as_mask), n_features,
+        )
+
+    mask_files = volume_mask_files(
+        fp_layout, label_dir, apply_label_as_mask, subject, session, task, space, run_list,
+    )
+    if apply_label_as_mask and not apply_label_as_mask.endswith((".nii", ".nii.gz")):
+        console.print(
+            f"  [yellow]WARNING[/yellow]: {apply_label_as_mask} is not a NIfTI mask, "
+            f"ignored for volumetric runs"
+        )
+    if not mask_files:
+        console.print(
+            "  [yellow]WARNING[/yellow]: no desc-brain_mask found, fitting every voxel"
+        )
+        return glm_mask.FeatureMask.full_volume(ref_img)
+    return glm_mask.FeatureMask.from_volume_masks(mask_files, ref_img)
+
+
 def replace_prefix_and_suffix(val):
     if isinstance(val, str) and (val.endswith("1") or val.endswith("2")):
         val = val[:-1]
@@ -148,83 +291,130 @@ def load_contrasts(yaml_file, design_matrix):
 # Core processing
 # ---------------------------------------------------------------------------
 
+def l1_outdir(bids_dir, output_name, subject, session):
+    return op.join(
+        bids_dir, "derivatives", "l1_surface",
+        f"analysis-{output_name}", f"sub-{subject}", f"ses-{session}",
+    )
+
+
+def contrast_outputs(
+    outdir, subject, session, task, space, contrast_id,
+    use_smoothed=False, sm=None, randrun_idx=None, hemi=None,
+):
+    """{stat: output path} of one contrast (power-analysis iterations write effect and t only)."""
+    if hemi:
+        outname_base = (
+            f"sub-{subject}_ses-{session}_task-{task}"
+            f"_hemi-{hemi}_space-{space}_contrast-{contrast_id}"
+            f"_stat-X_statmap.func.gii"
+        )
+    else:
+        outname_base = (
+            f"sub-{subject}_ses-{session}_task-{task}"
+            f"_space-{space}_contrast-{contrast_id}"
+            f"_stat-X_statmap.nii.gz"
+        )
+    if use_smoothed:
+        outname_base = outname_base.replace("_statmap", f"_desc-smoothed{sm}_statmap")
+    if randrun_idx:
+        outname_base = outname_base.replace("_statmap", f"{randrun_idx}_statmap")
+    outname_base = op.join(outdir, outname_base)
+
+    stat_names = ["effect", "t"] if randrun_idx else ["effect", "t", "z", "p", "variance"]
+    return {st: outname_base.replace("stat-X", f"stat-{st}") for st in stat_names}
+
+
 def glm_l1(
     conc_data_std, design_matrix_std, contrasts,
     bids_dir, task, space, subject, session,
     output_name, use_smoothed=False, sm=None, randrun_idx=None, hemi=None,
+    feature_mask=None, cache=None,
 ) -> dict[str, float]:
     """
     Fit the GLM and compute contrasts.
 
+    *conc_data_std* is the float32 (n_timepoints, n_features) matrix from
+    ``prepare_glm_input``, passed to ``run_glm`` as is.  It holds the in-mask
+    features only; the stat maps are scattered back to full size through
+    *feature_mask* when written (``None``: every surface vertex was fitted).
+
+    With a *cache* (``glm_cache.FitCache``) the fit is saved after fitting,
+    and contrasts already written from the same fit are skipped.  Pass
+    ``conc_data_std=None`` to compute the contrasts from the cached fit.
+
     Returns
     -------
     dict[str, float]
-        Wall-clock seconds spent computing each contrast.
+        Wall-clock seconds spent computing each (new) contrast.
     """
-    console.print("[bold]------- GLM start running[/bold]")
-
-    outdir = op.join(
-        bids_dir, "derivatives", "l1_surface",
-        f"analysis-{output_name}", f"sub-{subject}", f"ses-{session}",
-    )
-    if not op.exists(outdir):
-        makedirs(outdir)
-
-    plot_design_matrix(design_matrix_std)
-    plt.savefig(os.path.join(outdir, "design_matrix.png"))
-    plt.close()
+    label = f"hemi-{hemi}" if hemi else "volumetric"
+    outdir = l1_outdir(bids_dir, output_name, subject, session)
+    outputs = {
+        contrast_id: contrast_outputs(
+            outdir, subject, session, task, space, contrast_id,
+            use_smoothed, sm, randrun_idx, hemi,
+        )
+        for contrast_id in contrasts
+    }
+    pending = {
+        contrast_id: contrast_val for contrast_id, contrast_val in contrasts.items()
+        if cache is None
+        or not cache.is_done(contrast_id, contrast_val, outputs[contrast_id].values())
+    }
+    if not pending:
+        console.print(f"  [green]Up to date[/green] ({label}): all contrasts written from the cached fit")
+        return {}
+    makedirs(outdir, exist_ok=True)
 
-    Y = np.transpose(conc_data_std)
-    X = np.asarray(design_matrix_std)
-    labels, estimates = run_glm(Y, X, n_jobs=1)
+    if conc_data_std is None:
+        console.print(
+            f"[bold]------- GLM from cached fit[/bold]  "
+            f"({len(pending)}/{len(contrasts)} contrasts to compute)"
+        )
+        labels, estimates, _, extra = cache.load_fit(glm_stream.SuffStatResults)
+        if "mask_indices" in extra:
+            ref_fpath = str(extra["mask_ref"])
+            feature_mask = glm_mask.FeatureMask(
+                extra["mask_indices"], int(extra["mask_n_features"]),
+                nib.load(ref_fpath) if ref_fpath else None,
+            )
+    else:
+        console.print("[bold]------- GLM start running[/bold]")
+        plot_design_matrix(design_matrix_std)
+        plt.savefig(os.path.join(outdir, "design_matrix.png"))
+        plt.close()
+
+        X = np.asarray(design_matrix_std)
+        labels, estimates = run_glm(conc_data_std, X, n_jobs=1)
+        if cache is not None:
+            extra = {}
+            if feature_mask is not None:
+                ref_img = feature_mask.ref_img
+                extra = {
+                    "mask_indices":    feature_mask.indices,
+                    "mask_n_features": feature_mask.n_features,
+                    "mask_ref":        ref_img.get_filename() if ref_img is not None else "",
+                }
+            cache.save_fit(labels, estimates, design_matrix_std, **extra)
 
     timing: dict[str, float] = {}
 
-    for contrast_id, contrast_val in contrasts.items():
-        t_c = time.time()
-
-        # Build output filename template
-        if hemi:
-            outname_base = (
-                f"sub-{subject}_ses-{session}_task-{task}"
-                f"_hemi-{hemi}_space-{space}_contrast-{contrast_id}"
-                f"_stat-X_statmap.func.gii"
-            )
-        else:
-            outname_base = (
-                f"sub-{subject}_ses-{session}_task-{task}"
-                f"_space-{space}_contrast-{contrast_id}"
-                f"_stat-X_statmap.nii.gz"
-            )
-        if use_smoothed:
-            outname_base = outname_base.replace("_statmap", f"_desc-smoothed{sm}_statmap")
-        if randrun_idx:
-            outname_base = outname_base.replace("_statmap", f"{randrun_idx}_statmap")
-        outname_base = op.join(outdir, outname_base)
-
-        contrast_obj = compute_contrast(labels, estimates, contrast_val)
-
-        betas     = contrast_obj.effect_size()
-        t_value   = contrast_obj.stat()
-        z_score   = contrast_obj.z_score()
-        p_value   = contrast_obj.p_value()
-        variance  = contrast_obj.effect_variance()
-
-        if hemi:
-            save_statmap_to_gifti(betas,   outname_base.replace("stat-X", "stat-effect"))
-            save_statmap_to_gifti(t_value, outname_base.replace("stat-X", "stat-t"))
-            if not randrun_idx:
-                save_statmap_to_gifti(z_score,  outname_base.replace("stat-X", "stat-z"))
-                save_statmap_to_gifti(p_value,  outname_base.replace("stat-X", "stat-p"))
-                save_statmap_to_gifti(variance, outname_base.replace("stat-X", "stat-variance"))
-        else:
-            console.print(
-                f"  [yellow]WARNING[/yellow]: volumetric output not implemented, skipping {outname_base}"
-            )
+    # all pending contrasts in batched blocks; the time of a block is
+    # booked on its first contrast, so the per-hemi totals stay exact
+    stat_names = list(next(iter(outputs.values())))
+    t_c = time.time()
+    for contrast_id, stat_maps in glm_contrasts.iter_contrasts(
+        labels, estimates, pending, stat_names,
+    ):
+        for st, outname in outputs[contrast_id].items():
+            save_statmap(stat_maps[st], outname, feature_mask, fill=1.0 if st == "p" else 0.0)
+        if cache is not None:
+            cache.mark_done(contrast_id, pending[contrast_id])
 
         timing[contrast_id] = time.time() - t_c
+        t_c = time.time()
 
-    label = f"hemi-{hemi}" if hemi else "volumetric"
     console.print(f"  [green]GLM done[/green] ({label})")
     return timing
 
@@ -238,131 +428,135 @@ def prepare_glm_input(
     Gather per-run timeseries, events, and confounds; build concatenated
     design matrix and contrast dict for a single GLM call.
 
+    Only in-mask features are kept (see ``build_feature_mask``), so the GLM
+    cost scales with the ROI / brain size rather than the full grid.  The runs
+    are z-scored in float32 straight into one preallocated
+    (n_timepoints, n_features) buffer, the layout ``run_glm`` takes.
+
     Returns
     -------
     tuple
-        (conc_data_std, design_matrix_std, contrasts)
+        (conc_data_std, design_matrix_std, contrasts, feature_mask)
     """
     is_surface = space in ["fsnative", "fsaverage"]
+    feature_mask = None
 
-    data_allrun      = []
     frame_time_allrun = []
     events_allrun    = []
     confounds_allrun = []
-    store_l1         = []
 
     # Per-run step timing: {run_num: {step: seconds}}
     run_step_times: dict[str, dict[str, float]] = {}
 
-    for idx, run_num in enumerate(run_list):
+    # Events, confounds and TR of every run, resolved from one listing of the
+    # session's func/ folders (replaces one first_level_from_bids per run)
+    _t = time.time()
+    session_inputs = glm_inputs.load_session_inputs(
+        bids_dir, fmriprep_dir, subject, session, task, run_list,
+    )
+    t_session_inputs = time.time() - _t
+    console.print(
+        f"  Events/confounds/TR for {len(session_inputs)}/{len(run_list)} runs  "
+        f"[dim](session_inputs: {t_session_inputs:.2f} s)[/dim]"
+    )
+
+    # Scans kept per run are known from the confounds before any BOLD is read,
+    # so the concatenation buffer is allocated once, at the first loaded run
+    run_scans = {
+        run_num: len(confounds) - start_scans
+        for run_num, (_, _, confounds) in session_inputs.items()
+    }
+    conc_data_std = None
+    offset = 0
+
+    for run_num in run_list:
         console.print(f"  Processing run [cyan]{run_num}[/cyan]")
+        if run_num not in session_inputs:
+            console.print(
+                f"  [yellow]WARNING[/yellow]: no events/confounds/RepetitionTime "
+                f"for run {run_num} — skipping"
+            )
+            continue
         run_step_times[run_num] = {}
 
         # ── Step 1: find + load functional data ─────────────────────────────
         _t = time.time()
-        query_params = {
-            "subject":   subject,
-            "session":   session,
-            "task":      task,
-            "run":       run_num,
-            "space":     space,
-            "suffix":    "bold",
-            "extension": ".func.gii" if is_surface else ".nii.gz",
-        }
-        if is_surface and hemi:
-            query_params["hemi"] = hemi
-        if use_smoothed:
-            query_params["desc"] = f"smoothed{sm}"
-        elif not is_surface:
-            query_params["desc"] = "preproc"
-
-        func_files = fp_layout.get(**query_params)
-        if not func_files:
+        func_file, query_params = find_func_file(
+            fp_layout, subject, session, task, run_num, space, use_smoothed, sm, hemi,
+        )
+        if func_file is None:
             console.print(
                 f"  [yellow]WARNING[/yellow]: no functional file for run {run_num} "
                 f"(query: {query_params})"
             )
             continue
 
-        func_file = func_files[0].path
         console.print(f"  Found: [dim]{func_file}[/dim]")
 
+        first_loaded = conc_data_std is None
         if is_surface:
             data = load_surf_data(func_file)
-            data_float = np.vstack(data[:, :]).astype(float)
+            if first_loaded:
+                feature_mask = build_feature_mask(
+                    fp_layout, label_dir, apply_label_as_mask,
+                    subject, session, task, space, run_list, data.shape[0],
+                )
+            if feature_mask is not None:
+                data = feature_mask.apply(data)
         else:
             img = nib.load(func_file)
-            data_array = img.get_fdata()
-            original_shape = data_array.shape[:3]
-            n_timepoints = data_array.shape[3]
-            data_float = data_array.reshape(-1, n_timepoints).astype(float)
+            original_shape = img.shape[:3]
+            n_timepoints = img.shape[3]
+            if first_loaded:
+                feature_mask = build_feature_mask(
+                    fp_layout, label_dir, apply_label_as_mask,
+                    subject, session, task, space,
+                    [r for r in run_list if r in session_inputs],
+                    int(np.prod(original_shape)), ref_img=img,
+                )
+            data = feature_mask.apply_volume(img)
             console.print(
                 f"  Volumetric shape: {original_shape}, timepoints: {n_timepoints}"
             )
+        if first_loaded:
+            if feature_mask is not None:
+                console.print(
+                    f"  Fitting {feature_mask.n_in}/{feature_mask.n_features} in-mask features"
+                )
+            conc_data_std = np.empty(
+                (sum(run_scans.values()), data.shape[0]), dtype=np.float32,
+            )
         run_step_times[run_num]["load_func"] = time.time() - _t
         console.print(
-            f"  Length original data: {np.shape(data_float)[1]}  "
+            f"  Length original data: {data.shape[1]}  "
             f"[dim](load_func: {run_step_times[run_num]['load_func']:.1f} s)[/dim]"
         )
 
         # ── Step 2: z-score + trim ────────────────────────────────────────────
         _t = time.time()
-        data_remove_first = data_float[:, start_scans:]
-        console.print(f"  Length after removing {start_scans} prescan TRs: {np.shape(data_remove_first)[1]}")
-
-        data_std  = stats.zscore(data_remove_first, axis=1)
-        n_features = np.shape(data_std)[0]
+        n_scans = data.shape[1] - start_scans
+        console.print(f"  Length after removing {start_scans} prescan TRs: {n_scans}")
+        if n_scans != run_scans[run_num]:
+            raise ValueError(
+                f"run {run_num}: {n_scans} scans after trimming, "
+                f"confounds have {run_scans[run_num]}"
+            )
 
-        if apply_label_as_mask:
-            if is_surface:
-                label_path = f"{label_dir}/{apply_label_as_mask}"
-                surf_mask  = load_surf_data(label_path)
-                mask = np.zeros((n_features, 1))
-                mask[surf_mask] = 1
-                data_std   = data_std * mask
-                data_float = data_float * mask
-            else:
-                console.print("  [yellow]WARNING[/yellow]: volumetric masking not implemented")
-
-        n_scans = np.shape(data_std)[1]
-        data_allrun.append(data_std)
+        # scans of the runs kept so far: this run's start in the concatenation,
+        # so onsets stay aligned when an earlier run was skipped
+        run_start = offset
+        zscore_run_into(conc_data_std[offset:offset + n_scans], data[:, start_scans:])
+        offset += n_scans
+        del data
         run_step_times[run_num]["zscore_mask"] = time.time() - _t
 
-        # ── Step 3: first_level_from_bids (events + confounds + TR) ──────────
-        _t = time.time()
-        img_filters = [("desc", "preproc"), ("ses", session), ("run", run_num)]
-        try:
-            l1 = first_level_from_bids(
-                bids_dir,
-                task,
-                space_label="T1w",
-                sub_labels=[subject],
-                slice_time_ref=slice_time_ref,
-                hrf_model="spm",
-                drift_model=None,
-                drift_order=0,
-                high_pass=None,
-                img_filters=img_filters,
-                derivatives_folder=fmriprep_dir,
-            )
-        except (TypeError, FileNotFoundError, IndexError) as e:
-            console.print(f"  [yellow]WARNING[/yellow]: error processing run {run_num}: {e} — skipping")
-            continue
-        run_step_times[run_num]["first_level_from_bids"] = time.time() - _t
-        console.print(
-            f"  [dim]first_level_from_bids: {run_step_times[run_num]['first_level_from_bids']:.1f} s[/dim]"
-        )
-
-        # ── Step 4: confound processing ───────────────────────────────────────
+        # ── Step 3: confound processing ───────────────────────────────────────
         _t = time.time()
-        t_r      = l1[0][0].t_r
-        events   = l1[2][0][0]
-        confounds = l1[3][0][0]
-        events.loc[:, "onset"] = events["onset"] + idx * n_scans * t_r
+        t_r, events, confounds = session_inputs[run_num]
+        events.loc[:, "onset"] = events["onset"] + run_start * t_r
 
         events_nobaseline = events[events.loc[:, "trial_type"] != "baseline"]
         events_allrun.append(events_nobaseline)
-        store_l1.append(l1)
 
         motion_keys = [
             "framewise_displacement",
@@ -381,7 +575,7 @@ def prepare_glm_input(
         confounds_keep = confounds_keep.iloc[start_scans:]
         confounds_allrun.append(confounds_keep)
 
-        frame_times = t_r * ((np.arange(n_scans) + slice_time_ref) + idx * n_scans)
+        frame_times = t_r * ((np.arange(n_scans) + slice_time_ref) + run_start)
         frame_time_allrun.append(frame_times)
         run_step_times[run_num]["confounds"] = time.time() - _t
         console.print(
@@ -391,7 +585,7 @@ def prepare_glm_input(
 
     # ── Per-run timing summary table ──────────────────────────────────────────
     if run_step_times:
-        step_cols = ["load_func", "zscore_mask", "first_level_from_bids", "confounds"]
+        step_cols = ["load_func", "zscore_mask", "confounds"]
         tbl_run = Table(title="Per-run step timing (s)", box=box.SIMPLE_HEAD)
         tbl_run.add_column("run")
         for s in step_cols:
@@ -408,7 +602,7 @@ def prepare_glm_input(
 
     # ── Step 5: build design matrix ───────────────────────────────────────────
     _t = time.time()
-    conc_data_std   = np.concatenate(data_allrun, axis=1)
+    conc_data_std   = conc_data_std[:offset]
     concat_frame_times = np.concatenate(frame_time_allrun, axis=0)
     concat_events   = pd.concat(events_allrun, axis=0)
     concat_events   = concat_events.applymap(replace_prefix_and_suffix)
@@ -436,7 +630,7 @@ def prepare_glm_input(
         f"  [dim]design_matrix build: {t_design:.2f} s[/dim]"
     )
 
-    return conc_data_std, design_matrix_std, contrasts
+    return conc_data_std, design_matrix_std, contrasts, feature_mask
 
 
 def _load_rerun_exclusions(rerun_tsv: str) -> dict[tuple[str, str, str], set[str]]:
@@ -522,24 +716,87 @@ def generate_run_groups(
     return run_list, randrun_idx
 
 
+def glm_fingerprint(
+    bids_dir, fmriprep_dir, fp_layout, label_dir,
+    subject, session, task, start_scans, space, slice_time_ref,
+    run_list, use_smoothed, sm, apply_label_as_mask, hemi=None,
+):
+    """
+    Fingerprint of everything the fit of one run list depends on.
+
+    Covers the BOLD, events, confounds and sidecar files of every run, the
+    mask files, and the GLM parameters; not the contrast file.
+    """
+    index = glm_inputs.index_session(bids_dir, fmriprep_dir, subject, session, task)
+    files = []
+    for run_num in run_list:
+        entry = index.get(run_num, {})
+        files += [f for f in (entry.get("events"), entry.get("confounds")) if f]
+        files += entry.get("sidecars", [])
+        func_file, _ = find_func_file(
+            fp_layout, subject, session, task, run_num, space, use_smoothed, sm, hemi,
+        )
+        if func_file:
+            files.append(func_file)
+    if space in ["fsnative", "fsaverage"]:
+        if apply_label_as_mask:
+            files.append(op.join(label_dir, apply_label_as_mask))
+    else:
+        files += volume_mask_files(
+            fp_layout, label_dir, apply_label_as_mask, subject, session, task, space, run_list,
+        )
+    return glm_cache.fingerprint(
+        files,
+        subject=subject, session=session, task=task, space=space, hemi=hemi,
+        run_list=list(run_list), start_scans=start_scans, slice_time_ref=slice_time_ref,
+        use_smoothed=use_smoothed, sm=sm, mask=apply_label_as_mask,
+    )
+
+
 def process_run_list(
     bids_dir, fmriprep_dir, fp_layout, label_dir, contrast_fpath,
     subject, session, output_name, task, start_scans, space, slice_time_ref,
     run_list, use_smoothed, sm, apply_label_as_mask, dry_run,
-    randrun_idx=None, hemi=None,
+    randrun_idx=None, hemi=None, use_cache=True,
 ) -> dict[str, float]:
     """
     Build GLM inputs and run the GLM for one run-list / hemisphere combination.
 
+    With *use_cache*, a fit whose inputs are unchanged is reloaded from
+    ``.glm_cache`` in the output directory instead of refitted, and only
+    new or changed contrasts are computed.
+
     Returns
     -------
     dict[str, float]
-        Per-contrast wall-clock seconds (empty dict in dry-run mode).
+        Per-contrast wall-clock seconds (empty dict in dry-run mode or when
+        everything is up to date).
     """
     label = f"hemi-{hemi}" if hemi else "volumetric"
     console.print(f"\n[bold]Processing {label}[/bold]  runs: {run_list}")
 
-    conc_data_std, design_matrix_std, contrasts = prepare_glm_input(
+    cache = None
+    if use_cache and not dry_run:
+        key = glm_fingerprint(
+            bids_dir, fmriprep_dir, fp_layout, label_dir,
+            subject, session, task, start_scans, space, slice_time_ref,
+            run_list, use_smoothed, sm, apply_label_as_mask, hemi,
+        )
+        cache = glm_cache.FitCache(
+            l1_outdir(bids_dir, output_name, subject, session),
+            f"{label}{randrun_idx or ''}", key,
+        )
+        if cache.has_fit():
+            console.print(f"  Inputs unchanged [dim](fit {key[:12]})[/dim] — reusing cached fit")
+            design_matrix_std = cache.load_design_matrix()
+            contrasts = load_contrasts(contrast_fpath, design_matrix_std)
+            return glm_l1(
+                None, design_matrix_std, contrasts,
+                bids_dir, task, space, subject, session,
+                output_name, use_smoothed, sm, randrun_idx, hemi, cache=cache,
+            )
+
+    conc_data_std, design_matrix_std, contrasts, feature_mask = prepare_glm_input(
         bids_dir, fmriprep_dir, fp_layout, label_dir, contrast_fpath,
         subject, session, output_name, task, start_scans, space, slice_time_ref,
         run_list, use_smoothed, sm, apply_label_as_mask, hemi,
@@ -553,7 +810,7 @@ def process_run_list(
     return glm_l1(
         conc_data_std, design_matrix_std, contrasts,
         bids_dir, task, space, subject, session,
-        output_name, use_smoothed, sm, randrun_idx, hemi,
+        output_name, use_smoothed, sm, randrun_idx, hemi, feature_mask, cache,
     )
 
 
@@ -561,7 +818,7 @@ def run_power_analysis(
     bids_dir, fmriprep_dir, fp_layout, label_dir, contrast_fpath,
     subject, session, base_output_name, task, start_scans, space, slice_time_ref,
     use_smoothed, sm, apply_label_as_mask, dry_run,
-    total_runs, n_iterations, seed, hemi=None,
+    total_runs, n_iterations, seed, hemi=None, use_cache=True,
 ) -> None:
     """Run power analysis: total_runs × n_iterations GLMs."""
     label = f"hemi-{hemi}" if hemi else "volumetric"
@@ -594,7 +851,7 @@ def run_power_analysis(
                 subject, session, iter_output, task, start_scans,
                 space, slice_time_ref,
                 run_list, use_smoothed, sm, apply_label_as_mask, dry_run,
-                randrun_idx, hemi,
+                randrun_idx, hemi, use_cache,
             )
 
             elapsed = time.time() - t_iter
@@ -745,7 +1002,7 @@ def main(
     use_smoothed: bool = typer.Option(False, "--use-smoothed", help="Use smoothed functional files"),
     dry_run: bool = typer.Option(False, "--dry-run", help="Print design matrix / confounds; do not write outputs"),
     sm: str = typer.Option("", "--sm", help="FreeSurfer FWHM smoothing label, e.g. 05"),
-    mask: str = typer.Option("", "--mask", help="FreeSurfer label file to apply as mask"),
+    mask: str = typer.Option("", "--mask", help="FreeSurfer label file (surface) or NIfTI mask (volume) to restrict the fit to"),
     selected_runs: Optional[str] = typer.Option(
         None, "--selected-runs",
         help="Comma-separated run numbers to use, e.g. '1,3,5'. Default: all runs.",
@@ -762,6 +1019,10 @@ def main(
             "Ignored when --selected-runs is given."
         ),
     ),
+    no_cache: bool = typer.Option(
+        False, "--no-cache",
+        help="Bypass the .glm_cache: refit from scratch, leaving any cached fit untouched",
+    ),
 ) -> None:
     t0 = time.time()
 
@@ -815,6 +1076,7 @@ def main(
         rerun_map if rerun_map else "[dim]— (no exclusions)[/dim]",
     )
     tbl_launch.add_row("Mode",              mode_str)
+    tbl_launch.add_row("Fit cache",         "off (--no-cache)" if no_cache else "on")
     if power_analysis:
         tbl_launch.add_row(
             "Power analysis",
@@ -848,7 +1110,7 @@ def main(
                     bids_dir, fmriprep_dir, fp_layout, label_dir, contrast,
                     sub, ses, output_name, task, start_scans, space, slice_time_ref,
                     use_smoothed, sm, mask, dry_run,
-                    total_runs, n_iterations, seed, hemi,
+                    total_runs, n_iterations, seed, hemi, not no_cache,
                 )
             session_times[(sub, ses)] = time.time() - t_ses
             continue
@@ -867,7 +1129,7 @@ def main(
                     bids_dir, fmriprep_dir, fp_layout, label_dir, contrast,
                     sub, ses, output_name, task, start_scans, space, slice_time_ref,
                     run_list, use_smoothed, sm, mask, dry_run,
-                    randrun_idx, hemi,
+                    randrun_idx, hemi, not no_cache,
                 )
                 timing_per_hemi[f"hemi-{hemi}"] = timing
         else:
@@ -876,7 +1138,7 @@ def main(
                 bids_dir, fmriprep_dir, fp_layout, label_dir, contrast,
                 sub, ses, output_name, task, start_scans, space, slice_time_ref,
                 run_list, use_smoothed, sm, mask, dry_run,
-                randrun_idx, hemi=None,
+                randrun_idx, hemi=None, use_cache=not no_cache,
             )
             timing_per_hemi["volumetric"] = timing
 
@@ -887,10 +1149,14 @@ def main(
         console.rule(f"[cyan]sub-{sub} ses-{ses} — Contrast Timing[/cyan]", style="dim")
         if any(v for v in timing_per_hemi.values()):
             _print_timing_table(timing_per_hemi, ses_elapsed)
-        else:
+        elif dry_run:
             console.print(
                 f"  [dim]Dry-run — no outputs written.[/dim]  ({ses_elapsed:.1f} s)"
             )
+        else:
+            console.print(
+                f"  [dim]Up to date — nothing recomputed.[/dim]  ({ses_elapsed:.1f} s)"
+            )
 
     # ── Final summary across all sessions ────────────────────────────────────
     console.rule("[bold cyan]Run Summary[/bold cyan]")
@@ -0,0 +1,526 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Yongning Lei 2024-2025
+# All rights reserved.
+#
+# This script is distributed under the Apache-2.0 license.
+# You may use, distribute, and modify this code under the terms of the Apache-2.0 license.
+# See the LICENSE file for details.
+#
+# THIS SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE, AND NONINFRINGEMENT.
+#
+# Author: Yongning Lei
+# Email: yl4874@nyu.edu
+# GitHub: https://github.com/yongninglei
+# -----------------------------------------------------------------------------
+"""
+Node-level batch runner for run_glm.py.
+
+Instead of one scheduler job per session (launch_glm_slurm.sh) with the
+hemispheres fitted one after the other, this script takes a whole subseslist
+and runs every (sub, ses, hemi, run-set) GLM as one work item on a process
+pool sized to the node:
+
+    python run_glm_batch.py --base /scratch/tlei/VOTCLOC -f subseslist.txt \\
+        --fp-ana-name 25.1.4_newest --task fLoc --space fsnative \\
+        --start-scans 6 --contrast contrast_votcloc_all.yaml \\
+        --output-name batch --threads-per-worker 2
+
+Every worker is capped to ``--threads-per-worker`` BLAS/OpenMP/joblib threads
+(set in the environment before numpy loads, plus threadpoolctl when
+installed), so ``workers x threads`` never exceeds the CPUs this process may
+use (``sched_getaffinity``, i.e. the Slurm/SGE allocation).  The fMRIPrep
+layout is indexed once into a pybids database that the workers open instead
+of re-indexing.  Each item logs to its own file under ``--log-dir``; the
+console shows one line per finished item and a summary table.
+
+The per-item work is ``run_glm.process_run_list``, so the fit cache, masks and
+outputs are exactly those of run_glm.py.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import multiprocessing as mp
+import os
+import os.path as op
+import shutil
+import tempfile
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Optional
+
+import typer
+from rich import box
+from rich.console import Console
+from rich.table import Table
+
+console = Console()
+app = typer.Typer(add_completion=False, pretty_exceptions_show_locals=False)
+
+_RUN_GLM_PY = op.join(op.dirname(op.abspath(__file__)), "run_glm.py")
+
+# thread pools that numpy/scipy (BLAS, OpenMP) and joblib size from the environment
+THREAD_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "BLIS_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+    "LOKY_MAX_CPU_COUNT",
+)
+
+
+def node_cpus() -> int:
+    """CPUs this process may run on (the job allocation, not the whole node)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def limit_threads(n_threads: int) -> None:
+    """
+    Cap BLAS/OpenMP/joblib threads of this process and the ones it starts.
+
+    The environment only takes effect for libraries not loaded yet, so call
+    this before numpy is imported; threadpoolctl (if installed) also caps
+    pools that are already running.
+    """
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(n_threads)
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return
+    threadpool_limits(n_threads)
+
+
+def _load_run_glm():
+    import importlib.util
+    import sys
+
+    if "_run_glm_mod" not in sys.modules:
+        spec = importlib.util.spec_from_file_location("_run_glm_mod", _RUN_GLM_PY)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules["_run_glm_mod"] = module
+        spec.loader.exec_module(module)
+    return sys.modules["_run_glm_mod"]
+
+
+# ---------------------------------------------------------------------------
+# Worker side
+# ---------------------------------------------------------------------------
+
+_worker: dict = {}
+
+
+def _init_worker(n_threads, fmriprep_dir, database_path):
+    limit_threads(n_threads)
+    from bids import BIDSLayout
+
+    _worker["run_glm"] = _load_run_glm()
+    _worker["fp_layout"] = BIDSLayout(
+        fmriprep_dir,
+        validate=False,
+        database_path=database_path,
+    )
+
+
+def _run_item(item: dict, params: dict) -> dict:
+    """Run one GLM work item; all its output is appended to ``item["log"]``."""
+    run_glm = _worker["run_glm"]
+    t0 = time.time()
+    status, timing = "failed", {}
+    with open(item["log"], "a") as fh, contextlib.redirect_stderr(fh):
+        run_glm.console = Console(file=fh, width=120, soft_wrap=True)
+        run_glm.console.rule(f"{item['key']}  {time.strftime('%Y-%m-%d %H:%M:%S')}")
+        try:
+            timing = run_glm.process_run_list(
+                params["bids_dir"],
+                params["fmriprep_dir"],
+                _worker["fp_layout"],
+                item["label_dir"],
+                params["contrast"],
+                item["sub"],
+                item["ses"],
+                item["output_name"],
+                params["task"],
+                params["start_scans"],
+                params["space"],
+                params["slice_time_ref"],
+                item["run_list"],
+                params["use_smoothed"],
+                params["sm"],
+                params["mask"],
+                params["dry_run"],
+                item["randrun_idx"],
+                item["hemi"],
+                params["use_cache"],
+            )
+            if timing:
+                status = "done"
+            else:
+                status = "dry-run" if params["dry_run"] else "up to date"
+        except Exception:
+            fh.write(traceback.format_exc())
+    return {
+        "key": item["key"],
+        "status": status,
+        "elapsed": time.time() - t0,
+        "n_contrasts": len(timing),
+        "log": item["log"],
+    }
+
+
+# ---------------------------------------------------------------------------
+# Scheduling
+# ---------------------------------------------------------------------------
+
+
+def build_work_items(
+    run_glm,
+    layout,
+    pairs,
+    fsdir,
+    log_dir,
+    task,
+    space,
+    output_name,
+    selected_runs_list,
+    rerun_excl,
+    power_analysis,
+    total_runs,
+    n_iterations,
+    seed,
+) -> tuple[list[dict], list[tuple[str, str]]]:
+    """
+    One item per (sub, ses, hemi, run-set).
+
+    Returns
+    -------
+    tuple
+        (items, [(session key, error) for sessions that could not be scheduled])
+    """
+    hemis = ["L", "R"] if space in ["fsnative", "fsaverage"] else [None]
+    items: list[dict] = []
+    skipped: list[tuple[str, str]] = []
+
+    for sub, ses in pairs:
+        # (run_list, randrun_idx, output_name) per run set
+        if power_analysis:
+            run_sets = []
+            for num_of_runs in range(1, total_runs + 1):
+                combinations = run_glm.generate_random_run_combinations(
+                    total_runs,
+                    num_of_runs,
+                    n_iterations,
+                    seed,
+                )
+                for iter_num, selected in enumerate(combinations, start=1):
+                    run_sets.append(
+                        (
+                            [f"{r:02d}" for r in selected],
+                            f"_run-{''.join(map(str, selected))}",
+                            f"{output_name}/power_analysis_{num_of_runs}_run/iter_{iter_num:02d}",
+                        )
+                    )
+        else:
+            excl_runs = rerun_excl.get((sub, ses, task), set())
+            try:
+                run_list, randrun_idx = run_glm.generate_run_groups(
+                    layout,
+                    sub,
+                    ses,
+                    task,
+                    selected_runs_list,
+                    excl_runs or None,
+                )
+            except ValueError as e:
+                skipped.append((f"sub-{sub} ses-{ses}", str(e)))
+                continue
+            run_sets = [(run_list, randrun_idx, output_name)]
+
+        for run_list, randrun_idx, item_output in run_sets:
+            for hemi in hemis:
+                hemi_label = f"hemi-{hemi}" if hemi else "volumetric"
+                key = f"sub-{sub} ses-{ses} {hemi_label}{randrun_idx or ''}"
+                if power_analysis:
+                    key += f" [{item_output.split('/', 1)[1]}]"
+                log_name = (
+                    key.replace(" ", "_")
+                    .replace("[", "")
+                    .replace("]", "")
+                    .replace("/", "_")
+                )
+                items.append(
+                    {
+                        "key": key,
+                        "sub": sub,
+                        "ses": ses,
+                        "hemi": hemi,
+                        "run_list": run_list,
+                        "randrun_idx": randrun_idx,
+                        "output_name": item_output,
+                        "label_dir": f"{fsdir}/sub-{sub}/label",
+                        "log": op.join(log_dir, f"{log_name}.log"),
+                    }
+                )
+    return items, skipped
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+
+@app.command()
+def main(
+    base: str = typer.Option(
+        ..., "--base", help="Base directory, e.g. /scratch/tlei/VOTCLOC"
+    ),
+    subses_arg: Optional[str] = typer.Option(
+        None, "-s", help="Single sub,ses pair, e.g. 01,09"
+    ),
+    file_arg: Optional[str] = typer.Option(
+        None, "-f", help="Path to subseslist TSV/CSV file"
+    ),
+    fp_ana_name: str = typer.Option(
+        ..., "--fp-ana-name", help="fMRIPrep analysis name"
+    ),
+    task: str = typer.Option(..., "--task", help="Task name, e.g. fLoc"),
+    start_scans: int = typer.Option(
+        ..., "--start-scans", help="Number of non-steady-state TRs to drop"
+    ),
+    space: str = typer.Option(
+        ..., "--space", help="Space: T1w | fsnative | fsaverage | MNI152NLin2009cAsym"
+    ),
+    contrast: str = typer.Option(
+        ..., "--contrast", help="Path to YAML contrast definition file"
+    ),
+    output_name: str = typer.Option(
+        ..., "--output-name", help="Output folder name label"
+    ),
+    input_dirname: str = typer.Option(
+        "BIDS", "--input-dir", "-i", help="Input BIDS dir name under base"
+    ),
+    slice_time_ref: float = typer.Option(
+        0.5, "--slice-time-ref", help="Slice timing reference (fMRIPrep default 0.5)"
+    ),
+    use_smoothed: bool = typer.Option(
+        False, "--use-smoothed", help="Use smoothed functional files"
+    ),
+    dry_run: bool = typer.Option(
+        False, "--dry-run", help="Build design matrices only; do not write outputs"
+    ),
+    sm: str = typer.Option("", "--sm", help="FreeSurfer FWHM smoothing label, e.g. 05"),
+    mask: str = typer.Option(
+        "",
+        "--mask",
+        help="FreeSurfer label file (surface) or NIfTI mask (volume) to restrict the fit to",
+    ),
+    selected_runs: Optional[str] = typer.Option(
+        None,
+        "--selected-runs",
+        help="Comma-separated run numbers to use, e.g. '1,3,5'. Default: all runs.",
+    ),
+    power_analysis: bool = typer.Option(
+        False, "--power-analysis", help="One work item per power-analysis run set"
+    ),
+    n_iterations: int = typer.Option(
+        10, "--n-iterations", help="Iterations per run count in power analysis"
+    ),
+    seed: int = typer.Option(42, "--seed", help="Random seed for power analysis"),
+    total_runs: int = typer.Option(
+        10, "--total-runs", help="Total runs available (power analysis)"
+    ),
+    rerun_map: Optional[str] = typer.Option(
+        None,
+        "--rerun-map",
+        help="Path to rerun_check.tsv (see run_glm.py). Ignored when --selected-runs is given.",
+    ),
+    no_cache: bool = typer.Option(
+        False, "--no-cache", help="Bypass the .glm_cache and refit from scratch"
+    ),
+    workers: int = typer.Option(
+        0,
+        "--workers",
+        "-j",
+        help="Parallel GLMs. Default: available CPUs // --threads-per-worker",
+    ),
+    threads_per_worker: int = typer.Option(
+        1,
+        "--threads-per-worker",
+        help="BLAS/OpenMP/joblib threads per GLM",
+    ),
+    log_dir: Optional[str] = typer.Option(
+        None,
+        "--log-dir",
+        help="Per-item logs. Default: <BIDS>/derivatives/l1_surface/analysis-<output_name>/logs",
+    ),
+) -> None:
+    t0 = time.time()
+
+    # Cap threads before run_glm.py (numpy, scipy, nilearn) is imported here,
+    # so the parent and every spawned worker start with the same limits
+    n_cpus = node_cpus()
+    threads = max(1, threads_per_worker)
+    limit_threads(threads)
+    n_workers = workers if workers > 0 else max(1, n_cpus // threads)
+
+    run_glm = _load_run_glm()
+    from bids import BIDSLayout
+
+    pairs = run_glm._parse_pairs(subses_arg, file_arg)
+    selected_runs_list: Optional[List[int]] = None
+    if selected_runs:
+        selected_runs_list = [int(r.strip()) for r in selected_runs.split(",")]
+
+    bids_dir = op.join(base, input_dirname)
+    fsdir = op.join(bids_dir, "derivatives", "freesurfer")
+    fmriprep_dir = op.join(bids_dir, "derivatives", f"fmriprep-{fp_ana_name}")
+    log_dir = log_dir or op.join(
+        bids_dir,
+        "derivatives",
+        "l1_surface",
+        f"analysis-{output_name}",
+        "logs",
+    )
+    os.makedirs(log_dir, exist_ok=True)
+
+    rerun_excl: dict[tuple[str, str, str], set[str]] = {}
+    if rerun_map:
+        rerun_excl = run_glm._load_rerun_exclusions(rerun_map)
+
+    # ── Layouts: raw BIDS for scheduling, fMRIPrep indexed once for workers ──
+    console.print("Creating BIDS layout …")
+    layout = BIDSLayout(bids_dir, validate=False)
+    db_dir = tempfile.mkdtemp(prefix="lc_glm_layout_")
+    database_path = op.join(db_dir, "fmriprep.db")
+    console.print("Creating fMRIPrep layout …")
+    BIDSLayout(fmriprep_dir, validate=False, database_path=database_path)
+
+    items, skipped = build_work_items(
+        run_glm,
+        layout,
+        pairs,
+        fsdir,
+        log_dir,
+        task,
+        space,
+        output_name,
+        selected_runs_list,
+        rerun_excl,
+        power_analysis,
+        total_runs,
+        n_iterations,
+        seed,
+    )
+    n_workers = min(n_workers, max(1, len(items)))
+
+    # ── Launch summary ───────────────────────────────────────────────────────
+    console.rule("[bold cyan]GLM Batch[/bold cyan]")
+    tbl_launch = Table(box=box.SIMPLE, show_header=False, padding=(0, 1))
+    tbl_launch.add_column("key", style="dim")
+    tbl_launch.add_column("value", style="bold")
+    tbl_launch.add_row("Sessions", str(len(pairs)))
+    tbl_launch.add_row("Work items", f"{len(items)}  (sub × ses × hemi × run set)")
+    tbl_launch.add_row("Space", space)
+    tbl_launch.add_row("Output name", output_name)
+    tbl_launch.add_row("CPUs available", str(n_cpus))
+    tbl_launch.add_row("Workers", str(n_workers))
+    tbl_launch.add_row("Threads / worker", str(threads))
+    tbl_launch.add_row(
+        "Mode", "[yellow]DRY-RUN[/yellow]" if dry_run else "[green]EXECUTE[/green]"
+    )
+    tbl_launch.add_row("Fit cache", "off (--no-cache)" if no_cache else "on")
+    tbl_launch.add_row("Logs", log_dir)
+    console.print(tbl_launch)
+    if n_workers * threads > n_cpus:
+        console.print(
+            f"[yellow]WARNING[/yellow]: {n_workers} workers × {threads} threads "
+            f"> {n_cpus} CPUs — cores will be oversubscribed"
+        )
+    for key, err in skipped:
+        console.print(f"  [yellow]WARNING[/yellow]: {key} not scheduled: {err}")
+
+    params = {
+        "bids_dir": bids_dir,
+        "fmriprep_dir": fmriprep_dir,
+        "contrast": contrast,
+        "task": task,
+        "start_scans": start_scans,
+        "space": space,
+        "slice_time_ref": slice_time_ref,
+        "use_smoothed": use_smoothed,
+        "sm": sm,
+        "mask": mask,
+        "dry_run": dry_run,
+        "use_cache": not no_cache,
+    }
+
+    # ── Run ──────────────────────────────────────────────────────────────────
+    results: list[dict] = []
+    try:
+        # spawn: workers start clean (no forked sqlite handles / BLAS pools)
+        with ProcessPoolExecutor(
+            max_workers=n_workers,
+            mp_context=mp.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(threads, fmriprep_dir, database_path),
+        ) as pool:
+            futures = {pool.submit(_run_item, item, params): item for item in items}
+            for n_done, fut in enumerate(as_completed(futures), start=1):
+                item = futures[fut]
+                try:
+                    res = fut.result()
+                except Exception as e:  # worker crashed (e.g. killed for memory)
+                    res = {
+                        "key": item["key"],
+                        "status": "failed",
+                        "elapsed": 0.0,
+                        "n_contrasts": 0,
+                        "log": item["log"],
+                    }
+                    console.print(
+                        f"  [red]ERROR[/red]: worker for {item['key']} died: {e!r}"
+                    )
+                results.append(res)
+                style = {"done": "green", "failed": "red"}.get(res["status"], "dim")
+                console.print(
+                    f"  [{n_done}/{len(items)}] {res['key']:<40} "
+                    f"[{style}]{res['status']}[/{style}]  {res['elapsed']:.1f} s"
+                )
+    finally:
+        shutil.rmtree(db_dir, ignore_errors=True)
+
+    # ── Summary ──────────────────────────────────────────────────────────────
+    wall = time.time() - t0
+    busy = sum(r["elapsed"] for r in results)
+    console.rule("[bold cyan]Batch Summary[/bold cyan]")
+    tbl_sum = Table(box=box.SIMPLE_HEAD)
+    tbl_sum.add_column("status", style="bold")
+    tbl_sum.add_column("items", justify="right")
+    for status in ("done", "up to date", "dry-run", "failed"):
+        n = sum(r["status"] == status for r in results)
+        if n:
+            tbl_sum.add_row(status, str(n))
+    console.print(tbl_sum)
+    console.print(
+        f"  [bold]Wall time:[/bold] {wall:.1f} s ({wall / 60:.1f} min)   "
+        f"[bold]GLM time summed over items:[/bold] {busy:.1f} s   "
+        f"[bold]Speed-up:[/bold] {busy / wall if wall else 0:.1f}×"
+    )
+
+    failed = [r for r in results if r["status"] == "failed"]
+    for r in failed:
+        console.print(f"  [red]FAILED[/red] {r['key']}  → {r['log']}")
+    if failed or skipped:
+        raise typer.Exit(1)
+
+
+if __name__ == "__main__":
+    app()
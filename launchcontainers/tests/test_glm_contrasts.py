@@ -0,0 +1,112 @@
+"""
+Batched contrasts of ``run_glm/glm_contrasts.py`` against nilearn.
+
+``iter_contrasts`` computes all t contrasts of a fit in stacked matrix
+products; every stat map must match ``nilearn.glm.contrasts.compute_contrast``
+called one contrast at a time.
+
+Run with::
+
+    pytest launchcontainers/tests/test_glm_contrasts.py -q
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import os.path as op
+
+import numpy as np
+import pytest
+
+pytest.importorskip("nilearn")
+
+from nilearn.glm.contrasts import compute_contrast
+from nilearn.glm.first_level.first_level import run_glm
+
+GLM_CONTRASTS_PY = op.join(
+    op.dirname(op.abspath(__file__)), "run_glm", "glm_contrasts.py"
+)
+
+N_SCANS = 160
+N_FEATURES = 300
+N_REGRESSORS = 8
+
+
+@pytest.fixture(scope="module")
+def glm_contrasts():
+    spec = importlib.util.spec_from_file_location(
+        "_test_glm_contrasts", GLM_CONTRASTS_PY
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="module")
+def design_and_data():
+    rng = np.random.default_rng(3)
+    X = np.column_stack(
+        [rng.standard_normal((N_SCANS, N_REGRESSORS - 1)), np.ones(N_SCANS)]
+    )
+    beta = rng.standard_normal((N_REGRESSORS, N_FEATURES))
+    beta[:, : N_FEATURES // 3] = 0  # null features, so p spans (0, 1)
+    noise = rng.standard_normal((N_SCANS, N_FEATURES))
+    noise[1:] += 0.4 * noise[:-1]  # some autocorrelation for AR(1) labels
+    return X, X @ beta + 3 * noise
+
+
+@pytest.fixture(scope="module")
+def contrasts():
+    rng = np.random.default_rng(4)
+    out = {f"c{i}": rng.standard_normal(N_REGRESSORS) for i in range(20)}
+    out["first"] = np.eye(N_REGRESSORS)[0]
+    out["AvsB"] = np.array([1.0, -1.0])  # shorter than the design: zero-padded
+    return out
+
+
+@pytest.mark.parametrize("noise_model", ["ols", "ar1"])
+def test_matches_compute_contrast(
+    glm_contrasts, design_and_data, contrasts, noise_model
+):
+    X, Y = design_and_data
+    labels, results = run_glm(Y, X, noise_model=noise_model, n_jobs=1)
+    got = dict(glm_contrasts.iter_contrasts(labels, results, contrasts, block_size=7))
+    assert list(got) == list(contrasts)
+
+    for cid, con_val in contrasts.items():
+        ref = compute_contrast(labels, results, con_val)
+        expected = {
+            "effect": ref.effect_size(),
+            "t": ref.stat(),
+            "z": ref.z_score(),
+            "p": ref.p_value(),
+            "variance": ref.effect_variance(),
+        }
+        for st, ref_map in expected.items():
+            np.testing.assert_allclose(
+                got[cid][st], ref_map, rtol=1e-10, atol=1e-12, err_msg=f"{cid} {st}"
+            )
+
+
+def test_requested_stats_only(glm_contrasts, design_and_data, contrasts):
+    X, Y = design_and_data
+    labels, results = run_glm(Y, X, noise_model="ar1", n_jobs=1)
+    for _, maps in glm_contrasts.iter_contrasts(
+        labels, results, contrasts, ["effect", "t"]
+    ):
+        assert set(maps) == {"effect", "t"}
+
+
+def test_f_contrast_falls_back_to_nilearn(glm_contrasts, design_and_data):
+    X, Y = design_and_data
+    labels, results = run_glm(Y, X, noise_model="ols", n_jobs=1)
+    con_val = np.eye(N_REGRESSORS)[:2]
+    ((_, maps),) = glm_contrasts.iter_contrasts(labels, results, {"F": con_val})
+    np.testing.assert_allclose(
+        maps["t"], compute_contrast(labels, results, con_val).stat()
+    )
+
+
+def test_contrast_too_long(glm_contrasts):
+    with pytest.raises(ValueError, match="length"):
+        glm_contrasts.contrast_matrix([np.ones(N_REGRESSORS + 1)], N_REGRESSORS)
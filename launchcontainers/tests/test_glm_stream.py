@@ -0,0 +1,94 @@
+"""
+Streaming GLM of ``run_glm/glm_stream.py`` against nilearn.
+
+The runs are spilled to a ``RunStore`` and fitted from sufficient statistics;
+labels and every contrast must match ``nilearn.glm.first_level.run_glm`` on
+the concatenated data followed by ``compute_contrast``.
+
+Run with::
+
+    pytest launchcontainers/tests/test_glm_stream.py -q
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import os.path as op
+
+import numpy as np
+import pytest
+
+pytest.importorskip("nilearn")
+
+from nilearn.glm.contrasts import compute_contrast
+from nilearn.glm.first_level.first_level import run_glm
+
+GLM_STREAM_PY = op.join(op.dirname(op.abspath(__file__)), "run_glm", "glm_stream.py")
+
+RUN_SCANS = [70, 50, 40]  # unequal runs, concatenated
+N_FEATURES = 250
+N_REGRESSORS = 6
+
+
+@pytest.fixture(scope="module")
+def glm_stream():
+    spec = importlib.util.spec_from_file_location("_test_glm_stream", GLM_STREAM_PY)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="module")
+def design_and_data():
+    rng = np.random.default_rng(7)
+    n_scans = sum(RUN_SCANS)
+    X = np.column_stack(
+        [rng.standard_normal((n_scans, N_REGRESSORS - 1)), np.ones(n_scans)]
+    )
+    beta = rng.standard_normal((N_REGRESSORS, N_FEATURES))
+    noise = rng.standard_normal((n_scans, N_FEATURES))
+    noise[1:] += 0.4 * noise[:-1]  # some autocorrelation for AR(1) labels
+    return X, X @ beta + 3 * noise
+
+
+@pytest.fixture
+def store(glm_stream, design_and_data, tmp_path):
+    _, Y = design_and_data
+    store = glm_stream.RunStore(str(tmp_path))
+    for run in np.split(Y, np.cumsum(RUN_SCANS)[:-1]):
+        store.add(run.T)  # (n_features, n_scans), as prepare_*_input builds it
+    yield store
+    store.cleanup()
+
+
+@pytest.mark.parametrize("noise_model", ["ols", "ar1"])
+def test_matches_nilearn(glm_stream, design_and_data, store, noise_model):
+    X, Y = design_and_data
+    # the store holds float32 runs; compare against nilearn on the same values
+    Y32 = Y.astype(np.float32).astype(np.float64)
+    ref_labels, ref_results = run_glm(Y32, X, noise_model=noise_model, n_jobs=1)
+    labels, results = glm_stream.run_glm(store, X, noise_model=noise_model)
+
+    if noise_model == "ar1":
+        np.testing.assert_array_equal(labels, ref_labels)
+        assert len(np.unique(labels)) > 1
+
+    rng = np.random.default_rng(8)
+    contrasts = [np.eye(N_REGRESSORS)[0], rng.standard_normal(N_REGRESSORS)]
+    for con_val in contrasts:
+        ref = compute_contrast(ref_labels, ref_results, con_val)
+        got = compute_contrast(labels, results, con_val)
+        np.testing.assert_allclose(got.effect_size(), ref.effect_size(), rtol=1e-10)
+        np.testing.assert_allclose(
+            got.effect_variance(), ref.effect_variance(), rtol=1e-10
+        )
+        np.testing.assert_allclose(got.stat(), ref.stat(), rtol=1e-10, atol=1e-12)
+
+
+def test_runs_must_share_features(glm_stream, tmp_path):
+    store = glm_stream.RunStore(str(tmp_path))
+    store.add(np.zeros((5, 10)))
+    with pytest.raises(ValueError, match="features"):
+        store.add(np.zeros((4, 10)))
+    assert store.shape == (5, 10)
+    store.cleanup()
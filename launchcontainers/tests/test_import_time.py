@@ -0,0 +1,97 @@
+"""
+Import-time benchmark for the ``lc`` and ``checker`` entry points.
+
+Each entry module is imported in a fresh interpreter (``python -X importtime``)
+so the numbers are cold-start costs, as paid by ``lc --help`` or a dry
+``lc run``.  The tests fail when
+
+- a heavy scientific dependency (pandas, pybids, nibabel, ...) is imported at
+  module level again, or
+- the cumulative import time exceeds the budget.
+
+The budget defaults to 1 s and can be changed with ``LC_IMPORT_BUDGET_S`` on
+slow (e.g. NFS-hosted) environments.
+
+Run with::
+
+    pytest launchcontainers/tests/test_import_time.py -q
+"""
+
+from __future__ import annotations
+
+import os
+import os.path as op
+import subprocess as sp
+import sys
+
+import pytest
+
+REPO_ROOT = op.dirname(op.dirname(op.dirname(op.abspath(__file__))))
+
+ENTRY_MODULES = [
+    "launchcontainers.cli",
+    "launchcontainers.do_launch",
+    "launchcontainers.do_prepare",
+    "launchcontainers.do_workflow",
+    "launchcontainers.do_qc",
+    "launchcontainers.do_estimate",
+    "analysis_checker.check_analysis_integrity",
+]
+
+# packages that must only be imported inside the code paths that use them
+HEAVY_PACKAGES = {
+    "bids",
+    "h5py",
+    "matplotlib",
+    "nibabel",
+    "nilearn",
+    "numpy",
+    "pandas",
+    "scipy",
+}
+
+BUDGET_S = float(os.environ.get("LC_IMPORT_BUDGET_S", "1.0"))
+
+
+def _import_profile(module: str) -> tuple[dict[str, int], int]:
+    """
+    Import ``module`` in a fresh interpreter.
+
+    Returns
+    -------
+    tuple[dict[str, int], int]
+        Cumulative import time in microseconds of every imported module, and
+        the cumulative time of ``module`` itself.
+    """
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    proc = sp.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=False,
+        env=env,
+        cwd=REPO_ROOT,
+    )
+    assert proc.returncode == 0, proc.stderr
+    cumulative = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cum, name = line[len("import time:") :].split("|")
+        cumulative[name.strip()] = int(cum)
+    return cumulative, cumulative[module]
+
+
+@pytest.mark.parametrize("module", ENTRY_MODULES)
+def test_no_heavy_imports(module):
+    imported, _ = _import_profile(module)
+    heavy = sorted(HEAVY_PACKAGES & {name.split(".")[0] for name in imported})
+    assert not heavy, f"{module} imports {heavy} at module level"
+
+
+@pytest.mark.parametrize("module", ENTRY_MODULES)
+def test_import_time_budget(module):
+    _, total_us = _import_profile(module)
+    assert total_us / 1e6 < BUDGET_S, (
+        f"importing {module} took {total_us / 1e6:.2f}s (budget {BUDGET_S:.2f}s)"
+    )
@@ -0,0 +1,41 @@
+"""
+``permission_mode`` parsing of ``prepare/permissions.py``.
+
+YAML reads an unquoted ``500`` as decimal 500 and ``0755`` as 493, so only
+quoted octal strings are accepted.
+
+Run with::
+
+    pytest launchcontainers/tests/test_permissions.py -q
+"""
+
+from __future__ import annotations
+
+import pytest
+import yaml
+
+from launchcontainers.prepare.permissions import DEFAULT_MODE, parse_mode
+
+
+def _yaml_value(text):
+    return yaml.safe_load(f"permission_mode: {text}")["permission_mode"]
+
+
+@pytest.mark.parametrize(
+    "text, mode",
+    [('"0o755"', 0o755), ('"775"', 0o775), ("'2775'", 0o2775), ("null", DEFAULT_MODE)],
+)
+def test_quoted_modes(text, mode):
+    assert parse_mode(_yaml_value(text)) == mode
+
+
+@pytest.mark.parametrize("text", ["500", "777", "0755", "true"])
+def test_unquoted_modes_rejected(text):
+    with pytest.raises(ValueError, match="quoted"):
+        parse_mode(_yaml_value(text))
+
+
+@pytest.mark.parametrize("value", ["8", "rwx", "0o17777"])
+def test_invalid_strings_rejected(value):
+    with pytest.raises(ValueError):
+        parse_mode(value)
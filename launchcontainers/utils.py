@@ -28,11 +28,10 @@ import uuid
 from datetime import datetime
 from pathlib import Path
 
-import pandas as pd
 import yaml
 from yaml.loader import SafeLoader
 
-from launchcontainers.log_setup import console
+from launchcontainers.log_setup import console, log_event
 
 
 def parse_hms(ts: str) -> str:
@@ -152,6 +151,24 @@ def substitute_run(name: str, new_run_int: int, zero_pad: int = 2) -> str:
     return _RUN_RE.sub(f"_run-{new_run_int:0{zero_pad}d}", name, count=1)
 
 
+_NII_RE = re.compile(r"\.nii(\.gz)?$")
+_ENTITY_RE = re.compile(r"^([a-zA-Z]+)-([a-zA-Z0-9]+)$")
+
+
+def parse_bids_name(name: str) -> tuple[dict[str, str], str]:
+    """Split a BIDS file name into its entities and suffix."""
+    stem = _NII_RE.sub("", name)
+    if stem.endswith(".json"):
+        stem = stem[:-5]
+    parts = stem.split("_")
+    entities = {}
+    for part in parts[:-1]:
+        m = _ENTITY_RE.match(part)
+        if m:
+            entities[m.group(1)] = m.group(2)
+    return entities, parts[-1]
+
+
 def atomic_rename_pairs(
     pairs: list[tuple[Path, Path]],
     dry_run: bool = True,
@@ -300,6 +317,15 @@ def read_yaml(path_to_config_file):
     return config
 
 
+_SUBSES_RE = re.compile(r"sub-([^/_]+)(?:.*?ses-([^/_]+))?")
+
+
+def _subses_of(path) -> dict:
+    """Best-effort ``sub``/``ses`` labels of a BIDS-like path, for log events."""
+    match = _SUBSES_RE.search(str(path))
+    if match is None:
+        return {}
+    return {"sub": match.group(1), "ses": match.group(2)}
 
 
 def copy_file(src_file, dst_file, force):
@@ -325,7 +351,6 @@ def copy_file(src_file, dst_file, force):
     FileExistsError
         If the source file does not exist.
     """
-    console.print("\n" + "=" * 30 + "COPY_FILE_WORKING" + "=" * 30, style="cyan")
     if not os.path.isfile(src_file):
         console.print("\n \u274c Source file does not exist.", style="red")
         raise FileExistsError("the source file is not here")
@@ -335,12 +360,10 @@ def copy_file(src_file, dst_file, force):
             os.path.isfile(dst_file) and force
         ):
             shutil.copy(src_file, dst_file)
-            console.print(
-                "\n"
-                + f"\u2705 {src_file} has been successfully copied to \
-                     {os.path.dirname(dst_file)} directory \n"
-                + "\U0001f37a REMEMBER TO CHECK/EDIT TO HAVE THE CORRECT PARAMETERS IN THE FILE\n",
-                style="cyan",
+            log_event(
+                "copy_file",
+                f"{src_file} -> {dst_file} (check/edit the parameters in the file)",
+                **_subses_of(dst_file),
             )
         elif os.path.isfile(dst_file) and not force:
             console.print(
@@ -413,18 +436,14 @@ def force_symlink(file1, file2, force):
     OSError
         If the source is missing or the link cannot be created.
     """
-    console.print("\n" + "=" * 30 + "SYMLINK_WORKING" + "=" * 30, style="cyan")
+    subses = _subses_of(file2)
     # If force is set to False (we do not want to overwrite)
     if not force:
         try:
             # Try the command, if the files are correct and the symlink does not exist, create one
 
             os.symlink(file1, file2)
-            console.print(
-                "\n"
-                + f"\u2705 Created symlink for source file: {file1} and destination file: {file2}\n",
-                style="cyan",
-            )
+            log_event("symlink", f"{file1} -> {file2}", **subses)
         # If raise [erron 2]: file does not exist, print the error and pass
         except OSError as n:
             if n.errno == 2:
@@ -445,30 +464,16 @@ def force_symlink(file1, file2, force):
 
     # If we set force to True (we want to overwrite)
     if force:
-        console.print(
-            "\n"
-            + "---force is set to True, we will overwrite the existing symlink if it exist\n",
-            style="cyan",
-        )
         try:
             # Try the command, if the file are correct and symlink not exist, it will create one
             os.symlink(file1, file2)
-            console.print(
-                "\n"
-                + f"\u2705 Created symlink for source file: {file1} and destination file: {file2}\n",
-                style="cyan",
-            )
+            log_event("symlink", f"{file1} -> {file2}", **subses)
         # If the symlink exists, OSError will be raised
         except OSError as e:
             if e.errno == errno.EEXIST:
                 os.remove(file2)
-                console.print("\n" + "Overwriting the existing symlink", style="yellow")
                 os.symlink(file1, file2)
-                console.print(
-                    "\n"
-                    + f"\u2705 Created symlink for source file: {file1} and destination file: {file2}\n",
-                    style="cyan",
-                )
+                log_event("symlink", f"{file1} -> {file2} (overwritten)", **subses)
             elif e.errno == 2:
                 console.print(
                     "\n"
@@ -502,9 +507,10 @@ def check_symlink(path: str) -> None:
     """
     if op.islink(path):
         if op.exists(path):
-            console.print(
-                f" √ Symlink {path!r} is valid and points to {op.realpath(path)!r}",
-                style="cyan",
+            log_event(
+                "check_symlink",
+                f"{path} -> {op.realpath(path)}",
+                **_subses_of(path),
             )
         else:
             target = os.readlink(path)
@@ -515,4 +521,4 @@ def check_symlink(path: str) -> None:
             raise FileNotFoundError(f"Broken symlink: {path!r} → {target!r}")
 
     else:
-        console.print(f" {path!r} is not a symlink", style="cyan")
+        log_event("check_symlink", f"{path} is not a symlink", **_subses_of(path))